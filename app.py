@@ -1,18 +1,233 @@
+import atexit
 import os
 import logging
+from functools import partial
 
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
+from slack_bolt.authorization.authorize import InstallationStoreAuthorize
+from slack_bolt.oauth.oauth_settings import OAuthSettings
+from slack_sdk.oauth.installation_store.sqlite3 import SQLite3InstallationStore
+from slack_sdk.oauth.state_store.sqlite3 import SQLite3OAuthStateStore
 
+from lib.attachment_budget import AttachmentBudget, configure_attachment_budget
+from lib.dedupe import InMemoryDedupeStore, SQLiteDedupeStore, build_dedupe_middleware, configure_dedupe_store
+from lib.job_queue import JobQueueWorker, SQLiteJobQueue, configure_job_queue
+from lib.sharding import ShardedDispatcher, configure_sharded_dispatcher, get_sharded_dispatcher
+from lib.slack_client import RateLimitedWebClient, SlackRateLimiter, build_rate_limit_middleware
+from lib.tracing import (
+    DEFAULT_LISTENER_THREADS,
+    ContextThreadPoolExecutor,
+    JsonlSpanExporter,
+    configure_span_exporter,
+    trace_app_dispatch,
+)
+from lib.constants import SUGGESTED_PROMPTS
+from lib.image_descriptions import ImageDescriptionCache, configure_image_descriptions
+from lib.installations import BOT_SCOPES, CachedInstallationStore
+from lib.logging_utils import configure_logging
+from lib.metrics import start_metrics_server
+from lib.prewarm import prewarm
+from lib.prompt_cache import (
+    PromptAnswerCache,
+    PromptPrewarmer,
+    SQLitePromptAnswerCache,
+    configure_prompt_cache,
+    parse_refresh_times,
+    prompt_messages,
+)
+from lib.usage import SQLiteUsageStore, UsageLimits, configure_usage_store
+from lib.user_directory import USER_DIRECTORY
+from lib.worker_pool import WorkerPool, configure_worker_pool
 from listeners import register_listeners
+from listeners.assistant import (
+    THREAD_RESPONSE_JOB,
+    run_sharded_thread_response,
+    run_thread_response_job,
+    thread_response_needs_replay,
+)
 
 # Initialization
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-app = App(token=os.environ.get("SLACK_BOT_TOKEN"))
+configure_logging(
+    level=os.environ.get("MOOAI_LOG_LEVEL", "INFO"),
+    json_output=os.environ.get("MOOAI_LOG_FORMAT", "json") == "json",
+    debug_per_second=int(os.environ.get("MOOAI_LOG_DEBUG_PER_SECOND", "50")),
+)
+# Serve every workspace that installs the app via OAuth when client credentials are set, instead of one bot token
+installation_store = None
+oauth_kwargs = {}
+if os.environ.get("SLACK_CLIENT_ID") and os.environ.get("SLACK_CLIENT_SECRET"):
+    installation_db_path = os.environ.get("MOOAI_INSTALLATION_DB_PATH", "mooai_installations.sqlite3")
+    installation_store = CachedInstallationStore(
+        SQLite3InstallationStore(database=installation_db_path, client_id=os.environ["SLACK_CLIENT_ID"]),
+        ttl_seconds=float(os.environ.get("MOOAI_INSTALLATION_CACHE_TTL_SECONDS", "300")),
+    )
+    oauth_kwargs = dict(
+        installation_store=installation_store,
+        oauth_settings=OAuthSettings(
+            client_id=os.environ["SLACK_CLIENT_ID"],
+            client_secret=os.environ["SLACK_CLIENT_SECRET"],
+            scopes=list(BOT_SCOPES),
+            redirect_uri=os.environ.get("SLACK_REDIRECT_URI"),
+            installation_store=installation_store,
+            state_store=SQLite3OAuthStateStore(database=installation_db_path, expiration_seconds=600),
+        ),
+        # Cache each token's auth.test result, so only a workspace's first event pays for it
+        authorize=InstallationStoreAuthorize(
+            logger=logging.getLogger("mooai.authorize"),
+            installation_store=installation_store,
+            client_id=os.environ["SLACK_CLIENT_ID"],
+            client_secret=os.environ["SLACK_CLIENT_SECRET"],
+            cache_enabled=True,
+        ),
+    )
+
+# One rate limiter for a single workspace; with OAuth each workspace gets its own, as Slack limits per workspace
+rate_limiter = SlackRateLimiter() if installation_store is None else None
+# Listener threads copy the dispatching thread's contextvars, so their spans join the event's trace
+app = App(
+    client=RateLimitedWebClient(token=os.environ.get("SLACK_BOT_TOKEN"), rate_limiter=rate_limiter),
+    listener_executor=ContextThreadPoolExecutor(max_workers=DEFAULT_LISTENER_THREADS),
+    **oauth_kwargs,
+)
+
+# Trace each event from receipt to reply when a span file is configured
+if os.environ.get("MOOAI_TRACE_PATH"):
+    configure_span_exporter(JsonlSpanExporter(os.environ["MOOAI_TRACE_PATH"]))
+    trace_app_dispatch(app)
+
+# Route every Slack API call through its workspace's pooled, rate-limited client (must run before the assistant middleware)
+app.use(build_rate_limit_middleware(rate_limiter))
+
+# Drop redelivered events; the SQLite backend shares dedupe state between bot instances
+dedupe_ttl = float(os.environ.get("MOOAI_DEDUPE_TTL_SECONDS", "3600"))
+if os.environ.get("MOOAI_DEDUPE_BACKEND", "memory") == "sqlite":
+    configure_dedupe_store(SQLiteDedupeStore(os.environ.get("MOOAI_DEDUPE_SQLITE_PATH", "mooai_dedupe.sqlite3"), dedupe_ttl))
+else:
+    configure_dedupe_store(InMemoryDedupeStore(dedupe_ttl))
+app.use(build_dedupe_middleware())
+
+# Account token usage per user, channel and workspace, and refuse agent runs past the configured quotas
+if os.environ.get("MOOAI_USAGE_DB_PATH"):
+    configure_usage_store(
+        SQLiteUsageStore(
+            os.environ["MOOAI_USAGE_DB_PATH"],
+            UsageLimits(
+                user_tokens_per_day=int(os.environ.get("MOOAI_USER_TOKENS_PER_DAY", "0")),
+                channel_tokens_per_day=int(os.environ.get("MOOAI_CHANNEL_TOKENS_PER_DAY", "0")),
+                team_tokens_per_day=int(os.environ.get("MOOAI_TEAM_TOKENS_PER_DAY", "0")),
+                user_requests_per_minute=int(os.environ.get("MOOAI_USER_REQUESTS_PER_MINUTE", "0")),
+            ),
+        )
+    )
+
+# Cap the attachment bytes all in-flight requests hold in memory; requests wait for room, then skip attachments
+attachment_budget_mb = int(os.environ.get("MOOAI_ATTACHMENT_BUDGET_MB", "256"))
+if attachment_budget_mb > 0:
+    configure_attachment_budget(
+        AttachmentBudget(
+            attachment_budget_mb * 1024 * 1024,
+            wait_seconds=float(os.environ.get("MOOAI_ATTACHMENT_BUDGET_WAIT_SECONDS", "5")),
+        )
+    )
+
+# Send earlier images as a cached description (caption and transcribed text) unless the latest message asks about them
+if os.environ.get("MOOAI_IMAGE_DESCRIPTIONS", "false").lower() == "true":
+    configure_image_descriptions(ImageDescriptionCache())
+
+# Run thread responses on a bounded background pool instead of inside the event handler
+execution_mode = os.environ.get("MOOAI_EXECUTION_MODE", "inline")
+worker_pool = None
+if execution_mode == "pool":
+    worker_pool = WorkerPool(
+        size=int(os.environ.get("MOOAI_WORKER_POOL_SIZE", "8")),
+        queue_size=int(os.environ.get("MOOAI_WORKER_QUEUE_SIZE", "100")),
+        overflow=os.environ.get("MOOAI_WORKER_OVERFLOW", "reject"),
+    )
+    configure_worker_pool(worker_pool)
+# The sharded and queue modes reply with app.client, which only has a token for a single workspace
+elif execution_mode in ("sharded", "queue") and installation_store is not None:
+    raise RuntimeError(f"MOOAI_EXECUTION_MODE={execution_mode} needs a single SLACK_BOT_TOKEN, not OAuth installations")
+# Or send each thread to the worker process that owns it, so that process's caches stay warm for the thread
+elif execution_mode == "sharded":
+    shard_workers = int(os.environ.get("MOOAI_SHARD_WORKERS", "0")) or os.cpu_count() or 1
+    # Each forked shard gets a copy of the rate limiter, so this process and every shard get an equal share of it
+    rate_limiter.set_share(1 / (shard_workers + 1))
+    configure_sharded_dispatcher(
+        ShardedDispatcher(
+            partial(run_sharded_thread_response, client=app.client, logger=logging.getLogger("mooai.shard")),
+            workers=shard_workers,
+            threads=int(os.environ.get("MOOAI_SHARD_THREADS", "8")),
+            should_replay=partial(thread_response_needs_replay, client=app.client),
+        )
+    )
+# Or persist thread responses in a SQLite queue that every process drains, so they survive restarts
+elif execution_mode == "queue":
+    job_queue = SQLiteJobQueue(
+        os.environ.get("MOOAI_JOB_QUEUE_PATH", "mooai_jobs.sqlite3"),
+        visibility_timeout=float(os.environ.get("MOOAI_JOB_VISIBILITY_TIMEOUT", "120")),
+        max_attempts=int(os.environ.get("MOOAI_JOB_MAX_ATTEMPTS", "3")),
+    )
+    configure_job_queue(job_queue)
+    JobQueueWorker(
+        job_queue,
+        {THREAD_RESPONSE_JOB: partial(run_thread_response_job, client=app.client, logger=logging.getLogger("mooai.jobs"))},
+        concurrency=int(os.environ.get("MOOAI_JOB_WORKERS", "4")),
+    ).start()
+
+# Answer new assistant threads that start with a suggested prompt from answers computed ahead of time
+# (the SQLite backend shares the answers, and who refreshes them, between processes and across restarts)
+prompt_cache = None
+if os.environ.get("MOOAI_PROMPT_CACHE", "false").lower() == "true":
+    prompt_cache_ttl = float(os.environ.get("MOOAI_PROMPT_CACHE_TTL_SECONDS", "86400"))
+    if os.environ.get("MOOAI_PROMPT_CACHE_BACKEND", "sqlite") == "sqlite":
+        prompt_cache = SQLitePromptAnswerCache(
+            os.environ.get("MOOAI_PROMPT_CACHE_SQLITE_PATH", "mooai_prompt_cache.sqlite3"), prompt_cache_ttl
+        )
+    else:
+        prompt_cache = PromptAnswerCache(prompt_cache_ttl)
+    configure_prompt_cache(prompt_cache)
+
+
+# Stop the worker pool after its queued replies have run, waiting at most MOOAI_WORKER_SHUTDOWN_TIMEOUT seconds
+def drain_worker_pool():
+    if worker_pool is not None:
+        worker_pool.shutdown(timeout=float(os.environ.get("MOOAI_WORKER_SHUTDOWN_TIMEOUT", "30")))
+
 
 # Register Listeners
 register_listeners(app)
 
 # Start Bolt app
 if __name__ == "__main__":
+    # Load the lazily imported modules and build the agent before connecting (and before forking shards)
+    if os.environ.get("MOOAI_PREWARM", "true").lower() == "true":
+        prewarm()
+
+    # Let queued replies finish (up to a timeout) when the process exits, and log the ones that don't
+    if worker_pool is not None:
+        atexit.register(drain_worker_pool)
+
+    # Fork the shard workers before any other thread is started
+    sharded = get_sharded_dispatcher()
+    if sharded is not None:
+        sharded.start()
+
+    # Serve Prometheus metrics on a local port when one is configured
+    if os.environ.get("MOOAI_METRICS_PORT"):
+        start_metrics_server(int(os.environ["MOOAI_METRICS_PORT"]), host=os.environ.get("MOOAI_METRICS_HOST", "127.0.0.1"))
+
+    # Warm the user directory in the background so the first replies don't pay for users.info lookups
+    # (with OAuth, each workspace's directory is filled by its first lookups and refreshed in the background)
+    if installation_store is None and os.environ.get("MOOAI_WARM_USER_DIRECTORY", "true").lower() == "true":
+        USER_DIRECTORY.refresh_in_background(app.client)
+
+    # Compute the missing suggested prompt answers now, and all of them again at each refresh time
+    if prompt_cache is not None:
+        PromptPrewarmer(
+            prompt_cache,
+            prompt_messages(SUGGESTED_PROMPTS),
+            refresh_times=parse_refresh_times(os.environ.get("MOOAI_PROMPT_CACHE_REFRESH_TIMES", "07:00")),
+        ).start()
+
     SocketModeHandler(app, os.environ.get("SLACK_APP_TOKEN")).start()
@@ -0,0 +1,173 @@
+import os
+import asyncio
+import logging
+
+from slack_bolt.async_app import AsyncApp
+from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
+from slack_bolt.authorization.async_authorize import AsyncInstallationStoreAuthorize
+from slack_bolt.oauth.async_oauth_settings import AsyncOAuthSettings
+from slack_sdk.oauth.installation_store.sqlite3 import SQLite3InstallationStore
+from slack_sdk.oauth.state_store.sqlite3 import SQLite3OAuthStateStore
+
+from lib.async_slack_client import AsyncRateLimitedWebClient, AsyncTeamClients, build_async_rate_limit_middleware
+from lib.attachment_budget import AttachmentBudget, configure_attachment_budget
+from lib.constants import SUGGESTED_PROMPTS
+from lib.dedupe import InMemoryDedupeStore, SQLiteDedupeStore, build_async_dedupe_middleware, configure_dedupe_store
+from lib.image_descriptions import ImageDescriptionCache, configure_image_descriptions
+from lib.installations import BOT_SCOPES, CachedInstallationStore
+from lib.logging_utils import configure_logging
+from lib.metrics import start_metrics_server
+from lib.prewarm import prewarm
+from lib.prompt_cache import (
+    PromptAnswerCache,
+    PromptPrewarmer,
+    SQLitePromptAnswerCache,
+    configure_prompt_cache,
+    parse_refresh_times,
+    prompt_messages,
+)
+from lib.slack_client import SlackRateLimiter
+from lib.tracing import JsonlSpanExporter, configure_span_exporter, trace_app_dispatch
+from lib.usage import SQLiteUsageStore, UsageLimits, configure_usage_store
+from lib.user_directory import USER_DIRECTORY
+from listeners.aio import register_listeners
+
+# Initialization
+configure_logging(
+    level=os.environ.get("MOOAI_LOG_LEVEL", "INFO"),
+    json_output=os.environ.get("MOOAI_LOG_FORMAT", "json") == "json",
+    debug_per_second=int(os.environ.get("MOOAI_LOG_DEBUG_PER_SECOND", "50")),
+)
+# Replies run as tasks on the event loop here; shard workers are only forked by app.py
+if os.environ.get("MOOAI_EXECUTION_MODE", "inline") == "sharded":
+    raise RuntimeError("MOOAI_EXECUTION_MODE=sharded is only supported by app.py")
+# Serve every workspace that installs the app via OAuth when client credentials are set, instead of one bot token
+installation_store = None
+oauth_kwargs = {}
+if os.environ.get("SLACK_CLIENT_ID") and os.environ.get("SLACK_CLIENT_SECRET"):
+    installation_db_path = os.environ.get("MOOAI_INSTALLATION_DB_PATH", "mooai_installations.sqlite3")
+    installation_store = CachedInstallationStore(
+        SQLite3InstallationStore(database=installation_db_path, client_id=os.environ["SLACK_CLIENT_ID"]),
+        ttl_seconds=float(os.environ.get("MOOAI_INSTALLATION_CACHE_TTL_SECONDS", "300")),
+    )
+    oauth_kwargs = dict(
+        installation_store=installation_store,
+        oauth_settings=AsyncOAuthSettings(
+            client_id=os.environ["SLACK_CLIENT_ID"],
+            client_secret=os.environ["SLACK_CLIENT_SECRET"],
+            scopes=list(BOT_SCOPES),
+            redirect_uri=os.environ.get("SLACK_REDIRECT_URI"),
+            installation_store=installation_store,
+            state_store=SQLite3OAuthStateStore(database=installation_db_path, expiration_seconds=600),
+        ),
+        # Cache each token's auth.test result, so only a workspace's first event pays for it
+        authorize=AsyncInstallationStoreAuthorize(
+            logger=logging.getLogger("mooai.authorize"),
+            installation_store=installation_store,
+            client_id=os.environ["SLACK_CLIENT_ID"],
+            client_secret=os.environ["SLACK_CLIENT_SECRET"],
+            cache_enabled=True,
+        ),
+    )
+
+# One rate limiter for a single workspace; with OAuth each workspace gets its own, as Slack limits per workspace
+rate_limiter = SlackRateLimiter() if installation_store is None else None
+app = AsyncApp(
+    client=AsyncRateLimitedWebClient(token=os.environ.get("SLACK_BOT_TOKEN"), rate_limiter=rate_limiter), **oauth_kwargs
+)
+
+# Trace each event from receipt to reply when a span file is configured (listener tasks inherit the span)
+if os.environ.get("MOOAI_TRACE_PATH"):
+    configure_span_exporter(JsonlSpanExporter(os.environ["MOOAI_TRACE_PATH"]))
+    trace_app_dispatch(app)
+
+# Route every Slack API call through its workspace's pooled, rate-limited client (must run before the assistant middleware)
+# The pooled clients share one aiohttp session, so calls reuse keep-alive connections instead of opening one each
+team_clients = AsyncTeamClients(rate_limiter)
+app.use(build_async_rate_limit_middleware(rate_limiter, team_clients))
+
+# Drop redelivered events; the SQLite backend shares dedupe state between bot instances
+dedupe_ttl = float(os.environ.get("MOOAI_DEDUPE_TTL_SECONDS", "3600"))
+if os.environ.get("MOOAI_DEDUPE_BACKEND", "memory") == "sqlite":
+    configure_dedupe_store(SQLiteDedupeStore(os.environ.get("MOOAI_DEDUPE_SQLITE_PATH", "mooai_dedupe.sqlite3"), dedupe_ttl))
+else:
+    configure_dedupe_store(InMemoryDedupeStore(dedupe_ttl))
+app.use(build_async_dedupe_middleware())
+
+# Account token usage per user, channel and workspace, and refuse agent runs past the configured quotas
+if os.environ.get("MOOAI_USAGE_DB_PATH"):
+    configure_usage_store(
+        SQLiteUsageStore(
+            os.environ["MOOAI_USAGE_DB_PATH"],
+            UsageLimits(
+                user_tokens_per_day=int(os.environ.get("MOOAI_USER_TOKENS_PER_DAY", "0")),
+                channel_tokens_per_day=int(os.environ.get("MOOAI_CHANNEL_TOKENS_PER_DAY", "0")),
+                team_tokens_per_day=int(os.environ.get("MOOAI_TEAM_TOKENS_PER_DAY", "0")),
+                user_requests_per_minute=int(os.environ.get("MOOAI_USER_REQUESTS_PER_MINUTE", "0")),
+            ),
+        )
+    )
+
+# Answer new assistant threads that start with a suggested prompt from answers computed ahead of time
+# (the SQLite backend shares the answers, and who refreshes them, between processes and across restarts)
+prompt_cache = None
+if os.environ.get("MOOAI_PROMPT_CACHE", "false").lower() == "true":
+    prompt_cache_ttl = float(os.environ.get("MOOAI_PROMPT_CACHE_TTL_SECONDS", "86400"))
+    if os.environ.get("MOOAI_PROMPT_CACHE_BACKEND", "sqlite") == "sqlite":
+        prompt_cache = SQLitePromptAnswerCache(
+            os.environ.get("MOOAI_PROMPT_CACHE_SQLITE_PATH", "mooai_prompt_cache.sqlite3"), prompt_cache_ttl
+        )
+    else:
+        prompt_cache = PromptAnswerCache(prompt_cache_ttl)
+    configure_prompt_cache(prompt_cache)
+
+# Cap the attachment bytes all in-flight requests hold in memory; requests wait for room, then skip attachments
+attachment_budget_mb = int(os.environ.get("MOOAI_ATTACHMENT_BUDGET_MB", "256"))
+if attachment_budget_mb > 0:
+    configure_attachment_budget(
+        AttachmentBudget(
+            attachment_budget_mb * 1024 * 1024,
+            wait_seconds=float(os.environ.get("MOOAI_ATTACHMENT_BUDGET_WAIT_SECONDS", "5")),
+        )
+    )
+
+# Send earlier images as a cached description (caption and transcribed text) unless the latest message asks about them
+if os.environ.get("MOOAI_IMAGE_DESCRIPTIONS", "false").lower() == "true":
+    configure_image_descriptions(ImageDescriptionCache())
+
+# Register Listeners
+register_listeners(app)
+
+
+async def main():
+    # Load the lazily imported modules and build the agent before connecting
+    if os.environ.get("MOOAI_PREWARM", "true").lower() == "true":
+        await asyncio.to_thread(prewarm)
+
+    # Serve Prometheus metrics on a local port when one is configured
+    if os.environ.get("MOOAI_METRICS_PORT"):
+        start_metrics_server(int(os.environ["MOOAI_METRICS_PORT"]), host=os.environ.get("MOOAI_METRICS_HOST", "127.0.0.1"))
+
+    # Warm the user directory in the background so the first replies don't pay for users.info lookups
+    # (with OAuth, each workspace's directory is filled by its first lookups and refreshed in the background)
+    if installation_store is None and os.environ.get("MOOAI_WARM_USER_DIRECTORY", "true").lower() == "true":
+        USER_DIRECTORY.refresh_in_background_async(app.client)
+
+    # Compute the missing suggested prompt answers now, and all of them again at each refresh time, on this event loop
+    if prompt_cache is not None:
+        prewarmer = PromptPrewarmer(
+            prompt_cache,
+            prompt_messages(SUGGESTED_PROMPTS),
+            refresh_times=parse_refresh_times(os.environ.get("MOOAI_PROMPT_CACHE_REFRESH_TIMES", "07:00")),
+        )
+        asyncio.create_task(prewarmer.run_async())
+
+    try:
+        await AsyncSocketModeHandler(app, os.environ.get("SLACK_APP_TOKEN")).start_async()
+    finally:
+        await team_clients.close()
+
+
+# Start Bolt app
+if __name__ == "__main__":
+    asyncio.run(main())
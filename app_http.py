@@ -0,0 +1,55 @@
+import os
+
+from app import app, drain_worker_pool, execution_mode, installation_store, prompt_cache
+from lib.constants import SUGGESTED_PROMPTS
+from lib.http_server import build_http_api, run_http_server
+from lib.prewarm import prewarm
+from lib.prompt_cache import PromptPrewarmer, parse_refresh_times, prompt_messages
+from lib.user_directory import USER_DIRECTORY
+
+# HTTP Events API entry point: the same Bolt app as app.py, served by uvicorn worker processes.
+# Every worker imports this module, so each process gets its own app, rate limiter and caches.
+# With SLACK_CLIENT_ID and SLACK_CLIENT_SECRET set, it also serves the install page and OAuth redirect.
+if not os.environ.get("SLACK_SIGNING_SECRET"):
+    raise RuntimeError("SLACK_SIGNING_SECRET must be set to verify requests in HTTP mode")
+# Shard workers are forked by app.py's Socket Mode entry point; here replies would silently run inline instead
+if execution_mode == "sharded":
+    raise RuntimeError("MOOAI_EXECUTION_MODE=sharded is only supported by app.py; use pool or queue in HTTP mode")
+
+
+def warm_user_directory():
+    # Warm the user directory in the background so the first replies don't pay for users.info lookups
+    # (with OAuth, each workspace's directory is filled by its first lookups and refreshed in the background)
+    if installation_store is None and os.environ.get("MOOAI_WARM_USER_DIRECTORY", "true").lower() == "true":
+        USER_DIRECTORY.refresh_in_background(app.client)
+
+
+def prewarm_worker():
+    # Load the lazily imported modules and build the agent before this worker serves requests
+    if os.environ.get("MOOAI_PREWARM", "true").lower() == "true":
+        prewarm()
+
+
+def prewarm_prompt_answers():
+    # Every worker schedules the refreshes, but with the shared SQLite cache only the worker that claims a
+    # refresh runs it, and a worker (re)started after the answers were computed just reads them
+    if prompt_cache is not None:
+        PromptPrewarmer(
+            prompt_cache,
+            prompt_messages(SUGGESTED_PROMPTS),
+            refresh_times=parse_refresh_times(os.environ.get("MOOAI_PROMPT_CACHE_REFRESH_TIMES", "07:00")),
+        ).start()
+
+
+# Metrics are only served to scrapers that send MOOAI_METRICS_TOKEN, since the app itself is public
+api = build_http_api(
+    app,
+    on_startup=[prewarm_worker, warm_user_directory, prewarm_prompt_answers],
+    metrics_token=os.environ.get("MOOAI_METRICS_TOKEN"),
+    # Let queued replies finish when a worker stops or is recycled by uvicorn
+    on_shutdown=[drain_worker_pool],
+)
+
+# Start the HTTP server
+if __name__ == "__main__":
+    run_http_server("app_http:api")
@@ -0,0 +1,3 @@
+"""
+Benchmarks for MooAI. Run a benchmark from the repository root, e.g. `python -m benchmarks.bench_render`.
+"""
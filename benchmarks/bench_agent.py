@@ -0,0 +1,182 @@
+"""
+bench_agent.py
+Benchmark the real agent path (lib.agent, Runner.run, the OpenAI client and its HTTP connection pool)
+against the local Responses API stand-in in benchmarks.fake_openai.
+
+Runs the agent as the sync listeners do (run_agent_with_messages_sync, one event loop per call, from
+concurrent threads) and, with --stream, with Runner.run_streamed to measure time to first token. Reports
+throughput and latency along with the HTTP requests, retries and connections the stand-in saw.
+
+Usage:
+    python -m benchmarks.bench_agent [--repeat N] [--concurrency N] [--latency S] [--tokens-per-second N]
+        [--output-tokens N] [--rate-limit-ratio R] [--server-error-ratio R] [--max-retries N] [--timeout S]
+        [--stream] [--output PATH] [--compare PATH] [--no-save]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from benchmarks.fake_openai import FakeOpenAIServer, FakeOpenAISettings
+from benchmarks.fixtures import build_scenario
+from benchmarks.harness import compare_results, percentile, save_results, summarize_latencies
+from lib.agent import get_agent, run_agent_with_messages_sync
+from lib.models import StructuredResponse
+from lib.slack_utils import format_slack_messages_for_openai
+
+
+def configure_openai_client(base_url: str, max_retries: int, timeout: float) -> None:
+    """Send the Agents SDK's requests to base_url, and keep its traces off the network"""
+    from agents import set_default_openai_client, set_tracing_disabled
+    from openai import AsyncOpenAI
+
+    set_default_openai_client(AsyncOpenAI(base_url=base_url, api_key="sk-fake", max_retries=max_retries, timeout=timeout))
+    set_tracing_disabled(True)
+
+
+def run_sync(messages: List[Dict[str, Any]]) -> float:
+    """One reply as the sync listeners make it; raises if the agent fell back to an error response"""
+    started = time.perf_counter()
+    response = run_agent_with_messages_sync(messages, use_structured_output=True)
+    if not isinstance(response, StructuredResponse) or not response.response or response.thread_title is None:
+        raise RuntimeError("Agent returned an error response")
+    return time.perf_counter() - started
+
+
+async def run_streamed(messages: List[Dict[str, Any]]) -> tuple:
+    """One streamed run: (seconds to the first text delta, seconds in total)"""
+    from agents import Runner
+
+    started = time.perf_counter()
+    first_token: Optional[float] = None
+    result = Runner.run_streamed(get_agent(None, use_structured_output=True), messages)  # type: ignore[arg-type]
+    async for event in result.stream_events():
+        if first_token is None and event.type == "raw_response_event" and event.data.type == "response.output_text.delta":
+            first_token = time.perf_counter() - started
+    if not isinstance(result.final_output, StructuredResponse):
+        raise RuntimeError("Streamed run did not produce a StructuredResponse")
+    return first_token or 0.0, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", default="thread_10", help="Fixture thread sent as the agent's input")
+    parser.add_argument("--repeat", type=int, default=20, help="Agent runs")
+    parser.add_argument("--concurrency", type=int, default=4, help="Runs in flight at once")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stand-in seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Stand-in output token rate (0: instant)")
+    parser.add_argument("--output-tokens", type=int, default=500, help="Stand-in answer length")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--server-error-ratio", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--max-retries", type=int, default=2, help="OpenAI client retries")
+    parser.add_argument("--timeout", type=float, default=30.0, help="OpenAI client timeout in seconds")
+    parser.add_argument("--stream", action="store_true", help="Also measure streamed runs (time to first token)")
+    parser.add_argument("--log", help="Append the stand-in's request log to this file")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/agent-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--no-save", action="store_true", help="Don't write a results file")
+    args = parser.parse_args()
+
+    settings = FakeOpenAISettings(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        rate_limit_ratio=args.rate_limit_ratio,
+        server_error_ratio=args.server_error_ratio,
+        retry_after=args.retry_after,
+        seed=0,
+    )
+    server = FakeOpenAIServer(settings, log_path=args.log)
+    configure_openai_client(server.base_url, args.max_retries, args.timeout)
+    # Failed runs are counted below; the agent's own exception logs would only repeat them
+    logging.getLogger("lib.agent").setLevel(logging.CRITICAL)
+    messages = format_slack_messages_for_openai(build_scenario(args.scenario).messages, {})
+
+    print(f"Agent runs against the Responses API stand-in ({args.repeat} runs, concurrency {args.concurrency})")
+    results: Dict[str, Any] = {}
+    try:
+        run_sync(messages)  # warm up: imports, agent construction and the first connection
+        server.requests.clear()
+
+        latencies: List[float] = []
+        failures = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for future in [executor.submit(run_sync, messages) for _ in range(args.repeat)]:
+                try:
+                    latencies.append(future.result())
+                except Exception:
+                    failures += 1
+        wall = time.perf_counter() - started
+        requests = list(server.requests)
+        results["sync"] = {
+            **summarize_latencies(latencies, wall),
+            "failures": failures,
+            "http_requests": len(requests),
+            "retries": sum(1 for request in requests if request["retry"]),
+            "injected_errors": sum(1 for request in requests if request["status"] != 200),
+            "connections": len({request["connection"] for request in requests}),
+        }
+        print(
+            f"  sync     {results['sync']['throughput_per_s']:7.2f}/s  p50 {results['sync']['p50_ms']:8.1f} ms"
+            f"  p99 {results['sync']['p99_ms']:8.1f} ms  failures {failures}  HTTP requests {len(requests)}"
+            f" (retries {results['sync']['retries']})  connections {results['sync']['connections']}"
+        )
+
+        if args.stream:
+            server.requests.clear()
+
+            async def streamed_runs() -> List[tuple]:
+                semaphore = asyncio.Semaphore(args.concurrency)
+
+                async def one() -> tuple:
+                    async with semaphore:
+                        return await run_streamed(messages)
+
+                return await asyncio.gather(*(one() for _ in range(args.repeat)))
+
+            started = time.perf_counter()
+            timings = asyncio.run(streamed_runs())
+            wall = time.perf_counter() - started
+            results["stream"] = {
+                **summarize_latencies([total for _, total in timings], wall),
+                "ttft_p50_ms": percentile([first for first, _ in timings], 50) * 1000,
+                "ttft_p99_ms": percentile([first for first, _ in timings], 99) * 1000,
+                "http_requests": len(server.requests),
+                "connections": len({request["connection"] for request in server.requests}),
+            }
+            stream = results["stream"]
+            print(
+                f"  stream   {stream['throughput_per_s']:7.2f}/s  p50 {stream['p50_ms']:8.1f} ms  p99 {stream['p99_ms']:8.1f} ms"
+                f"  first token p50 {stream['ttft_p50_ms']:7.1f} ms  p99 {stream['ttft_p99_ms']:7.1f} ms"
+                f"  connections {stream['connections']}"
+            )
+    finally:
+        server.shutdown()
+
+    run_settings = {
+        key: getattr(args, key)
+        for key in (
+            "scenario",
+            "repeat",
+            "concurrency",
+            "latency",
+            "tokens_per_second",
+            "output_tokens",
+            "rate_limit_ratio",
+            "server_error_ratio",
+            "max_retries",
+        )
+    }
+    if not args.no_save:
+        print(f"Saved results to {save_results('agent', results, run_settings, args.output)}")
+    if args.compare:
+        print("\n".join(compare_results(args.compare, results)))
+
+
+if __name__ == "__main__":
+    main()
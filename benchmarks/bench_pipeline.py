@@ -0,0 +1,158 @@
+"""
+bench_pipeline.py
+End-to-end benchmark of the thread reply pipeline: process_thread_and_respond fetching, downloading,
+formatting, running the agent, converting and posting, against in-process Slack and agent stand-ins.
+
+Reports throughput, p50/p99 latency, peak memory and mean time per stage for each fixture thread, and
+saves the results to benchmarks/results/pipeline-<commit>.json for comparison across commits.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--scenario NAME ...] [--repeat N] [--concurrency N]
+        [--agent-latency S] [--slack-latency S] [--output PATH] [--compare PATH] [--no-save]
+"""
+
+import argparse
+import logging
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from benchmarks.fakes import DEFAULT_RESPONSE_CHARS, FakeSlackClient, fake_agent
+from benchmarks.fixtures import SCENARIOS, ThreadFixture, build_scenario
+from benchmarks.harness import compare_results, save_results, summarize_latencies
+from lib.file_utils import extract_files_from_slack_messages
+from lib.metrics import stage_seconds
+from lib.slack_utils import format_slack_messages_for_openai
+from listeners.assistant import process_thread_and_respond
+
+# Stages recorded by lib.metrics.time_stage during a reply
+STAGES = (
+    "fetch_thread",
+    "download_attachment",
+    "parse_pdf",
+    "encode_attachment",
+    "agent_run",
+    "mrkdwn_convert",
+    "post_reply",
+)
+
+
+class ErrorCounter(logging.Handler):
+    """Count ERROR records logged by the pipeline, so failed runs show up in the results"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.errors = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.errors += 1
+
+
+def _stage_totals() -> Dict[str, tuple]:
+    return {stage: (stage_seconds.sum(stage=stage), stage_seconds.count(stage=stage)) for stage in STAGES}
+
+
+def run_scenario(name: str, repeat: int, concurrency: int, slack_latency: float) -> Dict[str, Any]:
+    """Run one scenario's thread through the pipeline repeat times and summarize the runs"""
+    fixture = build_scenario(name)
+    client = FakeSlackClient(latency=slack_latency)
+    client.add_thread(fixture)
+    # Each measured run answers its own copy of the thread: replies within one thread are serialized
+    copies = [fixture._replace(thread_ts=f"{float(fixture.thread_ts) + (run + 1) / 1_000_000:.6f}") for run in range(repeat)]
+    for thread in copies:
+        client.add_thread(thread)
+    logger = logging.getLogger(f"bench.{name}")
+    logger.propagate = False
+    errors = ErrorCounter()
+    logger.addHandler(errors)
+
+    def reply(thread: ThreadFixture = fixture) -> float:
+        started = time.perf_counter()
+        process_thread_and_respond(thread.channel_id, thread.thread_ts, client, logger).result()
+        return time.perf_counter() - started
+
+    try:
+        # Warm caches (user names, converters, the agent) so the runs measure steady state
+        reply()
+        errors.errors = 0
+
+        stages_before = _stage_totals()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies: List[float] = list(executor.map(reply, copies))
+        wall = time.perf_counter() - started
+        stages_after = _stage_totals()
+
+        # Format once more in isolation: it is not a stage of its own in the metrics
+        files_by_ts = extract_files_from_slack_messages(client, fixture.messages)
+        format_started = time.perf_counter()
+        format_slack_messages_for_openai(fixture.messages, files_by_ts)
+        format_ms = (time.perf_counter() - format_started) * 1000
+
+        tracemalloc.start()
+        reply()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        client.close()
+        logger.removeHandler(errors)
+
+    stage_ms = {}
+    for stage in STAGES:
+        total = stages_after[stage][0] - stages_before[stage][0]
+        count = stages_after[stage][1] - stages_before[stage][1]
+        if count:
+            stage_ms[stage] = total / repeat * 1000
+    stage_ms["format_messages"] = format_ms
+
+    return {
+        **summarize_latencies(latencies, wall),
+        "errors": errors.errors,
+        "messages": len(fixture.messages),
+        "attachments": len(fixture.files),
+        "peak_memory_mb": peak_bytes / (1024 * 1024),
+        "stage_ms_per_reply": stage_ms,
+    }
+
+
+def print_result(name: str, result: Dict[str, Any]) -> None:
+    print(
+        f"  {name:<12} {result['throughput_per_s']:8.1f}/s  p50 {result['p50_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms"
+        f"  peak {result['peak_memory_mb']:7.1f} MB  errors {result['errors']}"
+    )
+    stages = ", ".join(f"{stage} {ms:.1f}" for stage, ms in result["stage_ms_per_reply"].items())
+    print(f"  {'':<12} ms per reply: {stages}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=20, help="Replies per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="Replies in flight at once")
+    parser.add_argument("--agent-latency", type=float, default=0.0, help="Seconds the fake agent takes per run")
+    parser.add_argument("--slack-latency", type=float, default=0.0, help="Seconds each fake Slack call takes")
+    parser.add_argument("--response-chars", type=int, default=DEFAULT_RESPONSE_CHARS, help="Length of the fake answer")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/pipeline-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--no-save", action="store_true", help="Don't write a results file")
+    args = parser.parse_args()
+
+    settings = {
+        key: getattr(args, key) for key in ("repeat", "concurrency", "agent_latency", "slack_latency", "response_chars")
+    }
+    print(f"Reply pipeline ({args.repeat} replies per scenario, concurrency {args.concurrency})")
+    results = {}
+    with fake_agent(latency=args.agent_latency, response_chars=args.response_chars):
+        for name in args.scenario or SCENARIOS:
+            results[name] = run_scenario(name, args.repeat, args.concurrency, args.slack_latency)
+            print_result(name, results[name])
+
+    if not args.no_save:
+        print(f"Saved results to {save_results('pipeline', results, settings, args.output)}")
+    if args.compare:
+        print("\n".join(compare_results(args.compare, results)))
+
+
+if __name__ == "__main__":
+    main()
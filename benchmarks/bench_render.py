@@ -0,0 +1,74 @@
+"""
+bench_render.py
+Benchmark Markdown to mrkdwn conversion and Block Kit rendering on large responses.
+
+Usage:
+    python -m benchmarks.bench_render [--repeat N]
+"""
+
+import argparse
+import time
+from typing import Callable
+
+from markdown_to_mrkdwn import SlackMarkdownConverter
+
+from lib.renderer import render_mrkdwn_messages
+from lib.slack_utils import markdown_to_mrkdwn
+
+SECTION = """## 🐮 Section {i}
+
+Here is **bold**, *italic*, ~~struck~~ text and a [link](https://example.com/{i}).
+
+- First point with `inline code`
+- Second point
+  - Nested point
+
+| Column A | Column B |
+|----------|----------|
+| {i}      | value    |
+
+```python
+def handler_{i}(event):
+    return event.get("text", "")
+```
+"""
+
+
+def make_markdown(size: int) -> str:
+    """Build a realistic Markdown response of roughly size characters"""
+    parts = []
+    total = 0
+    i = 0
+    while total < size:
+        part = SECTION.format(i=i)
+        parts.append(part)
+        total += len(part)
+        i += 1
+    return "\n".join(parts)
+
+
+def bench(label: str, func: Callable[[str], object], markdown: str, repeat: int) -> None:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(markdown)
+    elapsed = time.perf_counter() - started
+    mb = len(markdown.encode("utf-8")) * repeat / (1024 * 1024)
+    print(f"  {label:<28} {elapsed / repeat * 1000:9.3f} ms/call {mb / elapsed:9.2f} MB/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50, help="Conversions per size")
+    args = parser.parse_args()
+
+    for size in (2_000, 20_000, 200_000):
+        markdown = make_markdown(size)
+        repeat = max(1, args.repeat * 2_000 // size)
+        print(f"{len(markdown):,} characters ({repeat} runs)")
+        bench("new converter per call", lambda text: SlackMarkdownConverter().convert(text), markdown, repeat)
+        bench("cached converter", markdown_to_mrkdwn, markdown, repeat)
+        bench("convert + split into blocks", lambda text: render_mrkdwn_messages(markdown_to_mrkdwn(text)), markdown, repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+bench_startup.py
+Benchmark cold-start cost: interpreter start, importing the listeners, and the prewarm phase.
+
+Each measurement runs in a fresh interpreter, since imports are cached after the first one.
+
+Usage:
+    python -m benchmarks.bench_startup [--repeat N] [--importtime]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Code run in each fresh interpreter
+SCENARIOS = {
+    "interpreter only": "pass",
+    "import listeners": "import listeners",
+    "import listeners + prewarm": "import listeners; from lib.prewarm import prewarm; prewarm()",
+}
+
+
+def run(code: str, repeat: int) -> List[float]:
+    """Run code in repeat fresh interpreters; returns the wall time of each run in seconds"""
+    results = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, check=True, capture_output=True)
+        results.append(time.perf_counter() - started)
+    return results
+
+
+def show_importtime(top: int = 15) -> None:
+    """Print the modules with the largest cumulative import time when importing the listeners"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import listeners"], cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    print("Slowest imports under `import listeners` (cumulative):")
+    for cumulative, module in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:9.1f} ms  {module}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per scenario")
+    parser.add_argument("--importtime", action="store_true", help="Also list the slowest imports")
+    args = parser.parse_args()
+
+    print(f"Wall time per fresh interpreter ({args.repeat} runs)")
+    for label, code in SCENARIOS.items():
+        times = run(code, args.repeat)
+        print(f"  {label:<28} median {statistics.median(times) * 1000:8.1f} ms   min {min(times) * 1000:8.1f} ms")
+
+    if args.importtime:
+        print()
+        show_importtime()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+events.py
+Synthetic Slack event bodies for the load generator, pointing at fixture threads that a FakeSlackClient serves.
+"""
+
+import itertools
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.fixtures import BENCH_BOT_USER_ID, BENCH_CHANNEL_ID, BENCH_TEAM_ID, ThreadFixture, build_thread
+
+BENCH_APP_ID = "A07MOOAI01"
+
+# Event kinds the generator can send; "assistant_message" is a user message in an assistant (DM) thread
+EVENT_KINDS = ("app_mention", "message", "assistant_thread_started", "assistant_message", "app_home_opened")
+
+# Default relative weights of the event kinds
+DEFAULT_MIX = {
+    "app_mention": 3,
+    "message": 2,
+    "assistant_thread_started": 1,
+    "assistant_message": 3,
+    "app_home_opened": 1,
+}
+
+QUESTIONS = (
+    "Can you summarise this thread?",
+    "What are the open action items here?",
+    "Draft a reply to the last message, please.",
+    "Which of the attachments matters most for the decision?",
+)
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """
+    Parse an event mix such as "app_mention=3,assistant_message=1" into weights.
+
+    Raises:
+        ValueError: For unknown event kinds, malformed entries or a mix without positive weights.
+    """
+    mix: Dict[str, float] = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        kind, _, weight = entry.partition("=")
+        if kind not in EVENT_KINDS:
+            raise ValueError(f"Unknown event kind {kind!r} (expected one of {', '.join(EVENT_KINDS)})")
+        mix[kind] = float(weight) if weight else 1.0
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError(f"Event mix {spec!r} has no positive weights")
+    return mix
+
+
+class EventFactory:
+    """
+    Build event_callback bodies spread over a fixed set of conversation threads.
+
+    Each of the threads exists twice: as a channel thread (for mentions and thread messages) and as an
+    assistant thread in a DM channel. Every body gets a unique event ID, message timestamp and client_msg_id,
+    so the dedupe middleware treats each one as a new event.
+    """
+
+    def __init__(
+        self,
+        threads: int,
+        thread_size: int = 20,
+        images: int = 0,
+        pdfs: int = 0,
+        mix: Optional[Dict[str, float]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.channel_threads: List[ThreadFixture] = [
+            build_thread(thread_size, images, pdfs, channel_id=BENCH_CHANNEL_ID, thread_index=i) for i in range(threads)
+        ]
+        self.dm_threads: List[ThreadFixture] = [
+            build_thread(thread_size, images, pdfs, channel_id=f"D0LOAD{i:04d}", thread_index=i) for i in range(threads)
+        ]
+        mix = mix or DEFAULT_MIX
+        self._kinds = [kind for kind in mix if mix[kind] > 0]
+        self._weights = [mix[kind] for kind in self._kinds]
+        self._random = random.Random(seed)
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def fixtures(self) -> List[ThreadFixture]:
+        return self.channel_threads + self.dm_threads
+
+    def next_kind(self) -> str:
+        """Pick an event kind at random according to the mix"""
+        with self._lock:
+            return self._random.choices(self._kinds, self._weights)[0]
+
+    def make(self, kind: str) -> Dict[str, Any]:
+        """Build an event_callback body for an event of the given kind"""
+        with self._lock:
+            sequence = next(self._sequence)
+            index = self._random.randrange(len(self.channel_threads))
+            question = self._random.choice(QUESTIONS)
+        user = f"U0LOAD{index:04d}"
+        ts = f"{1_900_000_000 + sequence // 1_000_000}.{sequence % 1_000_000:06d}"
+        channel_thread, dm_thread = self.channel_threads[index], self.dm_threads[index]
+
+        if kind == "app_mention":
+            event = self._message(channel_thread, user, f"<@{BENCH_BOT_USER_ID}> {question}", ts, sequence)
+            event["type"] = "app_mention"
+        elif kind == "message":
+            event = self._message(channel_thread, user, f"<@{BENCH_BOT_USER_ID}> {question}", ts, sequence)
+            event["channel_type"] = "channel"
+        elif kind == "assistant_message":
+            event = self._message(dm_thread, user, question, ts, sequence)
+            event["channel_type"] = "im"
+        elif kind == "assistant_thread_started":
+            event = {
+                "type": "assistant_thread_started",
+                "assistant_thread": {
+                    "user_id": user,
+                    "context": {"channel_id": BENCH_CHANNEL_ID, "team_id": BENCH_TEAM_ID, "enterprise_id": None},
+                    "channel_id": dm_thread.channel_id,
+                    "thread_ts": dm_thread.thread_ts,
+                },
+                "event_ts": ts,
+            }
+        elif kind == "app_home_opened":
+            event = {"type": "app_home_opened", "user": user, "channel": dm_thread.channel_id, "tab": "home", "event_ts": ts}
+        else:
+            raise ValueError(f"Unknown event kind {kind!r}")
+
+        return {
+            "token": "bench",
+            "team_id": BENCH_TEAM_ID,
+            "api_app_id": BENCH_APP_ID,
+            "type": "event_callback",
+            "event_id": f"Ev0LOAD{sequence:010d}",
+            "event_time": int(time.time()),
+            "authorizations": [
+                {"enterprise_id": None, "team_id": BENCH_TEAM_ID, "user_id": BENCH_BOT_USER_ID, "is_bot": True}
+            ],
+            "event": event,
+        }
+
+    @staticmethod
+    def _message(thread: ThreadFixture, user: str, text: str, ts: str, sequence: int) -> Dict[str, Any]:
+        return {
+            "type": "message",
+            "user": user,
+            "text": text,
+            "ts": ts,
+            "thread_ts": thread.thread_ts,
+            "channel": thread.channel_id,
+            "event_ts": ts,
+            "client_msg_id": f"00000000-0000-4000-8000-{sequence:012d}",
+        }
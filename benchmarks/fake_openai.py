@@ -0,0 +1,367 @@
+"""
+fake_openai.py
+Local stand-in for the subset of the OpenAI Responses API the Agents SDK uses: POST /v1/responses, with
+plain text or json_schema structured output, optionally streamed as server-sent events.
+
+Responses take a scripted time to first token plus output tokens at a fixed token rate. A share of
+requests can be failed with 429 (with Retry-After) or 5xx, and every request is logged, so the real
+Runner.run path (HTTP client, connection pool, retries and timeouts) can be exercised offline.
+
+Usage:
+    python -m benchmarks.fake_openai [--port N] [--latency S] [--tokens-per-second N] [--output-tokens N]
+        [--rate-limit-ratio R] [--server-error-ratio R] [--retry-after S] [--log PATH]
+
+Then point the OpenAI client at it:
+    OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 OPENAI_API_KEY=sk-fake python app.py
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from benchmarks.bench_render import make_markdown
+
+# Characters per token used to estimate usage and size the output
+CHARS_PER_TOKEN = 4
+# String properties that receive the long answer when generating structured output, in order of preference
+LONG_TEXT_PROPERTIES = ("response", "answer", "text", "content")
+
+
+class FakeOpenAISettings(NamedTuple):
+    # Seconds before the first output token (and before any response for non-streamed requests)
+    latency: float = 0.5
+    # Random extra latency, uniformly up to this many seconds
+    jitter: float = 0.0
+    # Output generation speed; 0 means instant
+    tokens_per_second: float = 0.0
+    # Length of the generated answer
+    output_tokens: int = 500
+    # Share of requests answered with 429 and a Retry-After header
+    rate_limit_ratio: float = 0.0
+    # Share of requests answered with a 5xx error
+    server_error_ratio: float = 0.0
+    retry_after: float = 1.0
+    server_error_status: int = 500
+    # Output tokens per streamed text delta
+    tokens_per_delta: int = 8
+    seed: Optional[int] = None
+
+
+def _words(count: int, offset: int = 0) -> str:
+    words = ("moo", "pasture", "herd", "milk", "barn", "grass", "field", "cowbell")
+    return " ".join(words[(offset + i) % len(words)] for i in range(max(1, count)))
+
+
+def generate_from_schema(schema: Dict[str, Any], long_text: str, root: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Build a value that satisfies a (strict mode) JSON schema, putting long_text in the answer property.
+
+    Args:
+        schema: JSON schema of the value, as sent in text.format.schema.
+        long_text: Text for the first string property named like an answer (see LONG_TEXT_PROPERTIES),
+            or for the first string property if none is.
+        root: Schema that $ref values resolve against (defaults to schema).
+    """
+    root = root or schema
+    if "$ref" in schema:
+        target: Any = root
+        for part in schema["$ref"].lstrip("#/").split("/"):
+            target = target[part]
+        return generate_from_schema(target, long_text, root)
+    for combinator in ("anyOf", "oneOf", "allOf"):
+        if schema.get(combinator):
+            options = [option for option in schema[combinator] if option.get("type") != "null"] or schema[combinator]
+            return generate_from_schema(options[0], long_text, root)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "const" in schema:
+        return schema["const"]
+
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        properties: Dict[str, Any] = schema.get("properties", {})
+        strings = [name for name, prop in properties.items() if prop.get("type") == "string"]
+        long_name = next((name for name in LONG_TEXT_PROPERTIES if name in strings), strings[0] if strings else None)
+        return {
+            name: long_text if name == long_name else generate_from_schema(prop, "", root)
+            for name, prop in properties.items()
+        }
+    if kind == "array":
+        items = schema.get("items", {"type": "string"})
+        count = max(schema.get("minItems", 0), min(schema.get("maxItems", 2), 2))
+        return [
+            _words(3, i) if items.get("type") == "string" else generate_from_schema(items, "", root) for i in range(count)
+        ]
+    if kind == "string":
+        return long_text or _words(4)
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 1.0
+    if kind == "boolean":
+        return True
+    return None
+
+
+def estimate_tokens(value: Any) -> int:
+    """Rough token count of a request's input or instructions"""
+    text = value if isinstance(value, str) else json.dumps(value)
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+class FakeOpenAIServer:
+    """
+    Serve POST /v1/responses from a daemon thread, speaking HTTP/1.1 with keep-alive.
+
+    Requests are appended to .requests (and to log_path as JSON lines, if given) with the connection they
+    arrived on, so tests and benchmarks can see retries and connection reuse.
+    """
+
+    def __init__(
+        self,
+        settings: FakeOpenAISettings = FakeOpenAISettings(),
+        host: str = "127.0.0.1",
+        port: int = 0,
+        log_path: Optional[str] = None,
+    ):
+        self.settings = settings
+        self.requests: List[Dict[str, Any]] = []
+        self._random = random.Random(settings.seed)
+        self._ids = itertools.count(1)
+        self._connections = itertools.count(1)
+        self._lock = threading.Lock()
+        self._log = open(log_path, "a", encoding="utf-8", buffering=1) if log_path else None
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                super().setup()
+                self.connection_id = next(server._connections)
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.path.rstrip("/") not in ("/v1/responses", "/responses"):
+                    self._send_json(
+                        404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}}
+                    )
+                    return
+                try:
+                    request = json.loads(body or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+                    return
+                server._handle(self, request)
+
+            def _send_json(self, status: int, document: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+                content = json.dumps(document).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-openai", daemon=True).start()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _fault(self) -> Optional[int]:
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.settings.rate_limit_ratio:
+            return 429
+        if roll < self.settings.rate_limit_ratio + self.settings.server_error_ratio:
+            return self.settings.server_error_status
+        return None
+
+    def _record(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self.requests.append(entry)
+            if self._log is not None:
+                self._log.write(json.dumps(entry) + "\n")
+
+    def _handle(self, handler: Any, request: Dict[str, Any]) -> None:
+        started = time.monotonic()
+        settings = self.settings
+        stream = bool(request.get("stream"))
+        entry: Dict[str, Any] = {
+            "time": time.time(),
+            "connection": handler.connection_id,
+            "retry": int(handler.headers.get("x-stainless-retry-count") or 0),
+            "model": request.get("model"),
+            "stream": stream,
+            "input_items": len(request["input"]) if isinstance(request.get("input"), list) else 1,
+            "input_tokens": estimate_tokens(request.get("input", "")) + estimate_tokens(request.get("instructions") or ""),
+            "structured": (request.get("text") or {}).get("format", {}).get("type") == "json_schema",
+        }
+
+        fault = self._fault()
+        if fault is not None:
+            entry.update(status=fault, latency_ms=(time.monotonic() - started) * 1000)
+            self._record(entry)
+            if fault == 429:
+                error = {"message": "Rate limit reached (injected)", "type": "requests", "code": "rate_limit_exceeded"}
+                handler._send_json(429, {"error": error}, {"Retry-After": f"{settings.retry_after:g}"})
+            else:
+                error = {"message": "The server had an error (injected)", "type": "server_error", "code": None}
+                handler._send_json(fault, {"error": error})
+            return
+
+        with self._lock:
+            delay = settings.latency + (self._random.uniform(0, settings.jitter) if settings.jitter else 0.0)
+        time.sleep(delay)
+        response = self._build_response(request, entry["input_tokens"])
+        text = response["output"][0]["content"][0]["text"]
+        try:
+            if stream:
+                self._stream(handler, response, text)
+            else:
+                if settings.tokens_per_second:
+                    time.sleep(settings.output_tokens / settings.tokens_per_second)
+                handler._send_json(200, response, {"x-request-id": response["id"]})
+            entry["status"] = 200
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (e.g. a timeout) part way through
+            entry["status"] = 499
+        entry.update(output_tokens=response["usage"]["output_tokens"], latency_ms=(time.monotonic() - started) * 1000)
+        self._record(entry)
+
+    def _build_response(self, request: Dict[str, Any], input_tokens: int) -> Dict[str, Any]:
+        number = next(self._ids)
+        long_text = make_markdown(self.settings.output_tokens * CHARS_PER_TOKEN)
+        text_format = (request.get("text") or {}).get("format") or {"type": "text"}
+        if text_format.get("type") == "json_schema":
+            text = json.dumps(generate_from_schema(text_format.get("schema", {}), long_text))
+        else:
+            text = long_text
+        output_tokens = estimate_tokens(text)
+        message = {
+            "type": "message",
+            "id": f"msg_fake{number:08d}",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }
+        return {
+            "id": f"resp_fake{number:08d}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": request.get("model") or "gpt-4.1-mini",
+            "instructions": request.get("instructions"),
+            "output": [message],
+            "parallel_tool_calls": request.get("parallel_tool_calls", True),
+            "tool_choice": request.get("tool_choice") or "auto",
+            "tools": request.get("tools", []),
+            "text": {"format": text_format},
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": 0},
+                "output_tokens": output_tokens,
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + output_tokens,
+            },
+            "error": None,
+            "incomplete_details": None,
+            "metadata": {},
+        }
+
+    def _stream_events(self, response: Dict[str, Any], text: str) -> Iterator[Tuple[Dict[str, Any], float]]:
+        """Server-sent events for a streamed response, each with the seconds to wait before sending it"""
+        settings = self.settings
+        message = response["output"][0]
+        in_progress = {**response, "status": "in_progress", "output": [], "usage": None}
+        empty_message = {**message, "status": "in_progress", "content": []}
+        part = {"type": "output_text", "text": "", "annotations": []}
+        item = {"item_id": message["id"], "output_index": 0, "content_index": 0}
+
+        yield {"type": "response.created", "response": in_progress}, 0.0
+        yield {"type": "response.in_progress", "response": in_progress}, 0.0
+        yield {"type": "response.output_item.added", "output_index": 0, "item": empty_message}, 0.0
+        yield {"type": "response.content_part.added", **item, "part": part}, 0.0
+        step = settings.tokens_per_delta * CHARS_PER_TOKEN
+        pause = settings.tokens_per_delta / settings.tokens_per_second if settings.tokens_per_second else 0.0
+        for start in range(0, len(text), step):
+            end = start + step
+            yield {"type": "response.output_text.delta", **item, "delta": text[start:end]}, pause
+        yield {"type": "response.output_text.done", **item, "text": text}, 0.0
+        yield {"type": "response.content_part.done", **item, "part": message["content"][0]}, 0.0
+        yield {"type": "response.output_item.done", "output_index": 0, "item": message}, 0.0
+        yield {"type": "response.completed", "response": response}, 0.0
+
+    def _stream(self, handler: Any, response: Dict[str, Any], text: str) -> None:
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.send_header("x-request-id", response["id"])
+        handler.end_headers()
+        for sequence, (event, pause) in enumerate(self._stream_events(response, text)):
+            if pause:
+                time.sleep(pause)
+            data = f"event: {event['type']}\ndata: {json.dumps({**event, 'sequence_number': sequence})}\n\n".encode("utf-8")
+            handler.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            handler.wfile.flush()
+        handler.wfile.write(b"0\r\n\r\n")
+
+    def shutdown(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._log is not None:
+            self._log.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds before the first output token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency, up to this many seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Output token rate (0: instant)")
+    parser.add_argument("--output-tokens", type=int, default=500, help="Length of each answer")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--server-error-ratio", type=float, default=0.0, help="Share of requests answered with 5xx")
+    parser.add_argument("--server-error-status", type=int, default=500, help="Status code of injected server errors")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int, help="Seed for jitter and fault injection")
+    parser.add_argument("--log", help="Append a JSON line per request to this file")
+    args = parser.parse_args()
+
+    settings = FakeOpenAISettings(
+        latency=args.latency,
+        jitter=args.jitter,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        rate_limit_ratio=args.rate_limit_ratio,
+        server_error_ratio=args.server_error_ratio,
+        retry_after=args.retry_after,
+        server_error_status=args.server_error_status,
+        seed=args.seed,
+    )
+    server = FakeOpenAIServer(settings, args.host, args.port, args.log)
+    print(f"Fake Responses API listening on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
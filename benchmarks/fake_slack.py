@@ -0,0 +1,321 @@
+"""
+fake_slack.py
+Local stand-in for the Slack Web API methods the bot calls, served over HTTP so a real WebClient (with
+its retry handlers and the bot's rate limiter) can be pointed at it via base_url.
+
+It serves seeded threads and files (url_private downloads included), records posted messages into their
+threads, adds configurable latency, and enforces each method's rate-limit tier (chat.postMessage per
+channel) with HTTP 429 and Retry-After, as Slack does.
+
+Usage:
+    python -m benchmarks.fake_slack [--port N] [--threads N] [--thread-size N] [--latency S] [--rate-scale X]
+        [--window S] [--log PATH]
+
+Then: WebClient(token="xoxb-fake", base_url="http://127.0.0.1:<port>/api/")
+"""
+
+import argparse
+import collections
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+from benchmarks.fixtures import BENCH_BOT_ID, BENCH_BOT_USER_ID, BENCH_CHANNEL_ID, BENCH_TEAM_ID, ThreadFixture, build_thread
+from lib.slack_client import (
+    DEFAULT_TIER,
+    METHOD_TIERS,
+    PER_CHANNEL_METHODS,
+    POST_MESSAGE_LIMIT_PER_MINUTE,
+    TIER_LIMITS_PER_MINUTE,
+)
+
+
+class FakeSlackSettings(NamedTuple):
+    # Seconds added to every API call, plus up to jitter seconds at random
+    latency: float = 0.0
+    jitter: float = 0.0
+    # Seconds added to every url_private download
+    file_latency: float = 0.0
+    # Multiplier on every tier's limit (e.g. 0.1 to hit the limits with little load)
+    rate_scale: float = 1.0
+    # Length of the rate-limit window; limits are per minute, scaled to the window
+    window: float = 60.0
+    # Whether methods are rate limited at all
+    enforce_limits: bool = True
+    seed: Optional[int] = None
+
+
+class SlidingWindowLimiter:
+    """Allow at most limit calls per key in any window seconds; refused calls learn when to retry"""
+
+    def __init__(self, window: float):
+        self.window = window
+        self._calls: Dict[Tuple[str, Optional[str]], Deque[float]] = collections.defaultdict(collections.deque)
+        self._lock = threading.Lock()
+
+    def acquire(self, key: Tuple[str, Optional[str]], limit: int) -> float:
+        """Record a call and return 0.0, or return the seconds until the key has room again"""
+        now = time.monotonic()
+        with self._lock:
+            calls = self._calls[key]
+            while calls and calls[0] <= now - self.window:
+                calls.popleft()
+            if len(calls) >= limit:
+                return calls[0] + self.window - now
+            calls.append(now)
+            return 0.0
+
+
+class FakeSlackServer:
+    """
+    Serve /api/<method> and /files/<id>/<name> from a daemon thread, speaking HTTP/1.1 with keep-alive.
+
+    Calls are counted per method in .calls, 429s in .rate_limited, and posted messages are kept in .posted.
+    """
+
+    def __init__(
+        self,
+        settings: FakeSlackSettings = FakeSlackSettings(),
+        host: str = "127.0.0.1",
+        port: int = 0,
+        log_path: Optional[str] = None,
+    ):
+        self.settings = settings
+        self.threads: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self.files: Dict[str, Tuple[str, str, bytes]] = {}
+        self.posted: List[Dict[str, Any]] = []
+        self.calls: "collections.Counter[str]" = collections.Counter()
+        self.rate_limited: "collections.Counter[str]" = collections.Counter()
+        self._limiter = SlidingWindowLimiter(settings.window)
+        self._random = random.Random(settings.seed)
+        self._ts = itertools.count(1)
+        self._lock = threading.Lock()
+        self._log = open(log_path, "a", encoding="utf-8", buffering=1) if log_path else None
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                server._route(self, {})
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8")
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    params = json.loads(body or "{}")
+                else:
+                    params = dict(parse_qsl(body))
+                server._route(self, params)
+
+            def send(self, status: int, content: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-slack", daemon=True).start()
+
+    @property
+    def address(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        """Value for WebClient(base_url=...)"""
+        return f"{self.address}/api/"
+
+    def add_thread(self, fixture: ThreadFixture) -> None:
+        with self._lock:
+            self.threads[(fixture.channel_id, fixture.thread_ts)] = list(fixture.messages)
+            self.files.update(fixture.files)
+
+    def limit_for(self, method: str) -> int:
+        """Calls allowed per window for a method, from its tier"""
+        per_minute = (
+            POST_MESSAGE_LIMIT_PER_MINUTE
+            if method in PER_CHANNEL_METHODS
+            else TIER_LIMITS_PER_MINUTE[METHOD_TIERS.get(method, DEFAULT_TIER)]
+        )
+        return max(1, int(per_minute * self.settings.rate_scale * self.settings.window / 60))
+
+    def _sleep(self, seconds: float) -> None:
+        if self.settings.jitter:
+            with self._lock:
+                seconds += self._random.uniform(0, self.settings.jitter)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _route(self, handler: Any, params: Dict[str, Any]) -> None:
+        started = time.monotonic()
+        url = urlparse(handler.path)
+        params = {**dict(parse_qsl(url.query)), **params}
+        if url.path.startswith("/files/"):
+            self._download(handler, url.path.split("/")[2])
+            return
+        if not url.path.startswith("/api/"):
+            handler.send(404, b"Not Found", "text/plain")
+            return
+
+        method = url.path.split("/api/", 1)[1]
+        with self._lock:
+            self.calls[method] += 1
+        entry: Dict[str, Any] = {"time": time.time(), "method": method, "channel": params.get("channel")}
+
+        retry_after = 0.0
+        if self.settings.enforce_limits:
+            channel = params.get("channel") if method in PER_CHANNEL_METHODS else None
+            retry_after = self._limiter.acquire((method, channel), self.limit_for(method))
+        if retry_after:
+            with self._lock:
+                self.rate_limited[method] += 1
+            status, document = 429, {"ok": False, "error": "ratelimited"}
+            headers = {"Retry-After": str(max(1, math.ceil(retry_after)))}
+        elif not handler.headers.get("Authorization") and not params.get("token"):
+            status, document, headers = 200, {"ok": False, "error": "not_authed"}, {}
+        else:
+            self._sleep(self.settings.latency)
+            status, document, headers = 200, self._call(method, params), {}
+
+        handler.send(status, json.dumps(document).encode("utf-8"), "application/json; charset=utf-8", headers)
+        entry.update(status=status, ok=document.get("ok"), latency_ms=(time.monotonic() - started) * 1000)
+        if self._log is not None:
+            with self._lock:
+                self._log.write(json.dumps(entry) + "\n")
+
+    def _download(self, handler: Any, file_id: str) -> None:
+        file = self.files.get(file_id)
+        if file is None or not handler.headers.get("Authorization"):
+            handler.send(404 if file is None else 403, b"", "text/plain")
+            return
+        with self._lock:
+            self.calls["files.download"] += 1
+        self._sleep(self.settings.file_latency)
+        handler.send(200, file[2], "application/octet-stream")
+
+    def _call(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if method == "auth.test":
+            return {
+                "ok": True,
+                "url": "https://mooai-bench.slack.com/",
+                "team": "MooAI Bench",
+                "user": "mooai",
+                "team_id": BENCH_TEAM_ID,
+                "user_id": BENCH_BOT_USER_ID,
+                "bot_id": BENCH_BOT_ID,
+            }
+        if method == "conversations.replies":
+            with self._lock:
+                messages = list(self.threads.get((params.get("channel"), params.get("ts")), []))
+            if not messages:
+                return {"ok": False, "error": "thread_not_found"}
+            if params.get("oldest"):
+                messages = [msg for msg in messages if float(msg["ts"]) > float(params["oldest"])]
+            limit = int(params.get("limit") or 1000)
+            return {"ok": True, "messages": messages[:limit], "has_more": len(messages) > limit}
+        if method == "files.info":
+            file = self.files.get(params.get("file", ""))
+            if file is None:
+                return {"ok": False, "error": "file_not_found"}
+            name, filetype, content = file
+            url_private = f"{self.address}/files/{params['file']}/{name}"
+            info = {"id": params["file"], "name": name, "filetype": filetype, "size": len(content)}
+            return {"ok": True, "file": {**info, "url_private": url_private}}
+        if method == "chat.postMessage":
+            return self._post_message(params)
+        if method == "chat.update":
+            return {"ok": True, "channel": params.get("channel"), "ts": params.get("ts"), "text": params.get("text", "")}
+        if method == "views.publish":
+            return {"ok": True, "view": {"id": f"V{params.get('user_id', '')}", "hash": f"{time.time():.6f}"}}
+        if method in ("assistant.threads.setStatus", "assistant.threads.setTitle", "assistant.threads.setSuggestedPrompts"):
+            return {"ok": True}
+        if method == "users.info":
+            user = params.get("user", "")
+            profile = {"display_name": f"User {user[-4:]}", "real_name": f"Bench User {user[-4:]}"}
+            return {"ok": True, "user": {"id": user, "name": user.lower(), "profile": profile}}
+        if method == "users.list":
+            return {"ok": True, "members": [], "response_metadata": {"next_cursor": ""}}
+        return {"ok": False, "error": "unknown_method"}
+
+    def _post_message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        channel = params.get("channel")
+        if not channel:
+            return {"ok": False, "error": "channel_not_found"}
+        with self._lock:
+            ts = f"{2_000_000_000 + next(self._ts)}.000000"
+            message = {
+                "type": "message",
+                "user": BENCH_BOT_USER_ID,
+                "bot_id": BENCH_BOT_ID,
+                "text": params.get("text", ""),
+                "ts": ts,
+            }
+            thread_ts = params.get("thread_ts")
+            if thread_ts:
+                message["thread_ts"] = thread_ts
+                # Replies join their thread, so later conversations.replies calls see them
+                if (channel, thread_ts) in self.threads:
+                    self.threads[(channel, thread_ts)].append(message)
+            self.posted.append({"channel": channel, **message})
+        return {"ok": True, "channel": channel, "ts": ts, "message": message}
+
+    def shutdown(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._log is not None:
+            self._log.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8766, help="Port to listen on")
+    parser.add_argument("--threads", type=int, default=10, help="Seeded threads in the benchmark channel")
+    parser.add_argument("--thread-size", type=int, default=20, help="Messages per seeded thread")
+    parser.add_argument("--images", type=int, default=0, help="Image attachments per seeded thread")
+    parser.add_argument("--pdfs", type=int, default=0, help="PDF attachments per seeded thread")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every API call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency, up to this many seconds")
+    parser.add_argument("--file-latency", type=float, default=0.0, help="Seconds added to every file download")
+    parser.add_argument("--rate-scale", type=float, default=1.0, help="Multiplier on every tier's rate limit")
+    parser.add_argument("--window", type=float, default=60.0, help="Rate-limit window in seconds")
+    parser.add_argument("--no-limits", action="store_true", help="Don't enforce rate limits")
+    parser.add_argument("--log", help="Append a JSON line per API call to this file")
+    args = parser.parse_args()
+
+    settings = FakeSlackSettings(
+        latency=args.latency,
+        jitter=args.jitter,
+        file_latency=args.file_latency,
+        rate_scale=args.rate_scale,
+        window=args.window,
+        enforce_limits=not args.no_limits,
+    )
+    server = FakeSlackServer(settings, args.host, args.port, args.log)
+    for i in range(args.threads):
+        fixture = build_thread(args.thread_size, args.images, args.pdfs, channel_id=BENCH_CHANNEL_ID, thread_index=i)
+        server.add_thread(fixture)
+        print(f"  thread {fixture.channel_id} {fixture.thread_ts} ({len(fixture.messages)} messages)")
+    print(f"Fake Slack Web API listening on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+fakes.py
+In-process stand-ins for Slack and the agent, so benchmarks exercise the real pipeline without network access.
+
+File downloads still go over HTTP, to a local server, because download_file fetches url_private with requests.
+"""
+
+import asyncio
+import collections
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from benchmarks.fixtures import BENCH_BOT_ID, ThreadFixture
+
+# Default markdown answer length of the fake agent, in characters
+DEFAULT_RESPONSE_CHARS = 2_000
+
+
+class FileServer:
+    """Serve fixture file contents at /files/<file id> from a daemon thread"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.files: Dict[str, bytes] = {}
+        files = self.files
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                content = files.get(self.path.rsplit("/", 1)[-1])
+                if content is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="bench-file-server", daemon=True).start()
+
+    def url(self, file_id: str) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/files/{file_id}"
+
+    def shutdown(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeSlackClient:
+    """
+    Stand-in for the WebClient methods the reply pipeline calls, serving fixture threads.
+
+    Every call sleeps for latency seconds to model the Slack round trip; calls are counted per
+    method and posted messages are recorded.
+    """
+
+    def __init__(self, file_server: Optional[FileServer] = None, latency: float = 0.0, token: str = "xoxb-bench"):
+        self.token = token
+        self.latency = latency
+        self.file_server = file_server or FileServer()
+        self.threads: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self.file_info: Dict[str, Dict[str, Any]] = {}
+        self.posted: List[Dict[str, Any]] = []
+        self.calls: "collections.Counter[str]" = collections.Counter()
+        self._ts = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add_thread(self, fixture: ThreadFixture) -> None:
+        self.threads[(fixture.channel_id, fixture.thread_ts)] = fixture.messages
+        for file_id, (name, filetype, content) in fixture.files.items():
+            self.file_server.files[file_id] = content
+            self.file_info[file_id] = {"id": file_id, "name": name, "filetype": filetype, "size": len(content)}
+
+    def _respond(self, method: str, **data: Any) -> Dict[str, Any]:
+        with self._lock:
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return {"ok": True, **data}
+
+    def conversations_replies(self, channel: str, ts: str, **kwargs: Any) -> Dict[str, Any]:
+        messages = self.threads.get((channel, ts), [])
+        oldest = kwargs.get("oldest")
+        if oldest is not None:
+            messages = [msg for msg in messages if float(msg["ts"]) > float(oldest)]
+        return self._respond("conversations.replies", messages=messages, has_more=False)
+
+    def files_info(self, file: str, **kwargs: Any) -> Dict[str, Any]:
+        info = self.file_info.get(file)
+        if info is None:
+            return {"ok": False, "error": "file_not_found"}
+        return self._respond("files.info", file={**info, "url_private": self.file_server.url(file)})
+
+    def users_info(self, user: str, **kwargs: Any) -> Dict[str, Any]:
+        profile = {"display_name": f"User {user[-4:]}"}
+        return self._respond("users.info", user={"id": user, "name": user.lower(), "profile": profile})
+
+    def users_list(self, **kwargs: Any) -> Dict[str, Any]:
+        return self._respond("users.list", members=[], response_metadata={"next_cursor": ""})
+
+    def chat_postMessage(self, channel: str, **kwargs: Any) -> Dict[str, Any]:
+        with self._lock:
+            ts = f"{2_000_000_000 + next(self._ts)}.000000"
+            self.posted.append({"channel": channel, "ts": ts, **kwargs})
+        return self._respond("chat.postMessage", channel=channel, ts=ts, message={"bot_id": BENCH_BOT_ID, **kwargs})
+
+    def chat_update(self, channel: str, ts: str, **kwargs: Any) -> Dict[str, Any]:
+        return self._respond("chat.update", channel=channel, ts=ts)
+
+    def views_publish(self, user_id: str, view: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+        return self._respond("views.publish", view={**view, "id": f"V{user_id}"})
+
+    def assistant_threads_setStatus(self, channel_id: str, thread_ts: str, status: str, **kwargs: Any) -> Dict[str, Any]:
+        return self._respond("assistant.threads.setStatus")
+
+    def assistant_threads_setTitle(self, channel_id: str, thread_ts: str, title: str, **kwargs: Any) -> Dict[str, Any]:
+        return self._respond("assistant.threads.setTitle")
+
+    def assistant_threads_setSuggestedPrompts(
+        self, channel_id: str, thread_ts: str, prompts: Any, **kwargs: Any
+    ) -> Dict[str, Any]:
+        return self._respond("assistant.threads.setSuggestedPrompts")
+
+    def close(self) -> None:
+        self.file_server.shutdown()
+
+
+class FakeRunner:
+    """Stand-in for agents.Runner: waits latency seconds, then answers with a fixed-size StructuredResponse"""
+
+    def __init__(self, latency: float = 0.0, response_chars: int = DEFAULT_RESPONSE_CHARS):
+        self.latency = latency
+        self.response_chars = response_chars
+        self.calls = 0
+
+    async def run(self, agent: Any, messages: Any) -> Any:
+        from agents.usage import Usage
+
+        from benchmarks.bench_render import make_markdown
+        from lib.models import StructuredResponse
+
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        output = StructuredResponse(
+            thread_title="Benchmark thread",
+            message_title="Benchmark answer",
+            response=make_markdown(self.response_chars),
+            followups=["Tell me more", "Summarise"],
+        )
+        input_tokens = sum(len(str(msg.get("content", ""))) for msg in messages) // 4
+        usage = Usage(requests=1, input_tokens=input_tokens, output_tokens=self.response_chars // 4)
+        return SimpleNamespace(
+            final_output=output, context_wrapper=SimpleNamespace(usage=usage), raw_responses=[], new_items=[]
+        )
+
+
+@contextmanager
+def fake_agent(latency: float = 0.0, response_chars: int = DEFAULT_RESPONSE_CHARS) -> Iterator[FakeRunner]:
+    """Route lib.agent's Runner to a FakeRunner for the duration of the block"""
+    import lib.agent
+
+    lib.agent._load_agents_sdk()
+    original = lib.agent.Runner
+    runner = FakeRunner(latency, response_chars)
+    lib.agent.Runner = runner
+    try:
+        yield runner
+    finally:
+        lib.agent.Runner = original
@@ -0,0 +1,143 @@
+"""
+fixtures.py
+Slack thread fixtures for the benchmarks, scaled up from a recorded conversations.replies payload.
+"""
+
+import copy
+import json
+import os
+import zlib
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+PAYLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "payloads")
+
+BENCH_CHANNEL_ID = "C0BENCH001"
+BENCH_TEAM_ID = "T01MOOTEAM"
+BENCH_BOT_USER_ID = "U07MOOAI01"
+BENCH_BOT_ID = "B07MOOAI01"
+THREAD_TS_BASE = 1718000000.0
+
+
+class ThreadFixture(NamedTuple):
+    channel_id: str
+    thread_ts: str
+    messages: List[Dict[str, Any]]
+    # file ID -> (name, filetype, content)
+    files: Dict[str, Tuple[str, str, bytes]]
+
+
+class Scenario(NamedTuple):
+    messages: int
+    images: int = 0
+    pdfs: int = 0
+
+
+# Benchmark scenarios: thread length, and how many of its messages carry an image or a PDF
+SCENARIOS: Dict[str, Scenario] = {
+    "thread_10": Scenario(messages=10),
+    "thread_100": Scenario(messages=100),
+    "thread_1000": Scenario(messages=1000),
+    "image_heavy": Scenario(messages=40, images=12),
+    "pdf_heavy": Scenario(messages=40, pdfs=8),
+}
+
+
+def load_recorded_thread() -> List[Dict[str, Any]]:
+    """Messages of the recorded (anonymized) conversations.replies response"""
+    with open(os.path.join(PAYLOADS_DIR, "thread_replies.json"), encoding="utf-8") as f:
+        return json.load(f)["messages"]
+
+
+@lru_cache(maxsize=8)
+def png_bytes(size: int = 200_000) -> bytes:
+    """A valid PNG of roughly size bytes (noise compresses badly, so the file stays large)"""
+    width = max(1, int((size / 3) ** 0.5))
+    rows = b"".join(b"\x00" + os.urandom(width * 3) for _ in range(width))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return len(data).to_bytes(4, "big") + kind + data + zlib.crc32(kind + data).to_bytes(4, "big")
+
+    header = width.to_bytes(4, "big") * 2 + b"\x08\x02\x00\x00\x00"
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows, 1)) + chunk(b"IEND", b"")
+
+
+@lru_cache(maxsize=8)
+def pdf_bytes(pages: int = 5) -> bytes:
+    """A PDF with the given number of blank pages"""
+    import PyPDF2
+
+    writer = PyPDF2.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=612, height=792)
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def _spread(count: int, size: int) -> List[int]:
+    """count message indices spread evenly over 1..size-1 (the root message never has a file)"""
+    if count <= 0 or size < 2:
+        return []
+    step = (size - 1) / count
+    return [1 + int(i * step) for i in range(count)]
+
+
+def build_thread(
+    size: int,
+    images: int = 0,
+    pdfs: int = 0,
+    channel_id: str = BENCH_CHANNEL_ID,
+    thread_index: int = 0,
+    pdf_pages: int = 5,
+    image_size: int = 200_000,
+) -> ThreadFixture:
+    """
+    Build a thread of size messages by repeating the recorded message shapes.
+
+    Args:
+        size: Number of messages, including the root.
+        images: Messages that carry a PNG attachment.
+        pdfs: Messages that carry a PDF attachment.
+        channel_id: Channel of the thread.
+        thread_index: Distinguishes threads built for the same channel (their timestamps differ).
+        pdf_pages: Pages per PDF attachment.
+        image_size: Approximate bytes per image attachment.
+
+    Returns:
+        ThreadFixture with the messages (as conversations.replies returns them) and the file contents.
+    """
+    recorded = load_recorded_thread()
+    root = recorded[0]
+    text_templates = [msg for msg in recorded[1:] if not msg.get("files")]
+    file_templates = {msg["files"][0]["filetype"]: msg for msg in recorded if msg.get("files")}
+
+    thread_ts = f"{THREAD_TS_BASE + thread_index * 100_000:.6f}"
+    file_kinds = {i: "png" for i in _spread(images, size)}
+    file_kinds.update({i: "pdf" for i in _spread(pdfs, size) if i not in file_kinds})
+
+    messages: List[Dict[str, Any]] = []
+    files: Dict[str, Tuple[str, str, bytes]] = {}
+    for i in range(size):
+        kind = file_kinds.get(i)
+        template = root if i == 0 else file_templates[kind] if kind else text_templates[i % len(text_templates)]
+        message = copy.deepcopy(template)
+        message["ts"] = thread_ts if i == 0 else f"{float(thread_ts) + i:.6f}"
+        message["thread_ts"] = thread_ts
+        if kind:
+            file_info = message["files"][0]
+            file_info["id"] = f"F{kind.upper()}{thread_index:04d}{i:05d}"
+            content = png_bytes(image_size) if kind == "png" else pdf_bytes(pdf_pages)
+            file_info["size"] = len(content)
+            files[file_info["id"]] = (file_info["name"], kind, content)
+        messages.append(message)
+
+    if messages:
+        messages[0]["reply_count"] = size - 1
+    return ThreadFixture(channel_id, thread_ts, messages, files)
+
+
+def build_scenario(name: str, thread_index: int = 0) -> ThreadFixture:
+    scenario = SCENARIOS[name]
+    return build_thread(scenario.messages, scenario.images, scenario.pdfs, thread_index=thread_index)
@@ -0,0 +1,102 @@
+"""
+harness.py
+Shared helpers for the benchmarks: latency percentiles, and saving results per commit for comparison.
+"""
+
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+# Result fields compared by compare_results, and whether a higher value is better
+COMPARED_FIELDS = {"throughput_per_s": True, "p50_ms": False, "p99_ms": False, "peak_memory_mb": False}
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile (pct in 0-100) of values; 0.0 for an empty sequence"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def summarize_latencies(latencies: Sequence[float], wall_seconds: float) -> Dict[str, float]:
+    """Throughput and latency percentiles (in ms) for runs that took wall_seconds in total"""
+    return {
+        "runs": len(latencies),
+        "throughput_per_s": len(latencies) / wall_seconds if wall_seconds > 0 else 0.0,
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def git_commit() -> str:
+    """Short hash of HEAD (with a +dirty suffix for uncommitted changes), or "unknown" outside a git checkout"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=REPO_ROOT).returncode != 0
+        return f"{commit}+dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(benchmark: str, scenarios: Dict[str, Any], settings: Dict[str, Any], path: Optional[str] = None) -> str:
+    """
+    Write a benchmark's results as JSON, by default to benchmarks/results/<benchmark>-<commit>.json.
+
+    Returns:
+        The path written.
+    """
+    commit = git_commit()
+    path = path or os.path.join(RESULTS_DIR, f"{benchmark}-{commit}.json")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    document = {
+        "benchmark": benchmark,
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": settings,
+        "scenarios": scenarios,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+    return path
+
+
+def compare_results(baseline_path: str, scenarios: Dict[str, Any]) -> List[str]:
+    """
+    Lines describing how each scenario's results changed relative to a saved baseline.
+
+    Args:
+        baseline_path: JSON file written by save_results.
+        scenarios: Current results, keyed by scenario name.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    lines = [f"Compared with {baseline['commit']} ({baseline['timestamp']}):"]
+    for name, current in scenarios.items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            lines.append(f"  {name:<16} (not in baseline)")
+            continue
+        changes = []
+        for field, higher_is_better in COMPARED_FIELDS.items():
+            if field not in current or not previous.get(field):
+                continue
+            change = (current[field] - previous[field]) / previous[field] * 100
+            better = change > 0 if higher_is_better else change < 0
+            changes.append(f"{field} {change:+6.1f}%{'' if abs(change) < 5 else ' (better)' if better else ' (worse)'}")
+        lines.append(f"  {name:<16} " + ", ".join(changes))
+    return lines
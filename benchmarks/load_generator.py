@@ -0,0 +1,408 @@
+"""
+load_generator.py
+Open-loop load generator for the Bolt listeners: sends a weighted mix of synthetic events (app_mention,
+message, assistant_thread_started, assistant user messages, app_home_opened) through a Bolt App with
+register_listeners, at a target rate spread over N conversation threads, against an in-process agent
+stand-in and either an in-process Slack stand-in or (with --slack-server) the local Slack Web API server
+in benchmarks.fake_slack, which enforces Slack's rate-limit tiers.
+
+Each rate step runs for a fixed duration and then drains. For every step it reports the completed
+throughput, ack latency, the delay events wait for a listener thread (and, in pool mode, for a worker),
+end-to-end latency and errors by event kind. The highest completed throughput over the steps is the
+saturation throughput; results are saved to benchmarks/results/loadgen-<commit>.json.
+
+Usage:
+    python -m benchmarks.load_generator [--rates R,R,...] [--duration S] [--threads N] [--mix KIND=W,...]
+        [--execution-mode inline|pool] [--listener-threads N] [--pool-size N] [--pool-queue N]
+        [--agent-latency S] [--slack-latency S] [--slack-server [--slack-rate-scale X]]
+        [--output PATH] [--compare PATH] [--no-save]
+"""
+
+import argparse
+import collections
+import contextvars
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from slack_bolt import App, BoltRequest
+from slack_bolt.authorization import AuthorizeResult
+from slack_bolt.context.assistant.assistant_utilities import AssistantUtilities
+from slack_bolt.request.payload_utils import is_assistant_event, to_event
+from slack_sdk import WebClient
+
+from benchmarks.events import DEFAULT_MIX, EventFactory, parse_mix
+from benchmarks.fake_slack import FakeSlackServer, FakeSlackSettings
+from benchmarks.fakes import DEFAULT_RESPONSE_CHARS, FakeSlackClient, fake_agent
+from benchmarks.fixtures import BENCH_BOT_USER_ID, BENCH_TEAM_ID
+from benchmarks.harness import compare_results, percentile, save_results, summarize_latencies
+from lib.dedupe import InMemoryDedupeStore, build_dedupe_middleware, configure_dedupe_store
+from lib.slack_client import ASSISTANT_UTILITY_KEYS, SlackRateLimiter, build_rate_limit_middleware
+from lib.tracing import DEFAULT_LISTENER_THREADS, ContextThreadPoolExecutor
+from lib.worker_pool import DEFAULT_POOL_SIZE, DEFAULT_QUEUE_SIZE, WorkerPool, configure_worker_pool
+from listeners import register_listeners
+
+# A step is saturated when it completes less than this share of the offered rate
+SATURATION_COMPLETION_RATIO = 0.95
+
+
+class EventRecord:
+    """Timing of one sent event, carried to its listener and worker pool job in a contextvar"""
+
+    __slots__ = ("kind", "sent_at", "listeners", "jobs")
+
+    def __init__(self, kind: str, sent_at: float):
+        self.kind = kind
+        self.sent_at = sent_at
+        self.listeners = 0
+        self.jobs = 0
+
+
+_current_event: contextvars.ContextVar[Optional[EventRecord]] = contextvars.ContextVar("loadgen_event", default=None)
+
+
+class StepStats:
+    """Latencies and counts collected during one rate step (times in seconds)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent: "collections.Counter[str]" = collections.Counter()
+        self.completed: "collections.Counter[str]" = collections.Counter()
+        self.errors: "collections.Counter[str]" = collections.Counter()
+        self.rejected = 0
+        self.send_lag: List[float] = []
+        self.ack: List[float] = []
+        self.listener_queue: List[float] = []
+        self.listener_service: List[float] = []
+        self.job_queue: List[float] = []
+        self.end_to_end: List[float] = []
+
+    def add(self, series: List[float], value: float) -> None:
+        with self.lock:
+            series.append(value)
+
+    def complete(self, record: EventRecord) -> None:
+        with self.lock:
+            self.completed[record.kind] += 1
+            self.end_to_end.append(time.monotonic() - record.sent_at)
+
+    def error(self, kind: str) -> None:
+        with self.lock:
+            self.errors[kind] += 1
+
+
+class ErrorsByKind(logging.Handler):
+    """Count ERROR records against the kind of the event being handled when they were logged"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.stats: Optional[StepStats] = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        event = _current_event.get()
+        if self.stats is not None:
+            self.stats.error(event.kind if event else "unknown")
+
+
+class InstrumentedListenerExecutor(ContextThreadPoolExecutor):
+    """Bolt listener executor that records how long each listener waits for a thread and then runs"""
+
+    def __init__(self, stats: StepStats, max_workers: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix="loadgen-listener")
+        self.stats = stats
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        record = _current_event.get()
+        if record is not None:
+            record.listeners += 1
+        submitted = time.monotonic()
+
+        def run() -> Any:
+            started = time.monotonic()
+            self.stats.add(self.stats.listener_queue, started - submitted)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.stats.add(self.stats.listener_service, time.monotonic() - started)
+                # Events whose listener handed the reply to the worker pool complete when that job does
+                if record is not None and record.jobs == 0:
+                    self.stats.complete(record)
+
+        return super().submit(run)
+
+
+class InstrumentedWorkerPool(WorkerPool):
+    """Worker pool that records each job's queueing delay and completes the event that submitted it"""
+
+    def __init__(self, stats: StepStats, size: int, queue_size: int):
+        super().__init__(size=size, queue_size=queue_size, name="loadgen-worker")
+        self.stats = stats
+
+    def submit(self, name: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> bool:
+        record = _current_event.get()
+        if record is not None:
+            record.jobs += 1
+        accepted = super().submit(name, func, *args, **kwargs)
+        if not accepted:
+            with self.stats.lock:
+                self.stats.rejected += 1
+            if record is not None:
+                record.jobs -= 1
+        return accepted
+
+    def _run(self, job: Any) -> None:
+        self.stats.add(self.stats.job_queue, time.monotonic() - job.enqueued_at)
+        try:
+            super()._run(job)
+        finally:
+            record = job.context.get(_current_event)
+            if record is not None:
+                self.stats.complete(record)
+
+
+def build_fake_client_middleware(client: FakeSlackClient) -> Callable[..., None]:
+    """Global middleware that hands every listener the fake Slack client (see build_rate_limit_middleware)"""
+
+    def fake_client_middleware(body: Dict[str, Any], context: Any, next: Callable[[], None]) -> None:
+        context["client"] = client
+        if is_assistant_event(body):
+            assistant = AssistantUtilities(payload=to_event(body), context=context)  # type: ignore[arg-type]
+            for key in ASSISTANT_UTILITY_KEYS:
+                context[key] = getattr(assistant, key)
+        next()
+
+    return fake_client_middleware
+
+
+def build_app(client: Any, listener_executor: ThreadPoolExecutor, rate_limiter: Optional[SlackRateLimiter] = None) -> App:
+    """
+    A Bolt App wired like app.py, but authorized locally.
+
+    Args:
+        client: A FakeSlackClient, or (with rate_limiter) a WebClient whose base_url is the fake Slack server.
+        listener_executor: Executor Bolt runs listeners on.
+        rate_limiter: Shared rate limiter for the WebClient, as in app.py.
+    """
+    app = App(
+        signing_secret="loadgen",
+        authorize=lambda **kwargs: AuthorizeResult(
+            enterprise_id=None, team_id=BENCH_TEAM_ID, bot_token=client.token, bot_user_id=BENCH_BOT_USER_ID
+        ),
+        client=client if rate_limiter is not None else None,
+        request_verification_enabled=False,
+        listener_executor=listener_executor,
+    )
+    if rate_limiter is not None:
+        app.use(build_rate_limit_middleware(rate_limiter))
+    else:
+        app.use(build_fake_client_middleware(client))
+    configure_dedupe_store(InMemoryDedupeStore())
+    app.use(build_dedupe_middleware())
+    register_listeners(app)
+    return app
+
+
+def send_event(app: App, factory: EventFactory, stats: StepStats, due: float) -> None:
+    """Dispatch one event to the app, as Socket Mode would, and record its ack"""
+    kind = factory.next_kind()
+    body = json.dumps(factory.make(kind))
+    record = EventRecord(kind, time.monotonic())
+    _current_event.set(record)
+    stats.add(stats.send_lag, record.sent_at - due)
+    with stats.lock:
+        stats.sent[kind] += 1
+    try:
+        response = app.dispatch(BoltRequest(body=body, headers={"content-type": ["application/json"]}))
+    except Exception:
+        logging.getLogger("loadgen").exception(f"Dispatching a {kind} event failed")
+        response = None
+    stats.add(stats.ack, time.monotonic() - record.sent_at)
+    if response is None or response.status != 200:
+        stats.error(kind)
+    # Events that reached no listener are done once acknowledged
+    if record.listeners == 0:
+        stats.complete(record)
+
+
+def run_step(
+    rate: float,
+    duration: float,
+    factory: EventFactory,
+    client: Any,
+    rate_limiter: Optional[SlackRateLimiter],
+    errors: ErrorsByKind,
+    args: argparse.Namespace,
+) -> Dict[str, Any]:
+    """Send events at rate per second for duration seconds, wait for them to drain and summarize the step"""
+    stats = StepStats()
+    errors.stats = stats
+    listener_executor = InstrumentedListenerExecutor(stats, args.listener_threads)
+    pool = InstrumentedWorkerPool(stats, args.pool_size, args.pool_queue) if args.execution_mode == "pool" else None
+    configure_worker_pool(pool)
+    app = build_app(client, listener_executor, rate_limiter)
+
+    total = max(1, int(rate * duration))
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.senders, thread_name_prefix="loadgen-sender") as senders:
+        for i in range(total):
+            due = started + i / rate
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            context = contextvars.copy_context()
+            senders.submit(context.run, send_event, app, factory, stats, due)
+    sent = time.monotonic()
+    listener_executor.shutdown(wait=True)
+    if pool is not None:
+        pool.shutdown(wait=True, timeout=None)
+    drained = time.monotonic()
+    configure_worker_pool(None)
+    errors.stats = None
+
+    completed = sum(stats.completed.values())
+    error_count = sum(stats.errors.values())
+    result = {
+        **summarize_latencies(stats.end_to_end, drained - started),
+        "offered_per_s": rate,
+        "achieved_send_per_s": total / (sent - started) if sent > started else 0.0,
+        "sent": dict(stats.sent),
+        "completed": completed,
+        "drain_s": drained - sent,
+        "errors": dict(stats.errors),
+        "error_rate": error_count / total,
+        "rejected": stats.rejected,
+        "send_lag_p99_ms": percentile(stats.send_lag, 99) * 1000,
+        "ack_p50_ms": percentile(stats.ack, 50) * 1000,
+        "ack_p99_ms": percentile(stats.ack, 99) * 1000,
+        "listener_queue_p50_ms": percentile(stats.listener_queue, 50) * 1000,
+        "listener_queue_p99_ms": percentile(stats.listener_queue, 99) * 1000,
+        "listener_service_p50_ms": percentile(stats.listener_service, 50) * 1000,
+        "listener_service_p99_ms": percentile(stats.listener_service, 99) * 1000,
+    }
+    if pool is not None:
+        result["job_queue_p50_ms"] = percentile(stats.job_queue, 50) * 1000
+        result["job_queue_p99_ms"] = percentile(stats.job_queue, 99) * 1000
+    result["saturated"] = result["throughput_per_s"] < rate * SATURATION_COMPLETION_RATIO or stats.rejected > 0
+    return result
+
+
+def print_step(result: Dict[str, Any]) -> None:
+    queue = f"listener queue p50 {result['listener_queue_p50_ms']:7.1f} p99 {result['listener_queue_p99_ms']:8.1f} ms"
+    if "job_queue_p99_ms" in result:
+        queue += f"  job queue p50 {result['job_queue_p50_ms']:7.1f} p99 {result['job_queue_p99_ms']:8.1f} ms"
+    print(
+        f"  {result['offered_per_s']:7.1f}/s offered  {result['throughput_per_s']:7.1f}/s completed"
+        f"  ack p99 {result['ack_p99_ms']:6.1f} ms  {queue}"
+        f"  e2e p50 {result['p50_ms']:8.1f} p99 {result['p99_ms']:8.1f} ms"
+        f"  errors {result['error_rate']:.1%}{'  SATURATED' if result['saturated'] else ''}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", default="2,5,10,20", help="Comma-separated event rates (per second) to step through")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to send at each rate")
+    parser.add_argument("--threads", type=int, default=20, help="Conversation threads the events are spread over")
+    parser.add_argument("--thread-size", type=int, default=20, help="Messages per conversation thread")
+    parser.add_argument("--images", type=int, default=0, help="Image attachments per conversation thread")
+    parser.add_argument("--pdfs", type=int, default=0, help="PDF attachments per conversation thread")
+    mix = ",".join(f"{kind}={weight}" for kind, weight in DEFAULT_MIX.items())
+    parser.add_argument("--mix", default=mix, help=f"Event kinds and relative weights (default: {mix})")
+    parser.add_argument("--execution-mode", choices=("inline", "pool"), default="inline", help="Where replies run")
+    parser.add_argument("--listener-threads", type=int, default=DEFAULT_LISTENER_THREADS, help="Bolt listener threads")
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE, help="Worker pool threads (pool mode)")
+    parser.add_argument("--pool-queue", type=int, default=DEFAULT_QUEUE_SIZE, help="Worker pool queue size (pool mode)")
+    parser.add_argument(
+        "--senders", type=int, default=64, help="Threads dispatching events, so slow acks don't slow the rate"
+    )
+    parser.add_argument("--agent-latency", type=float, default=1.0, help="Seconds the fake agent takes per run")
+    parser.add_argument("--slack-latency", type=float, default=0.02, help="Seconds each fake Slack call takes")
+    parser.add_argument(
+        "--slack-server", action="store_true", help="Call the rate-limited fake Slack Web API server over HTTP"
+    )
+    parser.add_argument(
+        "--slack-rate-scale", type=float, default=1.0, help="Multiplier on the fake Slack server's rate limits"
+    )
+    parser.add_argument("--response-chars", type=int, default=DEFAULT_RESPONSE_CHARS, help="Length of the fake answer")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the event mix and thread choice")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/loadgen-<commit>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--no-save", action="store_true", help="Don't write a results file")
+    args = parser.parse_args()
+
+    rates = [float(rate) for rate in args.rates.split(",") if rate.strip()]
+    factory = EventFactory(args.threads, args.thread_size, args.images, args.pdfs, parse_mix(args.mix), args.seed)
+    server: Optional[FakeSlackServer] = None
+    rate_limiter: Optional[SlackRateLimiter] = None
+    if args.slack_server:
+        server = FakeSlackServer(FakeSlackSettings(latency=args.slack_latency, rate_scale=args.slack_rate_scale))
+        client: Any = WebClient(token="xoxb-bench", base_url=server.base_url)
+        rate_limiter = SlackRateLimiter()
+    else:
+        client = FakeSlackClient(latency=args.slack_latency)
+    for fixture in factory.fixtures:
+        (server or client).add_thread(fixture)
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    errors = ErrorsByKind()
+    logging.getLogger().addHandler(errors)
+
+    print(
+        f"Listener load ({args.execution_mode} mode, {args.listener_threads} listener threads, {args.threads} threads,"
+        f" {args.duration:g}s per rate, agent {args.agent_latency:g}s, Slack {args.slack_latency:g}s per call)"
+    )
+    results = {}
+    try:
+        with fake_agent(latency=args.agent_latency, response_chars=args.response_chars):
+            for rate in rates:
+                results[f"rate_{rate:g}"] = run_step(rate, args.duration, factory, client, rate_limiter, errors, args)
+                print_step(results[f"rate_{rate:g}"])
+    finally:
+        logging.getLogger().removeHandler(errors)
+        if server is not None:
+            server.shutdown()
+        else:
+            client.close()
+
+    saturation = max(result["throughput_per_s"] for result in results.values())
+    first_saturated = next((result["offered_per_s"] for result in results.values() if result["saturated"]), None)
+    print(f"Saturation throughput: {saturation:.1f} events/s")
+    if first_saturated is not None:
+        print(f"Saturated from {first_saturated:g} events/s offered")
+    print(f"Slack calls: {dict(server.calls if server is not None else client.calls)}")
+    if server is not None:
+        print(f"Slack 429s: {dict(server.rate_limited)}")
+
+    settings = {
+        key: getattr(args, key)
+        for key in (
+            "duration",
+            "threads",
+            "thread_size",
+            "images",
+            "pdfs",
+            "mix",
+            "execution_mode",
+            "listener_threads",
+            "pool_size",
+            "pool_queue",
+            "agent_latency",
+            "slack_latency",
+            "slack_server",
+            "slack_rate_scale",
+            "response_chars",
+            "seed",
+        )
+    }
+    results["saturation"] = {"throughput_per_s": saturation, "saturated_from_per_s": first_saturated}
+    if not args.no_save:
+        print(f"Saved results to {save_results('loadgen', results, settings, args.output)}")
+    if args.compare:
+        print("\n".join(compare_results(args.compare, results)))
+
+
+if __name__ == "__main__":
+    main()
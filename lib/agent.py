@@ -1,15 +1,75 @@
-from agents import Agent, Runner, WebSearchTool
-from lib.constants import SYSTEM_INSTRUCTIONS
+from lib.constants import SYSTEM_INSTRUCTIONS, USAGE_LIMIT_MESSAGE, USAGE_LIMIT_TITLE
+from lib.metrics import COUNT_BUCKETS, REGISTRY, TOKEN_BUCKETS, time_stage
 from lib.models import StructuredResponse
-from typing import List, Dict, Optional, Union
+from lib.tracing import span
+from lib.usage import UsageLimitExceeded, finish_run_async, start_run_async
+from typing import TYPE_CHECKING, Any, List, Dict, Optional, Union
+from functools import lru_cache
 import asyncio
 import logging
+import math
+
+if TYPE_CHECKING:
+    from agents import Agent, Runner, WebSearchTool
 
 logger = logging.getLogger(__name__)
 
 # Define the expected message type for agent input
 AgentMessage = Dict[str, str]
 
+# Names re-exported from the Agents SDK, which (with openai) takes about a second to import
+_AGENTS_SDK_NAMES = ("Agent", "Runner", "WebSearchTool")
+
+agent_input_messages = REGISTRY.histogram("agent_input_messages", "Messages sent to each agent run", buckets=COUNT_BUCKETS)
+agent_model_requests_total = REGISTRY.counter("agent_model_requests_total", "Model API requests made by agent runs")
+agent_tokens = REGISTRY.histogram("agent_tokens", "Tokens used by each agent run, by direction", buckets=TOKEN_BUCKETS)
+
+
+def _load_agents_sdk() -> None:
+    """Import the Agents SDK on first use and bind its names in this module (leaving patched names alone)"""
+    import agents
+
+    for name in _AGENTS_SDK_NAMES:
+        globals().setdefault(name, getattr(agents, name))
+
+
+def __getattr__(name: str) -> Any:
+    if name in _AGENTS_SDK_NAMES:
+        _load_agents_sdk()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@lru_cache(maxsize=16)
+def get_agent(system_instructions: Optional[str] = SYSTEM_INSTRUCTIONS, use_structured_output: bool = False) -> Any:
+    """
+    Build (once) the agent for a set of instructions and output type.
+
+    Agents are stateless configuration, so one instance can serve every run.
+
+    Args:
+        system_instructions: System instructions for the agent
+        use_structured_output: Whether to use structured output format
+
+    Returns:
+        The cached Agent instance
+    """
+    _load_agents_sdk()
+    return Agent(
+        name="Assistant",
+        instructions=system_instructions,
+        tools=[WebSearchTool(user_location={"type": "approximate", "country": "GB"})],
+        model="gpt-4.1-mini",
+        output_type=StructuredResponse if use_structured_output else None,
+    )
+
+
+def prewarm_agents() -> None:
+    """Import the Agents SDK and build the agent the listeners use, before the first request needs it"""
+    # Listeners call run_agent_with_messages_sync without instructions and with structured output, which calls
+    # get_agent(None, True) positionally; lru_cache keys keyword and positional calls differently, so match it
+    get_agent(None, True)
+
 
 async def run_agent_with_messages(
     messages: List[AgentMessage],
@@ -27,23 +87,49 @@ async def run_agent_with_messages(
     Returns:
         Either a string (plain text response) or a StructuredResponse object
     """
-    agent = Agent(
-        name="Assistant",
-        instructions=system_instructions,
-        tools=[WebSearchTool(user_location={"type": "approximate", "country": "GB"})],
-        model="gpt-4.1-mini",
-        output_type=StructuredResponse if use_structured_output else None,
-    )
+    agent = get_agent(system_instructions, use_structured_output)
     # Ensure messages is the correct type for Runner.run
     # If Runner.run expects Sequence[TResponseInputItem], cast messages accordingly
-    result = await Runner.run(agent, messages)  # type: ignore  # See Pyright lint: type invariance
-    logger.debug(result)
+    agent_input_messages.observe(len(messages))
+    # Check the requester's quotas (raising UsageLimitExceeded) before any tokens are spent
+    run_id = await start_run_async(messages)
+    with span("agent.run", model=agent.model, input_messages=len(messages)) as current:
+        try:
+            with time_stage("agent_run"):
+                result = await Runner.run(agent, messages)  # type: ignore  # See Pyright lint: type invariance
+        except BaseException:
+            # Release the run's reserved tokens; what a failed run used isn't reported
+            await finish_run_async(run_id, None)
+            raise
+        usage = result.context_wrapper.usage
+        record_usage(usage)
+        await finish_run_async(run_id, usage)
+        if current is not None:
+            current.set_attribute("input_tokens", usage.input_tokens)
+            current.set_attribute("output_tokens", usage.output_tokens)
+    # The full result holds every input item (including base64 attachments), so log a summary instead
+    logger.debug(
+        "Agent run finished: %d model responses, %d new items, output %s",
+        len(result.raw_responses),
+        len(result.new_items),
+        type(result.final_output).__name__,
+    )
 
     return result.final_output
 
 
+def record_usage(usage: Any) -> None:
+    """Record the token usage an agent run reports (an Agents SDK Usage) in the agent metrics"""
+    agent_model_requests_total.inc(usage.requests)
+    agent_tokens.observe(usage.input_tokens, direction="input")
+    agent_tokens.observe(usage.output_tokens, direction="output")
+
+
 def run_agent_with_messages_sync(
-    messages: List[AgentMessage], system_instructions: Optional[str] = None, use_structured_output: bool = False
+    messages: List[AgentMessage],
+    system_instructions: Optional[str] = None,
+    use_structured_output: bool = False,
+    raise_errors: bool = False,
 ) -> Union[str, StructuredResponse]:
     """
     Run the OpenAI Agent synchronously as a wrapper for the async function,
@@ -53,22 +139,79 @@ def run_agent_with_messages_sync(
         messages: List of messages in the conversation history
         system_instructions: Custom system instructions
         use_structured_output: Whether to use structured output format
+        raise_errors: Re-raise agent failures instead of returning an error response (for callers that retry)
 
     Returns:
         Either a string (plain text response) or a StructuredResponse object
     """
     try:
         return asyncio.run(run_agent_with_messages(messages, system_instructions, use_structured_output))
+    except UsageLimitExceeded as e:
+        return usage_limit_response(e, use_structured_output)
+    except Exception as e:
+        if raise_errors:
+            raise
+        logger.exception(f"Agent execution failed: {e}")
+        return agent_error_response(e, use_structured_output)
+
+
+async def run_agent_with_messages_safe(
+    messages: List[AgentMessage], system_instructions: Optional[str] = None, use_structured_output: bool = False
+) -> Union[str, StructuredResponse]:
+    """
+    Await the OpenAI Agent directly (for async Bolt handlers), returning an error
+    response instead of raising, like run_agent_with_messages_sync.
+
+    Args:
+        messages: List of messages in the conversation history
+        system_instructions: Custom system instructions
+        use_structured_output: Whether to use structured output format
+
+    Returns:
+        Either a string (plain text response) or a StructuredResponse object
+    """
+    try:
+        return await run_agent_with_messages(messages, system_instructions, use_structured_output)
+    except UsageLimitExceeded as e:
+        return usage_limit_response(e, use_structured_output)
     except Exception as e:
-        import logging
-
-        logging.getLogger(__name__).exception(f"Agent execution failed: {e}")
-        if use_structured_output:
-            return StructuredResponse(
-                thread_title=None,
-                message_title="Error Encountered",
-                response=f"I'm sorry, I encountered an error: {str(e)}",
-                followups=None,
-            )
-        else:
-            return f"I'm sorry, I encountered an error: {str(e)}"
+        logger.exception(f"Agent execution failed: {e}")
+        return agent_error_response(e, use_structured_output)
+
+
+def agent_error_response(error: Exception, use_structured_output: bool = False) -> Union[str, StructuredResponse]:
+    """
+    Build the response shown to the user when the agent fails.
+
+    Args:
+        error: The exception raised by the agent run
+        use_structured_output: Whether to return a StructuredResponse instead of a string
+
+    Returns:
+        Either a string (plain text response) or a StructuredResponse object
+    """
+    if use_structured_output:
+        return StructuredResponse(
+            thread_title=None,
+            message_title="Error Encountered",
+            response=f"I'm sorry, I encountered an error: {str(error)}",
+            followups=None,
+        )
+    return f"I'm sorry, I encountered an error: {str(error)}"
+
+
+def usage_limit_response(error: UsageLimitExceeded, use_structured_output: bool = False) -> Union[str, StructuredResponse]:
+    """
+    Build the response shown to the user instead of running the agent when a quota is used up.
+
+    Args:
+        error: The exhausted quota
+        use_structured_output: Whether to return a StructuredResponse instead of a string
+
+    Returns:
+        Either a string (plain text response) or a StructuredResponse object
+    """
+    message = USAGE_LIMIT_MESSAGE.format(minutes=max(1, math.ceil(error.retry_after / 60)))
+    if use_structured_output:
+        return StructuredResponse(thread_title=None, message_title=USAGE_LIMIT_TITLE, response=message, followups=None)
+    return message
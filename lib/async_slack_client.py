@@ -0,0 +1,140 @@
+"""
+async_slack_client.py
+asyncio counterpart of slack_client.py: a rate-limited AsyncWebClient sharing the same token buckets.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import aiohttp
+from slack_sdk.http_retry.builtin_async_handlers import AsyncRateLimitErrorRetryHandler
+from slack_sdk.http_retry.request import HttpRequest
+from slack_sdk.http_retry.response import HttpResponse
+from slack_sdk.http_retry.state import RetryState
+from slack_sdk.web.async_client import AsyncWebClient
+
+from lib.slack_client import (
+    ASSISTANT_UTILITY_KEYS,
+    MAX_RATE_LIMIT_RETRIES,
+    SlackRateLimiter,
+    TeamClients,
+    channel_from_kwargs,
+    penalize_from_response,
+)
+from lib.tracing import span
+
+# Keep-alive connections to Slack shared by the pooled clients of every workspace
+POOLED_CONNECTIONS = 100
+
+
+class AsyncRateLimitRetryHandler(AsyncRateLimitErrorRetryHandler):
+    """Retries 429 responses after Retry-After, and pauses the method's bucket so other callers back off too"""
+
+    def __init__(self, rate_limiter: SlackRateLimiter, max_retry_count: int = MAX_RATE_LIMIT_RETRIES):
+        super().__init__(max_retry_count=max_retry_count)
+        self.rate_limiter = rate_limiter
+
+    async def prepare_for_next_attempt_async(
+        self,
+        *,
+        state: RetryState,
+        request: HttpRequest,
+        response: Optional[HttpResponse] = None,
+        error: Optional[Exception] = None,
+    ) -> None:
+        if response is not None:
+            penalize_from_response(self.rate_limiter, request, response)
+        await super().prepare_for_next_attempt_async(state=state, request=request, response=response, error=error)
+
+
+class AsyncRateLimitedWebClient(AsyncWebClient):
+    """AsyncWebClient that awaits a token from the shared SlackRateLimiter before every API call"""
+
+    def __init__(self, *args, rate_limiter: Optional[SlackRateLimiter] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter or SlackRateLimiter()
+        self.workspace_id: Optional[str] = None
+        self.retry_handlers = [h for h in self.retry_handlers if not isinstance(h, AsyncRateLimitErrorRetryHandler)]
+        self.retry_handlers.append(AsyncRateLimitRetryHandler(self.rate_limiter))
+
+    @classmethod
+    def from_client(
+        cls, client: AsyncWebClient, rate_limiter: SlackRateLimiter, session: Optional[aiohttp.ClientSession] = None
+    ) -> "AsyncRateLimitedWebClient":
+        """Build a rate-limited copy of a (per-request) AsyncWebClient, sharing its aiohttp session (or the given one)"""
+        return cls(
+            token=client.token,
+            base_url=client.base_url,
+            timeout=client.timeout,
+            ssl=client.ssl,
+            proxy=client.proxy,
+            session=client.session or session,
+            trust_env_in_session=client.trust_env_in_session,
+            headers=client.headers,
+            team_id=client.default_params.get("team_id"),
+            logger=client.logger,
+            retry_handlers=list(client.retry_handlers or []),
+            rate_limiter=rate_limiter,
+        )
+
+    async def api_call(self, api_method: str, **kwargs) -> Any:  # type: ignore[override]
+        with span("slack.api", method=api_method) as current:
+            async with self.rate_limiter.async_slot(api_method, channel_from_kwargs(kwargs)) as waited:
+                if current is not None:
+                    current.set_attribute("rate_limit_wait", round(waited, 6))
+                return await super().api_call(api_method, **kwargs)
+
+
+class AsyncTeamClients(TeamClients):
+    """
+    TeamClients for AsyncApp, whose pooled clients share one aiohttp session.
+
+    An AsyncWebClient without a session opens (and closes) a new one for every API call, so each call pays for a
+    fresh TCP and TLS handshake. Sharing one session keeps connections to Slack alive between calls.
+    """
+
+    client_class = AsyncRateLimitedWebClient
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _build(self, client: Any, rate_limiter: SlackRateLimiter) -> Any:
+        # Created on first use, inside the event loop it belongs to
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=POOLED_CONNECTIONS), trust_env=client.trust_env_in_session
+            )
+        return self.client_class.from_client(client, rate_limiter, session=self._session)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+
+def build_async_rate_limit_middleware(
+    rate_limiter: Optional[SlackRateLimiter], team_clients: Optional[AsyncTeamClients] = None
+) -> Callable[..., Awaitable[None]]:
+    """
+    Build an AsyncApp global middleware that swaps each request's client for its workspace's rate-limited one.
+
+    See build_rate_limit_middleware() for the pooling and why the assistant utilities are rebuilt too. Pass
+    team_clients to close its shared session on shutdown.
+    """
+    from slack_bolt.context.assistant.async_assistant_utilities import AsyncAssistantUtilities
+    from slack_bolt.request.payload_utils import is_assistant_event, to_event
+
+    team_clients = team_clients or AsyncTeamClients(rate_limiter)
+
+    async def async_rate_limit_middleware(
+        body: Dict[str, Any], context: Any, next: Callable[[], Awaitable[None]]
+    ) -> None:
+        if context.client is not None and not isinstance(context.client, AsyncRateLimitedWebClient):
+            context["client"] = team_clients.client_for(context.enterprise_id, context.team_id, context.client)
+
+            if is_assistant_event(body):
+                assistant = AsyncAssistantUtilities(payload=to_event(body), context=context)  # type: ignore[arg-type]
+                for key in ASSISTANT_UTILITY_KEYS:
+                    context[key] = getattr(assistant, key)
+        await next()
+
+    return async_rate_limit_middleware
@@ -0,0 +1,161 @@
+"""
+attachment_budget.py
+Process-wide cap on attachment bytes held in memory (downloaded and base64-encoded) across all in-flight requests.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from lib.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Default budget, in bytes (a few requests' worth of the largest PDFs and images)
+DEFAULT_BUDGET_BYTES = 256 * 1024 * 1024
+# How long a request waits for budget before skipping an attachment, in seconds
+DEFAULT_WAIT_SECONDS = 5.0
+
+attachment_budget_bytes_in_use = REGISTRY.gauge(
+    "attachment_budget_bytes_in_use", "Attachment bytes reserved by in-flight requests"
+)
+attachment_budget_bytes_capacity = REGISTRY.gauge("attachment_budget_bytes_capacity", "Configured attachment byte budget")
+attachment_budget_wait_seconds = REGISTRY.histogram(
+    "attachment_budget_wait_seconds", "Time attachments waited for byte budget, by outcome"
+)
+
+
+def encoded_size(size: int) -> int:
+    """Length of the base64 encoding of size bytes"""
+    return (size + 2) // 3 * 4
+
+
+class AttachmentBudget:
+    """Byte semaphore shared by every request in the process; reservations block until bytes are released"""
+
+    def __init__(self, capacity_bytes: int = DEFAULT_BUDGET_BYTES, wait_seconds: float = DEFAULT_WAIT_SECONDS):
+        self.capacity_bytes = capacity_bytes
+        self.wait_seconds = wait_seconds
+        self.in_use = 0
+        self._condition = threading.Condition()
+        attachment_budget_bytes_capacity.set(capacity_bytes)
+
+    def acquire(self, nbytes: int, timeout: Optional[float] = None) -> bool:
+        """
+        Reserve nbytes, waiting up to timeout seconds (default wait_seconds) for other requests to release theirs.
+
+        Returns:
+            True if reserved, False if the budget stayed too full (or nbytes exceeds the whole budget)
+        """
+        timeout = self.wait_seconds if timeout is None else timeout
+        started = time.perf_counter()
+        with self._condition:
+            acquired = nbytes <= self.capacity_bytes and self._condition.wait_for(
+                lambda: self.in_use + nbytes <= self.capacity_bytes, timeout
+            )
+            if acquired:
+                self.in_use += nbytes
+                attachment_budget_bytes_in_use.set(self.in_use)
+        attachment_budget_wait_seconds.observe(time.perf_counter() - started, outcome="acquired" if acquired else "skipped")
+        return acquired
+
+    def release(self, nbytes: int) -> None:
+        with self._condition:
+            self.in_use = max(0, self.in_use - nbytes)
+            attachment_budget_bytes_in_use.set(self.in_use)
+            self._condition.notify_all()
+
+
+class AttachmentLease:
+    """The bytes one request holds; released together when the request finishes"""
+
+    def __init__(self, budget: AttachmentBudget):
+        self.budget = budget
+        self.held = 0
+        self._lock = threading.Lock()
+        # Once a reservation times out, later ones in the request don't wait again
+        self.waited_out = False
+
+    def reserve(self, nbytes: int) -> bool:
+        timeout = 0.0 if self.waited_out else None
+        if not self.budget.acquire(nbytes, timeout):
+            self.waited_out = True
+            return False
+        with self._lock:
+            self.held += nbytes
+        return True
+
+    def release(self, nbytes: int) -> None:
+        with self._lock:
+            nbytes = min(nbytes, self.held)
+            self.held -= nbytes
+        self.budget.release(nbytes)
+
+    def release_all(self) -> None:
+        self.release(self.held)
+
+
+# Budget shared by all requests; None (the default) leaves attachment memory uncapped
+_budget: Optional[AttachmentBudget] = None
+
+# Lease of the request running in the current context, set by holds_attachment_budget
+_current_lease: "contextvars.ContextVar[Optional[AttachmentLease]]" = contextvars.ContextVar(
+    "mooai_attachment_lease", default=None
+)
+
+
+def configure_attachment_budget(budget: Optional[AttachmentBudget]) -> None:
+    """Set (or with None, clear) the process-wide attachment byte budget"""
+    global _budget
+    _budget = budget
+
+
+def get_attachment_budget() -> Optional[AttachmentBudget]:
+    return _budget
+
+
+def current_lease() -> Optional[AttachmentLease]:
+    """The current request's lease, or None if no budget is configured (or the caller isn't a request handler)"""
+    return _current_lease.get()
+
+
+def holds_attachment_budget(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Decorator for request handlers: attachment bytes reserved during the call are held until it returns.
+
+    The lease lives in a contextvar, so the attachment pipeline finds it without extra arguments, including
+    in the worker threads it hands encoding to.
+    """
+    if asyncio.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _budget is None:
+                return await func(*args, **kwargs)
+            lease = AttachmentLease(_budget)
+            token = _current_lease.set(lease)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _current_lease.reset(token)
+                lease.release_all()
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if _budget is None:
+            return func(*args, **kwargs)
+        lease = AttachmentLease(_budget)
+        token = _current_lease.set(lease)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_lease.reset(token)
+            lease.release_all()
+
+    return wrapper
@@ -39,9 +39,22 @@ FOLLOWUP_PROMPTS_TITLE = "💭✍️ Suggested follow-ups or write your own "
 # Error message templates
 GENERIC_ERROR = ":warning: Something went wrong! ({error})"
 
+# Shown when the bot is too busy to queue another request
+BUSY_MESSAGE = "🐮💦 I'm a bit overwhelmed right now! Please mention me again in a minute."
+
+# Shown instead of an answer when the requester's user, channel or workspace quota is used up
+USAGE_LIMIT_TITLE = "🐮🌾 Usage limit reached"
+USAGE_LIMIT_MESSAGE = "You've used up your MooAI allowance for now. Please try again in about {minutes} minutes."
+
+# /ask slash command: usage hint, acknowledgement, and the update shown while a long answer is generated
+ASK_USAGE = "Ask MooAI anything: `/ask [--public] your question` (add `--public` to answer in the channel)"
+ASK_ACK_MESSAGE = "🐮 Got it! Your answer will appear here shortly."
+ASK_WORKING_MESSAGE = "🐮💭 Still chewing on it, thanks for your patience..."
+
 # Logging templates
 THREAD_START_ERROR_LOG = "Failed to handle an assistant_thread_started event: {error}"
 USER_MESSAGE_ERROR_LOG = "Failed to handle a user message event: {error}"
+ASK_COMMAND_ERROR_LOG = "Failed to answer an /ask command: {error}"
 
 SYSTEM_INSTRUCTIONS = """
 - You are a very friendly and helpful assistant.
@@ -57,3 +70,21 @@ SYSTEM_INSTRUCTIONS = """
 - Keep your main response clear, helpful, and well-formatted.
 - Suggest followups that are natural extensions of the conversation.
 """
+
+# Describes an image once, so later turns can send the description instead of the image
+IMAGE_DESCRIPTION_INSTRUCTIONS = """
+- You describe images for a model that will answer questions about them later without seeing them.
+- Start with a one or two sentence caption of what the image shows.
+- If the image contains text (a screenshot, document, chart or sign), transcribe it verbatim after the caption under "Text:".
+- Do not add commentary, greetings or formatting beyond this.
+"""
+IMAGE_DESCRIPTION_REQUEST = "Describe this image."
+
+# Stands in for an image from an earlier turn in the agent input
+IMAGE_DESCRIPTION_TEMPLATE = "[Image {name} from earlier in the thread, described]\n{description}"
+
+# Stands in for an attachment skipped because the process-wide attachment memory budget was exhausted
+ATTACHMENT_SKIPPED_NOTE = (
+    "[Attachment {name} was not loaded because MooAI is handling a lot of files right now. "
+    "Tell the user it was skipped and that they can ask again in a minute to include it.]"
+)
@@ -0,0 +1,221 @@
+"""
+dedupe.py
+Idempotency guard for Slack events, so retries and duplicate deliveries don't trigger a second reply.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from lib.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed key is remembered, in seconds (Slack retries within about 5 minutes)
+DEDUPE_TTL_SECONDS = 60 * 60
+# Upper bound on keys held by the in-memory store (oldest are evicted first)
+DEDUPE_MAX_ENTRIES = 100_000
+# Purge expired SQLite rows once every this many claims
+SQLITE_PURGE_EVERY = 500
+# How long a SQLite writer waits for another instance's lock, in seconds
+SQLITE_BUSY_TIMEOUT_SECONDS = 5.0
+
+duplicates_total = REGISTRY.counter("slack_duplicate_events_total", "Slack events skipped as duplicates, by key kind")
+
+
+class InMemoryDedupeStore:
+    """Process-local TTL set of claimed keys"""
+
+    def __init__(self, ttl_seconds: float = DEDUPE_TTL_SECONDS, max_entries: int = DEDUPE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def claim(self, key: str) -> bool:
+        """
+        Record key as seen.
+
+        Returns:
+            True if this is the first claim of key within the TTL, False if it is a duplicate.
+        """
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is not None and expires_at > now:
+                return False
+            self._entries[key] = now + self.ttl_seconds
+            self._entries.move_to_end(key)
+            # Entries share one TTL, so the oldest ones expire first
+            while self._entries and (len(self._entries) > self.max_entries or next(iter(self._entries.values())) <= now):
+                self._entries.popitem(last=False)
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteDedupeStore:
+    """TTL set of claimed keys in a SQLite file, shared by every bot instance that can reach it"""
+
+    def __init__(self, path: str, ttl_seconds: float = DEDUPE_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._claims = 0
+        self._claims_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS dedupe_keys (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads, so each thread opens its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key: str) -> bool:
+        """
+        Record key as seen, atomically across processes.
+
+        Returns:
+            True if this is the first claim of key within the TTL, False if it is a duplicate.
+        """
+        # Wall-clock time, since expiry has to mean the same thing in every process
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM dedupe_keys WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO dedupe_keys (key, expires_at) VALUES (?, ?)", (key, now + self.ttl_seconds)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        with self._claims_lock:
+            self._claims += 1
+            purge = self._claims % SQLITE_PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+        return cursor.rowcount == 1
+
+    def purge_expired(self) -> int:
+        """Delete expired keys; returns how many were removed"""
+        cursor = self._connection().execute("DELETE FROM dedupe_keys WHERE expires_at <= ?", (time.time(),))
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM dedupe_keys")
+
+
+def event_key(body: Dict[str, Any]) -> Optional[str]:
+    """Key for one delivery of an Events API event (the same across Slack's retries)"""
+    event_id = body.get("event_id")
+    return f"event:{event_id}" if event_id else None
+
+
+def message_key(event: Dict[str, Any]) -> Optional[str]:
+    """
+    Key for the user message behind an event.
+
+    app_mention and message events for the same mention have different event IDs but share
+    client_msg_id (and channel + ts), so this key lets only one of them produce a reply.
+    """
+    client_msg_id = event.get("client_msg_id")
+    if client_msg_id:
+        return f"msg:{client_msg_id}"
+    channel, ts = event.get("channel"), event.get("ts")
+    if channel and ts:
+        return f"msg:{channel}:{ts}"
+    return None
+
+
+# Store used by the helpers below; in-memory unless configure_dedupe_store() is called
+_store: Any = InMemoryDedupeStore()
+
+
+def configure_dedupe_store(store: Any) -> None:
+    """Set the store used by claim_event(), claim_message() and the dedupe middleware"""
+    global _store
+    _store = store
+
+
+def get_dedupe_store() -> Any:
+    return _store
+
+
+def _claim(key: Optional[str], kind: str) -> bool:
+    if key is None:
+        return True
+    try:
+        if _store.claim(key):
+            return True
+    except Exception as e:
+        # Failing open risks a double reply; failing closed would drop the event entirely
+        logger.exception(f"Dedupe store failed, processing {key} anyway: {e}")
+        return True
+    duplicates_total.inc(kind=kind)
+    logger.info(f"Skipping duplicate {kind} {key}")
+    return False
+
+
+def claim_event(body: Dict[str, Any]) -> bool:
+    """Return True the first time an event delivery is seen, False for Slack's retries"""
+    return _claim(event_key(body), "event")
+
+
+def claim_message(event: Dict[str, Any]) -> bool:
+    """Return True the first time a user message is seen, whichever event type delivers it"""
+    return _claim(message_key(event), "message")
+
+
+async def _claim_async(key: Optional[str], kind: str) -> bool:
+    # The SQLite store can wait seconds for another instance's lock, so it is claimed off the event loop
+    if key is None or isinstance(_store, InMemoryDedupeStore):
+        return _claim(key, kind)
+    return await asyncio.to_thread(_claim, key, kind)
+
+
+async def claim_event_async(body: Dict[str, Any]) -> bool:
+    """Async counterpart of claim_event for AsyncApp"""
+    return await _claim_async(event_key(body), "event")
+
+
+async def claim_message_async(event: Dict[str, Any]) -> bool:
+    """Async counterpart of claim_message for AsyncApp"""
+    return await _claim_async(message_key(event), "message")
+
+
+def build_dedupe_middleware() -> Callable[..., Any]:
+    """Build a Bolt global middleware that acks and drops redelivered events"""
+
+    def dedupe_middleware(body: Dict[str, Any], ack: Callable[..., Any], next: Callable[[], Any]) -> Any:
+        if not claim_event(body):
+            return ack()
+        return next()
+
+    return dedupe_middleware
+
+
+def build_async_dedupe_middleware() -> Callable[..., Any]:
+    """Async counterpart of build_dedupe_middleware for AsyncApp"""
+
+    async def dedupe_middleware(body: Dict[str, Any], ack: Callable[..., Any], next: Callable[[], Any]) -> Any:
+        if not await claim_event_async(body):
+            return await ack()
+        return await next()
+
+    return dedupe_middleware
@@ -3,18 +3,34 @@ file_utils.py
 Utilities for handling file attachments in Slack messages.
 """
 
+import asyncio
 import base64
+import collections
 import logging
 import os
 from io import BytesIO
 from typing import Dict, List, Optional, Tuple, Any, Set
 
-import requests
-import PyPDF2
 from slack_sdk import WebClient
 
+from lib.attachment_budget import current_lease, encoded_size
+from lib.constants import ATTACHMENT_SKIPPED_NOTE
+from lib.image_descriptions import (
+    describe_in_background,
+    describe_in_background_async,
+    images_to_describe,
+    replace_with_descriptions,
+)
+from lib.metrics import REGISTRY, SIZE_BUCKETS, time_stage
+from lib.tracing import traced
+
 logger = logging.getLogger(__name__)
 
+attachment_bytes = REGISTRY.histogram(
+    "attachment_bytes", "Size of each downloaded attachment, by file type", buckets=SIZE_BUCKETS
+)
+attachments_total = REGISTRY.counter("attachments_total", "Thread attachments, by file type and outcome")
+
 # Supported file types and their MIME types
 SUPPORTED_FILE_TYPES = {
     # Document types
@@ -32,6 +48,9 @@ MAX_IMAGE_SIZE_MB = 20  # 20MB limit for images
 MAX_PDF_SIZE_MB = 32  # 32MB limit for PDFs
 MAX_PDF_PAGES = 100  # 100 pages limit for PDFs
 
+# Concurrent downloads per request in the async pipeline
+MAX_CONCURRENT_DOWNLOADS = 4
+
 
 # Request limits tracking
 class RequestLimits:
@@ -61,6 +80,7 @@ class RequestLimits:
         self.processed_files.add(file_id)
 
 
+@traced("file.download")
 def download_file(client: WebClient, file_info: Dict[str, Any]) -> Optional[Tuple[str, bytes]]:
     """
     Download a file from Slack using the files.info API.
@@ -93,9 +113,13 @@ def download_file(client: WebClient, file_info: Dict[str, Any]) -> Optional[Tupl
             logger.error("No private URL found in file info")
             return None
 
+        # requests is only needed once someone attaches a file, so import it on first use
+        import requests
+
         # Download the file using the bot token for authentication
         headers = {"Authorization": f"Bearer {client.token}"}
-        file_response = requests.get(url_private, headers=headers)
+        with time_stage("download_attachment"):
+            file_response = requests.get(url_private, headers=headers)
 
         if file_response.status_code != 200:
             logger.error(f"Failed to download file: HTTP {file_response.status_code}")
@@ -119,8 +143,11 @@ def get_pdf_page_count(file_content: bytes) -> Optional[int]:
         Number of pages or None if counting fails
     """
     try:
-        pdf = PyPDF2.PdfReader(BytesIO(file_content))
-        return len(pdf.pages)
+        import PyPDF2
+
+        with time_stage("parse_pdf"):
+            pdf = PyPDF2.PdfReader(BytesIO(file_content))
+            return len(pdf.pages)
     except Exception as e:
         logger.exception(f"Error counting PDF pages: {e}")
         return None
@@ -160,7 +187,8 @@ def process_file_for_openai(filename: str, file_content: bytes, file_id: Optiona
             return None
 
         # Encode file content as base64
-        base64_content = base64.b64encode(file_content).decode("utf-8")
+        with time_stage("encode_attachment"):
+            base64_content = base64.b64encode(file_content).decode("utf-8")
         mime_type = SUPPORTED_FILE_TYPES.get(ext)
 
         # Create appropriate format based on file type
@@ -181,23 +209,17 @@ def process_file_for_openai(filename: str, file_content: bytes, file_id: Optiona
         return None
 
 
-def extract_files_from_slack_messages(
-    client: WebClient, slack_messages: List[Dict[str, Any]]
-) -> Dict[str, List[Dict[str, Any]]]:
+def _attachment_candidates(slack_messages: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
     """
-    Extract files from Slack messages and organize them by message timestamp.
+    List the supported file attachments in Slack messages, in thread order.
 
     Args:
-        client: Slack WebClient instance
         slack_messages: List of Slack message dictionaries
 
     Returns:
-        Dictionary mapping message timestamps to lists of processed files
+        List of (message timestamp, file info) tuples
     """
-
-    files_by_ts = {}
-    request_limits = RequestLimits()
-
+    candidates = []
     for msg in slack_messages:
         ts = msg.get("ts")
         files = msg.get("files", [])
@@ -205,54 +227,279 @@ def extract_files_from_slack_messages(
         if not ts or not files:
             continue
 
-        processed_files = []
         for file_info in files:
-            # Get file ID and type
-            file_id = file_info.get("id")
             filetype = file_info.get("filetype", "").lower()
 
             # Skip if not supported
             if filetype not in ["pdf", "png", "jpg", "jpeg", "webp", "gif"]:
                 logger.info(f"Skipping unsupported file type: {filetype}")
+                attachments_total.inc(filetype="other", outcome="unsupported")
                 continue
 
-            # Download the file
-            download_result = download_file(client, file_info)
-            if not download_result:
-                continue
+            candidates.append((ts, file_info))
+    return candidates
+
+
+def _prepare_attachment(
+    file_info: Dict[str, Any], download_result: Optional[Tuple[str, bytes]], request_limits: RequestLimits
+) -> Optional[Dict[str, Any]]:
+    """
+    Check a downloaded file against the limits and format it for OpenAI.
+
+    Args:
+        file_info: File information dictionary from the Slack message
+        download_result: Tuple of (filename, file_content_bytes) or None if the download failed
+        request_limits: Limits tracker shared by all files in the request
+
+    Returns:
+        Dictionary with file information formatted for OpenAI or None if the file is skipped
+    """
+    if not download_result:
+        return None
 
-            filename, file_content = download_result
-            file_size_mb = len(file_content) / (1024 * 1024)
-
-            # For PDFs, check page count and request limits
-            if filetype == "pdf":
-                # Count PDF pages
-                page_count = get_pdf_page_count(file_content)
-                if page_count is None:
-                    logger.warning(f"Could not determine PDF page count for {filename}")
-                    continue
-                elif page_count > MAX_PDF_PAGES:
-                    logger.warning(f"PDF has too many pages: {page_count} (limit: {MAX_PDF_PAGES})")
-                    continue
-
-                # Check if adding this PDF would exceed request limits
-                if not request_limits.can_add_pdf(file_id, file_size_mb, page_count):
-                    logger.warning(f"Skipping PDF due to request limits: size={file_size_mb:.2f}MB, pages={page_count}")
-                    continue
-
-                # Track this PDF in our request limits
-                request_limits.add_pdf(file_id, file_size_mb, page_count)
-                logger.info(
-                    f"Adding PDF: {filename}, size={file_size_mb:.2f}MB, pages={page_count}, "
-                    f"total={request_limits.total_pdf_size_mb:.2f}MB/{request_limits.total_pdf_pages} pages"
-                )
-
-            # Process the file for OpenAI
-            processed_file = process_file_for_openai(filename, file_content, file_id)
-            if processed_file:
-                processed_files.append(processed_file)
-
-        if processed_files:
-            files_by_ts[ts] = processed_files
+    file_id = file_info.get("id")
+    filetype = file_info.get("filetype", "").lower()
+    filename, file_content = download_result
+    file_size_mb = len(file_content) / (1024 * 1024)
+
+    # For PDFs, check page count and request limits
+    if filetype == "pdf":
+        # Count PDF pages
+        page_count = get_pdf_page_count(file_content)
+        if page_count is None:
+            logger.warning(f"Could not determine PDF page count for {filename}")
+            return None
+        elif page_count > MAX_PDF_PAGES:
+            logger.warning(f"PDF has too many pages: {page_count} (limit: {MAX_PDF_PAGES})")
+            return None
+
+        # Check if adding this PDF would exceed request limits
+        if not request_limits.can_add_pdf(file_id, file_size_mb, page_count):
+            logger.warning(f"Skipping PDF due to request limits: size={file_size_mb:.2f}MB, pages={page_count}")
+            return None
 
+        # Track this PDF in our request limits
+        request_limits.add_pdf(file_id, file_size_mb, page_count)
+        logger.info(
+            f"Adding PDF: {filename}, size={file_size_mb:.2f}MB, pages={page_count}, "
+            f"total={request_limits.total_pdf_size_mb:.2f}MB/{request_limits.total_pdf_pages} pages"
+        )
+
+    # Process the file for OpenAI
+    return process_file_for_openai(filename, file_content, file_id)
+
+
+def _process_download(
+    file_info: Dict[str, Any], download_result: Optional[Tuple[str, bytes]], request_limits: RequestLimits
+) -> Optional[Dict[str, Any]]:
+    """Prepare one downloaded candidate, counting it in attachment_bytes and attachments_total"""
+    filetype = file_info.get("filetype", "").lower()
+    if download_result:
+        attachment_bytes.observe(len(download_result[1]), filetype=filetype)
+    processed_file = _prepare_attachment(file_info, download_result, request_limits)
+    outcome = "attached" if processed_file else "skipped" if download_result else "download_failed"
+    attachments_total.inc(filetype=filetype, outcome=outcome)
+    return processed_file
+
+
+def _group_by_ts(
+    candidates: List[Tuple[str, Dict[str, Any]]],
+    processed_files: List[Optional[Dict[str, Any]]],
+    described: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Map message timestamps to their attachments, with images replaced by descriptions first"""
+    files_by_ts: Dict[str, List[Dict[str, Any]]] = {ts: list(parts) for ts, parts in (described or {}).items()}
+    for (ts, _), processed_file in zip(candidates, processed_files):
+        if processed_file:
+            files_by_ts.setdefault(ts, []).append(processed_file)
     return files_by_ts
+
+
+def _describe_earlier_images(
+    slack_messages: List[Dict[str, Any]], candidates: List[Tuple[str, Dict[str, Any]]]
+) -> Tuple[List[Tuple[str, Dict[str, Any]]], Dict[str, List[Dict[str, Any]]]]:
+    """Replace earlier images that have a cached description, counting each in attachments_total"""
+    remaining, described = replace_with_descriptions(slack_messages, candidates)
+    kept = {file_info.get("id") for _, file_info in remaining}
+    for _, file_info in candidates:
+        if file_info.get("id") not in kept:
+            attachments_total.inc(filetype=file_info.get("filetype", "").lower(), outcome="described")
+    return remaining, described
+
+
+def _reserve_attachment_budget(
+    candidates: List[Tuple[str, Dict[str, Any]]],
+) -> Tuple[List[Tuple[str, Dict[str, Any]]], Dict[str, List[Dict[str, Any]]], List[int]]:
+    """
+    Reserve process-wide budget for each attachment's downloaded and encoded bytes, in thread order.
+
+    Attachments that don't fit after waiting are skipped, with a note so the model can tell the user.
+
+    Returns:
+        Tuple of (candidates to download, notes by message timestamp, downloaded bytes reserved per candidate)
+    """
+    lease = current_lease()
+    if lease is None:
+        return candidates, {}, [0] * len(candidates)
+
+    remaining: List[Tuple[str, Dict[str, Any]]] = []
+    skipped: Dict[str, List[Dict[str, Any]]] = {}
+    raw_sizes: List[int] = []
+    for ts, file_info in candidates:
+        filetype = file_info.get("filetype", "").lower()
+        # Slack reports the size; without it, assume the largest file the type allows
+        limit_mb = MAX_PDF_SIZE_MB if filetype == "pdf" else MAX_IMAGE_SIZE_MB
+        size = file_info.get("size") or limit_mb * 1024 * 1024
+        if lease.reserve(size + encoded_size(size)):
+            remaining.append((ts, file_info))
+            raw_sizes.append(size)
+            continue
+        logger.warning(f"Skipping {file_info.get('name')}: attachment byte budget exhausted")
+        attachments_total.inc(filetype=filetype, outcome="over_budget")
+        note = ATTACHMENT_SKIPPED_NOTE.format(name=file_info.get("name", "file"))
+        skipped.setdefault(ts, []).append({"type": "input_text", "text": note})
+    return remaining, skipped, raw_sizes
+
+
+def _release_downloaded_bytes(raw_size: int) -> None:
+    """Give back a file's downloaded bytes' budget once it is encoded; the encoded copy stays reserved"""
+    lease = current_lease()
+    if lease is not None:
+        lease.release(raw_size)
+
+
+def _merge_parts(*parts_by_ts: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+    merged: Dict[str, List[Dict[str, Any]]] = {}
+    for parts in parts_by_ts:
+        for ts, ts_parts in parts.items():
+            merged.setdefault(ts, []).extend(ts_parts)
+    return merged
+
+
+def extract_files_from_slack_messages(
+    client: WebClient, slack_messages: List[Dict[str, Any]]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Extract files from Slack messages and organize them by message timestamp.
+
+    Args:
+        client: Slack WebClient instance
+        slack_messages: List of Slack message dictionaries
+
+    Returns:
+        Dictionary mapping message timestamps to lists of processed files
+    """
+    candidates, described = _describe_earlier_images(slack_messages, _attachment_candidates(slack_messages))
+    candidates, skipped, raw_sizes = _reserve_attachment_budget(candidates)
+
+    # Download, process and release one file at a time, so only one file's raw bytes are held
+    request_limits = RequestLimits()
+    processed_files: List[Optional[Dict[str, Any]]] = []
+    for (_, file_info), raw_size in zip(candidates, raw_sizes):
+        processed_files.append(_process_download(file_info, download_file(client, file_info), request_limits))
+        _release_downloaded_bytes(raw_size)
+
+    # Describe newly sent images alongside the reply, so later turns can send the description instead
+    describe_in_background(images_to_describe(candidates, processed_files))
+    return _group_by_ts(candidates, processed_files, _merge_parts(described, skipped))
+
+
+@traced("file.download")
+async def download_file_async(client: Any, file_info: Dict[str, Any]) -> Optional[Tuple[str, bytes]]:
+    """
+    Async counterpart of download_file for AsyncWebClient.
+
+    Args:
+        client: Slack AsyncWebClient instance
+        file_info: File information dictionary from Slack event
+
+    Returns:
+        Tuple of (filename, file_content_bytes) or None if download fails
+    """
+    import aiohttp
+
+    try:
+        file_id = file_info.get("id")
+        if not file_id:
+            logger.error("Missing file ID in file info")
+            return None
+
+        response = await client.files_info(file=file_id)
+        if not response or not response.get("ok", False):
+            logger.error(f"Failed to get file info: {response.get('error', 'Unknown error')}")
+            return None
+
+        file_data = response.get("file", {})
+        url_private = file_data.get("url_private")
+        filename = file_data.get("name", "unknown_file")
+
+        if not url_private:
+            logger.error("No private URL found in file info")
+            return None
+
+        # Reuse the client's aiohttp session when it has one
+        headers = {"Authorization": f"Bearer {client.token}"}
+        session = client.session or aiohttp.ClientSession()
+        try:
+            with time_stage("download_attachment"):
+                async with session.get(url_private, headers=headers) as file_response:
+                    if file_response.status != 200:
+                        logger.error(f"Failed to download file: HTTP {file_response.status}")
+                        return None
+                    return filename, await file_response.read()
+        finally:
+            if session is not client.session:
+                await session.close()
+
+    except Exception as e:
+        logger.exception(f"Error downloading file: {e}")
+        return None
+
+
+async def extract_files_from_slack_messages_async(
+    client: Any, slack_messages: List[Dict[str, Any]]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Async counterpart of extract_files_from_slack_messages. Up to MAX_CONCURRENT_DOWNLOADS files are
+    downloaded or waiting to be processed at once; each is processed as soon as it and the files before it
+    have arrived, with PDF parsing and base64 encoding in a worker thread to keep the event loop free.
+
+    Args:
+        client: Slack AsyncWebClient instance
+        slack_messages: List of Slack message dictionaries
+
+    Returns:
+        Dictionary mapping message timestamps to lists of processed files
+    """
+    candidates, described = _describe_earlier_images(slack_messages, _attachment_candidates(slack_messages))
+    if not candidates:
+        return described
+
+    # Waiting for budget blocks, so it happens off the event loop (to_thread keeps the request's lease)
+    candidates, skipped, raw_sizes = await asyncio.to_thread(_reserve_attachment_budget, candidates)
+
+    # A download's slot is only freed once the file is processed, which bounds the raw bytes held at once
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+
+    async def download(file_info: Dict[str, Any]) -> Optional[Tuple[str, bytes]]:
+        await semaphore.acquire()
+        return await download_file_async(client, file_info)
+
+    # Processing stays in thread order, so the PDF request limits favour earlier files
+    pending = collections.deque(asyncio.ensure_future(download(file_info)) for _, file_info in candidates)
+    request_limits = RequestLimits()
+    processed_files: List[Optional[Dict[str, Any]]] = []
+    try:
+        for (_, file_info), raw_size in zip(candidates, raw_sizes):
+            download_result = await pending.popleft()
+            processed_files.append(await asyncio.to_thread(_process_download, file_info, download_result, request_limits))
+            del download_result
+            semaphore.release()
+            _release_downloaded_bytes(raw_size)
+    finally:
+        for task in pending:
+            task.cancel()
+
+    # Describe newly sent images alongside the reply, so later turns can send the description instead
+    describe_in_background_async(images_to_describe(candidates, processed_files))
+    return _group_by_ts(candidates, processed_files, _merge_parts(described, skipped))
@@ -0,0 +1,147 @@
+"""
+http_server.py
+Starlette application that serves a Bolt app over the HTTP Events API.
+"""
+
+import hmac
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from slack_bolt import App, BoltResponse
+from slack_bolt.adapter.starlette import SlackRequestHandler
+from slack_bolt.adapter.starlette.handler import to_bolt_request, to_starlette_response
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+
+from lib.metrics import METRICS_PATH, PROMETHEUS_CONTENT_TYPE, render_prometheus
+
+logger = logging.getLogger(__name__)
+
+# Path Slack's Event Subscriptions, Interactivity and Slash Commands request URLs should point at
+SLACK_EVENTS_PATH = "/slack/events"
+HEALTH_PATH = "/healthz"
+
+DEFAULT_HTTP_PORT = 3000
+# Recycle a worker process after this many requests to cap memory growth (0 disables recycling)
+DEFAULT_MAX_REQUESTS_PER_WORKER = 10_000
+
+
+class ThreadpoolSlackRequestHandler(SlackRequestHandler):
+    """
+    Bolt's starlette adapter with the blocking parts moved off the event loop.
+
+    The stock handler calls the sync App.dispatch (signature check, authorize, listener middleware) and
+    the OAuth pages directly on the event loop, so a worker served one request at a time. Here they run on
+    starlette's thread pool and the loop keeps accepting requests meanwhile.
+    """
+
+    async def handle(self, req: Request, addition_context_properties: Optional[Dict[str, Any]] = None) -> Response:
+        body = await req.body()
+        bolt_request = to_bolt_request(req, body, addition_context_properties)
+        run: Optional[Callable[[Any], BoltResponse]] = None
+        if req.method == "POST":
+            run = self.app.dispatch
+        elif req.method == "GET" and self.app.oauth_flow is not None:
+            if req.url.path == self.app.oauth_flow.install_path:
+                run = self.app.oauth_flow.handle_installation
+            elif req.url.path == self.app.oauth_flow.redirect_uri_path:
+                run = self.app.oauth_flow.handle_callback
+        if run is None:
+            return Response(status_code=404, content="Not found")
+        return to_starlette_response(await run_in_threadpool(run, bolt_request))
+
+
+def build_http_api(
+    bolt_app: App,
+    on_startup: Optional[List[Callable[[], Any]]] = None,
+    metrics_token: Optional[str] = None,
+    on_shutdown: Optional[List[Callable[[], Any]]] = None,
+) -> Starlette:
+    """
+    Build the ASGI application for HTTP mode.
+
+    Bolt verifies each request's X-Slack-Signature against the app's signing secret before any
+    listener runs, so unsigned or stale requests are rejected with 401. When the app has OAuth
+    settings, the install page and OAuth redirect are served too.
+
+    Args:
+        bolt_app: Bolt App created with the signing secret.
+        on_startup: Callables run once when each worker process starts serving.
+        metrics_token: Bearer token that scrapes of METRICS_PATH must send. The app listens publicly, so the
+            metrics route is only mounted when a token is set.
+        on_shutdown: Callables run once when each worker process stops serving (including when uvicorn
+            recycles it).
+
+    Returns:
+        Starlette application with the Slack events, health check and (with a token) metrics routes, plus the
+        install routes with OAuth.
+    """
+    handler = ThreadpoolSlackRequestHandler(bolt_app)
+
+    # Also serves the OAuth install and redirect pages, which Bolt recognizes by path
+    async def slack_events(request: Request) -> Response:
+        return await handler.handle(request)
+
+    async def health(request: Request) -> Response:
+        return PlainTextResponse("ok")
+
+    async def metrics(request: Request) -> Response:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {metrics_token}"):
+            return PlainTextResponse("Unauthorized", status_code=401)
+        # Metrics are per process, so each scrape reports the worker that happened to serve it
+        return Response(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+    @asynccontextmanager
+    async def lifespan(api: Starlette) -> AsyncIterator[None]:
+        for func in on_startup or []:
+            func()
+        yield
+        for func in on_shutdown or []:
+            func()
+
+    routes = [
+        Route(SLACK_EVENTS_PATH, endpoint=slack_events, methods=["POST"]),
+        Route(HEALTH_PATH, endpoint=health, methods=["GET"]),
+    ]
+    if metrics_token:
+        routes.append(Route(METRICS_PATH, endpoint=metrics, methods=["GET"]))
+    if bolt_app.oauth_flow is not None:
+        settings = bolt_app.oauth_flow.settings
+        routes.append(Route(settings.install_path, endpoint=slack_events, methods=["GET"]))
+        routes.append(Route(settings.redirect_uri_path, endpoint=slack_events, methods=["GET"]))
+
+    return Starlette(routes=routes, lifespan=lifespan)
+
+
+def http_workers() -> int:
+    """Number of worker processes from MOOAI_HTTP_WORKERS, defaulting to one per CPU"""
+    return int(os.environ.get("MOOAI_HTTP_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def run_http_server(import_path: str) -> None:
+    """
+    Serve an ASGI app under uvicorn with several worker processes.
+
+    Each worker imports import_path itself, so every process builds its own Bolt app, clients and caches.
+
+    Args:
+        import_path: "module:attribute" of the ASGI app, e.g. "app_http:api".
+    """
+    import uvicorn
+
+    workers = http_workers()
+    max_requests = int(os.environ.get("MOOAI_HTTP_MAX_REQUESTS", str(DEFAULT_MAX_REQUESTS_PER_WORKER)))
+    logger.info(f"Starting HTTP server with {workers} workers (recycled every {max_requests or 'unlimited'} requests)")
+    uvicorn.run(
+        import_path,
+        host=os.environ.get("MOOAI_HTTP_HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", str(DEFAULT_HTTP_PORT))),
+        workers=workers,
+        # uvicorn's supervisor replaces a worker that exits after reaching its request limit
+        limit_max_requests=max_requests or None,
+    )
@@ -0,0 +1,278 @@
+"""
+image_descriptions.py
+Image attachments described once (caption plus transcribed text) and cached by Slack file ID, so later turns
+can send the description instead of re-downloading and re-sending the image.
+"""
+
+import asyncio
+import contextvars
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from lib.attachment_budget import AttachmentBudget, get_attachment_budget
+from lib.constants import IMAGE_DESCRIPTION_INSTRUCTIONS, IMAGE_DESCRIPTION_REQUEST, IMAGE_DESCRIPTION_TEMPLATE
+from lib.metrics import REGISTRY
+from lib.usage import UsageLimitExceeded, background_usage
+
+logger = logging.getLogger(__name__)
+
+# How long a description stays valid, in seconds (a Slack file's content never changes)
+DESCRIPTION_TTL_SECONDS = 7 * 24 * 60 * 60
+# Upper bound on cached descriptions (oldest entries are evicted first)
+DESCRIPTION_MAX_ENTRIES = 10_000
+# Image file types that can be described
+DESCRIBABLE_FILE_TYPES = {"png", "jpg", "jpeg", "webp", "gif"}
+# Threads describing images for the sync app
+DESCRIBE_WORKERS = 2
+# Description jobs queued or running at once; images past this are left for a later turn to describe
+DESCRIBE_MAX_PENDING = 16
+# Words in the latest message that mean the user is asking about an image again, so it is re-attached
+IMAGE_REFERENCE_PATTERN = re.compile(
+    r"\b(image|images|picture|pictures|pic|pics|photo|photos|screenshot|screenshots|diagram|chart|graph|figure)\b",
+    re.IGNORECASE,
+)
+
+image_descriptions_total = REGISTRY.counter(
+    "image_descriptions_total", "Image descriptions generated for the description cache, by outcome"
+)
+
+# (file ID, base64 data URL) of an image to describe
+PendingImage = Tuple[str, str]
+
+
+class ImageDescriptionCache:
+    """Process-wide map of Slack file ID to the image's description"""
+
+    def __init__(self, ttl_seconds: float = DESCRIPTION_TTL_SECONDS, max_entries: int = DESCRIPTION_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, file_id: str) -> Optional[str]:
+        """Return the description of file_id, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(file_id)
+            if entry is None:
+                return None
+            description, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[file_id]
+                return None
+            self._entries.move_to_end(file_id)
+            return description
+
+    def put(self, file_id: str, description: str) -> None:
+        with self._lock:
+            self._entries[file_id] = (description, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(file_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def claim(self, file_id: str) -> bool:
+        """Mark file_id as being described; False if it already is, or already has a description"""
+        with self._lock:
+            if file_id in self._pending or file_id in self._entries:
+                return False
+            self._pending.add(file_id)
+            return True
+
+    def release(self, file_id: str) -> None:
+        with self._lock:
+            self._pending.discard(file_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+
+
+# Cache used by the attachment pipeline; images are always sent as-is unless configure_image_descriptions() is called
+_cache: Optional[ImageDescriptionCache] = None
+
+# Description tasks started on an event loop, kept referenced until they finish
+_tasks: Set["asyncio.Task[None]"] = set()
+# Threads the sync app describes on (started on first use), and the slots bounding the jobs waiting for them
+_executor = ThreadPoolExecutor(max_workers=DESCRIBE_WORKERS, thread_name_prefix="image-describe")
+_pending_slots = threading.BoundedSemaphore(DESCRIBE_MAX_PENDING)
+
+
+def configure_image_descriptions(cache: Optional[ImageDescriptionCache]) -> None:
+    """Set (or with None, clear) the cache that replaces earlier images with their descriptions"""
+    global _cache
+    _cache = cache
+
+
+def get_image_description_cache() -> Optional[ImageDescriptionCache]:
+    return _cache
+
+
+def _latest_user_message(slack_messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    for msg in reversed(slack_messages):
+        if not msg.get("bot_id"):
+            return msg
+    return {}
+
+
+def replace_with_descriptions(
+    slack_messages: List[Dict[str, Any]], candidates: List[Tuple[str, Dict[str, Any]]]
+) -> Tuple[List[Tuple[str, Dict[str, Any]]], Dict[str, List[Dict[str, Any]]]]:
+    """
+    Swap images from earlier turns that already have a description for that description.
+
+    Images in the latest user message, and every image when that message refers to images (or names one),
+    are kept so the model sees them.
+
+    Args:
+        slack_messages: The thread's messages
+        candidates: (message timestamp, file info) of each supported attachment, in thread order
+
+    Returns:
+        Tuple of (candidates still to download, input_text parts by message timestamp for the described images)
+    """
+    if _cache is None:
+        return candidates, {}
+
+    latest = _latest_user_message(slack_messages)
+    latest_text = latest.get("text", "")
+    refers_to_images = bool(IMAGE_REFERENCE_PATTERN.search(latest_text))
+
+    remaining: List[Tuple[str, Dict[str, Any]]] = []
+    described: Dict[str, List[Dict[str, Any]]] = {}
+    for ts, file_info in candidates:
+        filetype = file_info.get("filetype", "").lower()
+        name = file_info.get("name", "image")
+        description = None
+        if (
+            filetype in DESCRIBABLE_FILE_TYPES
+            and ts != latest.get("ts")
+            and not refers_to_images
+            and name not in latest_text
+        ):
+            description = _cache.get(file_info.get("id", ""))
+        if description is None:
+            remaining.append((ts, file_info))
+            continue
+        text = IMAGE_DESCRIPTION_TEMPLATE.format(name=name, description=description)
+        described.setdefault(ts, []).append({"type": "input_text", "text": text})
+    return remaining, described
+
+
+def images_to_describe(
+    candidates: List[Tuple[str, Dict[str, Any]]], files: List[Optional[Dict[str, Any]]]
+) -> List[PendingImage]:
+    """
+    Pick the attached images that have no description yet and aren't being described.
+
+    Args:
+        candidates: (message timestamp, file info) of each downloaded attachment
+        files: The processed attachment for each candidate, or None if it was skipped
+    """
+    if _cache is None:
+        return []
+    pending = []
+    for (_, file_info), processed in zip(candidates, files):
+        file_id = file_info.get("id")
+        if processed and processed.get("type") == "input_image" and file_id and _cache.claim(file_id):
+            pending.append((file_id, processed["image_url"]))
+    return pending
+
+
+async def describe_images(images: List[PendingImage]) -> None:
+    """
+    Describe each image with the agent and cache the descriptions.
+
+    The runs are accounted to the current usage scope, as background work that doesn't count toward its
+    per-minute request limit. A failed or refused description is logged, and the image keeps being sent
+    as-is until a later turn describes it.
+    """
+    from lib.agent import run_agent_with_messages
+
+    for file_id, image_url in images:
+        message = {
+            "role": "user",
+            "content": [
+                {"type": "input_image", "image_url": image_url},
+                {"type": "input_text", "text": IMAGE_DESCRIPTION_REQUEST},
+            ],
+        }
+        try:
+            with background_usage():
+                description = await run_agent_with_messages([message], IMAGE_DESCRIPTION_INSTRUCTIONS)
+        except UsageLimitExceeded as e:
+            logger.info(f"Not describing image {file_id}: {e}")
+            image_descriptions_total.inc(outcome="limited")
+        except Exception as e:
+            logger.exception(f"Failed to describe image {file_id}: {e}")
+            image_descriptions_total.inc(outcome="error")
+        else:
+            if _cache is not None:
+                _cache.put(file_id, str(description).strip())
+            image_descriptions_total.inc(outcome="described")
+        finally:
+            if _cache is not None:
+                _cache.release(file_id)
+
+
+def _encoded_bytes(images: List[PendingImage]) -> int:
+    return sum(len(image_url) for _, image_url in images)
+
+
+def _admit(images: List[PendingImage]) -> Tuple[bool, Optional[AttachmentBudget]]:
+    """
+    Take a pending slot and reserve the images' bytes in the attachment budget, without waiting for either.
+
+    Returns:
+        Whether the images were admitted, and the budget holding their bytes (None when no budget is configured)
+    """
+    reason = None
+    budget = get_attachment_budget()
+    if not _pending_slots.acquire(blocking=False):
+        reason = "too many descriptions pending"
+    elif budget is not None and not budget.acquire(_encoded_bytes(images), timeout=0):
+        _pending_slots.release()
+        reason = "attachment budget full"
+    if reason is None:
+        return True, budget
+    logger.info(f"Not describing {len(images)} images now ({reason}); a later turn will")
+    image_descriptions_total.inc(len(images), outcome="skipped")
+    if _cache is not None:
+        for file_id, _ in images:
+            _cache.release(file_id)
+    return False, None
+
+
+async def _describe_admitted(images: List[PendingImage], budget: Optional[AttachmentBudget]) -> None:
+    try:
+        await describe_images(images)
+    finally:
+        if budget is not None:
+            budget.release(_encoded_bytes(images))
+        _pending_slots.release()
+
+
+def describe_in_background(images: List[PendingImage]) -> None:
+    """Describe images on the description threads, in the caller's contextvars (so its usage scope)"""
+    if images:
+        admitted, budget = _admit(images)
+        if admitted:
+            _executor.submit(contextvars.copy_context().run, asyncio.run, _describe_admitted(images, budget))
+
+
+def describe_in_background_async(images: List[PendingImage]) -> None:
+    """Describe images in a task on the running event loop (tasks copy the caller's contextvars)"""
+    if images:
+        admitted, budget = _admit(images)
+        if admitted:
+            task = asyncio.get_running_loop().create_task(_describe_admitted(images, budget))
+            _tasks.add(task)
+            task.add_done_callback(_tasks.discard)
@@ -0,0 +1,205 @@
+"""
+installations.py
+Workspace installations for multi-workspace (OAuth) deployments, with a read-through cache in front of the store.
+"""
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from slack_sdk.oauth.installation_store import Bot, Installation, InstallationStore
+from slack_sdk.oauth.installation_store.async_installation_store import AsyncInstallationStore
+
+from lib.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Bot scopes requested when a workspace installs the app (see "Required Scopes" in the README)
+BOT_SCOPES = (
+    "app_mentions:read",
+    "assistant:write",
+    "channels:history",
+    "channels:join",
+    "chat:write",
+    "commands",
+    "files:read",
+    "groups:history",
+    "im:history",
+    "users:read",
+)
+
+# How long a looked-up installation is reused, in seconds (bounds how stale a reinstall made elsewhere can be)
+DEFAULT_INSTALLATION_CACHE_TTL_SECONDS = 300.0
+# Upper bound on cached lookups (least recently used ones are evicted first)
+DEFAULT_INSTALLATION_CACHE_MAX_ENTRIES = 10_000
+
+installation_lookups_total = REGISTRY.counter(
+    "installation_lookups_total", "Installation and bot lookups, by whether the cache answered them"
+)
+
+_CacheKey = Tuple[str, Optional[str], Optional[str], Optional[str], Optional[bool]]
+
+
+class CachedInstallationStore(InstallationStore, AsyncInstallationStore):
+    """
+    TTL cache in front of an installation store, for both App and AsyncApp.
+
+    Bolt looks up the workspace's installation for every event, and the SQLite store opens the database for
+    each lookup. Writes made through this store drop the workspace's entries at once; writes made by other
+    processes sharing the database are seen within ttl_seconds. Lookups that find nothing are not cached, so a
+    new installation is picked up immediately.
+    """
+
+    def __init__(
+        self,
+        store: Any,
+        ttl_seconds: float = DEFAULT_INSTALLATION_CACHE_TTL_SECONDS,
+        max_entries: int = DEFAULT_INSTALLATION_CACHE_MAX_ENTRIES,
+    ):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[_CacheKey, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def logger(self) -> logging.Logger:
+        return self.store.logger
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: _CacheKey) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        installation_lookups_total.inc(outcome="miss" if entry is None else "hit")
+        # Bolt's authorize clears fields on the object it gets back, so callers never see the cached one
+        return None if entry is None else copy.copy(entry[0])
+
+    def _put(self, key: _CacheKey, value: Optional[Any]) -> Optional[Any]:
+        if value is not None:
+            with self._lock:
+                self._entries[key] = (copy.copy(value), time.monotonic() + self.ttl_seconds)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, enterprise_id: Optional[str], team_id: Optional[str]) -> None:
+        """Drop the cached lookups of a workspace (of every workspace in the org, for Enterprise Grid)"""
+        with self._lock:
+            for key in list(self._entries):
+                if key[1] == enterprise_id and (enterprise_id is not None or key[2] == team_id):
+                    del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def save(self, installation: Installation):
+        self.store.save(installation)
+        self.invalidate(installation.enterprise_id, installation.team_id)
+
+    def save_bot(self, bot: Bot):
+        self.store.save_bot(bot)
+        self.invalidate(bot.enterprise_id, bot.team_id)
+
+    def find_bot(
+        self, *, enterprise_id: Optional[str], team_id: Optional[str], is_enterprise_install: Optional[bool] = False
+    ) -> Optional[Bot]:
+        key: _CacheKey = ("bot", enterprise_id, team_id, None, is_enterprise_install)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        bot = self.store.find_bot(enterprise_id=enterprise_id, team_id=team_id, is_enterprise_install=is_enterprise_install)
+        return self._put(key, bot)
+
+    def find_installation(
+        self,
+        *,
+        enterprise_id: Optional[str],
+        team_id: Optional[str],
+        user_id: Optional[str] = None,
+        is_enterprise_install: Optional[bool] = False,
+    ) -> Optional[Installation]:
+        key: _CacheKey = ("installation", enterprise_id, team_id, user_id, is_enterprise_install)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        installation = self.store.find_installation(
+            enterprise_id=enterprise_id, team_id=team_id, user_id=user_id, is_enterprise_install=is_enterprise_install
+        )
+        return self._put(key, installation)
+
+    def delete_bot(self, *, enterprise_id: Optional[str], team_id: Optional[str]) -> None:
+        self.store.delete_bot(enterprise_id=enterprise_id, team_id=team_id)
+        self.invalidate(enterprise_id, team_id)
+
+    def delete_installation(
+        self, *, enterprise_id: Optional[str], team_id: Optional[str], user_id: Optional[str] = None
+    ) -> None:
+        self.store.delete_installation(enterprise_id=enterprise_id, team_id=team_id, user_id=user_id)
+        self.invalidate(enterprise_id, team_id)
+
+    def delete_all(self, *, enterprise_id: Optional[str], team_id: Optional[str]):
+        self.store.delete_all(enterprise_id=enterprise_id, team_id=team_id)
+        self.invalidate(enterprise_id, team_id)
+
+    async def async_save(self, installation: Installation):
+        await self.store.async_save(installation)
+        self.invalidate(installation.enterprise_id, installation.team_id)
+
+    async def async_save_bot(self, bot: Bot):
+        await self.store.async_save_bot(bot)
+        self.invalidate(bot.enterprise_id, bot.team_id)
+
+    async def async_find_bot(
+        self, *, enterprise_id: Optional[str], team_id: Optional[str], is_enterprise_install: Optional[bool] = False
+    ) -> Optional[Bot]:
+        key: _CacheKey = ("bot", enterprise_id, team_id, None, is_enterprise_install)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        bot = await self.store.async_find_bot(
+            enterprise_id=enterprise_id, team_id=team_id, is_enterprise_install=is_enterprise_install
+        )
+        return self._put(key, bot)
+
+    async def async_find_installation(
+        self,
+        *,
+        enterprise_id: Optional[str],
+        team_id: Optional[str],
+        user_id: Optional[str] = None,
+        is_enterprise_install: Optional[bool] = False,
+    ) -> Optional[Installation]:
+        key: _CacheKey = ("installation", enterprise_id, team_id, user_id, is_enterprise_install)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+        installation = await self.store.async_find_installation(
+            enterprise_id=enterprise_id, team_id=team_id, user_id=user_id, is_enterprise_install=is_enterprise_install
+        )
+        return self._put(key, installation)
+
+    async def async_delete_bot(self, *, enterprise_id: Optional[str], team_id: Optional[str]) -> None:
+        await self.store.async_delete_bot(enterprise_id=enterprise_id, team_id=team_id)
+        self.invalidate(enterprise_id, team_id)
+
+    async def async_delete_installation(
+        self, *, enterprise_id: Optional[str], team_id: Optional[str], user_id: Optional[str] = None
+    ) -> None:
+        await self.store.async_delete_installation(enterprise_id=enterprise_id, team_id=team_id, user_id=user_id)
+        self.invalidate(enterprise_id, team_id)
+
+    async def async_delete_all(self, *, enterprise_id: Optional[str], team_id: Optional[str]):
+        await self.store.async_delete_all(enterprise_id=enterprise_id, team_id=team_id)
+        self.invalidate(enterprise_id, team_id)
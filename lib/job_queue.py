@@ -0,0 +1,371 @@
+"""
+job_queue.py
+Durable SQLite job queue with leases, retries and a dead-letter table, so queued replies survive restarts.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from lib.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# How long a worker owns a leased job before another worker may take it over, in seconds
+DEFAULT_VISIBILITY_TIMEOUT_SECONDS = 120.0
+# Attempts before a job is moved to the dead-letter table
+DEFAULT_MAX_ATTEMPTS = 3
+# Delay before the first retry; doubles with every further attempt
+DEFAULT_RETRY_BACKOFF_SECONDS = 5.0
+# How long finished jobs are kept so a re-enqueue with the same dedupe key is ignored, in seconds
+DONE_RETENTION_SECONDS = 24 * 60 * 60
+# Purge finished jobs once every this many completions
+PURGE_EVERY = 500
+# How long idle workers wait before polling for new jobs, in seconds
+DEFAULT_POLL_INTERVAL_SECONDS = 0.5
+SQLITE_BUSY_TIMEOUT_SECONDS = 5.0
+
+STATUS_QUEUED = "queued"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+
+jobs_total = REGISTRY.counter("job_queue_jobs_total", "Durable queue jobs by kind and outcome")
+job_wait_seconds = REGISTRY.histogram("job_queue_wait_seconds", "Time from enqueue (or retry) until a worker leases the job")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    dedupe_key TEXT UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, available_at);
+CREATE TABLE IF NOT EXISTS dead_letter (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    dedupe_key TEXT,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    failed_at REAL NOT NULL
+);
+"""
+
+
+class LeasedJob(NamedTuple):
+    """A job a worker currently holds the lease for"""
+
+    id: int
+    kind: str
+    payload: Dict[str, Any]
+    attempts: int
+    lease_owner: str
+
+
+class SQLiteJobQueue:
+    """At-least-once job queue in a SQLite file; safe to share between threads and processes"""
+
+    def __init__(
+        self,
+        path: str,
+        visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        retry_backoff: float = DEFAULT_RETRY_BACKOFF_SECONDS,
+    ):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._local = threading.local()
+        self._completions = 0
+        self._completions_lock = threading.Lock()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads, so each thread opens its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, work: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Run work inside a write transaction (BEGIN IMMEDIATE serializes writers across processes)"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = work(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], dedupe_key: Optional[str] = None) -> Optional[int]:
+        """
+        Add a job to the queue.
+
+        Args:
+            kind: Job type, used to pick the handler.
+            payload: JSON-serializable job arguments.
+            dedupe_key: If set, a second job with the same key is ignored while the first is
+                queued, running or recently finished.
+
+        Returns:
+            The new job's ID, or None if a job with the same dedupe key already exists.
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT OR IGNORE INTO jobs (kind, dedupe_key, payload, status, available_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kind, dedupe_key, json.dumps(payload), STATUS_QUEUED, now, now, now),
+        )
+        if cursor.rowcount != 1:
+            logger.info(f"Ignoring duplicate {kind} job {dedupe_key}")
+            jobs_total.inc(kind=kind, outcome="duplicate")
+            return None
+        jobs_total.inc(kind=kind, outcome="enqueued")
+        return cursor.lastrowid
+
+    def lease(self, owner: str, limit: int = 1) -> List[LeasedJob]:
+        """
+        Take up to limit ready jobs, including jobs whose previous lease expired.
+
+        Jobs whose lease expired after their last allowed attempt are dead-lettered instead.
+
+        Args:
+            owner: Unique ID of the leasing worker.
+            limit: Maximum number of jobs to lease.
+
+        Returns:
+            The leased jobs, oldest first.
+        """
+        now = time.time()
+
+        def work(conn: sqlite3.Connection) -> List[LeasedJob]:
+            rows = conn.execute(
+                "SELECT id, kind, payload, attempts, available_at FROM jobs "
+                "WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at <= ?) "
+                "ORDER BY id LIMIT ?",
+                (STATUS_QUEUED, now, STATUS_LEASED, now, limit),
+            ).fetchall()
+            leased: List[LeasedJob] = []
+            for job_id, kind, payload, attempts, available_at in rows:
+                if attempts >= self.max_attempts:
+                    self._dead_letter(conn, job_id, "lease expired on final attempt", now)
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_expires_at = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    (STATUS_LEASED, owner, now + self.visibility_timeout, now, job_id),
+                )
+                job_wait_seconds.observe(max(now - available_at, 0.0), kind=kind)
+                leased.append(LeasedJob(job_id, kind, json.loads(payload), attempts + 1, owner))
+            return leased
+
+        return self._transaction(work)
+
+    def extend_lease(self, job_id: int, owner: str) -> bool:
+        """Push a held lease's expiry out by another visibility timeout; False if the lease was lost"""
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+            (now + self.visibility_timeout, now, job_id, STATUS_LEASED, owner),
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: int, owner: str) -> bool:
+        """Mark a leased job as done; False if the lease had already passed to another worker"""
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = ? "
+            "WHERE id = ? AND status = ? AND lease_owner = ?",
+            (STATUS_DONE, now, job_id, STATUS_LEASED, owner),
+        )
+        if cursor.rowcount != 1:
+            logger.warning(f"Lease on job {job_id} was lost before it completed")
+            return False
+
+        with self._completions_lock:
+            self._completions += 1
+            purge = self._completions % PURGE_EVERY == 0
+        if purge:
+            self.purge_done()
+        return True
+
+    def fail(self, job_id: int, owner: str, error: str) -> None:
+        """Record a failed attempt: schedule a retry with backoff, or dead-letter the job after max_attempts"""
+        now = time.time()
+
+        def work(conn: sqlite3.Connection) -> None:
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND status = ? AND lease_owner = ?", (job_id, STATUS_LEASED, owner)
+            ).fetchone()
+            if row is None:
+                logger.warning(f"Lease on job {job_id} was lost before it failed")
+                return
+            attempts = row[0]
+            if attempts >= self.max_attempts:
+                self._dead_letter(conn, job_id, error, now)
+                return
+            conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, lease_owner = NULL, lease_expires_at = NULL, "
+                "last_error = ?, updated_at = ? WHERE id = ?",
+                (STATUS_QUEUED, now + self.retry_backoff * 2 ** (attempts - 1), error, now, job_id),
+            )
+
+        self._transaction(work)
+
+    def _dead_letter(self, conn: sqlite3.Connection, job_id: int, error: str, now: float) -> None:
+        # The jobs row is kept (as done) so its dedupe key still blocks re-enqueueing
+        kind = conn.execute("SELECT kind FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        conn.execute(
+            "INSERT OR REPLACE INTO dead_letter (id, kind, dedupe_key, payload, attempts, last_error, failed_at) "
+            "SELECT id, kind, dedupe_key, payload, attempts, ?, ? FROM jobs WHERE id = ?",
+            (error, now, job_id),
+        )
+        conn.execute(
+            "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires_at = NULL, last_error = ?, updated_at = ? "
+            "WHERE id = ?",
+            (STATUS_DONE, error, now, job_id),
+        )
+        logger.error(f"Job {job_id} moved to the dead-letter table: {error}")
+        jobs_total.inc(kind=kind, outcome="dead_letter")
+
+    def purge_done(self, older_than: float = DONE_RETENTION_SECONDS) -> int:
+        """Delete finished jobs older than older_than seconds; returns how many were removed"""
+        cursor = self._connection().execute(
+            "DELETE FROM jobs WHERE status = ? AND updated_at <= ?", (STATUS_DONE, time.time() - older_than)
+        )
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status, plus the dead-letter count"""
+        conn = self._connection()
+        counts = {status: count for status, count in conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+        counts["dead_letter"] = conn.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+        return counts
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recent dead-lettered jobs, for inspection"""
+        rows = self._connection().execute(
+            "SELECT id, kind, dedupe_key, payload, attempts, last_error, failed_at FROM dead_letter "
+            "ORDER BY failed_at DESC LIMIT ?",
+            (limit,),
+        )
+        columns = ("id", "kind", "dedupe_key", "payload", "attempts", "last_error", "failed_at")
+        return [dict(zip(columns, row), payload=json.loads(row[3])) for row in rows]
+
+
+class JobQueueWorker:
+    """Threads that lease jobs from a SQLiteJobQueue and run the handler registered for each job kind"""
+
+    def __init__(
+        self,
+        job_queue: SQLiteJobQueue,
+        handlers: Dict[str, Callable[[LeasedJob], Any]],
+        concurrency: int = 4,
+        poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS,
+        name: str = "mooai-job",
+    ):
+        self.job_queue = job_queue
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = name
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._held: Dict[int, LeasedJob] = {}
+        self._held_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat, name=f"{self.name}-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+
+    def run_once(self) -> bool:
+        """Lease and run a single job; returns False if no job was ready"""
+        jobs = self.job_queue.lease(self.owner, limit=1)
+        if not jobs:
+            return False
+        job = jobs[0]
+        with self._held_lock:
+            self._held[job.id] = job
+        try:
+            handler = self.handlers.get(job.kind)
+            if handler is None:
+                raise LookupError(f"No handler registered for job kind {job.kind!r}")
+            handler(job)
+        except Exception as e:
+            logger.exception(f"Job {job.id} ({job.kind}) failed on attempt {job.attempts}: {e}")
+            jobs_total.inc(kind=job.kind, outcome="error")
+            self.job_queue.fail(job.id, self.owner, repr(e))
+        else:
+            if self.job_queue.complete(job.id, self.owner):
+                jobs_total.inc(kind=job.kind, outcome="ok")
+        finally:
+            with self._held_lock:
+                self._held.pop(job.id, None)
+        return True
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                if not self.run_once():
+                    self._stopping.wait(self.poll_interval)
+            except Exception as e:
+                # e.g. the database is locked for longer than the busy timeout; back off and poll again
+                logger.exception(f"Job worker error: {e}")
+                self._stopping.wait(self.poll_interval)
+
+    def _heartbeat(self) -> None:
+        # Long agent runs would otherwise outlive their lease and be picked up by a second worker
+        while not self._stopping.wait(self.job_queue.visibility_timeout / 3):
+            with self._held_lock:
+                held = list(self._held)
+            for job_id in held:
+                try:
+                    if not self.job_queue.extend_lease(job_id, self.owner):
+                        logger.warning(f"Could not extend lease on job {job_id}")
+                except Exception as e:
+                    logger.exception(f"Failed to extend lease on job {job_id}: {e}")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop leasing new jobs and wait for running ones to finish"""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+# Queue used by listeners to enqueue thread responses; None unless the queue execution mode is configured
+_job_queue: Optional[SQLiteJobQueue] = None
+
+
+def configure_job_queue(job_queue: Optional[SQLiteJobQueue]) -> None:
+    """Set (or with None, clear) the durable queue thread responses are enqueued on"""
+    global _job_queue
+    _job_queue = job_queue
+
+
+def get_job_queue() -> Optional[SQLiteJobQueue]:
+    return _job_queue
@@ -0,0 +1,208 @@
+"""
+logging_utils.py
+Non-blocking logging: records are handed to a background thread, emitted as JSON, redacted and sampled.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from lib.metrics import REGISTRY
+
+# Longest message or extra field kept in a log record; the rest is replaced with a marker
+MAX_FIELD_CHARS = 2000
+# DEBUG records allowed per second before sampling starts
+DEBUG_RECORDS_PER_SECOND = 50
+# Once over the per-second budget, keep one DEBUG record in this many
+DEBUG_SAMPLE_EVERY = 10
+# Records waiting for the background thread; beyond this, new records are dropped rather than blocking
+LOG_QUEUE_SIZE = 10_000
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_BASE64_PATTERN = re.compile(r"(data:[\w/+.-]+;base64,)[A-Za-z0-9+/=]{64,}")
+_SLACK_TOKEN_PATTERN = re.compile(r"xox[abposr]-[A-Za-z0-9-]+")
+_BEARER_PATTERN = re.compile(r"(Bearer\s+)[A-Za-z0-9._~+/=-]+")
+_OPENAI_KEY_PATTERN = re.compile(r"sk-[A-Za-z0-9_-]{16,}")
+_SECRET_KEYS = {"token", "authorization", "api_key", "password", "secret", "client_secret", "signing_secret"}
+
+# Attributes every LogRecord has; anything else was passed in extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+dropped_records_total = REGISTRY.counter("log_records_dropped_total", "Log records dropped, by reason")
+
+
+def scrub(text: str, limit: int = MAX_FIELD_CHARS) -> str:
+    """
+    Truncate text and redact secrets and inline base64 payloads.
+
+    Args:
+        text: Text to clean.
+        limit: Maximum characters kept.
+
+    Returns:
+        Text safe to log.
+    """
+    if len(text) > limit:
+        text = f"{text[:limit]}... [truncated {len(text) - limit} chars]"
+    text = _BASE64_PATTERN.sub(lambda m: f"{m.group(1)}<redacted>", text)
+    text = _SLACK_TOKEN_PATTERN.sub("xox?-<redacted>", text)
+    text = _OPENAI_KEY_PATTERN.sub("sk-<redacted>", text)
+    return _BEARER_PATTERN.sub(lambda m: f"{m.group(1)}<redacted>", text)
+
+
+def _scrub_value(key: str, value: Any) -> Any:
+    if key.lower() in _SECRET_KEYS:
+        return "<redacted>"
+    if isinstance(value, (bool, int, float)) or value is None:
+        return value
+    return scrub(value if isinstance(value, str) else repr(value))
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including any extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=repr, ensure_ascii=False)
+
+
+class DebugSampler(logging.Filter):
+    """Pass every record above DEBUG; pass DEBUG records up to a per-second budget, then one in sample_every"""
+
+    def __init__(self, per_second: int = DEBUG_RECORDS_PER_SECOND, sample_every: int = DEBUG_SAMPLE_EVERY):
+        super().__init__()
+        self.per_second = per_second
+        self.sample_every = sample_every
+        self._window = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        window = int(time.monotonic())
+        with self._lock:
+            if window != self._window:
+                self._window, self._count = window, 0
+            self._count += 1
+            over_budget = self._count - self.per_second
+        if over_budget <= 0 or over_budget % self.sample_every == 0:
+            return True
+        dropped_records_total.inc(reason="sampled")
+        return False
+
+
+class ScrubbingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that only does the cheap work on the calling thread: merge args, truncate and redact"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = scrub(record.getMessage())
+        record.args = None
+        if record.exc_info:
+            # Tracebacks are formatted here because the frames may be gone by the time the listener runs
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        for key in list(vars(record)):
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                setattr(record, key, _scrub_value(key, getattr(record, key)))
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records_total.inc(reason="queue_full")
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(
+    level: str = "INFO",
+    json_output: bool = True,
+    debug_per_second: int = DEBUG_RECORDS_PER_SECOND,
+    stream: Any = None,
+) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a background thread.
+
+    Application threads only copy, truncate and redact each record and put it on a queue;
+    formatting and writing happen on the listener thread.
+
+    Args:
+        level: Root log level name.
+        json_output: Emit one JSON object per line instead of plain text.
+        debug_per_second: DEBUG records allowed per second before sampling.
+        stream: Output stream (defaults to stderr).
+
+    Returns:
+        The running QueueListener (stopped automatically at exit).
+    """
+    global _listener
+    _stop_listener()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if json_output else logging.Formatter(TEXT_FORMAT))
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = ScrubbingQueueHandler(log_queue)
+    queue_handler.addFilter(DebugSampler(per_second=debug_per_second))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def _stop_listener() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_listener_after_fork() -> None:
+    """Give a forked child its own queue and listener thread (threads don't survive fork)"""
+    global _listener
+    if _listener is None:
+        return
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, ScrubbingQueueHandler):
+            handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+atexit.register(_stop_listener)
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
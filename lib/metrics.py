@@ -0,0 +1,267 @@
+"""
+metrics.py
+Minimal in-process metrics registry (counters, gauges and histograms with labels),
+with Prometheus text exposition and a small scrape endpoint.
+"""
+
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Default histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Buckets for payload sizes, in bytes (1 KB to 50 MB)
+SIZE_BUCKETS = (1_024, 16_384, 131_072, 524_288, 1_048_576, 5_242_880, 20_971_520, 52_428_800)
+# Buckets for item counts (messages, attachments)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+# Buckets for token counts per request
+TOKEN_BUCKETS = (100, 500, 1_000, 2_500, 5_000, 10_000, 25_000, 50_000, 100_000, 200_000)
+
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_PATH = "/metrics"
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Counter:
+    """Monotonically increasing value per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge(Counter):
+    """Value that can go up and down per label set"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """Bucketed distribution of observed values per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelKey, Tuple[List[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            counts, _ = self._values.get(_label_key(labels), ([0], 0.0))
+            return sum(counts)
+
+    def sum(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), ([0], 0.0))[1]
+
+    def samples(self) -> Dict[LabelKey, Tuple[List[int], float]]:
+        with self._lock:
+            return {k: (list(counts), total) for k, (counts, total) in self._values.items()}
+
+
+class MetricsRegistry:
+    """Get-or-create registry so modules can declare the metrics they use at import time"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, **kwargs)
+                self._metrics[name] = metric
+            elif type(metric) is not cls:
+                raise ValueError(f"Metric {name} already registered as {type(metric).__name__}")
+            return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._get_or_create(Counter, name, documentation)
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation)
+
+    def histogram(self, name: str, documentation: str, buckets: Optional[Sequence[float]] = None) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, buckets=buckets or DEFAULT_BUCKETS)
+
+    def all(self) -> List[object]:
+        with self._lock:
+            return list(self._metrics.values())
+
+
+# Process-wide registry
+REGISTRY = MetricsRegistry()
+
+
+stage_seconds = REGISTRY.histogram("reply_stage_seconds", "Time spent in each stage of building a reply, by stage")
+stage_errors_total = REGISTRY.counter(
+    "reply_stage_errors_total", "Exceptions raised in each reply stage, by stage and error class"
+)
+
+
+def record_stage_error(stage: str, error: BaseException) -> None:
+    """Count an exception against a reply stage, labelled with its class name"""
+    stage_errors_total.inc(stage=stage, error=type(error).__name__)
+
+
+@contextmanager
+def time_stage(stage: str) -> Iterator[None]:
+    """
+    Observe how long the block takes in reply_stage_seconds, and count any exception it raises.
+
+    Exceptions are re-raised, so callers keep their own error handling.
+
+    Args:
+        stage: Stage label, e.g. "fetch_thread" or "agent_run".
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_stage_error(stage, e)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + "}"
+
+
+def _format_number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def render_prometheus(registry: Optional[MetricsRegistry] = None) -> str:
+    """
+    Render every metric in the Prometheus text exposition format (version 0.0.4).
+
+    Histogram buckets are stored per bucket; they are made cumulative here, as the format requires.
+
+    Args:
+        registry: Registry to render (defaults to the process-wide REGISTRY).
+
+    Returns:
+        Exposition text, ending with a newline.
+    """
+    lines: List[str] = []
+    for metric in sorted((registry or REGISTRY).all(), key=lambda m: m.name):
+        documentation = metric.documentation.replace("\\", "\\\\").replace("\n", "\\n")
+        lines.append(f"# HELP {metric.name} {documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for key, sample in sorted(metric.samples().items()):
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{_format_labels(key)} {_format_number(sample)}")
+                continue
+            counts, total = sample
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (math.inf,), counts):
+                cumulative += count
+                le = (("le", _format_number(bound)),)
+                lines.append(f"{metric.name}_bucket{_format_labels(key, le)} {cumulative}")
+            lines.append(f"{metric.name}_sum{_format_labels(key)} {_format_number(total)}")
+            lines.append(f"{metric.name}_count{_format_labels(key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry: Optional[MetricsRegistry] = None
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != METRICS_PATH:
+            self.send_error(404)
+            return
+        body = render_prometheus(self.registry).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Scrapes every few seconds would drown the application log
+        pass
+
+
+def start_metrics_server(
+    port: int, host: str = "127.0.0.1", registry: Optional[MetricsRegistry] = None
+) -> ThreadingHTTPServer:
+    """
+    Serve METRICS_PATH for Prometheus scrapes from a daemon thread.
+
+    Args:
+        port: Port to listen on (0 picks a free port; see server.server_address).
+        host: Interface to bind; loopback by default so metrics aren't exposed publicly.
+        registry: Registry to serve (defaults to the process-wide REGISTRY).
+
+    Returns:
+        The running server; call shutdown() to stop it.
+    """
+    handler = type("MetricsRequestHandler", (_MetricsRequestHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}{METRICS_PATH}")
+    return server
@@ -0,0 +1,49 @@
+"""
+prewarm.py
+Optional warm-up run before connecting to Slack, so the first request doesn't pay for lazy imports.
+"""
+
+import logging
+import time
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_agents() -> None:
+    from lib.agent import prewarm_agents
+
+    prewarm_agents()
+
+
+def _warm_file_handling() -> None:
+    import PyPDF2  # noqa: F401
+    import requests  # noqa: F401
+
+
+# Steps run by prewarm(), in order
+PREWARM_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("agents", _warm_agents),
+    ("file_handling", _warm_file_handling),
+]
+
+
+def prewarm() -> Dict[str, float]:
+    """
+    Import the heavy modules and build the cached objects that handlers load lazily.
+
+    A failing step is logged and skipped; the app still works, just with a slower first request.
+
+    Returns:
+        Seconds taken by each step.
+    """
+    timings: Dict[str, float] = {}
+    for name, step in PREWARM_STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.exception(f"Prewarm step {name} failed: {e}")
+        timings[name] = time.perf_counter() - started
+    logger.info("Prewarm finished: " + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items()))
+    return timings
@@ -0,0 +1,348 @@
+"""
+prompt_cache.py
+Answers to the suggested prompts, computed ahead of time so a new assistant thread that starts with one is answered instantly.
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from lib.metrics import REGISTRY
+from lib.models import StructuredResponse
+
+logger = logging.getLogger(__name__)
+
+# How long a precomputed answer may be served, in seconds (a day, so "today" questions are refreshed daily)
+PROMPT_CACHE_TTL_SECONDS = 24 * 60 * 60
+# Local times of day at which the answers are recomputed
+DEFAULT_REFRESH_TIMES: List[datetime.time] = [datetime.time(7, 0)]
+# How long a process that claimed the startup fill of missing answers has to finish it before another may retry
+FILL_CLAIM_SECONDS = 15 * 60
+SQLITE_BUSY_TIMEOUT_SECONDS = 5.0
+
+prompt_cache_lookups_total = REGISTRY.counter(
+    "prompt_cache_lookups_total", "First messages of new assistant threads checked against the prompt cache, by outcome"
+)
+prompt_cache_refreshes_total = REGISTRY.counter(
+    "prompt_cache_refreshes_total", "Suggested prompt answers recomputed by the prewarm scheduler, by outcome"
+)
+
+
+def normalize_prompt(text: str) -> str:
+    """Collapse whitespace so a prompt matches however Slack spaced the message text"""
+    return " ".join(text.split())
+
+
+def prompt_messages(prompts: Iterable[Union[str, Dict[str, str]]]) -> List[str]:
+    """
+    Get the message text sent by each suggested prompt.
+
+    Args:
+        prompts: Prompts in the form passed to set_suggested_prompts
+
+    Returns:
+        The message of each prompt, in order
+    """
+    return [prompt if isinstance(prompt, str) else prompt["message"] for prompt in prompts]
+
+
+def parse_refresh_times(spec: str) -> List[datetime.time]:
+    """
+    Parse a comma-separated list of HH:MM local times, e.g. "07:00,13:30".
+
+    Raises:
+        ValueError: If a time isn't in HH:MM form
+    """
+    times = []
+    for part in spec.split(","):
+        part = part.strip()
+        if part:
+            hour, minute = part.split(":")
+            times.append(datetime.time(int(hour), int(minute)))
+    if not times:
+        raise ValueError(f"No refresh times in {spec!r}")
+    return sorted(times)
+
+
+class PromptAnswerCache:
+    """Process-wide map of prompt message to its precomputed answer, each valid for ttl_seconds"""
+
+    def __init__(self, ttl_seconds: float = PROMPT_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[Union[str, StructuredResponse], float]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, prompt: str) -> Optional[Union[str, StructuredResponse]]:
+        """Return the answer cached for prompt, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(normalize_prompt(prompt))
+        if entry is None:
+            return None
+        answer, expires_at = entry
+        if expires_at < time.monotonic():
+            return None
+        return answer
+
+    def put(self, prompt: str, answer: Union[str, StructuredResponse]) -> None:
+        with self._lock:
+            self._entries[normalize_prompt(prompt)] = (answer, time.monotonic() + self.ttl_seconds)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def claim_refresh(self, slot: str, seconds: float) -> bool:
+        """Claim a refresh slot; a process-local cache has no one to share refreshes with"""
+        return True
+
+
+class SQLitePromptAnswerCache:
+    """
+    Prompt answers in a SQLite file, shared by every process that can reach it (e.g. the HTTP workers).
+
+    Refreshes are claimed per slot in the same file, so of all the processes scheduling a refresh only the
+    one that claims it runs the agent, and the others (and recycled workers) read its answers.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = PROMPT_CACHE_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS prompt_answers "
+                "(prompt TEXT PRIMARY KEY, structured INTEGER NOT NULL, answer TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS prompt_refresh_claims (slot TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads, so each thread opens its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM prompt_answers").fetchone()[0]
+
+    def get(self, prompt: str) -> Optional[Union[str, StructuredResponse]]:
+        """Return the answer cached for prompt, or None if missing or expired"""
+        row = (
+            self._connection()
+            .execute(
+                "SELECT structured, answer FROM prompt_answers WHERE prompt = ? AND expires_at > ?",
+                (normalize_prompt(prompt), time.time()),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        structured, answer = row
+        return StructuredResponse.model_validate_json(answer) if structured else json.loads(answer)
+
+    def put(self, prompt: str, answer: Union[str, StructuredResponse]) -> None:
+        structured = isinstance(answer, StructuredResponse)
+        self._connection().execute(
+            "INSERT OR REPLACE INTO prompt_answers (prompt, structured, answer, expires_at) VALUES (?, ?, ?, ?)",
+            (
+                normalize_prompt(prompt),
+                int(structured),
+                answer.model_dump_json() if structured else json.dumps(answer),
+                time.time() + self.ttl_seconds,
+            ),
+        )
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM prompt_answers")
+
+    def claim_refresh(self, slot: str, seconds: float) -> bool:
+        """
+        Claim a refresh slot for this process, atomically across processes.
+
+        Returns:
+            True if nobody has claimed slot within the last seconds, False if another claim holds it.
+        """
+        # Wall-clock time, since expiry has to mean the same thing in every process
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM prompt_refresh_claims WHERE expires_at <= ?", (now,))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO prompt_refresh_claims (slot, expires_at) VALUES (?, ?)", (slot, now + seconds)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+
+class PromptPrewarmer:
+    """
+    Computes the answers missing at startup, and recomputes every answer at each refresh time of day.
+
+    Each refresh is claimed in the cache first, so with a shared cache only one process runs it.
+    """
+
+    def __init__(
+        self,
+        cache: Union[PromptAnswerCache, SQLitePromptAnswerCache],
+        prompts: List[str],
+        refresh_times: Optional[List[datetime.time]] = None,
+        refresh_on_start: bool = True,
+    ):
+        self.cache = cache
+        self.prompts = prompts
+        self.refresh_times = sorted(refresh_times or DEFAULT_REFRESH_TIMES)
+        self.refresh_on_start = refresh_on_start
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    async def refresh(self, prompts: Optional[List[str]] = None) -> int:
+        """
+        Run the agent on each prompt as the first message of a thread and cache the answers.
+
+        A failed prompt is logged and keeps its previous answer until that expires.
+
+        Args:
+            prompts: The prompts to refresh (default: all of them)
+
+        Returns:
+            Number of prompts refreshed
+        """
+        from lib.agent import run_agent_with_messages
+
+        prompts = self.prompts if prompts is None else prompts
+        refreshed = 0
+        for prompt in prompts:
+            try:
+                # run_agent_with_messages raises on failure, so an error reply is never cached
+                answer = await run_agent_with_messages(
+                    [{"role": "user", "content": prompt}], None, use_structured_output=True
+                )
+            except Exception as e:
+                logger.exception(f"Failed to prewarm the answer to {prompt!r}: {e}")
+                prompt_cache_refreshes_total.inc(outcome="error")
+                continue
+            await asyncio.to_thread(self.cache.put, prompt, answer)
+            prompt_cache_refreshes_total.inc(outcome="ok")
+            refreshed += 1
+        logger.info(f"Prewarmed answers to {refreshed} of {len(prompts)} suggested prompts")
+        return refreshed
+
+    def next_refresh_at(self, now: Optional[datetime.datetime] = None) -> datetime.datetime:
+        """The next configured refresh time after now (local time)"""
+        now = now or datetime.datetime.now()
+        for day in (0, 1):
+            date = now.date() + datetime.timedelta(days=day)
+            for refresh_time in self.refresh_times:
+                at = datetime.datetime.combine(date, refresh_time)
+                if at > now:
+                    return at
+        return now + datetime.timedelta(days=1)
+
+    def seconds_until_next_refresh(self, now: Optional[datetime.datetime] = None) -> float:
+        """Seconds from now (local time) until the next configured refresh time"""
+        now = now or datetime.datetime.now()
+        return (self.next_refresh_at(now) - now).total_seconds()
+
+    def missing_prompts(self) -> List[str]:
+        """The prompts without a current answer in the cache"""
+        return [prompt for prompt in self.prompts if self.cache.get(prompt) is None]
+
+    def claim_startup_fill(self) -> List[str]:
+        """The missing prompts this process should answer at startup (none if another process is on it)"""
+        missing = self.missing_prompts()
+        if missing and self.cache.claim_refresh("startup-fill", FILL_CLAIM_SECONDS):
+            return missing
+        return []
+
+    def claim_scheduled(self, at: datetime.datetime) -> bool:
+        """Claim the refresh scheduled at a time, so only one process sharing the cache runs it"""
+        return self.cache.claim_refresh(f"scheduled {at.isoformat(timespec='minutes')}", PROMPT_CACHE_TTL_SECONDS)
+
+    def start(self) -> None:
+        """Refresh on a background thread, for the sync app"""
+        self._thread = threading.Thread(target=self._run, name="prompt-prewarm", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def _run(self) -> None:
+        missing = self.claim_startup_fill() if self.refresh_on_start else []
+        if missing:
+            asyncio.run(self.refresh(missing))
+        while True:
+            at = self.next_refresh_at()
+            if self._stopping.wait((at - datetime.datetime.now()).total_seconds()):
+                break
+            if self.claim_scheduled(at):
+                asyncio.run(self.refresh())
+
+    async def run_async(self) -> None:
+        """Refresh as a task on the running event loop, for the async app (cache reads and claims run in a thread)"""
+        missing = await asyncio.to_thread(self.claim_startup_fill) if self.refresh_on_start else []
+        if missing:
+            await self.refresh(missing)
+        while not self._stopping.is_set():
+            at = self.next_refresh_at()
+            await asyncio.sleep((at - datetime.datetime.now()).total_seconds())
+            if await asyncio.to_thread(self.claim_scheduled, at):
+                await self.refresh()
+
+
+# Cache used by cached_first_answer(); no answers are prewarmed unless configure_prompt_cache() is called
+_cache: Optional[Union[PromptAnswerCache, SQLitePromptAnswerCache]] = None
+
+
+def configure_prompt_cache(cache: Optional[Union[PromptAnswerCache, SQLitePromptAnswerCache]]) -> None:
+    """Set the cache that new assistant threads are answered from"""
+    global _cache
+    _cache = cache
+
+
+def get_prompt_cache() -> Optional[Union[PromptAnswerCache, SQLitePromptAnswerCache]]:
+    return _cache
+
+
+def cached_first_answer(slack_messages: List[Dict[str, Any]]) -> Optional[Union[str, StructuredResponse]]:
+    """
+    Look up the precomputed answer for a thread whose only user message is a suggested prompt.
+
+    Later messages are answered by the agent as usual, since the answer depends on the rest of the thread.
+
+    Args:
+        slack_messages: The thread's messages from conversations.replies
+
+    Returns:
+        The cached answer, or None if the thread isn't new, the message isn't a cached prompt, or no cache is configured
+    """
+    if _cache is None:
+        return None
+    user_messages = [msg for msg in slack_messages if not msg.get("bot_id")]
+    if len(user_messages) != 1 or user_messages[0].get("files"):
+        return None
+    answer = _cache.get(user_messages[0].get("text", ""))
+    prompt_cache_lookups_total.inc(outcome="miss" if answer is None else "hit")
+    return answer
+
+
+async def cached_first_answer_async(slack_messages: List[Dict[str, Any]]) -> Optional[Union[str, StructuredResponse]]:
+    """Async counterpart of cached_first_answer; the SQLite cache is read off the event loop"""
+    if isinstance(_cache, SQLitePromptAnswerCache):
+        return await asyncio.to_thread(cached_first_answer, slack_messages)
+    return cached_first_answer(slack_messages)
@@ -0,0 +1,142 @@
+"""
+renderer.py
+Render agent responses into Slack messages that stay within Block Kit limits.
+"""
+
+import re
+from typing import List, NamedTuple, Optional
+
+from slack_sdk.models.blocks import Block, DividerBlock, HeaderBlock, SectionBlock
+
+# Slack limits
+SECTION_TEXT_LIMIT = 3000  # characters in a section block's text
+HEADER_TEXT_LIMIT = 150  # characters in a header block's text
+MESSAGE_BLOCK_LIMIT = 50  # blocks per message
+MESSAGE_TEXT_LIMIT = 40000  # characters in a message's top-level text
+
+CODE_FENCE = "```"
+_CODE_BLOCK_PATTERN = re.compile(r"(```.*?```)", re.DOTALL)
+_PARAGRAPH_PATTERN = re.compile(r"\n{2,}")
+
+
+class RenderedMessage(NamedTuple):
+    """A single Slack message: fallback text plus Block Kit blocks"""
+
+    text: str
+    blocks: List[Block]
+
+
+def _pack(pieces: List[str], limit: int, separator: str) -> List[str]:
+    """Greedily join pieces with separator into chunks no longer than limit (pieces must already fit)"""
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(separator) + len(piece) > limit:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}{separator}{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_text_hard(text: str, limit: int) -> List[str]:
+    """Split text into limit-sized pieces regardless of content"""
+    return [text[start : start + limit] for start in range(0, len(text), limit)]
+
+
+def _split_text(text: str, limit: int) -> List[str]:
+    """Split plain mrkdwn on lines, then words, then hard character boundaries"""
+    if len(text) <= limit:
+        return [text]
+
+    lines: List[str] = []
+    for line in text.split("\n"):
+        if len(line) <= limit:
+            lines.append(line)
+            continue
+        words: List[str] = []
+        for word in line.split(" "):
+            if len(word) > limit:
+                words.extend(_split_text_hard(word, limit))
+            else:
+                words.append(word)
+        lines.extend(_pack(words, limit, " "))
+    return _pack(lines, limit, "\n")
+
+
+def _split_code_block(block: str, limit: int) -> List[str]:
+    """Split a fenced code block into several fenced blocks, each within limit"""
+    if len(block) <= limit:
+        return [block]
+
+    inner = block[len(CODE_FENCE) : -len(CODE_FENCE)].strip("\n")
+    # Leave room for the fences and the newlines around them
+    inner_limit = limit - 2 * len(CODE_FENCE) - 2
+    return [f"{CODE_FENCE}\n{chunk}\n{CODE_FENCE}" for chunk in _split_text(inner, inner_limit)]
+
+
+def split_mrkdwn(text: str, limit: int = SECTION_TEXT_LIMIT) -> List[str]:
+    """
+    Split mrkdwn into chunks of at most limit characters.
+
+    Splits prefer paragraph boundaries and never cut a code block without closing and
+    reopening its fence, so each chunk renders correctly on its own.
+
+    Args:
+        text: mrkdwn-formatted string.
+        limit: Maximum characters per chunk.
+
+    Returns:
+        List of mrkdwn chunks (empty if text is empty).
+    """
+    if not text:
+        return []
+    if len(text) <= limit:
+        return [text]
+
+    segments: List[str] = []
+    for part in _CODE_BLOCK_PATTERN.split(text):
+        if not part.strip():
+            continue
+        if part.startswith(CODE_FENCE) and part.endswith(CODE_FENCE) and len(part) >= 2 * len(CODE_FENCE):
+            segments.extend(_split_code_block(part, limit))
+        else:
+            for paragraph in _PARAGRAPH_PATTERN.split(part.strip("\n")):
+                if paragraph.strip():
+                    segments.extend(_split_text(paragraph, limit))
+
+    return _pack(segments, limit, "\n\n")
+
+
+def render_mrkdwn_messages(mrkdwn: str, title: Optional[str] = None, title_divider: bool = False) -> List[RenderedMessage]:
+    """
+    Build one or more Slack messages for an (already converted) mrkdwn response.
+
+    Args:
+        mrkdwn: mrkdwn-formatted response.
+        title: Optional header shown at the top of the first message.
+        title_divider: Whether to add a divider under the header.
+
+    Returns:
+        List of messages, each within Slack's section, block and text limits.
+    """
+    header_blocks: List[Block] = []
+    if title:
+        header_blocks.append(HeaderBlock(text=title[:HEADER_TEXT_LIMIT]))
+        if title_divider:
+            header_blocks.append(DividerBlock())
+
+    messages: List[RenderedMessage] = []
+    chunks = split_mrkdwn(mrkdwn) or [" "]
+    blocks: List[Block] = list(header_blocks)
+    texts: List[str] = []
+    for chunk in chunks:
+        if len(blocks) >= MESSAGE_BLOCK_LIMIT:
+            messages.append(RenderedMessage(text="\n\n".join(texts)[:MESSAGE_TEXT_LIMIT], blocks=blocks))
+            blocks, texts = [], []
+        blocks.append(SectionBlock(text=chunk))
+        texts.append(chunk)
+    messages.append(RenderedMessage(text="\n\n".join(texts)[:MESSAGE_TEXT_LIMIT], blocks=blocks))
+    return messages
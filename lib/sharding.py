@@ -0,0 +1,266 @@
+"""
+sharding.py
+Route each conversation thread to a fixed worker process, so per-process caches stay warm for that thread.
+"""
+
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from lib.metrics import REGISTRY
+from lib.tracing import current_span_context, format_traceparent, parse_traceparent, use_span_context
+
+logger = logging.getLogger(__name__)
+
+# How often the parent checks for finished jobs and dead workers, in seconds
+MONITOR_INTERVAL_SECONDS = 0.5
+# Replies each worker process runs at once
+DEFAULT_SHARD_THREADS = 8
+
+shard_jobs_total = REGISTRY.counter("shard_jobs_total", "Jobs sent to shard worker processes, by shard")
+shard_replays_total = REGISTRY.counter(
+    "shard_replays_total", "In-flight jobs of a dead worker, by whether they were replayed or had already been answered"
+)
+shard_respawns_total = REGISTRY.counter("shard_respawns_total", "Shard worker processes replaced after dying, by shard")
+shard_workers_alive = REGISTRY.gauge("shard_workers_alive", "Shard worker processes currently alive")
+
+
+def thread_key(channel_id: str, thread_ts: str) -> str:
+    """Sharding key for a Slack conversation thread"""
+    return f"{channel_id}:{thread_ts}"
+
+
+def _score(shard: int, key: str) -> int:
+    # Python's hash() is salted per process, so use a stable digest
+    return int.from_bytes(hashlib.blake2b(f"{shard}:{key}".encode(), digest_size=8).digest(), "big")
+
+
+def rendezvous_owner(key: str, shards: Sequence[int]) -> int:
+    """
+    Pick the shard that owns key using rendezvous (highest random weight) hashing.
+
+    When a shard is removed, only the keys it owned move; every other key keeps its owner.
+
+    Args:
+        key: Sharding key, e.g. from thread_key().
+        shards: IDs of the shards that are available.
+
+    Returns:
+        The owning shard ID.
+    """
+    if not shards:
+        raise ValueError("No shards available")
+    return max(shards, key=lambda shard: _score(shard, key))
+
+
+def _run_shard_job(shard: int, handler: Callable[..., Any], job: Tuple[int, tuple, Optional[str]], results: Any) -> None:
+    job_id, args, traceparent = job
+    try:
+        # Spans can't follow the job across processes through contextvars, so the parent travels with it
+        with use_span_context(parse_traceparent(traceparent)):
+            handler(*args)
+    except Exception as e:
+        logger.exception(f"Shard {shard} job failed: {e}")
+    results.put(job_id)
+
+
+def _shard_worker(shard: int, handler: Callable[..., Any], jobs: Any, results: Any, threads: int) -> None:
+    """Worker process loop: run this shard's jobs on a thread pool and report each one as finished"""
+    # Replies spend most of their time waiting on Slack and the model, so each process runs several at once
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix=f"shard-{shard}") as executor:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            executor.submit(_run_shard_job, shard, handler, job, results)
+
+
+class ShardedDispatcher:
+    """
+    Fixed set of worker processes, each fed by its own queue and running jobs on its own thread pool,
+    with jobs routed by key.
+
+    Workers are forked, so handler can be any callable (it is not pickled); job arguments are
+    sent over a multiprocessing queue and must be picklable. Call start() before the parent
+    starts other threads. A worker that dies is replaced by a new process for the same shard, so
+    keys keep their owner, and the jobs it had not finished are sent to the replacement unless
+    should_replay(*args) says they already got their reply. If a replacement can't be started,
+    the shard's keys move to the surviving workers.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[..., Any],
+        workers: int,
+        threads: int = DEFAULT_SHARD_THREADS,
+        should_replay: Optional[Callable[..., bool]] = None,
+        name: str = "mooai-shard",
+    ):
+        if workers < 1:
+            raise ValueError("ShardedDispatcher needs at least one worker")
+        self.handler = handler
+        self.workers = workers
+        self.threads = threads
+        self.should_replay = should_replay
+        self.name = name
+        self._context = multiprocessing.get_context("fork")
+        self._results: Any = self._context.Queue()
+        self._queues: Dict[int, Any] = {}
+        self._processes: Dict[int, Any] = {}
+        self._alive: List[int] = []
+        self._in_flight: Dict[int, Tuple[int, str, tuple, Optional[str]]] = {}
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._monitor_thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Fork the worker processes and start the monitor thread"""
+        for shard in range(self.workers):
+            self._spawn(shard)
+            self._alive.append(shard)
+        shard_workers_alive.set(len(self._alive))
+        self._monitor_thread = threading.Thread(target=self._monitor, name=f"{self.name}-monitor", daemon=True)
+        self._monitor_thread.start()
+
+    def _spawn(self, shard: int) -> None:
+        # A worker killed mid-put can leave its queue unusable, so each process gets a fresh one
+        jobs = self._context.Queue()
+        process = self._context.Process(
+            target=_shard_worker,
+            args=(shard, self.handler, jobs, self._results, self.threads),
+            name=f"{self.name}-{shard}",
+            daemon=True,
+        )
+        process.start()
+        self._queues[shard] = jobs
+        self._processes[shard] = process
+
+    def shard_for(self, key: str) -> Optional[int]:
+        """Shard currently owning key, or None if no worker is alive"""
+        with self._lock:
+            return rendezvous_owner(key, self._alive) if self._alive else None
+
+    def submit(self, key: str, *args: Any) -> Optional[int]:
+        """
+        Send handler(*args) to the worker that owns key.
+
+        Args:
+            key: Sharding key; jobs with the same key go to the same worker while it is alive.
+
+        Returns:
+            The shard the job was sent to, or None if no worker was alive and it ran on the caller's thread.
+        """
+        traceparent = format_traceparent(current_span_context())
+        with self._lock:
+            shard = self._send(next(self._job_ids), key, args, traceparent)
+        if shard is None:
+            logger.error(f"No shard workers alive, running job for {key} on the caller's thread")
+            self.handler(*args)
+        return shard
+
+    def _send(self, job_id: int, key: str, args: tuple, traceparent: Optional[str]) -> Optional[int]:
+        # Caller holds self._lock
+        if not self._alive:
+            return None
+        shard = rendezvous_owner(key, self._alive)
+        self._in_flight[job_id] = (shard, key, args, traceparent)
+        self._queues[shard].put((job_id, args, traceparent))
+        shard_jobs_total.inc(shard=str(shard))
+        return shard
+
+    def _monitor(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job_id = self._results.get(timeout=MONITOR_INTERVAL_SECONDS)
+                with self._lock:
+                    self._in_flight.pop(job_id, None)
+            except queue.Empty:
+                pass
+            self._reap_dead_workers()
+
+    def _reap_dead_workers(self) -> None:
+        replays: List[Tuple[int, str, tuple, Optional[str]]] = []
+        with self._lock:
+            if self._stopping.is_set():
+                return
+            dead = [shard for shard in self._alive if not self._processes[shard].is_alive()]
+            if not dead:
+                return
+            for shard in dead:
+                logger.error(f"Shard worker {shard} exited with code {self._processes[shard].exitcode}; respawning")
+                try:
+                    self._spawn(shard)
+                    shard_respawns_total.inc(shard=str(shard))
+                except Exception as e:
+                    logger.exception(f"Failed to respawn shard worker {shard}, rebalancing its keys: {e}")
+                    self._alive.remove(shard)
+            shard_workers_alive.set(len(self._alive))
+
+            for job_id, (shard, key, args, traceparent) in list(self._in_flight.items()):
+                if shard in dead:
+                    del self._in_flight[job_id]
+                    replays.append((job_id, key, args, traceparent))
+
+        orphans: List[Tuple[tuple, Optional[str]]] = []
+        for job_id, key, args, traceparent in replays:
+            # The dead worker may have posted its reply before it died; replaying would post it twice
+            if self.should_replay is not None and not self._replay_wanted(args):
+                shard_replays_total.inc(outcome="skipped")
+                continue
+            with self._lock:
+                shard = self._send(job_id, key, args, traceparent)
+            if shard is None:
+                orphans.append((args, traceparent))
+            shard_replays_total.inc(outcome="replayed")
+
+        for args, traceparent in orphans:
+            logger.error("No shard workers alive, running orphaned job on the monitor thread")
+            try:
+                with use_span_context(parse_traceparent(traceparent)):
+                    self.handler(*args)
+            except Exception as e:
+                logger.exception(f"Orphaned shard job failed: {e}")
+
+    def _replay_wanted(self, args: tuple) -> bool:
+        try:
+            return bool(self.should_replay(*args))  # type: ignore[misc]
+        except Exception as e:
+            # If the check itself fails, a duplicate reply is better than none
+            logger.exception(f"Replay check failed, replaying the job: {e}")
+            return True
+
+    def alive_shards(self) -> List[int]:
+        with self._lock:
+            return list(self._alive)
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Stop the workers after the jobs already queued have run"""
+        with self._lock:
+            # Workers exiting from here on are not respawned
+            self._stopping.set()
+            for shard in self._alive:
+                self._queues[shard].put(None)
+        for process in self._processes.values():
+            process.join(timeout)
+        if self._monitor_thread is not None:
+            self._monitor_thread.join(timeout)
+
+
+# Dispatcher used for thread responses; None unless the sharded execution mode is configured
+_dispatcher: Optional[ShardedDispatcher] = None
+
+
+def configure_sharded_dispatcher(dispatcher: Optional[ShardedDispatcher]) -> None:
+    """Set (or with None, clear) the dispatcher that routes thread responses to shard workers"""
+    global _dispatcher
+    _dispatcher = dispatcher
+
+
+def get_sharded_dispatcher() -> Optional[ShardedDispatcher]:
+    return _dispatcher
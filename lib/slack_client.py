@@ -0,0 +1,436 @@
+"""
+slack_client.py
+Rate-limit-aware Slack WebClient with per-method token buckets.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from slack_sdk import WebClient
+from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
+from slack_sdk.http_retry.request import HttpRequest
+from slack_sdk.http_retry.response import HttpResponse
+from slack_sdk.http_retry.state import RetryState
+
+from lib.metrics import REGISTRY
+from lib.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Requests per minute allowed by each Slack rate-limit tier
+TIER_LIMITS_PER_MINUTE = {
+    1: 1,
+    2: 20,
+    3: 50,
+    4: 100,
+}
+
+# chat.postMessage is a "special" tier: roughly one message per second per channel
+POST_MESSAGE_LIMIT_PER_MINUTE = 60
+
+# Tier of each Slack method the bot calls (unknown methods default to DEFAULT_TIER)
+METHOD_TIERS = {
+    "auth.test": 4,
+    "conversations.replies": 3,
+    "conversations.history": 3,
+    "files.info": 4,
+    "chat.update": 3,
+    "chat.postEphemeral": 4,
+    "views.publish": 4,
+    "users.info": 4,
+    "users.list": 2,
+    "assistant.threads.setStatus": 4,
+    "assistant.threads.setTitle": 4,
+    "assistant.threads.setSuggestedPrompts": 4,
+}
+DEFAULT_TIER = 3
+
+# Methods keyed per channel rather than per workspace
+PER_CHANNEL_METHODS = {"chat.postMessage"}
+
+# Methods that are not user-facing replies and queue behind them
+BACKGROUND_METHODS = {"views.publish"}
+
+# Longest a background call waits for user-facing calls to drain, in seconds
+BACKGROUND_MAX_DELAY = 5.0
+
+# Fraction of a minute's allowance that can be spent in one burst
+BURST_FRACTION = 0.1
+
+# Retries for HTTP 429 responses (each one honors Retry-After)
+MAX_RATE_LIMIT_RETRIES = 3
+
+# How often async background calls re-check for in-flight user-facing calls, in seconds
+ASYNC_BACKGROUND_POLL_INTERVAL = 0.05
+
+# Context entries Bolt binds to the per-request client for assistant events
+ASSISTANT_UTILITY_KEYS = (
+    "say",
+    "set_status",
+    "set_title",
+    "set_suggested_prompts",
+    "get_thread_context",
+    "save_thread_context",
+)
+
+# Workspaces whose pooled client is kept (least recently used ones are dropped first)
+DEFAULT_MAX_POOLED_WORKSPACES = 1000
+
+throttle_seconds = REGISTRY.histogram("slack_api_throttle_seconds", "Time spent waiting for a Slack rate-limit token")
+rate_limited_total = REGISTRY.counter("slack_api_rate_limited_total", "HTTP 429 responses received from Slack")
+client_pool_lookups_total = REGISTRY.counter(
+    "slack_client_pool_lookups_total", "Per-request client swaps, by whether the workspace's pooled client was reused"
+)
+client_pool_workspaces = REGISTRY.gauge("slack_client_pool_workspaces", "Workspaces with a pooled client")
+
+
+class TokenBucket:
+    """Token bucket that hands out wait times instead of sleeping, so sync and async callers can share it"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute * BURST_FRACTION)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how many seconds the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            if now > self._updated_at:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+            self._tokens -= 1
+            # While penalized, _updated_at is in the future and no tokens accrue until then
+            wait = self._updated_at - now
+            if self._tokens < 0:
+                wait += -self._tokens / self.rate
+            return max(0.0, wait)
+
+    def penalize(self, seconds: float) -> None:
+        """Stop handing out tokens for the given number of seconds (e.g. after a Retry-After)"""
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._updated_at:
+                self._tokens = min(self._tokens, 0.0)
+                self._updated_at = until
+
+
+class SlackRateLimiter:
+    """
+    Per-method (and per-channel for chat.postMessage) token buckets shared by every client of a workspace.
+
+    Buckets live in the process. When several processes call Slack for the same workspace, give each a share of
+    Slack's limits, so that together they stay within them.
+    """
+
+    def __init__(
+        self,
+        method_tiers: Optional[Dict[str, int]] = None,
+        background_methods: Optional[set] = None,
+        background_max_delay: float = BACKGROUND_MAX_DELAY,
+        share: float = 1.0,
+    ):
+        self.method_tiers = method_tiers if method_tiers is not None else METHOD_TIERS
+        self.background_methods = background_methods if background_methods is not None else BACKGROUND_METHODS
+        self.background_max_delay = background_max_delay
+        self.share = share
+        self._buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+        # Number of user-facing calls currently waiting or in flight
+        self._urgent_active = 0
+        self._urgent_cond = threading.Condition()
+
+    def bucket(self, api_method: str, channel: Optional[str] = None) -> TokenBucket:
+        key = (api_method, channel if api_method in PER_CHANNEL_METHODS else None)
+        with self._buckets_lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if api_method in PER_CHANNEL_METHODS:
+                    bucket = TokenBucket(POST_MESSAGE_LIMIT_PER_MINUTE * self.share, capacity=3)
+                else:
+                    limit = TIER_LIMITS_PER_MINUTE[self.method_tiers.get(api_method, DEFAULT_TIER)]
+                    bucket = TokenBucket(limit * self.share)
+                self._buckets[key] = bucket
+            return bucket
+
+    def set_share(self, share: float) -> None:
+        """Limit this process to a fraction of Slack's rate limits (e.g. 1/N of them for N processes)"""
+        with self._buckets_lock:
+            self.share = share
+            self._buckets.clear()
+
+    def is_background(self, api_method: str) -> bool:
+        return api_method in self.background_methods
+
+    def penalize(self, api_method: str, seconds: float, channel: Optional[str] = None) -> None:
+        logger.warning(f"Slack rate limited {api_method}, backing off for {seconds:.1f}s")
+        rate_limited_total.inc(method=api_method)
+        if api_method in PER_CHANNEL_METHODS and channel is None:
+            # Without the channel, pause every channel's bucket for the method rather than none of them
+            with self._buckets_lock:
+                buckets = [bucket for (method, _), bucket in self._buckets.items() if method == api_method]
+            for bucket in buckets:
+                bucket.penalize(seconds)
+            return
+        self.bucket(api_method, channel).penalize(seconds)
+
+    @contextmanager
+    def slot(self, api_method: str, channel: Optional[str] = None) -> Iterator[float]:
+        """Block until a call to api_method may be made; yields the seconds spent waiting"""
+        started = time.monotonic()
+        background = self.is_background(api_method)
+
+        if background:
+            # Let user-facing replies go first, but never starve background calls forever
+            with self._urgent_cond:
+                deadline = started + self.background_max_delay
+                while self._urgent_active > 0:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._urgent_cond.wait(remaining)
+        else:
+            with self._urgent_cond:
+                self._urgent_active += 1
+
+        try:
+            wait = self.bucket(api_method, channel).reserve()
+            if wait > 0:
+                time.sleep(wait)
+            waited = time.monotonic() - started
+            throttle_seconds.observe(waited, method=api_method)
+            yield waited
+        finally:
+            if not background:
+                with self._urgent_cond:
+                    self._urgent_active -= 1
+                    self._urgent_cond.notify_all()
+
+    @asynccontextmanager
+    async def async_slot(self, api_method: str, channel: Optional[str] = None) -> AsyncIterator[float]:
+        """Async counterpart of slot(): waits without blocking the event loop"""
+        started = time.monotonic()
+        background = self.is_background(api_method)
+
+        if background:
+            deadline = started + self.background_max_delay
+            while self._urgent_active > 0 and time.monotonic() < deadline:
+                await asyncio.sleep(ASYNC_BACKGROUND_POLL_INTERVAL)
+        else:
+            with self._urgent_cond:
+                self._urgent_active += 1
+
+        try:
+            wait = self.bucket(api_method, channel).reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            waited = time.monotonic() - started
+            throttle_seconds.observe(waited, method=api_method)
+            yield waited
+        finally:
+            if not background:
+                with self._urgent_cond:
+                    self._urgent_active -= 1
+                    self._urgent_cond.notify_all()
+
+
+def _method_from_url(url: str) -> str:
+    return urlparse(url).path.rsplit("/", 1)[-1]
+
+
+def retry_after_seconds(response: HttpResponse) -> float:
+    """Read the Retry-After header of a 429 response (defaults to one second)"""
+    for key, values in response.headers.items():
+        if key.lower() == "retry-after" and values:
+            try:
+                return float(values[0])
+            except ValueError:
+                break
+    return 1.0
+
+
+def _request_body(request: HttpRequest) -> Dict[str, Any]:
+    """Parameters sent in a request's body, whether form-encoded, JSON or (for the async client) a dict"""
+    data: Any = request.data
+    if isinstance(data, dict):
+        return data
+    if not data:
+        return {}
+    try:
+        text = data.decode("utf-8") if isinstance(data, bytes) else str(data)
+        if text.lstrip().startswith("{"):
+            body = json.loads(text)
+            return body if isinstance(body, dict) else {}
+        return {key: values[0] for key, values in parse_qs(text).items()}
+    except ValueError:
+        return {}
+
+
+def channel_from_request(request: HttpRequest) -> Optional[str]:
+    """The channel a request was for, from its body params, query string (GET calls) or body"""
+    for values in (request.body_params or {}, parse_qs(urlparse(request.url).query), _request_body(request)):
+        channel = values.get("channel")
+        if isinstance(channel, list):
+            channel = channel[0] if channel else None
+        if channel:
+            return str(channel)
+    return None
+
+
+def penalize_from_response(rate_limiter: SlackRateLimiter, request: HttpRequest, response: HttpResponse) -> None:
+    """Pause the bucket of the method (and channel) that a 429 response was for"""
+    rate_limiter.penalize(_method_from_url(request.url), retry_after_seconds(response), channel_from_request(request))
+
+
+def channel_from_kwargs(kwargs: Dict[str, Any]) -> Optional[str]:
+    for key in ("json", "data", "params"):
+        values = kwargs.get(key)
+        if isinstance(values, dict) and values.get("channel"):
+            return values["channel"]
+    return None
+
+
+class RateLimitRetryHandler(RateLimitErrorRetryHandler):
+    """Retries 429 responses after Retry-After, and pauses the method's bucket so other callers back off too"""
+
+    def __init__(self, rate_limiter: SlackRateLimiter, max_retry_count: int = MAX_RATE_LIMIT_RETRIES):
+        super().__init__(max_retry_count=max_retry_count)
+        self.rate_limiter = rate_limiter
+
+    def prepare_for_next_attempt(
+        self,
+        *,
+        state: RetryState,
+        request: HttpRequest,
+        response: Optional[HttpResponse] = None,
+        error: Optional[Exception] = None,
+    ) -> None:
+        if response is not None:
+            penalize_from_response(self.rate_limiter, request, response)
+        super().prepare_for_next_attempt(state=state, request=request, response=response, error=error)
+
+
+class RateLimitedWebClient(WebClient):
+    """WebClient that waits for a token from the shared SlackRateLimiter before every API call"""
+
+    def __init__(self, *args, rate_limiter: Optional[SlackRateLimiter] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter or SlackRateLimiter()
+        # Set by TeamClients when each workspace has its own caches (see lib.user_directory)
+        self.workspace_id: Optional[str] = None
+        self.retry_handlers = [h for h in self.retry_handlers if not isinstance(h, RateLimitErrorRetryHandler)]
+        self.retry_handlers.append(RateLimitRetryHandler(self.rate_limiter))
+
+    @classmethod
+    def from_client(cls, client: WebClient, rate_limiter: SlackRateLimiter) -> "RateLimitedWebClient":
+        """Build a rate-limited copy of a (per-request) WebClient"""
+        return cls(
+            token=client.token,
+            base_url=client.base_url,
+            timeout=client.timeout,
+            ssl=client.ssl,
+            proxy=client.proxy,
+            headers=client.headers,
+            team_id=client.default_params.get("team_id"),
+            logger=client.logger,
+            retry_handlers=list(client.retry_handlers or []),
+            rate_limiter=rate_limiter,
+        )
+
+    def api_call(self, api_method: str, **kwargs) -> Any:  # type: ignore[override]
+        with span("slack.api", method=api_method) as current:
+            with self.rate_limiter.slot(api_method, channel_from_kwargs(kwargs)) as waited:
+                if current is not None:
+                    current.set_attribute("rate_limit_wait", round(waited, 6))
+                return super().api_call(api_method, **kwargs)
+
+
+class TeamClients:
+    """
+    Rate-limited clients pooled per workspace, so requests reuse their workspace's client instead of building one.
+
+    With a rate_limiter, every workspace shares it (single-workspace apps). Without one, each workspace gets its own
+    SlackRateLimiter, since Slack's limits are per workspace, and its client carries a workspace_id so per-workspace
+    caches are kept apart too.
+    """
+
+    client_class: Any = RateLimitedWebClient
+
+    def __init__(self, rate_limiter: Optional[SlackRateLimiter] = None, max_workspaces: int = DEFAULT_MAX_POOLED_WORKSPACES):
+        self.rate_limiter = rate_limiter
+        self.max_workspaces = max_workspaces
+        self._clients: "OrderedDict[Tuple[Optional[str], Optional[str]], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def client_for(self, enterprise_id: Optional[str], team_id: Optional[str], client: Any) -> Any:
+        """
+        Return the workspace's pooled client, building it from the per-request client the first time.
+
+        The pooled client is rebuilt (keeping the workspace's rate limiter) when the request's token differs,
+        e.g. after a reinstall or token rotation.
+        """
+        key = (enterprise_id, team_id)
+        with self._lock:
+            pooled = self._clients.get(key)
+            if pooled is not None and pooled.token == client.token:
+                self._clients.move_to_end(key)
+                client_pool_lookups_total.inc(outcome="hit")
+                return pooled
+
+        rate_limiter = self.rate_limiter or (pooled.rate_limiter if pooled is not None else SlackRateLimiter())
+        pooled = self._build(client, rate_limiter)
+        if self.rate_limiter is None:
+            pooled.workspace_id = team_id or enterprise_id
+
+        with self._lock:
+            self._clients[key] = pooled
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_workspaces:
+                self._clients.popitem(last=False)
+            client_pool_workspaces.set(len(self._clients))
+        client_pool_lookups_total.inc(outcome="miss")
+        return pooled
+
+    def _build(self, client: Any, rate_limiter: SlackRateLimiter) -> Any:
+        return self.client_class.from_client(client, rate_limiter)
+
+
+def build_rate_limit_middleware(
+    rate_limiter: Optional[SlackRateLimiter], team_clients: Optional[TeamClients] = None
+) -> Callable[..., None]:
+    """
+    Build a Bolt global middleware that swaps each request's client for its workspace's rate-limited one.
+
+    Bolt creates a plain WebClient per request, so the swap has to happen per request; the rate-limited
+    clients are pooled per workspace (see TeamClients), and a None rate_limiter gives each workspace its own.
+    Assistant utilities (say, set_status, ...) capture the client when the context is
+    initialized, so they are rebuilt around the rate-limited client as well.
+    """
+    from slack_bolt.context.assistant.assistant_utilities import AssistantUtilities
+    from slack_bolt.request.payload_utils import is_assistant_event, to_event
+
+    team_clients = team_clients or TeamClients(rate_limiter)
+
+    def rate_limit_middleware(body: Dict[str, Any], context: Any, next: Callable[[], None]) -> None:
+        if context.client is not None and not isinstance(context.client, RateLimitedWebClient):
+            context["client"] = team_clients.client_for(context.enterprise_id, context.team_id, context.client)
+
+            if is_assistant_event(body):
+                assistant = AssistantUtilities(payload=to_event(body), context=context)  # type: ignore[arg-type]
+                for key in ASSISTANT_UTILITY_KEYS:
+                    context[key] = getattr(assistant, key)
+        next()
+
+    return rate_limit_middleware
@@ -3,16 +3,38 @@ slack_utils.py
 Reusable utilities for Slack message formatting, thread fetching, and markdown conversion.
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import logging
+import threading
 from markdown_to_mrkdwn import SlackMarkdownConverter
 from lib.constants import GENERIC_ERROR
+from lib.metrics import COUNT_BUCKETS, REGISTRY, time_stage
 
 logger = logging.getLogger(__name__)
 
+thread_messages = REGISTRY.histogram("slack_thread_messages", "Messages in each fetched Slack thread", buckets=COUNT_BUCKETS)
+
+# SlackMarkdownConverter keeps per-conversion state, so each thread reuses its own instance
+_converter_local = threading.local()
+
+
+def get_markdown_converter() -> SlackMarkdownConverter:
+    """
+    Get this thread's cached SlackMarkdownConverter, creating it on first use.
+    Returns:
+        SlackMarkdownConverter instance.
+    """
+    converter = getattr(_converter_local, "converter", None)
+    if converter is None:
+        converter = SlackMarkdownConverter()
+        _converter_local.converter = converter
+    return converter
+
 
 def format_slack_messages_for_openai(
-    slack_messages: Optional[List[Dict[str, Any]]], files_by_ts: Optional[Dict[str, List[Dict[str, Any]]]] = None
+    slack_messages: Optional[List[Dict[str, Any]]],
+    files_by_ts: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+    user_names: Optional[Dict[str, str]] = None,
 ) -> List[Dict[str, Any]]:
     """
     Format Slack messages into OpenAI Message format, including file attachments.
@@ -20,12 +42,15 @@ def format_slack_messages_for_openai(
     Args:
         slack_messages: List of Slack message dicts.
         files_by_ts: Dictionary mapping message timestamps to lists of processed files.
+        user_names: Optional mapping of user IDs to display names; when given, user
+            messages are prefixed with their speaker's name.
 
     Returns:
         List of OpenAI-formatted message dicts.
     """
     formatted_messages = []
     files_by_ts = files_by_ts or {}
+    user_names = user_names or {}
 
     if not slack_messages:
         logger.error("Slack thread messages are empty or None.")
@@ -35,6 +60,12 @@ def format_slack_messages_for_openai(
         role = "user" if not msg.get("bot_id") else "assistant"
         ts = msg.get("ts")
 
+        # Attribute user messages to their speaker so the model can tell people apart
+        text = msg.get("text", "")
+        speaker = user_names.get(msg.get("user", "")) if role == "user" else None
+        if speaker and text:
+            text = f"{speaker}: {text}"
+
         # Check if this message has files attached
         message_files = [] if ts is None else files_by_ts.get(ts, [])
 
@@ -46,39 +77,51 @@ def format_slack_messages_for_openai(
             content.extend(message_files)
 
             # Add text content if present
-            text = msg.get("text", "")
             if text:
                 content.append({"type": "input_text", "text": text})
 
             formatted_messages.append({"role": role, "content": content})
         else:
             # No files, just add text content as before
-            formatted_messages.append({"role": role, "content": msg.get("text", "")})
+            formatted_messages.append({"role": role, "content": text})
 
     return formatted_messages
 
 
-def fetch_slack_thread(client: Any, context: Any, payload: Dict[str, Any], say: Any) -> Optional[List[Dict[str, Any]]]:
+def get_thread_location(context: Any, payload: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
     """
-    Fetch the full thread from Slack using conversations_replies.
+    Get the channel ID and thread timestamp of the thread an event belongs to.
 
     Args:
-        client: Slack WebClient instance.
         context: Slack context object (should have thread_ts and channel_id).
         payload: Event payload dict.
-        say: Slack say function for error reporting.
 
     Returns:
-        List of messages in the thread, or None if error.
+        Tuple of (channel_id, thread_ts), either of which may be None.
     """
-    # Get thread_ts and channel_id from context or payload, ensuring they're strings
     thread_ts = getattr(context, "thread_ts", None)
     if thread_ts is None and isinstance(payload, dict):
         thread_ts = payload.get("thread_ts")
     if thread_ts is None and isinstance(payload, dict):
         thread_ts = payload.get("ts")
 
-    channel_id = getattr(context, "channel_id", None)
+    return getattr(context, "channel_id", None), thread_ts
+
+
+def fetch_slack_thread(client: Any, context: Any, payload: Dict[str, Any], say: Any) -> Optional[List[Dict[str, Any]]]:
+    """
+    Fetch the full thread from Slack using conversations_replies.
+
+    Args:
+        client: Slack WebClient instance.
+        context: Slack context object (should have thread_ts and channel_id).
+        payload: Event payload dict.
+        say: Slack say function for error reporting.
+
+    Returns:
+        List of messages in the thread, or None if error.
+    """
+    channel_id, thread_ts = get_thread_location(context, payload)
 
     if not channel_id or not thread_ts:
         error_msg = "Missing channel or thread timestamp for conversations_replies."
@@ -88,8 +131,11 @@ def fetch_slack_thread(client: Any, context: Any, payload: Dict[str, Any], say:
 
     try:
         # Use inclusive=true to ensure we get the first message in the thread
-        response = client.conversations_replies(channel=channel_id, ts=thread_ts, limit=1000, inclusive=True)
-        return response.get("messages", [])
+        with time_stage("fetch_thread"):
+            response = client.conversations_replies(channel=channel_id, ts=thread_ts, limit=1000, inclusive=True)
+        messages = response.get("messages", [])
+        thread_messages.observe(len(messages))
+        return messages
     except Exception as e:
         error_msg = f"Failed to fetch Slack thread: {e}"
         logger.exception(error_msg)
@@ -97,6 +143,42 @@ def fetch_slack_thread(client: Any, context: Any, payload: Dict[str, Any], say:
         return None
 
 
+async def fetch_slack_thread_async(
+    client: Any, context: Any, payload: Dict[str, Any], say: Any
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Async counterpart of fetch_slack_thread for AsyncWebClient and AsyncSay.
+
+    Args:
+        client: Slack AsyncWebClient instance.
+        context: Slack context object (should have thread_ts and channel_id).
+        payload: Event payload dict.
+        say: Slack async say function for error reporting.
+
+    Returns:
+        List of messages in the thread, or None if error.
+    """
+    channel_id, thread_ts = get_thread_location(context, payload)
+
+    if not channel_id or not thread_ts:
+        error_msg = "Missing channel or thread timestamp for conversations_replies."
+        logger.error(error_msg)
+        await say(GENERIC_ERROR.format(error=error_msg))
+        return None
+
+    try:
+        with time_stage("fetch_thread"):
+            response = await client.conversations_replies(channel=channel_id, ts=thread_ts, limit=1000, inclusive=True)
+        messages = response.get("messages", [])
+        thread_messages.observe(len(messages))
+        return messages
+    except Exception as e:
+        error_msg = f"Failed to fetch Slack thread: {e}"
+        logger.exception(error_msg)
+        await say(GENERIC_ERROR.format(error=e))
+        return None
+
+
 def markdown_to_mrkdwn(returned_message: str) -> str:
     """
     Convert Markdown to Slack mrkdwn format.
@@ -109,8 +191,8 @@ def markdown_to_mrkdwn(returned_message: str) -> str:
         return ""
 
     try:
-        converter = SlackMarkdownConverter()
-        return converter.convert(returned_message)
+        with time_stage("mrkdwn_convert"):
+            return get_markdown_converter().convert(returned_message)
     except Exception as e:
         error_msg = f"Markdown to mrkdwn conversion failed: {e}"
         logger.error(error_msg)
@@ -0,0 +1,192 @@
+"""
+thread_locks.py
+Per-thread FIFO queues, so replies within one Slack thread are produced in order while different threads run in parallel.
+"""
+
+import asyncio
+import collections
+import contextvars
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Tuple
+
+from lib.metrics import REGISTRY
+from lib.sharding import thread_key
+
+logger = logging.getLogger(__name__)
+
+thread_lock_wait_seconds = REGISTRY.histogram(
+    "thread_lock_wait_seconds", "Time replies waited for an earlier reply in the same thread to finish"
+)
+thread_lock_contended_total = REGISTRY.counter(
+    "thread_lock_contended_total", "Replies that had to wait for an earlier reply in the same thread"
+)
+thread_lock_keys = REGISTRY.gauge("thread_lock_keys", "Threads with a reply in progress or waiting, by lock table")
+
+
+class _QueuedCall:
+    """A call waiting for its key, with the context it was submitted from and the Future it resolves"""
+
+    __slots__ = ("future", "context", "func", "args", "kwargs", "submitted")
+
+    def __init__(self, func: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]):
+        self.future: "Future[Any]" = Future()
+        self.context = contextvars.copy_context()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.submitted = time.perf_counter()
+
+    def run(self) -> None:
+        thread_lock_wait_seconds.observe(time.perf_counter() - self.submitted)
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            self.future.set_result(self.context.run(self.func, *self.args, **self.kwargs))
+        except BaseException as e:
+            self.future.set_exception(e)
+            # KeyboardInterrupt, SystemExit and the like still stop the thread running the call
+            if not isinstance(e, Exception):
+                raise
+
+
+class KeyedQueues:
+    """
+    Table of FIFO call queues by key, for threads.
+
+    The caller that finds a key idle runs its call and then every call queued behind it for that key, on its
+    own thread; a caller that finds the key busy queues its call and returns at once, so waiting never parks a
+    thread. Calls run in the context they were submitted from. A key's entry is removed as soon as its queue
+    drains, so the table only ever holds the keys with work in flight.
+    """
+
+    def __init__(self, name: str = "thread"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[_QueuedCall]] = {}
+
+    def __len__(self) -> int:
+        return len(self._queues)
+
+    def submit(self, key: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> "Future[Any]":
+        """Run func(*args, **kwargs) after every earlier call for the same key, returning a Future of its result"""
+        call = _QueuedCall(func, args, kwargs)
+        future = call.future
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is not None:
+                thread_lock_contended_total.inc()
+                queue.append(call)
+                return future
+            queue = self._queues[key] = collections.deque()
+            thread_lock_keys.set(len(self._queues), table=self.name)
+        self._drain(key, queue, call)
+        return future
+
+    def _drain(self, key: str, queue: Deque[_QueuedCall], call: Optional[_QueuedCall]) -> None:
+        """Run call and then every call queued behind it, removing the key once its queue is empty"""
+        try:
+            while call is not None:
+                call.run()
+                call = self._next(key, queue)
+        except BaseException:
+            # The running thread is being stopped: hand the rest of the queue to a new thread, so the key
+            # doesn't stay busy forever
+            call = self._next(key, queue)
+            if call is not None:
+                threading.Thread(
+                    target=self._drain, args=(key, queue, call), name=f"{self.name}-queue-drain", daemon=True
+                ).start()
+            raise
+
+    def _next(self, key: str, queue: Deque[_QueuedCall]) -> Optional[_QueuedCall]:
+        with self._lock:
+            if queue:
+                return queue.popleft()
+            del self._queues[key]
+            thread_lock_keys.set(len(self._queues), table=self.name)
+            return None
+
+
+class AsyncKeyedLocks:
+    """
+    Table of FIFO locks by key for one event loop, with the same idle-entry removal as KeyedQueues.
+
+    Waiting here only suspends a coroutine, so callers simply await their turn.
+    """
+
+    def __init__(self, name: str = "thread_async"):
+        self.name = name
+        self._waiters: Dict[str, Deque["asyncio.Future[None]"]] = {}
+
+    def __len__(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def hold(self, key: str) -> AsyncIterator[None]:
+        """Hold the lock for key, after every earlier caller for the same key has released it"""
+        started = time.perf_counter()
+        queue = self._waiters.get(key)
+        if queue is None:
+            queue = self._waiters[key] = collections.deque()
+            thread_lock_keys.set(len(self._waiters), table=self.name)
+        turn = asyncio.get_running_loop().create_future()
+        queue.append(turn)
+        if queue[0] is turn:
+            turn.set_result(None)
+        else:
+            thread_lock_contended_total.inc()
+        try:
+            await turn
+        except BaseException:
+            # Cancelled while waiting: give up the place in line (passing the turn on if it just arrived)
+            self._leave(key, queue, turn)
+            raise
+        thread_lock_wait_seconds.observe(time.perf_counter() - started)
+        try:
+            yield
+        finally:
+            self._leave(key, queue, turn)
+
+    def _leave(self, key: str, queue: Deque["asyncio.Future[None]"], turn: "asyncio.Future[None]") -> None:
+        was_first = queue[0] is turn
+        queue.remove(turn)
+        if not queue:
+            del self._waiters[key]
+            thread_lock_keys.set(len(self._waiters), table=self.name)
+        elif was_first and not queue[0].done():
+            queue[0].set_result(None)
+
+
+# Process-wide tables used by serialized_per_thread
+THREAD_QUEUES = KeyedQueues()
+ASYNC_THREAD_LOCKS = AsyncKeyedLocks()
+
+
+def serialized_per_thread(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Decorator for handlers taking (channel_id, thread_ts, ...): calls for the same thread run one at a time,
+    in the order they started, while calls for other threads run in parallel.
+
+    Sync calls return a Future of the handler's result (or exception): a call for an idle thread runs inline
+    and drains the calls queued behind it, and a call for a busy thread returns at once, so a burst of replies
+    in one thread holds a single executor thread. Callers that need the outcome wait on the Future.
+    """
+    if asyncio.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(channel_id: str, thread_ts: str, *args: Any, **kwargs: Any) -> Any:
+            async with ASYNC_THREAD_LOCKS.hold(thread_key(channel_id, thread_ts)):
+                return await func(channel_id, thread_ts, *args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(channel_id: str, thread_ts: str, *args: Any, **kwargs: Any) -> "Future[Any]":
+        return THREAD_QUEUES.submit(thread_key(channel_id, thread_ts), func, channel_id, thread_ts, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,284 @@
+"""
+tracing.py
+Per-event trace spans, propagated with contextvars and exported as JSONL in the Chrome trace event format.
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Workers Bolt runs listeners on, as in Bolt's own default executor
+DEFAULT_LISTENER_THREADS = 5
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = ("name", "context", "parent_id", "attributes", "start_ns", "end_ns", "thread_name")
+
+    def __init__(self, name: str, context: SpanContext, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.thread_name = threading.current_thread().name
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.attributes["error"] = type(error).__name__
+        self.attributes["error_message"] = str(error)[:500]
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+
+    def to_trace_event(self) -> Dict[str, Any]:
+        """
+        Chrome trace event ("complete" event, times in microseconds) for this span.
+
+        Each trace gets its own row (tid), so concurrent spans of one reply stay together in a viewer.
+        """
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return {
+            "name": self.name,
+            "cat": "mooai",
+            "ph": "X",
+            "ts": self.start_ns // 1000,
+            "dur": (end_ns - self.start_ns) // 1000,
+            "pid": os.getpid(),
+            "tid": int(self.context.trace_id[:8], 16),
+            "args": {
+                "trace_id": self.context.trace_id,
+                "span_id": self.context.span_id,
+                "parent_id": self.parent_id,
+                "thread": self.thread_name,
+                **self.attributes,
+            },
+        }
+
+
+class JsonlSpanExporter:
+    """Append each finished span to a file, one JSON trace event per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        # Line buffered, so each span is a single append even with several processes sharing the file
+        self._file = open(path, "a", buffering=1, encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_trace_event(), default=repr, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+_current_span: "contextvars.ContextVar[Optional[SpanContext]]" = contextvars.ContextVar("mooai_current_span", default=None)
+
+# Exporter for finished spans; None (the default) disables tracing
+_exporter: Optional[JsonlSpanExporter] = None
+
+
+def configure_span_exporter(exporter: Optional[JsonlSpanExporter]) -> None:
+    """Set (or with None, clear) the exporter that receives finished spans"""
+    global _exporter
+    _exporter = exporter
+
+
+def get_span_exporter() -> Optional[JsonlSpanExporter]:
+    return _exporter
+
+
+def current_span_context() -> Optional[SpanContext]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Time the block as a span, as a child of the current span (or as the root of a new trace).
+
+    Does nothing (and yields None) unless an exporter is configured. Exceptions are recorded on
+    the span and re-raised.
+
+    Args:
+        name: Span name, e.g. "slack.api" or "agent.run".
+        **attributes: Attributes recorded with the span.
+    """
+    exporter = _exporter
+    if exporter is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    trace_id = parent.trace_id if parent else secrets.token_hex(16)
+    current = Span(name, SpanContext(trace_id, secrets.token_hex(8)), parent.span_id if parent else None, attributes)
+    token = _current_span.set(current.context)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+        try:
+            exporter.export(current)
+        except Exception as e:
+            logger.warning(f"Failed to export span {name}: {e}")
+
+
+@contextmanager
+def use_span_context(context: Optional[SpanContext]) -> Iterator[None]:
+    """Make context the parent of spans started in the block (used where contextvars can't follow, e.g. other processes)"""
+    token = _current_span.set(context)
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+
+
+def format_traceparent(context: Optional[SpanContext]) -> Optional[str]:
+    """Serialize a span context as a W3C traceparent header value"""
+    return f"00-{context.trace_id}-{context.span_id}-01" if context else None
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C traceparent header value, returning None if it is missing or malformed"""
+    parts = (value or "").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return SpanContext(parts[1], parts[2])
+
+
+def traced(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator that runs each call of a sync or async function in a span.
+
+    functools.wraps keeps the original signature visible to Bolt's argument injection.
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _event_attributes(body: Dict[str, Any]) -> Dict[str, Any]:
+    event = body.get("event") or {}
+    return {
+        "type": event.get("type") or body.get("type") or ("slash_command" if body.get("command") else "unknown"),
+        "event_id": body.get("event_id"),
+        "team_id": body.get("team_id"),
+        "channel": event.get("channel"),
+    }
+
+
+def trace_app_dispatch(app: Any) -> None:
+    """
+    Run every request an App or AsyncApp dispatches in a root "slack.event" span.
+
+    Bolt runs global middleware one after another rather than nested, so the span wraps
+    dispatch itself. Listeners started during dispatch (asyncio tasks, or threads from a
+    ContextThreadPoolExecutor) inherit the span as their parent.
+    """
+    if hasattr(app, "async_dispatch"):
+        async_dispatch = app.async_dispatch
+
+        async def traced_async_dispatch(req: Any) -> Any:
+            with span("slack.event", **_event_attributes(req.body)) as current:
+                response = await async_dispatch(req)
+                if current is not None:
+                    current.set_attribute("status", response.status)
+                return response
+
+        app.async_dispatch = traced_async_dispatch
+        return
+
+    dispatch = app.dispatch
+
+    def traced_dispatch(req: Any) -> Any:
+        with span("slack.event", **_event_attributes(req.body)) as current:
+            response = dispatch(req)
+            if current is not None:
+                current.set_attribute("status", response.status)
+            return response
+
+    app.dispatch = traced_dispatch
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that runs each task in a copy of the submitter's contextvars, so spans follow it"""
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def to_chrome_trace(jsonl_path: str, output_path: str) -> int:
+    """
+    Convert a span JSONL file into a JSON trace file for chrome://tracing or ui.perfetto.dev.
+
+    Args:
+        jsonl_path: File written by JsonlSpanExporter.
+        output_path: Where to write the {"traceEvents": [...]} document.
+
+    Returns:
+        Number of spans written.
+    """
+    with open(jsonl_path, encoding="utf-8") as source:
+        events = [json.loads(line) for line in source if line.strip()]
+    with open(output_path, "w", encoding="utf-8") as output:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, output)
+    return len(events)
+
+
+def _reset_exporter_lock_after_fork() -> None:
+    # Another thread may have held the lock at fork time; the child has no such thread
+    if _exporter is not None:
+        _exporter._lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_exporter_lock_after_fork)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m lib.tracing SPANS.jsonl TRACE.json")
+    print(f"Wrote {to_chrome_trace(sys.argv[1], sys.argv[2])} spans to {sys.argv[2]}")
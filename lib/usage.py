@@ -0,0 +1,392 @@
+"""
+usage.py
+Token usage accounting per agent run, aggregated per user, channel and workspace, with quotas checked before each run.
+"""
+
+import asyncio
+import contextvars
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from lib.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Window for the per-day token quotas, in seconds (rolling, so there is no midnight rush)
+DAY_SECONDS = 24 * 60 * 60
+# Window for the per-user request rate limit, in seconds
+MINUTE_SECONDS = 60
+# How long usage rows are kept, in seconds
+USAGE_RETENTION_SECONDS = 90 * DAY_SECONDS
+# Purge rows past retention once every this many runs
+SQLITE_PURGE_EVERY = 1000
+# How long a SQLite writer waits for another instance's lock, in seconds
+SQLITE_BUSY_TIMEOUT_SECONDS = 5.0
+# Rough characters per token, for the tokens reserved by a run in flight
+CHARS_PER_TOKEN = 4
+# Tokens reserved per run for the answer, and per image or file in the input
+RESERVED_OUTPUT_TOKENS = 1_000
+RESERVED_ATTACHMENT_TOKENS = 1_000
+
+# Columns usage can be grouped by
+SCOPE_COLUMNS = ("user_id", "channel_id", "team_id")
+
+usage_limited_total = REGISTRY.counter("usage_limited_total", "Agent runs refused because a quota was exhausted, by quota")
+
+
+class UsageScope(NamedTuple):
+    """Who an agent run is for; None fields are recorded but not limited"""
+
+    user_id: Optional[str] = None
+    channel_id: Optional[str] = None
+    team_id: Optional[str] = None
+
+
+class UsageLimits(NamedTuple):
+    """Quotas checked before each agent run; 0 disables a quota"""
+
+    user_tokens_per_day: int = 0
+    channel_tokens_per_day: int = 0
+    team_tokens_per_day: int = 0
+    user_requests_per_minute: int = 0
+
+
+class UsageTotals(NamedTuple):
+    """Summed usage of a set of agent runs"""
+
+    runs: int = 0
+    model_requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    attachment_bytes: int = 0
+
+
+class UsageLimitExceeded(Exception):
+    """Raised instead of running the agent when the scope has used up a quota"""
+
+    def __init__(self, quota: str, retry_after: float):
+        super().__init__(f"{quota} quota exhausted, retry in {retry_after:.0f}s")
+        self.quota = quota
+        self.retry_after = retry_after
+
+
+class SQLiteUsageStore:
+    """
+    One row per agent run in a SQLite file, shared by every bot instance that can reach it.
+
+    A run's row holds an estimate of its tokens (reserved_tokens) while it is in flight, which finish_run
+    replaces with what it actually used, so the quotas see concurrent runs before they finish.
+    """
+
+    def __init__(self, path: str, limits: Optional[UsageLimits] = None, retention_seconds: float = USAGE_RETENTION_SECONDS):
+        self.path = path
+        self.limits = limits or UsageLimits()
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+        self._runs = 0
+        self._runs_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS agent_usage ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, started_at REAL NOT NULL, "
+                "user_id TEXT, channel_id TEXT, team_id TEXT, "
+                "model_requests INTEGER NOT NULL DEFAULT 0, input_tokens INTEGER NOT NULL DEFAULT 0, "
+                "output_tokens INTEGER NOT NULL DEFAULT 0, cached_tokens INTEGER NOT NULL DEFAULT 0, "
+                "attachment_bytes INTEGER NOT NULL DEFAULT 0, reserved_tokens INTEGER NOT NULL DEFAULT 0, "
+                "request INTEGER NOT NULL DEFAULT 1)"
+            )
+            # Files created by earlier versions lack the newer columns
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(agent_usage)")}
+            for column, default in (("reserved_tokens", 0), ("request", 1)):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE agent_usage ADD COLUMN {column} INTEGER NOT NULL DEFAULT {default}")
+            for column in SCOPE_COLUMNS:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS agent_usage_{column} ON agent_usage ({column}, started_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads, so each thread opens its own
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _check_limits(self, conn: sqlite3.Connection, scope: UsageScope, now: float, request: bool = True) -> None:
+        limits = self.limits
+        if request and scope.user_id and limits.user_requests_per_minute:
+            row = conn.execute(
+                "SELECT COUNT(*), MIN(started_at) FROM agent_usage WHERE user_id = ? AND started_at > ? AND request = 1",
+                (scope.user_id, now - MINUTE_SECONDS),
+            ).fetchone()
+            if row[0] >= limits.user_requests_per_minute:
+                raise UsageLimitExceeded("user_requests_per_minute", row[1] + MINUTE_SECONDS - now)
+
+        token_quotas = [
+            ("user_tokens_per_day", "user_id", scope.user_id, limits.user_tokens_per_day),
+            ("channel_tokens_per_day", "channel_id", scope.channel_id, limits.channel_tokens_per_day),
+            ("team_tokens_per_day", "team_id", scope.team_id, limits.team_tokens_per_day),
+        ]
+        for quota, column, value, limit in token_quotas:
+            if not value or not limit:
+                continue
+            row = conn.execute(
+                f"SELECT SUM(input_tokens + output_tokens + reserved_tokens), MIN(started_at) FROM agent_usage "
+                f"WHERE {column} = ? AND started_at > ?",
+                (value, now - DAY_SECONDS),
+            ).fetchone()
+            if (row[0] or 0) >= limit:
+                raise UsageLimitExceeded(quota, row[1] + DAY_SECONDS - now)
+
+    def start_run(self, scope: UsageScope, attachment_bytes: int = 0, reserved_tokens: int = 0, request: bool = True) -> int:
+        """
+        Check the scope's quotas and record the start of an agent run, atomically across processes.
+
+        The quotas count the tokens reserved by runs still in flight, so a run is refused once finished and
+        in-flight runs together reach a quota. A quota can still be exceeded by however much the runs it let
+        through use beyond their reservation.
+
+        Args:
+            scope: Who the run is for
+            attachment_bytes: Size of the attachments sent to the model
+            reserved_tokens: Estimate of the tokens the run will use, counted until finish_run()
+            request: Whether the run answers a request, so counts toward the per-minute request limit
+
+        Returns:
+            ID of the run's row, for finish_run()
+
+        Raises:
+            UsageLimitExceeded: If a quota is used up; nothing is recorded
+        """
+        # Wall-clock time, since the windows have to mean the same thing in every process
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._check_limits(conn, scope, now, request)
+            cursor = conn.execute(
+                "INSERT INTO agent_usage "
+                "(started_at, user_id, channel_id, team_id, attachment_bytes, reserved_tokens, request) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (now, scope.user_id, scope.channel_id, scope.team_id, attachment_bytes, reserved_tokens, int(request)),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        with self._runs_lock:
+            self._runs += 1
+            purge = self._runs % SQLITE_PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+        return cursor.lastrowid
+
+    def finish_run(
+        self, run_id: int, model_requests: int, input_tokens: int, output_tokens: int, cached_tokens: int
+    ) -> None:
+        """Record the tokens a run used, replacing its reservation"""
+        self._connection().execute(
+            "UPDATE agent_usage SET model_requests = ?, input_tokens = ?, output_tokens = ?, cached_tokens = ?, "
+            "reserved_tokens = 0 WHERE id = ?",
+            (model_requests, input_tokens, output_tokens, cached_tokens, run_id),
+        )
+
+    def totals(self, since: float, **scope: str) -> UsageTotals:
+        """
+        Sum the usage of runs started after since (a Unix time), optionally for one user, channel or workspace.
+
+        Args:
+            since: Unix time the window starts at
+            scope: Filters by user_id, channel_id and/or team_id
+        """
+        where, params = self._where(since, scope)
+        cursor = self._connection().execute(
+            "SELECT COUNT(*), SUM(model_requests), SUM(input_tokens), SUM(output_tokens), SUM(cached_tokens), "
+            f"SUM(attachment_bytes) FROM agent_usage WHERE {where}",
+            params,
+        )
+        row = cursor.fetchone()
+        return UsageTotals(*(value or 0 for value in row))
+
+    def totals_by(self, column: str, since: float, limit: int = 20) -> List[Tuple[Optional[str], UsageTotals]]:
+        """
+        Sum usage since a Unix time per user, channel or workspace, heaviest first.
+
+        Args:
+            column: One of SCOPE_COLUMNS
+            since: Unix time the window starts at
+            limit: Maximum number of rows
+        """
+        if column not in SCOPE_COLUMNS:
+            raise ValueError(f"Can't group usage by {column!r}")
+        cursor = self._connection().execute(
+            f"SELECT {column}, COUNT(*), SUM(model_requests), SUM(input_tokens), SUM(output_tokens), "
+            f"SUM(cached_tokens), SUM(attachment_bytes) FROM agent_usage WHERE started_at > ? "
+            f"GROUP BY {column} ORDER BY SUM(input_tokens + output_tokens) DESC LIMIT ?",
+            (since, limit),
+        )
+        return [(row[0], UsageTotals(*(value or 0 for value in row[1:]))) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _where(since: float, scope: Dict[str, str]) -> Tuple[str, List[Any]]:
+        clauses, params = ["started_at > ?"], [since]
+        for column, value in scope.items():
+            if column not in SCOPE_COLUMNS:
+                raise ValueError(f"Can't filter usage by {column!r}")
+            clauses.append(f"{column} = ?")
+            params.append(value)
+        return " AND ".join(clauses), params
+
+    def purge_expired(self) -> int:
+        """Delete rows past retention; returns how many were removed"""
+        cursor = self._connection().execute(
+            "DELETE FROM agent_usage WHERE started_at <= ?", (time.time() - self.retention_seconds,)
+        )
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM agent_usage")
+
+
+# Scope the current agent run is accounted to, set by the listeners around the run
+_current_scope: "contextvars.ContextVar[UsageScope]" = contextvars.ContextVar("mooai_usage_scope", default=UsageScope())
+
+# Whether agent runs in the current context answer a request, or are background work done on its behalf
+_counts_as_request: "contextvars.ContextVar[bool]" = contextvars.ContextVar("mooai_usage_request", default=True)
+
+# Store used by run_agent_with_messages; None (the default) disables accounting and quotas
+_store: Optional[SQLiteUsageStore] = None
+
+
+def configure_usage_store(store: Optional[SQLiteUsageStore]) -> None:
+    """Set (or with None, clear) the store agent runs are accounted in"""
+    global _store
+    _store = store
+
+
+def get_usage_store() -> Optional[SQLiteUsageStore]:
+    return _store
+
+
+@contextmanager
+def usage_scope(user_id: Optional[str], channel_id: Optional[str], team_id: Optional[str]) -> Iterator[UsageScope]:
+    """Account agent runs in the block (and in jobs dispatched from it) to a user, channel and workspace"""
+    scope = UsageScope(user_id or None, channel_id or None, team_id or None)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def current_usage_scope() -> UsageScope:
+    return _current_scope.get()
+
+
+@contextmanager
+def background_usage() -> Iterator[None]:
+    """Account agent runs in the block to the current scope, but not as requests for the per-minute limit"""
+    token = _counts_as_request.set(False)
+    try:
+        yield
+    finally:
+        _counts_as_request.reset(token)
+
+
+def thread_requester(slack_messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The latest message in a thread not sent by a bot (the one being answered), or {} if there is none"""
+    for msg in reversed(slack_messages):
+        if isinstance(msg, dict) and not msg.get("bot_id"):
+            return msg
+    return {}
+
+
+def attachment_bytes_in(messages: List[Dict[str, Any]]) -> int:
+    """Size of the encoded attachments in agent input messages, as sent to the model"""
+    total = 0
+    for message in messages:
+        content = message.get("content")
+        if not isinstance(content, list):
+            continue
+        for part in content:
+            total += len(part.get("image_url") or part.get("file_data") or "")
+    return total
+
+
+def estimate_run_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Rough token estimate of an agent run on messages, reserved against the quotas while it runs"""
+    tokens = RESERVED_OUTPUT_TOKENS
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            tokens += len(content) // CHARS_PER_TOKEN
+            continue
+        for part in content or []:
+            if part.get("image_url") or part.get("file_data"):
+                tokens += RESERVED_ATTACHMENT_TOKENS
+            else:
+                tokens += len(part.get("text") or "") // CHARS_PER_TOKEN
+    return tokens
+
+
+def start_run(messages: List[Dict[str, Any]]) -> Optional[int]:
+    """
+    Check quotas for the current scope and record an agent run about to start, reserving its estimated tokens.
+
+    Returns:
+        Run ID for finish_run(), or None if no usage store is configured
+
+    Raises:
+        UsageLimitExceeded: If the current scope has used up a quota
+    """
+    if _store is None:
+        return None
+    scope = _current_scope.get()
+    try:
+        return _store.start_run(
+            scope, attachment_bytes_in(messages), estimate_run_tokens(messages), request=_counts_as_request.get()
+        )
+    except UsageLimitExceeded as e:
+        usage_limited_total.inc(quota=e.quota)
+        logger.info(f"Refused agent run for {scope}: {e}")
+        raise
+
+
+def finish_run(run_id: Optional[int], usage: Any) -> None:
+    """
+    Record the token usage an agent run reports (an Agents SDK Usage) against its run, settling its reservation.
+
+    A run that failed passes None, which releases the reservation without recording any tokens.
+    """
+    if _store is None or run_id is None:
+        return
+    if usage is None:
+        requests = input_tokens = output_tokens = cached_tokens = 0
+    else:
+        requests, input_tokens, output_tokens = usage.requests, usage.input_tokens, usage.output_tokens
+        # Newer Agents SDK versions report cached input tokens; older ones only the totals
+        cached_tokens = getattr(getattr(usage, "input_tokens_details", None), "cached_tokens", 0) or 0
+    try:
+        _store.finish_run(run_id, requests, input_tokens, output_tokens, cached_tokens)
+    except Exception as e:
+        logger.exception(f"Failed to record usage of agent run {run_id}: {e}")
+
+
+async def start_run_async(messages: List[Dict[str, Any]]) -> Optional[int]:
+    """Async counterpart of start_run; the SQLite accounting blocks, so it runs off the event loop"""
+    if _store is None:
+        return None
+    return await asyncio.to_thread(start_run, messages)
+
+
+async def finish_run_async(run_id: Optional[int], usage: Any) -> None:
+    """Async counterpart of finish_run"""
+    if _store is None or run_id is None:
+        return
+    await asyncio.to_thread(finish_run, run_id, usage)
@@ -0,0 +1,329 @@
+"""
+user_directory.py
+TTL-cached Slack user display names, so thread messages can be attributed to speakers cheaply.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# How long a resolved name stays valid, in seconds
+USER_CACHE_TTL_SECONDS = 6 * 60 * 60
+# Upper bound on cached users (oldest entries are evicted first)
+USER_CACHE_MAX_ENTRIES = 50_000
+# Page size for users.list when warming the cache
+USERS_LIST_PAGE_SIZE = 200
+# Refresh the whole directory in the background when a lookup misses more users than this
+WARM_ON_MISSES = 20
+# Least time between background refreshes of one directory, in seconds (users.list is tier 2: 20 calls/min)
+WARM_MIN_INTERVAL_SECONDS = 30 * 60
+# users.info calls in flight at once when resolving missing users (users.info is tier 4: 100+ calls/min)
+USERS_INFO_BATCH_SIZE = 10
+# Workspaces with their own directory in multi-workspace apps (least recently used ones are dropped first)
+MAX_WORKSPACE_DIRECTORIES = 200
+
+
+def display_name(user: Dict[str, Any]) -> str:
+    """
+    Pick the best human-readable name for a Slack user object.
+
+    Args:
+        user: User dict from users.info, users.list or a user_change event.
+
+    Returns:
+        Display name, real name, username or user ID (first non-empty).
+    """
+    profile = user.get("profile") or {}
+    return (
+        profile.get("display_name")
+        or profile.get("real_name")
+        or user.get("real_name")
+        or user.get("name")
+        or user.get("id", "unknown")
+    )
+
+
+class UserDirectory:
+    """
+    Process-wide cache of user ID to display name, warmed from users.list.
+
+    Lookups only ever call users.info for the users they miss; paging through users.list takes minutes in a
+    large workspace, so it only runs at startup or in the background, one warm at a time per directory.
+    """
+
+    def __init__(self, ttl_seconds: float = USER_CACHE_TTL_SECONDS, max_entries: int = USER_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._warming = False
+        self._warm_started = float("-inf")
+        self._warm_task: "Optional[asyncio.Future[int]]" = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str) -> Optional[str]:
+        """Return the cached name for user_id, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            name, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            return name
+
+    def put(self, user_id: str, name: str) -> None:
+        with self._lock:
+            self._entries[user_id] = (name, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def update_from_user(self, user: Dict[str, Any]) -> None:
+        """Refresh a user's entry from a full user object (e.g. a user_change event)"""
+        user_id = user.get("id")
+        if user_id:
+            self.put(user_id, display_name(user))
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _add_page(self, response: Any) -> Tuple[int, Optional[str]]:
+        """Cache one users.list page; returns (users cached, next cursor)"""
+        members = response.get("members", [])
+        for user in members:
+            self.update_from_user(user)
+        return len(members), (response.get("response_metadata") or {}).get("next_cursor") or None
+
+    def _start_warm(self, min_interval: float = 0.0) -> bool:
+        """Claim the directory's single warm, unless one is running or started less than min_interval ago"""
+        with self._lock:
+            if self._warming or time.monotonic() - self._warm_started < min_interval:
+                return False
+            self._warming = True
+            self._warm_started = time.monotonic()
+            return True
+
+    def _finish_warm(self, count: int) -> int:
+        with self._lock:
+            self._warming = False
+        logger.info(f"User directory warmed with {count} users")
+        return count
+
+    def _warm_pages(self, client: Any) -> int:
+        count = 0
+        cursor = None
+        try:
+            while True:
+                added, cursor = self._add_page(client.users_list(limit=USERS_LIST_PAGE_SIZE, cursor=cursor))
+                count += added
+                if not cursor:
+                    break
+        except Exception as e:
+            logger.exception(f"Failed to warm user directory: {e}")
+        return self._finish_warm(count)
+
+    async def _warm_pages_async(self, client: Any) -> int:
+        count = 0
+        cursor = None
+        try:
+            while True:
+                added, cursor = self._add_page(await client.users_list(limit=USERS_LIST_PAGE_SIZE, cursor=cursor))
+                count += added
+                if not cursor:
+                    break
+        except Exception as e:
+            logger.exception(f"Failed to warm user directory: {e}")
+        return self._finish_warm(count)
+
+    def warm(self, client: Any) -> int:
+        """
+        Load every user in the workspace from paginated users.list calls.
+
+        Args:
+            client: Slack WebClient instance.
+
+        Returns:
+            Number of users cached, or 0 if another warm of this directory is already running.
+        """
+        # Concurrent callers would fetch the same pages, so only one warm runs at a time
+        if not self._start_warm():
+            return 0
+        return self._warm_pages(client)
+
+    async def warm_async(self, client: Any) -> int:
+        """Async counterpart of warm() for AsyncWebClient; concurrent callers share one warm"""
+        if self._warm_task is None or self._warm_task.done():
+            if not self._start_warm():
+                return 0
+            self._warm_task = asyncio.ensure_future(self._warm_pages_async(client))
+        return await asyncio.shield(self._warm_task)
+
+    def refresh_in_background(self, client: Any, min_interval: float = 0.0) -> bool:
+        """
+        Warm the directory on a daemon thread, unless a warm is running or started less than min_interval ago.
+
+        Returns:
+            Whether a warm was started.
+        """
+        if not self._start_warm(min_interval):
+            return False
+        threading.Thread(target=self._warm_pages, args=(client,), name="user-directory-warm", daemon=True).start()
+        return True
+
+    def refresh_in_background_async(self, client: Any, min_interval: float = 0.0) -> bool:
+        """Async counterpart of refresh_in_background(), warming on the running event loop"""
+        if not self._start_warm(min_interval):
+            return False
+        self._warm_task = asyncio.ensure_future(self._warm_pages_async(client))
+        return True
+
+    def _lookup(self, user_ids: Iterable[str], names: Dict[str, str]) -> List[str]:
+        """Fill names from the cache and return the IDs that are missing"""
+        missing: List[str] = []
+        for user_id in dict.fromkeys(uid for uid in user_ids if uid):
+            name = self.get(user_id)
+            if name is None:
+                missing.append(user_id)
+            else:
+                names[user_id] = name
+        return missing
+
+    def _add_user_info(self, user_id: str, response: Any, names: Dict[str, str]) -> None:
+        if isinstance(response, BaseException):
+            logger.warning(f"Failed to resolve user {user_id}: {response}")
+            return
+        name = display_name(response.get("user") or {"id": user_id})
+        self.put(user_id, name)
+        names[user_id] = name
+
+    def resolve(self, client: Any, user_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        Resolve user IDs to display names, fetching only the ones not already cached.
+
+        Missing users are fetched with users.info, USERS_INFO_BATCH_SIZE at a time; when more than WARM_ON_MISSES
+        are missing, the whole directory is also refreshed in the background for later lookups.
+
+        Args:
+            client: Slack WebClient instance.
+            user_ids: User IDs to resolve (duplicates are fine).
+
+        Returns:
+            Dictionary mapping each resolvable user ID to its display name.
+        """
+        names: Dict[str, str] = {}
+        missing = self._lookup(user_ids, names)
+
+        if len(missing) > WARM_ON_MISSES:
+            self.refresh_in_background(client, WARM_MIN_INTERVAL_SECONDS)
+
+        def fetch(user_id: str) -> Any:
+            try:
+                return client.users_info(user=user_id)
+            except Exception as e:
+                return e
+
+        if len(missing) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(missing), USERS_INFO_BATCH_SIZE)) as executor:
+                responses = list(executor.map(fetch, missing))
+        else:
+            responses = [fetch(user_id) for user_id in missing]
+        for user_id, response in zip(missing, responses):
+            self._add_user_info(user_id, response, names)
+
+        return names
+
+    async def resolve_async(self, client: Any, user_ids: Iterable[str]) -> Dict[str, str]:
+        """Async counterpart of resolve() for AsyncWebClient"""
+        names: Dict[str, str] = {}
+        missing = self._lookup(user_ids, names)
+
+        if len(missing) > WARM_ON_MISSES:
+            self.refresh_in_background_async(client, WARM_MIN_INTERVAL_SECONDS)
+
+        while missing:
+            batch, missing = missing[:USERS_INFO_BATCH_SIZE], missing[USERS_INFO_BATCH_SIZE:]
+            responses = await asyncio.gather(*(client.users_info(user=uid) for uid in batch), return_exceptions=True)
+            for user_id, response in zip(batch, responses):
+                self._add_user_info(user_id, response, names)
+
+        return names
+
+
+class WorkspaceDirectories:
+    """
+    One UserDirectory per workspace, for apps installed in several.
+
+    Each workspace's warm-up and entry limit are its own, so a large workspace can't evict another's users,
+    and a new workspace's directory is filled by its lookups and a background refresh.
+    """
+
+    def __init__(self, max_workspaces: int = MAX_WORKSPACE_DIRECTORIES):
+        self.max_workspaces = max_workspaces
+        self._directories: "OrderedDict[str, UserDirectory]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._directories)
+
+    def get(self, workspace_id: str) -> UserDirectory:
+        with self._lock:
+            directory = self._directories.get(workspace_id)
+            if directory is None:
+                directory = self._directories[workspace_id] = UserDirectory()
+                while len(self._directories) > self.max_workspaces:
+                    self._directories.popitem(last=False)
+            self._directories.move_to_end(workspace_id)
+            return directory
+
+
+# Process-wide directory shared by all listeners of a single-workspace app
+USER_DIRECTORY = UserDirectory()
+# Per-workspace directories of a multi-workspace (OAuth) app
+WORKSPACE_DIRECTORIES = WorkspaceDirectories()
+
+
+def user_directory_for(client: Any) -> UserDirectory:
+    """
+    The directory for the workspace a client belongs to.
+
+    Clients pooled per workspace (see lib.slack_client.TeamClients) carry a workspace_id; any other client,
+    including every client of a single-workspace app, uses the process-wide USER_DIRECTORY.
+    """
+    workspace_id = getattr(client, "workspace_id", None)
+    return USER_DIRECTORY if not isinstance(workspace_id, str) else WORKSPACE_DIRECTORIES.get(workspace_id)
+
+
+def resolve_user_names(client: Any, slack_messages: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Resolve the display names of every human speaker in a thread.
+
+    Args:
+        client: Slack WebClient instance.
+        slack_messages: List of Slack message dicts.
+
+    Returns:
+        Dictionary mapping user IDs to display names.
+    """
+    directory = user_directory_for(client)
+    return directory.resolve(client, (msg.get("user") for msg in slack_messages if not msg.get("bot_id")))
+
+
+async def resolve_user_names_async(client: Any, slack_messages: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Async counterpart of resolve_user_names for AsyncWebClient"""
+    directory = user_directory_for(client)
+    return await directory.resolve_async(client, (msg.get("user") for msg in slack_messages if not msg.get("bot_id")))
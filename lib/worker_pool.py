@@ -0,0 +1,258 @@
+"""
+worker_pool.py
+Bounded background worker pool so event handlers can return immediately and run agent work later.
+"""
+
+import contextvars
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from lib.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# What to do with a new job when the queue is full
+OVERFLOW_REJECT = "reject"  # refuse the new job
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # refuse the oldest queued job and queue the new one
+OVERFLOW_CALLER_RUNS = "caller_runs"  # run the new job on the submitting thread
+OVERFLOW_POLICIES = (OVERFLOW_REJECT, OVERFLOW_DROP_OLDEST, OVERFLOW_CALLER_RUNS)
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_QUEUE_SIZE = 100
+# Longest shutdown() waits for the queued jobs to run by default, in seconds
+DEFAULT_SHUTDOWN_TIMEOUT_SECONDS = 30.0
+
+job_queue_seconds = REGISTRY.histogram("worker_job_queue_seconds", "Time jobs spend queued before a worker starts them")
+job_run_seconds = REGISTRY.histogram("worker_job_run_seconds", "Time workers spend running jobs")
+jobs_total = REGISTRY.counter("worker_jobs_total", "Jobs handled by the worker pool, by outcome")
+queue_depth = REGISTRY.gauge("worker_queue_depth", "Jobs waiting in the worker pool queue")
+
+
+class Job(NamedTuple):
+    name: str
+    func: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    on_rejected: Optional[Callable[[], Any]]
+    enqueued_at: float
+    # Submitter's contextvars (e.g. the current trace span), so the job runs as if on the submitting thread
+    context: contextvars.Context
+
+
+class WorkerPool:
+    """Fixed number of worker threads draining a bounded FIFO queue"""
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        overflow: str = OVERFLOW_REJECT,
+        name: str = "mooai-worker",
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r} (expected one of {', '.join(OVERFLOW_POLICIES)})")
+        self.size = size
+        self.overflow = overflow
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=queue_size)
+        self._submit_lock = threading.Lock()
+        self._closed = False
+        self._threads: List[threading.Thread] = []
+        for i in range(size):
+            thread = threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        *args: Any,
+        on_rejected: Optional[Callable[[], Any]] = None,
+        **kwargs: Any,
+    ) -> bool:
+        """
+        Queue func(*args, **kwargs) to run on a worker thread.
+
+        Args:
+            name: Job name used in logs and metrics.
+            func: Callable to run.
+            on_rejected: Called (on the submitting thread) if this job is refused by the overflow policy or
+                because the pool has shut down.
+
+        Returns:
+            True if the job was queued or run, False if it was rejected.
+        """
+        job = Job(name, func, args, kwargs, on_rejected, time.monotonic(), contextvars.copy_context())
+        dropped: Optional[Job] = None
+        with self._submit_lock:
+            closed = self._closed
+            if not closed:
+                try:
+                    self._queue.put_nowait(job)
+                    queue_depth.set(self._queue.qsize())
+                    return True
+                except queue.Full:
+                    pass
+
+                if self.overflow == OVERFLOW_DROP_OLDEST:
+                    try:
+                        dropped = self._queue.get_nowait()
+                    except queue.Empty:
+                        pass
+                    self._queue.put_nowait(job)
+
+        if closed:
+            self._reject(job, "rejected", "Worker pool shut down")
+            return False
+
+        if self.overflow == OVERFLOW_DROP_OLDEST:
+            # The dropped job's rejection handler may be slow (e.g. posting to Slack), so it runs outside the lock
+            if dropped is not None:
+                self._reject(dropped, "dropped")
+            return True
+
+        if self.overflow == OVERFLOW_CALLER_RUNS:
+            logger.warning(f"Worker pool full, running {name} on the caller's thread")
+            self._run(job)
+            return True
+
+        self._reject(job, "rejected")
+        return False
+
+    def _reject(self, job: Job, outcome: str, reason: str = "Worker pool full") -> None:
+        logger.warning(f"{reason}, {outcome} job {job.name}")
+        jobs_total.inc(job=job.name, outcome=outcome)
+        if job.on_rejected is not None:
+            try:
+                job.on_rejected()
+            except Exception as e:
+                logger.exception(f"Rejection handler for {job.name} failed: {e}")
+
+    def _run(self, job: Job) -> None:
+        started = time.monotonic()
+        job_queue_seconds.observe(started - job.enqueued_at, job=job.name)
+        try:
+            result = job.context.run(job.func, *job.args, **job.kwargs)
+        except Exception as e:
+            self._finish(job, started, e)
+            return
+        if isinstance(result, Future):
+            # A job queued behind earlier work (see lib.thread_locks) finishes when its Future resolves
+            result.add_done_callback(lambda future: self._finish(job, started, _future_error(future)))
+        else:
+            self._finish(job, started, None)
+
+    def _finish(self, job: Job, started: float, error: Optional[BaseException]) -> None:
+        outcome = "ok" if error is None else "error"
+        if error is not None:
+            logger.error(f"Background job {job.name} failed: {error}", exc_info=error)
+        elapsed = time.monotonic() - started
+        job_run_seconds.observe(elapsed, job=job.name)
+        jobs_total.inc(job=job.name, outcome=outcome)
+        logger.debug(f"Job {job.name} finished in {elapsed:.3f}s ({outcome})")
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            queue_depth.set(self._queue.qsize())
+            if job is None:
+                break
+            self._run(job)
+
+    def shutdown(self, wait: bool = True, timeout: Optional[float] = DEFAULT_SHUTDOWN_TIMEOUT_SECONDS) -> int:
+        """
+        Stop taking jobs and stop the workers after the jobs already queued have run.
+
+        Args:
+            wait: Wait for the queued jobs to run.
+            timeout: Longest to wait, in seconds (None waits for every queued job). Jobs still queued
+                after that are dropped and logged.
+
+        Returns:
+            Number of queued jobs dropped.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._submit_lock:
+            if self._closed:
+                return 0
+            self._closed = True
+        # The stop markers queue behind the pending jobs, so the workers run those first
+        for _ in self._threads:
+            try:
+                self._queue.put(None, timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        if not wait:
+            return 0
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return self._drop_queued()
+
+    def _drop_queued(self) -> int:
+        dropped = 0
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                dropped += 1
+                logger.warning(f"Worker pool shut down before running job {job.name}, dropping it")
+                jobs_total.inc(job=job.name, outcome="dropped_at_shutdown")
+        queue_depth.set(0)
+        # Workers still busy with a job stop once they finish it
+        for thread in self._threads:
+            if thread.is_alive():
+                try:
+                    self._queue.put_nowait(None)
+                except queue.Full:
+                    break
+        if dropped:
+            logger.error(f"Worker pool shut down with {dropped} queued jobs not run")
+        return dropped
+
+
+def _future_error(future: "Future[Any]") -> Optional[BaseException]:
+    return None if future.cancelled() else future.exception()
+
+
+def _log_inline_error(name: str, error: Optional[BaseException]) -> None:
+    if error is not None:
+        logger.error(f"Job {name} failed: {error}", exc_info=error)
+
+
+# Pool used by dispatch(); None means jobs run inline on the caller's thread
+_pool: Optional[WorkerPool] = None
+
+
+def configure_worker_pool(pool: Optional[WorkerPool]) -> None:
+    """Set (or with None, clear) the pool used by dispatch()"""
+    global _pool
+    _pool = pool
+
+
+def dispatch(
+    name: str, func: Callable[..., Any], *args: Any, on_rejected: Optional[Callable[[], Any]] = None, **kwargs: Any
+) -> bool:
+    """
+    Run a job on the configured worker pool, or inline if no pool is configured.
+
+    Args:
+        name: Job name used in logs and metrics.
+        func: Callable to run.
+        on_rejected: Called if the pool refuses the job.
+
+    Returns:
+        True if the job was run or queued, False if it was rejected.
+    """
+    pool = _pool
+    if pool is None:
+        result = func(*args, **kwargs)
+        if isinstance(result, Future):
+            result.add_done_callback(lambda future: _log_inline_error(name, _future_error(future)))
+        return True
+    return pool.submit(name, func, *args, on_rejected=on_rejected, **kwargs)
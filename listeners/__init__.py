@@ -1,7 +1,8 @@
 import logging
 from .assistant import assistant, respond_to_mention, respond_to_thread_message
-from .commands import echo_command
+from .commands import ask_command, echo_command
 from .home_tab import home_opened
+from .users import user_changed
 
 # Get logger
 logger = logging.getLogger("mooai.listeners")
@@ -18,6 +19,10 @@ def register_listeners(app):
     logger.debug("Registering /echo command handler")
     app.command("/echo")(echo_command)
 
+    # Register the /ask command handler, which answers via response_url without fetching a thread
+    logger.debug("Registering /ask command handler")
+    app.command("/ask")(ask_command)
+
     # Register the app_mention event handler
     logger.debug("Registering app_mention event handler")
     app.event("app_mention")(respond_to_mention)
@@ -26,6 +31,10 @@ def register_listeners(app):
     logger.debug("Registering message event handler for thread messages")
     app.event("message")(respond_to_thread_message)
 
+    # Register the user_change event handler to keep cached display names fresh
+    logger.debug("Registering user_change event handler")
+    app.event("user_change")(user_changed)
+
     # Register the assistant middleware
     logger.debug("Registering assistant middleware")
     app.assistant(assistant)
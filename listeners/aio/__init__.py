@@ -0,0 +1,43 @@
+import logging
+from .assistant import assistant, respond_to_mention, respond_to_thread_message
+from .commands import ask_command, echo_command
+from .home_tab import home_opened
+from .users import user_changed
+
+# Get logger
+logger = logging.getLogger("mooai.listeners.aio")
+
+
+def register_listeners(app):
+    """Register the async listeners on an AsyncApp (mirrors listeners.register_listeners)."""
+    logger.debug("Registering async listeners...")
+
+    # Register the home tab event listener
+    logger.debug("Registering app_home_opened event handler")
+    app.event("app_home_opened")(home_opened)
+
+    # Register slash commands
+    logger.debug("Registering /echo command handler")
+    app.command("/echo")(echo_command)
+
+    # Register the /ask command handler, which answers via response_url without fetching a thread
+    logger.debug("Registering /ask command handler")
+    app.command("/ask")(ask_command)
+
+    # Register the app_mention event handler
+    logger.debug("Registering app_mention event handler")
+    app.event("app_mention")(respond_to_mention)
+
+    # Register the message event handler for thread messages
+    logger.debug("Registering message event handler for thread messages")
+    app.event("message")(respond_to_thread_message)
+
+    # Register the user_change event handler to keep cached display names fresh
+    logger.debug("Registering user_change event handler")
+    app.event("user_change")(user_changed)
+
+    # Register the assistant middleware
+    logger.debug("Registering assistant middleware")
+    app.assistant(assistant)
+
+    logger.debug("All async listeners registered successfully")
@@ -0,0 +1,285 @@
+import asyncio
+import logging
+from typing import cast, List, Dict, Union
+
+from slack_bolt.async_app import (
+    AsyncAssistant,
+    AsyncBoltContext,
+    AsyncSay,
+    AsyncSetStatus,
+    AsyncSetSuggestedPrompts,
+    AsyncSetTitle,
+)
+from slack_sdk.web.async_client import AsyncWebClient
+
+from lib.agent import run_agent_with_messages_safe
+from lib.attachment_budget import holds_attachment_budget
+from lib.constants import (
+    ASSISTANT_GREETING,
+    SUGGESTED_PROMPTS,
+    GENERIC_ERROR,
+    THREAD_START_ERROR_LOG,
+    USER_MESSAGE_ERROR_LOG,
+    THINKING_MESSAGE,
+    MENTION_GREETING,
+    FOLLOWUP_PROMPTS_TITLE,
+)
+from lib.dedupe import claim_message_async
+from lib.file_utils import extract_files_from_slack_messages_async
+from lib.metrics import time_stage
+from lib.models import StructuredResponse
+from lib.prompt_cache import cached_first_answer_async
+from lib.renderer import MESSAGE_TEXT_LIMIT, render_mrkdwn_messages, split_mrkdwn
+from lib.slack_utils import (
+    fetch_slack_thread_async,
+    format_slack_messages_for_openai,
+    markdown_to_mrkdwn,
+    thread_messages,
+)
+from lib.thread_locks import serialized_per_thread
+from lib.tracing import traced
+from lib.usage import thread_requester, usage_scope
+from lib.user_directory import resolve_user_names_async
+
+# Async counterpart of listeners.assistant: every Slack call and the agent run are awaited,
+# so one event loop can serve many conversations without a thread per handler.
+assistant = AsyncAssistant()
+
+
+# Handler for when a user starts a new assistant thread in Slack.
+# Presents the user with a set of suggested prompts to help them get started.
+@assistant.thread_started
+async def start_assistant_thread(
+    say: AsyncSay,
+    set_suggested_prompts: AsyncSetSuggestedPrompts,
+    logger: logging.Logger,
+):
+    try:
+        await say(ASSISTANT_GREETING)
+        await set_suggested_prompts(prompts=SUGGESTED_PROMPTS)
+    except Exception as e:
+        error_msg = THREAD_START_ERROR_LOG.format(error=e)
+        logger.exception(error_msg)
+        await say(GENERIC_ERROR.format(error=e))
+
+
+# Handler for when a user sends a message in an assistant thread.
+@assistant.user_message
+@traced("respond_in_assistant_thread")
+@holds_attachment_budget
+async def respond_in_assistant_thread(
+    payload: dict,
+    logger: logging.Logger,
+    context: AsyncBoltContext,
+    set_status: AsyncSetStatus,
+    client: AsyncWebClient,
+    say: AsyncSay,
+    set_title: AsyncSetTitle,
+    set_suggested_prompts: AsyncSetSuggestedPrompts,
+):
+    try:
+        await set_status(THINKING_MESSAGE)  # Show "is typing..." in Slack thread
+
+        # Fetch the full thread from Slack using utility
+        slack_messages = await fetch_slack_thread_async(client, context, payload, say)
+        if not slack_messages:
+            # Error already logged and displayed by fetch_slack_thread_async
+            return
+
+        # A new thread that starts with a suggested prompt is answered from the prewarmed cache
+        response = await cached_first_answer_async(slack_messages)
+        if response is None:
+            # Process any file attachments in the thread
+            files_by_ts = await extract_files_from_slack_messages_async(client, slack_messages)
+
+            # Format Slack messages into OpenAI Message format using utility
+            formatted_messages = format_slack_messages_for_openai(slack_messages, files_by_ts)
+            if not formatted_messages:
+                error_msg = "No messages found in thread."
+                logger.error(error_msg)
+                await say(GENERIC_ERROR.format(error=error_msg))
+                return
+
+            # Await the agent directly on the event loop, accounted to the requester so their quotas apply
+            with usage_scope(payload.get("user"), payload.get("channel"), context.team_id):
+                response = await run_agent_with_messages_safe(formatted_messages, use_structured_output=True)
+
+        if isinstance(response, StructuredResponse):
+            # Update thread title if provided
+            if response.thread_title:
+                await set_title(response.thread_title)
+
+            # Convert the main response and split it into messages within Slack's Block Kit limits
+            mrkdwn_response = markdown_to_mrkdwn(response.response)
+            with time_stage("post_reply"):
+                for message in render_mrkdwn_messages(mrkdwn_response, title=response.message_title):
+                    await say(text=message.text, blocks=message.blocks)
+
+            # Set follow-up prompts if provided
+            if response.followups and len(response.followups) > 0:
+                formatted_prompts = cast(List[Union[str, Dict[str, str]]], response.get_formatted_prompts())
+                await set_suggested_prompts(prompts=formatted_prompts, title=FOLLOWUP_PROMPTS_TITLE)
+
+        else:
+            # Fallback to plain text response if not structured
+            mrkdwn_message = markdown_to_mrkdwn(response)
+            with time_stage("post_reply"):
+                for chunk in split_mrkdwn(mrkdwn_message, MESSAGE_TEXT_LIMIT):
+                    await say(chunk)
+
+    except Exception as e:
+        error_msg = USER_MESSAGE_ERROR_LOG.format(error=e)
+        logger.exception(error_msg)
+        await say(GENERIC_ERROR.format(error=e))
+
+
+# Handler for when the bot is mentioned in a channel.
+# Creates a new thread with the bot's response.
+@traced("respond_to_mention")
+async def respond_to_mention(
+    body: dict,
+    logger: logging.Logger,
+    client: AsyncWebClient,
+):
+    """Handle mentions in channels by creating a thread with the bot's response.
+
+    Args:
+        body: The event body containing the mention details
+        logger: Logger instance for error reporting
+        client: Slack AsyncWebClient instance
+    """
+    try:
+        event = body.get("event", {})
+        message_text = event.get("text", "")
+        channel_id = event.get("channel")
+        ts = event.get("ts")
+        thread_ts = event.get("thread_ts", ts)  # Use message ts as thread_ts if not in a thread
+
+        if not message_text or not channel_id or not ts:
+            logger.error("Missing required fields in mention payload")
+            return
+
+        # Skip if this message was already answered via its message event or an earlier delivery
+        if not await claim_message_async(event):
+            return
+
+        # If this is a new message (not in a thread), create a thread by responding
+        if thread_ts == ts:
+            thread_response = await client.chat_postMessage(channel=channel_id, thread_ts=ts, text=MENTION_GREETING)
+
+            if not thread_response or not thread_response.get("ok", False):
+                logger.error(f"Failed to create thread: {thread_response.get('error', 'Unknown error')}")
+                return
+
+        await process_thread_and_respond(channel_id, thread_ts, client, logger)
+
+    except Exception as e:
+        logger.exception(f"Failed to handle mention: {e}")
+
+
+# Handler for messages in threads where the bot has been mentioned
+@traced("respond_to_thread_message")
+async def respond_to_thread_message(
+    body: dict,
+    logger: logging.Logger,
+    client: AsyncWebClient,
+):
+    """Handle messages in threads where the bot has been previously mentioned.
+    Only responds if the message contains a direct mention to the bot.
+
+    Args:
+        body: The event body containing the message details
+        logger: Logger instance for error reporting
+        client: Slack AsyncWebClient instance
+    """
+    try:
+        event = body.get("event", {})
+        message_text = event.get("text", "")
+        channel_id = event.get("channel")
+        ts = event.get("ts")
+        thread_ts = event.get("thread_ts")
+        bot_id = body.get("authorizations", [{}])[0].get("user_id")
+
+        # Skip if not in a thread or missing required fields
+        if not thread_ts or not message_text or not channel_id or not ts or not bot_id:
+            return
+
+        # Skip if this is a bot message (to avoid loops)
+        if event.get("bot_id") or event.get("user") == bot_id:
+            return
+
+        # Check if the message mentions the bot
+        if f"<@{bot_id}>" not in message_text:
+            return
+
+        # Skip if this message was already answered via its app_mention event or an earlier delivery
+        if not await claim_message_async(event):
+            return
+
+        await process_thread_and_respond(channel_id, thread_ts, client, logger)
+
+    except Exception as e:
+        logger.exception(f"Failed to handle thread message: {e}")
+
+
+# Helper function to process a thread and generate a response
+@traced("process_thread_and_respond")
+@serialized_per_thread
+@holds_attachment_budget
+async def process_thread_and_respond(channel_id: str, thread_ts: str, client: AsyncWebClient, logger: logging.Logger):
+    """Process all messages in a thread and generate a response.
+
+    Args:
+        channel_id: The Slack channel ID
+        thread_ts: The thread timestamp
+        client: Slack AsyncWebClient instance
+        logger: Logger instance for error reporting
+    """
+    try:
+        with time_stage("fetch_thread"):
+            response = await client.conversations_replies(channel=channel_id, ts=thread_ts, limit=1000, inclusive=True)
+        slack_messages = response.get("messages", [])
+        thread_messages.observe(len(slack_messages))
+
+        if not slack_messages:
+            logger.error("No messages found in thread")
+            return
+
+        # Attachments and speaker names are independent lookups, so fetch them concurrently
+        files_by_ts, user_names = await asyncio.gather(
+            extract_files_from_slack_messages_async(client, slack_messages),
+            resolve_user_names_async(client, slack_messages),
+        )
+
+        formatted_messages = format_slack_messages_for_openai(slack_messages, files_by_ts, user_names=user_names)
+        if not formatted_messages:
+            error_msg = "No messages found in thread."
+            logger.error(error_msg)
+            await client.chat_postMessage(
+                channel=channel_id, thread_ts=thread_ts, text=GENERIC_ERROR.format(error=error_msg)
+            )
+            return
+
+        # Account the run to the person being answered, so their quotas apply
+        requester = thread_requester(slack_messages)
+        with usage_scope(requester.get("user"), channel_id, requester.get("team")):
+            response = await run_agent_with_messages_safe(formatted_messages, use_structured_output=True)
+
+        if isinstance(response, StructuredResponse):
+            mrkdwn_response = markdown_to_mrkdwn(response.response)
+            with time_stage("post_reply"):
+                for message in render_mrkdwn_messages(mrkdwn_response, title=response.message_title, title_divider=True):
+                    await client.chat_postMessage(
+                        channel=channel_id, thread_ts=thread_ts, text=message.text, blocks=message.blocks
+                    )
+        else:
+            mrkdwn_message = markdown_to_mrkdwn(response)
+            with time_stage("post_reply"):
+                for chunk in split_mrkdwn(mrkdwn_message, MESSAGE_TEXT_LIMIT):
+                    await client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=chunk)
+
+    except Exception as thread_error:
+        logger.exception(f"Error processing thread: {thread_error}")
+        await client.chat_postMessage(
+            channel=channel_id, thread_ts=thread_ts, text=GENERIC_ERROR.format(error=thread_error)
+        )
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from slack_bolt.async_app import AsyncAck, AsyncRespond
+from typing import Dict, Any
+
+from lib.agent import run_agent_with_messages_safe
+from lib.constants import ASK_ACK_MESSAGE, ASK_COMMAND_ERROR_LOG, ASK_USAGE, ASK_WORKING_MESSAGE, GENERIC_ERROR
+from lib.metrics import time_stage
+from lib.tracing import traced
+from lib.usage import usage_scope
+from listeners.commands import ASK_WORKING_DELAY_SECONDS, parse_ask_text, render_ask_answer
+
+
+async def echo_command(command: Dict[str, Any], ack: AsyncAck, respond: AsyncRespond, logger: logging.Logger) -> None:
+    """
+    Handle the /echo slash command to echo back the user's message.
+
+    Args:
+        command: The command data from Slack
+        ack: Function to acknowledge the command request
+        respond: Function to respond to the command
+        logger: The logger instance
+    """
+    try:
+        # Acknowledge the command request immediately
+        await ack()
+
+        # Get the text from the command
+        text = command.get("text", "").strip()
+
+        if text:
+            # Respond with the echoed message
+            await respond(f"MooAI: {text}")
+        else:
+            # Respond with a helpful message if no text was provided
+            await respond("Please provide a message to echo. Usage: `/echo [message]`")
+
+    except Exception as e:
+        logger.error(f"Error handling echo command: {e}")
+        await respond("Sorry, something went wrong while processing your command.")
+
+
+async def ask_command(command: Dict[str, Any], ack: AsyncAck, respond: AsyncRespond, logger: logging.Logger) -> None:
+    """
+    Handle the /ask slash command: acknowledge at once, then answer via response_url.
+
+    Bolt has already returned the acknowledgement by the time the agent runs, so the answer is awaited here.
+
+    Args:
+        command: The command data from Slack
+        ack: Function to acknowledge the command request
+        respond: Function to respond to the command (posts to its response_url)
+        logger: The logger instance
+    """
+    question, public = parse_ask_text(command.get("text", ""))
+    if not question:
+        await ack(ASK_USAGE)
+        return
+
+    # Acknowledge within Slack's 3 second window; the answer follows via response_url
+    await ack(ASK_ACK_MESSAGE)
+    with usage_scope(command.get("user_id"), command.get("channel_id"), command.get("team_id")):
+        await answer_ask_command(question, public, respond, logger)
+
+
+@traced("answer_ask_command")
+async def answer_ask_command(question: str, public: bool, respond: AsyncRespond, logger: logging.Logger) -> None:
+    """
+    Run the agent on an /ask question and deliver the answer via response_url.
+
+    Args:
+        question: The question from the command text
+        public: Whether to answer in the channel rather than only to the user
+        respond: Function to respond to the command
+        logger: Logger instance for error reporting
+    """
+
+    # Replace the acknowledgement with a working update if the answer takes a while
+    sending_update = asyncio.Event()
+
+    async def show_working():
+        await asyncio.sleep(ASK_WORKING_DELAY_SECONDS)
+        sending_update.set()
+        await respond(text=ASK_WORKING_MESSAGE, replace_original=True)
+
+    working = asyncio.create_task(show_working())
+    try:
+        try:
+            response = await run_agent_with_messages_safe(
+                [{"role": "user", "content": question}], use_structured_output=True
+            )
+        finally:
+            # Let an update already being sent finish, so it can't land after (and replace) the answer
+            if sending_update.is_set():
+                await asyncio.gather(working, return_exceptions=True)
+            else:
+                working.cancel()
+
+        response_type = "in_channel" if public else "ephemeral"
+        with time_stage("post_reply"):
+            if public:
+                # Remove the private acknowledgement (or working update), which the public answer doesn't replace
+                await respond(delete_original=True)
+            for i, message in enumerate(render_ask_answer(response, public)):
+                # A private answer replaces the acknowledgement; a public one is posted to the channel
+                await respond(
+                    text=message.text,
+                    blocks=message.blocks,
+                    response_type=response_type,
+                    replace_original=i == 0 and not public,
+                )
+
+    except Exception as e:
+        logger.exception(ASK_COMMAND_ERROR_LOG.format(error=e))
+        await respond(text=GENERIC_ERROR.format(error=e), response_type="ephemeral", replace_original=True)
@@ -0,0 +1,36 @@
+import logging
+from slack_sdk.web.async_client import AsyncWebClient
+
+from listeners.home_tab import (
+    HOME_VIEW,
+    HOME_VIEW_VERSION,
+    PUBLISHED_HOME_VERSIONS,
+    home_publishes_total,
+    home_view_is_current,
+)
+
+
+async def home_opened(client: AsyncWebClient, event: dict, logger: logging.Logger):
+    """
+    Handle the app_home_opened event to display a custom home tab.
+
+    Args:
+        client: The Slack AsyncWebClient instance
+        event: The event data from Slack
+        logger: The logger instance
+    """
+    try:
+        # Get the user ID from the event
+        user_id = event["user"]
+
+        # Skip the (tier-limited) publish if the user already has this version
+        if home_view_is_current(event):
+            home_publishes_total.inc(outcome="skipped")
+            return
+
+        # Publish a Home tab view
+        await client.views_publish(user_id=user_id, view=HOME_VIEW)
+        PUBLISHED_HOME_VERSIONS.set(user_id, HOME_VIEW_VERSION)
+        home_publishes_total.inc(outcome="published")
+    except Exception as e:
+        logger.error(f"Error publishing home tab: {e}")
@@ -0,0 +1,17 @@
+import logging
+from typing import Any, Optional
+
+from listeners.users import user_changed as _user_changed
+
+
+async def user_changed(event: dict, logger: logging.Logger, client: Optional[Any] = None) -> None:
+    """
+    Handle the user_change event to keep cached display names fresh.
+
+    Args:
+        event: The event data from Slack
+        logger: The logger instance
+        client: Slack AsyncWebClient instance, whose workspace's directory is updated
+    """
+    # Updating the in-memory directory never blocks, so the sync handler is safe to call here
+    _user_changed(event, logger, client)
@@ -1,9 +1,11 @@
 import logging
+from typing import Optional
+
 from slack_bolt import Assistant, BoltContext, Say, SetSuggestedPrompts, SetStatus, SetTitle
 from slack_sdk import WebClient
-from slack_sdk.models.blocks import HeaderBlock, SectionBlock, DividerBlock
 
 from lib.agent import run_agent_with_messages_sync
+from lib.attachment_budget import holds_attachment_budget
 from lib.constants import (
     ASSISTANT_GREETING,
     SUGGESTED_PROMPTS,
@@ -13,15 +15,30 @@ from lib.constants import (
     THINKING_MESSAGE,
     MENTION_GREETING,
     FOLLOWUP_PROMPTS_TITLE,
+    BUSY_MESSAGE,
 )
 
-from lib.slack_utils import fetch_slack_thread, format_slack_messages_for_openai, markdown_to_mrkdwn
+from lib.slack_utils import fetch_slack_thread, format_slack_messages_for_openai, markdown_to_mrkdwn, thread_messages
+from lib.dedupe import claim_message
 from lib.file_utils import extract_files_from_slack_messages
+from lib.renderer import MESSAGE_TEXT_LIMIT, render_mrkdwn_messages, split_mrkdwn
+from lib.job_queue import LeasedJob, get_job_queue
+from lib.metrics import time_stage
+from lib.prompt_cache import cached_first_answer
+from lib.sharding import get_sharded_dispatcher, thread_key
+from lib.thread_locks import serialized_per_thread
+from lib.tracing import current_span_context, format_traceparent, parse_traceparent, traced, use_span_context
+from lib.usage import thread_requester, usage_scope
+from lib.user_directory import resolve_user_names
+from lib.worker_pool import dispatch
 
 # Initialize the Slack Assistant middleware instance
 # This handles AI-powered threads in Slack using the Bolt framework
 assistant = Assistant()
 
+# Durable queue job kind for thread responses
+THREAD_RESPONSE_JOB = "thread_response"
+
 
 # Handler for when a user starts a new assistant thread in Slack.
 # Presents the user with a set of suggested prompts to help them get started.
@@ -45,6 +62,8 @@ def start_assistant_thread(
 # Handler for when a user sends a message in an assistant thread.
 # Passes the user's latest message to the OpenAI agent (with context maintained by response_id mapping).
 @assistant.user_message
+@traced("respond_in_assistant_thread")
+@holds_attachment_budget
 def respond_in_assistant_thread(
     payload: dict,
     logger: logging.Logger,
@@ -64,19 +83,23 @@ def respond_in_assistant_thread(
             # Error already logged and displayed by fetch_slack_thread
             return
 
-        # Process any file attachments in the thread
-        files_by_ts = extract_files_from_slack_messages(client, slack_messages)
-
-        # Format Slack messages into OpenAI Message format using utility
-        formatted_messages = format_slack_messages_for_openai(slack_messages, files_by_ts)
-        if not formatted_messages:
-            error_msg = "No messages found in thread."
-            logger.error(error_msg)
-            say(GENERIC_ERROR.format(error=error_msg))
-            return
+        # A new thread that starts with a suggested prompt is answered from the prewarmed cache
+        response = cached_first_answer(slack_messages)
+        if response is None:
+            # Process any file attachments in the thread
+            files_by_ts = extract_files_from_slack_messages(client, slack_messages)
+
+            # Format Slack messages into OpenAI Message format using utility
+            formatted_messages = format_slack_messages_for_openai(slack_messages, files_by_ts)
+            if not formatted_messages:
+                error_msg = "No messages found in thread."
+                logger.error(error_msg)
+                say(GENERIC_ERROR.format(error=error_msg))
+                return
 
-        # Forward the full thread to the OpenAI Agent using our agent service with structured output
-        response = run_agent_with_messages_sync(formatted_messages, use_structured_output=True)
+            # Forward the full thread to the OpenAI Agent, accounted to the requester so their quotas apply
+            with usage_scope(payload.get("user"), payload.get("channel"), context.team_id):
+                response = run_agent_with_messages_sync(formatted_messages, use_structured_output=True)
 
         # Handle structured response
         from lib.models import StructuredResponse
@@ -86,19 +109,11 @@ def respond_in_assistant_thread(
             if response.thread_title:
                 set_title(response.thread_title)
 
-            # Build blocks for the message
-            blocks = []
-
-            # Add message title if provided
-            if response.message_title:
-                blocks.append(HeaderBlock(text=response.message_title))
-
-            # Add main response content
+            # Convert the main response and split it into messages within Slack's Block Kit limits
             mrkdwn_response = markdown_to_mrkdwn(response.response)
-            blocks.append(SectionBlock(text=mrkdwn_response))
-
-            # Send the message with blocks
-            say(text=mrkdwn_response, blocks=blocks)
+            with time_stage("post_reply"):
+                for message in render_mrkdwn_messages(mrkdwn_response, title=response.message_title):
+                    say(text=message.text, blocks=message.blocks)
 
             # Set follow-up prompts if provided
             if response.followups and len(response.followups) > 0:
@@ -111,7 +126,9 @@ def respond_in_assistant_thread(
         else:
             # Fallback to plain text response if not structured
             mrkdwn_message = markdown_to_mrkdwn(response)
-            say(mrkdwn_message)
+            with time_stage("post_reply"):
+                for chunk in split_mrkdwn(mrkdwn_message, MESSAGE_TEXT_LIMIT):
+                    say(chunk)
 
     except Exception as e:
         error_msg = USER_MESSAGE_ERROR_LOG.format(error=e)
@@ -121,6 +138,7 @@ def respond_in_assistant_thread(
 
 # Handler for when the bot is mentioned in a channel.
 # Creates a new thread with the bot's response.
+@traced("respond_to_mention")
 def respond_to_mention(
     body: dict,
     logger: logging.Logger,
@@ -146,6 +164,10 @@ def respond_to_mention(
             logger.error("Missing required fields in mention payload")
             return
 
+        # Skip if this message was already answered via its message event or an earlier delivery
+        if not claim_message(event):
+            return
+
         # If this is a new message (not in a thread), create a thread by responding
         if thread_ts == ts:  # This is a new message, not in a thread
             thread_response = client.chat_postMessage(channel=channel_id, thread_ts=ts, text=MENTION_GREETING)
@@ -155,7 +177,7 @@ def respond_to_mention(
                 return
 
         # Process the thread and generate a response
-        process_thread_and_respond(channel_id, thread_ts, client, logger)
+        schedule_thread_response(channel_id, thread_ts, client, logger, message_ts=ts)
 
     except Exception as e:
         error_msg = f"Failed to handle mention: {e}"
@@ -164,6 +186,7 @@ def respond_to_mention(
 
 
 # Handler for messages in threads where the bot has been mentioned
+@traced("respond_to_thread_message")
 def respond_to_thread_message(
     body: dict,
     logger: logging.Logger,
@@ -199,28 +222,162 @@ def respond_to_thread_message(
         if f"<@{bot_id}>" not in message_text:
             return
 
+        # Skip if this message was already answered via its app_mention event or an earlier delivery
+        if not claim_message(event):
+            return
+
         # Process the thread and respond
-        process_thread_and_respond(channel_id, thread_ts, client, logger)
+        schedule_thread_response(channel_id, thread_ts, client, logger, message_ts=ts)
 
     except Exception as e:
         error_msg = f"Failed to handle thread message: {e}"
         logger.exception(error_msg)
 
 
+# Helper function to run process_thread_and_respond inline or on the background worker pool
+def schedule_thread_response(
+    channel_id: str, thread_ts: str, client: WebClient, logger: logging.Logger, message_ts: Optional[str] = None
+):
+    """Schedule a thread response so the event handler can return as soon as possible.
+
+    Args:
+        channel_id: The Slack channel ID
+        thread_ts: The thread timestamp
+        client: Slack WebClient instance
+        logger: Logger instance for error reporting
+        message_ts: Timestamp of the message being answered, if known
+    """
+    # In queue mode the job is persisted first, so it survives a restart before a worker picks it up
+    job_queue = get_job_queue()
+    if job_queue is not None:
+        job_queue.enqueue(
+            THREAD_RESPONSE_JOB,
+            {
+                "channel_id": channel_id,
+                "thread_ts": thread_ts,
+                "message_ts": message_ts,
+                "traceparent": format_traceparent(current_span_context()),
+            },
+            dedupe_key=f"{THREAD_RESPONSE_JOB}:{channel_id}:{message_ts}" if message_ts else None,
+        )
+        return
+
+    # In sharded mode the thread's owning worker process replies with its own client
+    sharded = get_sharded_dispatcher()
+    if sharded is not None:
+        sharded.submit(thread_key(channel_id, thread_ts), channel_id, thread_ts, message_ts)
+        return
+
+    def on_rejected():
+        client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=BUSY_MESSAGE)
+
+    dispatch("thread_response", process_thread_and_respond, channel_id, thread_ts, client, logger, on_rejected=on_rejected)
+
+
+# Job queue handler for thread responses enqueued by schedule_thread_response
+def run_thread_response_job(job: LeasedJob, client: WebClient, logger: logging.Logger):
+    """Answer a thread from a durable queue job, skipping retries that already replied.
+
+    Args:
+        job: The leased job, with channel_id, thread_ts, message_ts and traceparent in its payload
+        client: Slack WebClient instance
+        logger: Logger instance for error reporting
+    """
+    channel_id = job.payload["channel_id"]
+    thread_ts = job.payload["thread_ts"]
+    message_ts = job.payload.get("message_ts")
+
+    # A retried job's previous worker may have died after posting its reply
+    if job.attempts > 1 and message_ts and has_bot_reply_since(client, channel_id, thread_ts, message_ts):
+        logger.info(f"Job {job.id} already answered {channel_id}:{message_ts}, skipping retry")
+        return
+
+    # Failures propagate so the queue retries the job with backoff; only the last attempt tells the user.
+    # The job waits for its turn in the thread so the queue only acks it once the reply is posted.
+    job_queue = get_job_queue()
+    final_attempt = job_queue is None or job.attempts >= job_queue.max_attempts
+
+    # Parent the reply's spans on the event that enqueued it
+    with use_span_context(parse_traceparent(job.payload.get("traceparent"))):
+        try:
+            process_thread_and_respond(channel_id, thread_ts, client, logger, raise_errors=True).result()
+        except Exception as e:
+            if final_attempt:
+                client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=GENERIC_ERROR.format(error=e))
+            raise
+
+
+# Sharded-mode handler for thread responses sent by schedule_thread_response
+def run_sharded_thread_response(
+    channel_id: str, thread_ts: str, message_ts: Optional[str], client: WebClient, logger: logging.Logger
+):
+    """Answer a thread in a shard worker process.
+
+    Args:
+        channel_id: The Slack channel ID
+        thread_ts: The thread timestamp
+        message_ts: Timestamp of the message being answered, if known (used by thread_response_needs_replay)
+        client: Slack WebClient instance
+        logger: Logger instance for error reporting
+    """
+    # Wait for the reply, so the dispatcher keeps it in flight (and replays it) until it is posted
+    process_thread_and_respond(channel_id, thread_ts, client, logger).result()
+
+
+def thread_response_needs_replay(channel_id: str, thread_ts: str, message_ts: Optional[str], client: WebClient) -> bool:
+    """Check whether a sharded thread response lost with a dead worker still has to be answered.
+
+    Args:
+        channel_id: The Slack channel ID
+        thread_ts: The thread timestamp
+        message_ts: Timestamp of the message being answered; without it the response is always replayed
+        client: Slack WebClient instance
+    """
+    return not (message_ts and has_bot_reply_since(client, channel_id, thread_ts, message_ts))
+
+
+def has_bot_reply_since(client: WebClient, channel_id: str, thread_ts: str, message_ts: str) -> bool:
+    """Check whether a bot has replied in the thread after message_ts (ignoring the mention greeting).
+
+    Args:
+        client: Slack WebClient instance
+        channel_id: The Slack channel ID
+        thread_ts: The thread timestamp
+        message_ts: Timestamp of the message being answered
+    """
+    response = client.conversations_replies(channel=channel_id, ts=thread_ts, oldest=message_ts, inclusive=False)
+    return any(
+        msg.get("bot_id") and msg.get("text") != MENTION_GREETING and float(msg.get("ts", 0)) > float(message_ts)
+        for msg in response.get("messages", [])
+    )
+
+
 # Helper function to process a thread and generate a response
-def process_thread_and_respond(channel_id: str, thread_ts: str, client: WebClient, logger: logging.Logger):
+@serialized_per_thread
+@traced("process_thread_and_respond")
+@holds_attachment_budget
+def process_thread_and_respond(
+    channel_id: str, thread_ts: str, client: WebClient, logger: logging.Logger, raise_errors: bool = False
+):
     """Process all messages in a thread and generate a response.
 
+    Replies within one thread run in order; the call returns a Future of the reply, and returns at once when
+    the thread already has a reply in progress (see serialized_per_thread).
+
     Args:
         channel_id: The Slack channel ID
         thread_ts: The thread timestamp
         client: Slack WebClient instance
         logger: Logger instance for error reporting
+        raise_errors: Re-raise failures (including agent failures) instead of posting an error reply,
+            so the caller can retry
     """
     try:
         # Use conversations_replies to get the thread messages
-        response = client.conversations_replies(channel=channel_id, ts=thread_ts, limit=1000, inclusive=True)
+        with time_stage("fetch_thread"):
+            response = client.conversations_replies(channel=channel_id, ts=thread_ts, limit=1000, inclusive=True)
         slack_messages = response.get("messages", [])
+        thread_messages.observe(len(slack_messages))
 
         if not slack_messages:
             logger.error("No messages found in thread")
@@ -229,46 +386,45 @@ def process_thread_and_respond(channel_id: str, thread_ts: str, client: WebClien
         # Process any file attachments in the thread
         files_by_ts = extract_files_from_slack_messages(client, slack_messages)
 
+        # Channel threads can have many participants, so attribute each message to its speaker
+        user_names = resolve_user_names(client, slack_messages)
+
         # Format Slack messages into OpenAI Message format
-        formatted_messages = format_slack_messages_for_openai(slack_messages, files_by_ts)
+        formatted_messages = format_slack_messages_for_openai(slack_messages, files_by_ts, user_names=user_names)
         if not formatted_messages:
             error_msg = "No messages found in thread."
             logger.error(error_msg)
             client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=GENERIC_ERROR.format(error=error_msg))
             return
 
-        # Forward the thread to the OpenAI Agent with structured output
-        response = run_agent_with_messages_sync(formatted_messages, use_structured_output=True)
+        # Forward the thread to the OpenAI Agent, accounted to the person being answered so their quotas apply
+        requester = thread_requester(slack_messages)
+        with usage_scope(requester.get("user"), channel_id, requester.get("team")):
+            response = run_agent_with_messages_sync(
+                formatted_messages, use_structured_output=True, raise_errors=raise_errors
+            )
 
         # Handle structured response
         from lib.models import StructuredResponse
 
         if isinstance(response, StructuredResponse):
-            # Build blocks for the message
-            blocks = []
-
-            # Add message title if provided
-            if response.message_title:
-                blocks.append(HeaderBlock(text=response.message_title))
-                blocks.append(DividerBlock())
-
-            # Add main response content
+            # Convert the main response and split it into messages within Slack's Block Kit limits
             mrkdwn_response = markdown_to_mrkdwn(response.response)
-            blocks.append(SectionBlock(text=mrkdwn_response))
-
-            # Send the response in the thread with blocks if available
-            if blocks:
-                client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=mrkdwn_response, blocks=blocks)
-            else:
-                client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=mrkdwn_response)
+            with time_stage("post_reply"):
+                for message in render_mrkdwn_messages(mrkdwn_response, title=response.message_title, title_divider=True):
+                    client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=message.text, blocks=message.blocks)
 
             # Note: We can't update thread title or set suggested prompts in regular threads
             # as those are specific to Assistant threads
         else:
             # Fallback to plain text response if not structured
             mrkdwn_message = markdown_to_mrkdwn(response)
-            client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=mrkdwn_message)
+            with time_stage("post_reply"):
+                for chunk in split_mrkdwn(mrkdwn_message, MESSAGE_TEXT_LIMIT):
+                    client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=chunk)
 
     except Exception as thread_error:
+        if raise_errors:
+            raise
         logger.exception(f"Error processing thread: {thread_error}")
         client.chat_postMessage(channel=channel_id, thread_ts=thread_ts, text=GENERIC_ERROR.format(error=thread_error))
@@ -1,6 +1,29 @@
 import logging
+import threading
 from slack_bolt import Ack, Respond
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple, Union
+
+from lib.agent import run_agent_with_messages_sync
+from lib.constants import ASK_ACK_MESSAGE, ASK_COMMAND_ERROR_LOG, ASK_USAGE, ASK_WORKING_MESSAGE, BUSY_MESSAGE, GENERIC_ERROR
+from lib.metrics import time_stage
+from lib.models import StructuredResponse
+from lib.renderer import RenderedMessage, render_mrkdwn_messages
+from lib.slack_utils import markdown_to_mrkdwn
+from lib.tracing import traced
+from lib.usage import usage_scope
+from lib.worker_pool import dispatch
+
+logger = logging.getLogger(__name__)
+
+# Flag that makes /ask answer in the channel instead of only to the user
+ASK_PUBLIC_FLAG = "--public"
+
+# Seconds an /ask answer can take before the user is shown ASK_WORKING_MESSAGE
+ASK_WORKING_DELAY_SECONDS = 5.0
+
+# Slack accepts up to five responses per response_url (within 30 minutes); one is kept for the working update,
+# and for a public answer another for deleting the private acknowledgement
+RESPONSE_URL_MAX_RESPONSES = 5
 
 
 def echo_command(command: Dict[str, Any], ack: Ack, respond: Respond, logger: logging.Logger) -> None:
@@ -30,3 +53,120 @@ def echo_command(command: Dict[str, Any], ack: Ack, respond: Respond, logger: lo
     except Exception as e:
         logger.error(f"Error handling echo command: {e}")
         respond("Sorry, something went wrong while processing your command.")
+
+
+def parse_ask_text(text: str) -> Tuple[str, bool]:
+    """
+    Split /ask command text into the question and whether to answer in the channel.
+
+    Args:
+        text: The command text, optionally starting with ASK_PUBLIC_FLAG
+
+    Returns:
+        Tuple of (question, public)
+    """
+    words = text.strip().split(maxsplit=1)
+    if words and words[0] == ASK_PUBLIC_FLAG:
+        return (words[1].strip() if len(words) > 1 else ""), True
+    return text.strip(), False
+
+
+def render_ask_answer(response: Union[str, StructuredResponse], public: bool = False) -> List[RenderedMessage]:
+    """
+    Render an agent answer as response_url messages, leaving room for the working update and, for a public
+    answer, the deletion of the private acknowledgement.
+
+    Args:
+        response: The agent's structured or plain text answer
+        public: Whether the answer is posted in the channel
+
+    Returns:
+        At most RESPONSE_URL_MAX_RESPONSES - 1 messages (- 2 if public) within Slack's Block Kit limits
+    """
+    if isinstance(response, StructuredResponse):
+        messages = render_mrkdwn_messages(markdown_to_mrkdwn(response.response), title=response.message_title)
+    else:
+        messages = render_mrkdwn_messages(markdown_to_mrkdwn(response))
+    room = RESPONSE_URL_MAX_RESPONSES - (2 if public else 1)
+    if len(messages) > room:
+        logger.warning(f"/ask answer needs {len(messages)} messages, sending the first {room}")
+    return messages[:room]
+
+
+def ask_command(command: Dict[str, Any], ack: Ack, respond: Respond, logger: logging.Logger) -> None:
+    """
+    Handle the /ask slash command: acknowledge at once, then answer via response_url in the background.
+
+    The command text is the whole context, so no thread is fetched.
+
+    Args:
+        command: The command data from Slack
+        ack: Function to acknowledge the command request
+        respond: Function to respond to the command (posts to its response_url)
+        logger: The logger instance
+    """
+    question, public = parse_ask_text(command.get("text", ""))
+    if not question:
+        ack(ASK_USAGE)
+        return
+
+    # Acknowledge within Slack's 3 second window; the answer follows via response_url
+    ack(ASK_ACK_MESSAGE)
+
+    def on_rejected():
+        respond(text=BUSY_MESSAGE, response_type="ephemeral", replace_original=True)
+
+    # The scope follows the job onto the worker pool, so the run is accounted to the user who asked
+    with usage_scope(command.get("user_id"), command.get("channel_id"), command.get("team_id")):
+        dispatch("ask_command", answer_ask_command, question, public, respond, logger, on_rejected=on_rejected)
+
+
+@traced("answer_ask_command")
+def answer_ask_command(question: str, public: bool, respond: Respond, logger: logging.Logger) -> None:
+    """
+    Run the agent on an /ask question and deliver the answer via response_url.
+
+    Args:
+        question: The question from the command text
+        public: Whether to answer in the channel rather than only to the user
+        respond: Function to respond to the command
+        logger: Logger instance for error reporting
+    """
+    # Replace the acknowledgement with a working update if the answer takes a while. The lock keeps a
+    # late update from landing after (and replacing) the answer.
+    answered = threading.Event()
+    lock = threading.Lock()
+
+    def show_working():
+        with lock:
+            if not answered.is_set():
+                respond(text=ASK_WORKING_MESSAGE, replace_original=True)
+
+    working = threading.Timer(ASK_WORKING_DELAY_SECONDS, show_working)
+    working.daemon = True
+    try:
+        working.start()
+        try:
+            response = run_agent_with_messages_sync([{"role": "user", "content": question}], use_structured_output=True)
+        finally:
+            working.cancel()
+            with lock:
+                answered.set()
+
+        response_type = "in_channel" if public else "ephemeral"
+        with time_stage("post_reply"):
+            if public:
+                # Remove the private acknowledgement (or working update), which the public answer doesn't replace
+                respond(delete_original=True)
+            for i, message in enumerate(render_ask_answer(response, public)):
+                # A private answer replaces the acknowledgement; a public one is posted to the channel
+                respond(
+                    text=message.text,
+                    blocks=message.blocks,
+                    response_type=response_type,
+                    replace_original=i == 0 and not public,
+                )
+
+    except Exception as e:
+        logger.exception(ASK_COMMAND_ERROR_LOG.format(error=e))
+        respond(text=GENERIC_ERROR.format(error=e), response_type="ephemeral", replace_original=True)
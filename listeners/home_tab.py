@@ -1,4 +1,10 @@
+import hashlib
+import json
 import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
 from slack_sdk import WebClient
 from slack_sdk.models.blocks import (
     HeaderBlock,
@@ -9,6 +15,160 @@ from slack_sdk.models.blocks import (
     MarkdownTextObject,
 )
 
+from lib.metrics import REGISTRY
+
+# Bump to republish the home tab for every user even though its blocks did not change
+HOME_VIEW_REVISION = 1
+# Upper bound on remembered per-user versions (oldest entries are evicted first)
+PUBLISHED_VERSIONS_MAX_ENTRIES = 50_000
+
+home_publishes_total = REGISTRY.counter("home_tab_publishes_total", "app_home_opened events by outcome")
+
+
+def build_home_view() -> dict:
+    """
+    Build the home tab view.
+
+    Returns:
+        The home tab view payload for views_publish
+    """
+    # Build blocks for the home tab using Block Kit builder classes
+    blocks = [
+        # Header
+        HeaderBlock(text=PlainTextObject(text="🐮 Welcome to MooAI!", emoji=True)),
+        DividerBlock(),
+        # Chat with MooAI section
+        SectionBlock(text=MarkdownTextObject(text="🐄 *Chat with MooAI...*")),
+        ContextBlock(
+            elements=[
+                MarkdownTextObject(
+                    text=" 1️⃣ *... in side panel*: Add MooAI to top bar by clicking three dots in top right ↗️"
+                )
+            ]
+        ),
+        ContextBlock(
+            elements=[MarkdownTextObject(text=" 2️⃣ *... in full mode*: Open MooAI via the apps menu in the side bar ⬅️")]
+        ),
+        ContextBlock(
+            elements=[
+                MarkdownTextObject(text=" 3️⃣ *... in threads*: While in a channel, mention `@MooAI` to start a thread 🧵")
+            ]
+        ),
+        DividerBlock(),
+        # Chat Features section
+        SectionBlock(text=MarkdownTextObject(text="🐮 *Chat Features*")),
+        ContextBlock(
+            elements=[MarkdownTextObject(text=" 📎 *Attach files and images*: Add PDF and/or images to your message")]
+        ),
+        ContextBlock(
+            elements=[MarkdownTextObject(text=" 📑 *Markdown formatting*: MooAI supports rich text responses")]
+        ),
+        ContextBlock(
+            elements=[
+                MarkdownTextObject(text=" 🌐 *Web search*: MooAI can search the web to provide up-to-date information")
+            ]
+        ),
+        ContextBlock(
+            elements=[
+                MarkdownTextObject(
+                    text=" 📊 *Thread titles*: MooAI automatically updates thread titles based on conversation"
+                )
+            ]
+        ),
+        ContextBlock(
+            elements=[
+                MarkdownTextObject(
+                    text=" 🗣️ *Follow-up prompts*: generates follow-up prompts to help you continue the conversation"
+                )
+            ]
+        ),
+        ContextBlock(
+            elements=[
+                MarkdownTextObject(
+                    text=" 💡 *Coming Soon*: Knowledge base integration, and image generation!"
+                )
+            ]
+        ),
+        DividerBlock(),
+        # Commands section
+        SectionBlock(text=MarkdownTextObject(text="*Available Commands*")),
+        SectionBlock(text=MarkdownTextObject(text="• `/echo [message]` - Echo back your message")),
+    ]
+
+    view = {
+        "type": "home",
+        "blocks": [block.to_dict() for block in blocks],
+    }
+    # The version travels with the published view, so app_home_opened can tell which one a user has
+    view["private_metadata"] = home_view_version(view)
+    return view
+
+
+def home_view_version(view: dict) -> str:
+    """
+    Compute the version of a home view from its blocks and HOME_VIEW_REVISION.
+
+    Args:
+        view: Home tab view payload
+
+    Returns:
+        Short hash that changes whenever the view content or revision changes
+    """
+    content = json.dumps({"revision": HOME_VIEW_REVISION, "blocks": view["blocks"]}, sort_keys=True)
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+class PublishedVersions:
+    """Per-user record of the home view version last published"""
+
+    def __init__(self, max_entries: int = PUBLISHED_VERSIONS_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._versions: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Optional[str]:
+        with self._lock:
+            return self._versions.get(user_id)
+
+    def set(self, user_id: str, version: str) -> None:
+        with self._lock:
+            self._versions[user_id] = version
+            self._versions.move_to_end(user_id)
+            while len(self._versions) > self.max_entries:
+                self._versions.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions.clear()
+
+
+# Built and serialized once at startup instead of on every app_home_opened
+HOME_VIEW = build_home_view()
+HOME_VIEW_VERSION = HOME_VIEW["private_metadata"]
+PUBLISHED_HOME_VERSIONS = PublishedVersions()
+
+
+def home_view_is_current(event: dict) -> bool:
+    """
+    Check whether the user already has the current home view, so views_publish can be skipped.
+
+    The view in the event (present once a view has been published) is authoritative, since it
+    survives restarts and is shared by every instance; the in-process record covers events without one.
+
+    Args:
+        event: The app_home_opened event
+
+    Returns:
+        True if the current HOME_VIEW is already published for the user
+    """
+    if event.get("tab") == "messages":
+        # Opening the Messages tab doesn't show the home view
+        return True
+    view = event.get("view")
+    if view is not None:
+        return view.get("private_metadata") == HOME_VIEW_VERSION
+    return PUBLISHED_HOME_VERSIONS.get(event["user"]) == HOME_VIEW_VERSION
+
 
 def home_opened(client: WebClient, event: dict, logger: logging.Logger):
     """
@@ -23,76 +183,14 @@ def home_opened(client: WebClient, event: dict, logger: logging.Logger):
         # Get the user ID from the event
         user_id = event["user"]
 
-        # Build blocks for the home tab using Block Kit builder classes
-        blocks = [
-            # Header
-            HeaderBlock(text=PlainTextObject(text="🐮 Welcome to MooAI!", emoji=True)),
-            DividerBlock(),
-            # Chat with MooAI section
-            SectionBlock(text=MarkdownTextObject(text="🐄 *Chat with MooAI...*")),
-            ContextBlock(
-                elements=[
-                    MarkdownTextObject(
-                        text=" 1️⃣ *... in side panel*: Add MooAI to top bar by clicking three dots in top right ↗️"
-                    )
-                ]
-            ),
-            ContextBlock(
-                elements=[MarkdownTextObject(text=" 2️⃣ *... in full mode*: Open MooAI via the apps menu in the side bar ⬅️")]
-            ),
-            ContextBlock(
-                elements=[
-                    MarkdownTextObject(text=" 3️⃣ *... in threads*: While in a channel, mention `@MooAI` to start a thread 🧵")
-                ]
-            ),
-            DividerBlock(),
-            # Chat Features section
-            SectionBlock(text=MarkdownTextObject(text="🐮 *Chat Features*")),
-            ContextBlock(
-                elements=[MarkdownTextObject(text=" 📎 *Attach files and images*: Add PDF and/or images to your message")]
-            ),
-            ContextBlock(
-                elements=[MarkdownTextObject(text=" 📑 *Markdown formatting*: MooAI supports rich text responses")]
-            ),
-            ContextBlock(
-                elements=[
-                    MarkdownTextObject(text=" 🌐 *Web search*: MooAI can search the web to provide up-to-date information")
-                ]
-            ),
-            ContextBlock(
-                elements=[
-                    MarkdownTextObject(
-                        text=" 📊 *Thread titles*: MooAI automatically updates thread titles based on conversation"
-                    )
-                ]
-            ),
-            ContextBlock(
-                elements=[
-                    MarkdownTextObject(
-                        text=" 🗣️ *Follow-up prompts*: generates follow-up prompts to help you continue the conversation"
-                    )
-                ]
-            ),
-            ContextBlock(
-                elements=[
-                    MarkdownTextObject(
-                        text=" 💡 *Coming Soon*: Knowledge base integration, and image generation!"
-                    )
-                ]
-            ),
-            DividerBlock(),
-            # Commands section
-            SectionBlock(text=MarkdownTextObject(text="*Available Commands*")),
-            SectionBlock(text=MarkdownTextObject(text="• `/echo [message]` - Echo back your message")),
-        ]
+        # Skip the (tier-limited) publish if the user already has this version
+        if home_view_is_current(event):
+            home_publishes_total.inc(outcome="skipped")
+            return
 
         # Publish a Home tab view
-        client.views_publish(
-            user_id=user_id,
-            view={
-                "type": "home",
-                "blocks": [block.to_dict() for block in blocks],
-            },
-        )
+        client.views_publish(user_id=user_id, view=HOME_VIEW)
+        PUBLISHED_HOME_VERSIONS.set(user_id, HOME_VIEW_VERSION)
+        home_publishes_total.inc(outcome="published")
     except Exception as e:
         logger.error(f"Error publishing home tab: {e}")
@@ -0,0 +1,24 @@
+import logging
+from typing import Any, Optional
+
+from lib.user_directory import user_directory_for
+
+
+def user_changed(event: dict, logger: logging.Logger, client: Optional[Any] = None) -> None:
+    """
+    Handle the user_change event to keep cached display names fresh.
+
+    Args:
+        event: The event data from Slack
+        logger: The logger instance
+        client: Slack WebClient instance, whose workspace's directory is updated
+    """
+    try:
+        directory = user_directory_for(client)
+        user = event.get("user") or {}
+        if user.get("deleted"):
+            directory.invalidate(user.get("id", ""))
+        else:
+            directory.update_from_user(user)
+    except Exception as e:
+        logger.error(f"Error updating user directory: {e}")
@@ -0,0 +1,25 @@
+"""
+Shared fixtures for the test suite.
+"""
+
+import pytest
+
+from lib.agent import get_agent
+from lib.dedupe import InMemoryDedupeStore, configure_dedupe_store
+
+
+@pytest.fixture(autouse=True)
+def fresh_dedupe_store():
+    """Give every test its own dedupe store so reused message timestamps aren't treated as duplicates."""
+    store = InMemoryDedupeStore()
+    configure_dedupe_store(store)
+    yield store
+    configure_dedupe_store(InMemoryDedupeStore())
+
+
+@pytest.fixture(autouse=True)
+def fresh_agent_cache():
+    """Clear cached agents so each test sees the Agent class it patched."""
+    get_agent.cache_clear()
+    yield
+    get_agent.cache_clear()
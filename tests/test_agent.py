@@ -4,6 +4,7 @@ Tests for the agent module.
 
 import pytest
 from unittest.mock import patch, AsyncMock
+from agents.usage import Usage
 from lib.agent import run_agent_with_messages, run_agent_with_messages_sync
 from lib.models import StructuredResponse
 
@@ -26,6 +27,7 @@ async def test_run_agent_with_messages():
         # Setup mock runner
         mock_result = AsyncMock()
         mock_result.final_output = "This is the agent's response"
+        mock_result.context_wrapper.usage = Usage(requests=1, input_tokens=120, output_tokens=30, total_tokens=150)
         MockRunner.run = AsyncMock(return_value=mock_result)
 
         # Act
@@ -63,6 +65,7 @@ async def test_run_agent_with_messages_structured_output():
         # Setup mock runner
         mock_result = AsyncMock()
         mock_result.final_output = structured_response
+        mock_result.context_wrapper.usage = Usage(requests=1, input_tokens=120, output_tokens=30, total_tokens=150)
         MockRunner.run = AsyncMock(return_value=mock_result)
 
         # Act
@@ -2,15 +2,27 @@
 Tests for the assistant listeners.
 """
 
-from unittest.mock import MagicMock, patch
+from functools import partial
+from unittest.mock import AsyncMock, MagicMock, patch
 from listeners.assistant import (
+    THREAD_RESPONSE_JOB,
     start_assistant_thread,
     respond_in_assistant_thread,
     respond_to_mention,
     respond_to_thread_message,
     process_thread_and_respond,
+    run_thread_response_job,
+    schedule_thread_response,
+)
+from lib.job_queue import STATUS_DONE, JobQueueWorker, LeasedJob, SQLiteJobQueue
+from lib.constants import (
+    ASSISTANT_GREETING,
+    BUSY_MESSAGE,
+    SUGGESTED_PROMPTS,
+    THINKING_MESSAGE,
+    MENTION_GREETING,
+    FOLLOWUP_PROMPTS_TITLE,
 )
-from lib.constants import ASSISTANT_GREETING, SUGGESTED_PROMPTS, THINKING_MESSAGE, MENTION_GREETING, FOLLOWUP_PROMPTS_TITLE
 from lib.models import StructuredResponse
 
 
@@ -328,12 +340,13 @@ def test_respond_to_thread_message_without_mention(mock_process_thread):
     mock_process_thread.assert_not_called()
 
 
+@patch("listeners.assistant.resolve_user_names")
 @patch("listeners.assistant.extract_files_from_slack_messages")
 @patch("listeners.assistant.format_slack_messages_for_openai")
 @patch("listeners.assistant.run_agent_with_messages_sync")
 @patch("listeners.assistant.markdown_to_mrkdwn")
 def test_process_thread_and_respond_success_plain_text(
-    mock_markdown_to_mrkdwn, mock_run_agent, mock_format_messages, mock_extract_files
+    mock_markdown_to_mrkdwn, mock_run_agent, mock_format_messages, mock_extract_files, mock_resolve_user_names
 ):
     """Test processing a thread and generating a plain text response successfully."""
     # Arrange
@@ -345,6 +358,7 @@ def test_process_thread_and_respond_success_plain_text(
     # Setup mocks
     mock_client.conversations_replies.return_value = {"messages": ["message1", "message2"]}
     mock_extract_files.return_value = {}
+    mock_resolve_user_names.return_value = {"U123": "Daisy"}
     mock_format_messages.return_value = [{"role": "user", "content": "Hello"}]
     mock_run_agent.return_value = "Agent response"
     mock_markdown_to_mrkdwn.return_value = "Formatted agent response"
@@ -355,20 +369,24 @@ def test_process_thread_and_respond_success_plain_text(
     # Assert
     mock_client.conversations_replies.assert_called_once_with(channel=channel_id, ts=thread_ts, limit=1000, inclusive=True)
     mock_extract_files.assert_called_once_with(mock_client, ["message1", "message2"])
-    mock_format_messages.assert_called_once_with(["message1", "message2"], {})
-    mock_run_agent.assert_called_once_with([{"role": "user", "content": "Hello"}], use_structured_output=True)
+    mock_resolve_user_names.assert_called_once_with(mock_client, ["message1", "message2"])
+    mock_format_messages.assert_called_once_with(["message1", "message2"], {}, user_names={"U123": "Daisy"})
+    mock_run_agent.assert_called_once_with(
+        [{"role": "user", "content": "Hello"}], use_structured_output=True, raise_errors=False
+    )
     mock_markdown_to_mrkdwn.assert_called_once_with("Agent response")
     mock_client.chat_postMessage.assert_called_once_with(
         channel=channel_id, thread_ts=thread_ts, text="Formatted agent response"
     )
 
 
+@patch("listeners.assistant.resolve_user_names")
 @patch("listeners.assistant.extract_files_from_slack_messages")
 @patch("listeners.assistant.format_slack_messages_for_openai")
 @patch("listeners.assistant.run_agent_with_messages_sync")
 @patch("listeners.assistant.markdown_to_mrkdwn")
 def test_process_thread_and_respond_success_structured(
-    mock_markdown_to_mrkdwn, mock_run_agent, mock_format_messages, mock_extract_files
+    mock_markdown_to_mrkdwn, mock_run_agent, mock_format_messages, mock_extract_files, mock_resolve_user_names
 ):
     """Test processing a thread and generating a structured response successfully."""
     # Arrange
@@ -380,6 +398,7 @@ def test_process_thread_and_respond_success_structured(
     # Setup mocks
     mock_client.conversations_replies.return_value = {"messages": ["message1", "message2"]}
     mock_extract_files.return_value = {}
+    mock_resolve_user_names.return_value = {"U123": "Daisy"}
     mock_format_messages.return_value = [{"role": "user", "content": "Hello"}]
     
     # Create a structured response
@@ -398,8 +417,11 @@ def test_process_thread_and_respond_success_structured(
     # Assert
     mock_client.conversations_replies.assert_called_once_with(channel=channel_id, ts=thread_ts, limit=1000, inclusive=True)
     mock_extract_files.assert_called_once_with(mock_client, ["message1", "message2"])
-    mock_format_messages.assert_called_once_with(["message1", "message2"], {})
-    mock_run_agent.assert_called_once_with([{"role": "user", "content": "Hello"}], use_structured_output=True)
+    mock_resolve_user_names.assert_called_once_with(mock_client, ["message1", "message2"])
+    mock_format_messages.assert_called_once_with(["message1", "message2"], {}, user_names={"U123": "Daisy"})
+    mock_run_agent.assert_called_once_with(
+        [{"role": "user", "content": "Hello"}], use_structured_output=True, raise_errors=False
+    )
     mock_markdown_to_mrkdwn.assert_called_once_with("This is the agent's structured response")
     
     # Check that chat_postMessage was called with blocks
@@ -408,3 +430,122 @@ def test_process_thread_and_respond_success_structured(
     assert mock_client.chat_postMessage.call_args[1]["channel"] == channel_id
     assert mock_client.chat_postMessage.call_args[1]["thread_ts"] == thread_ts
     assert mock_client.chat_postMessage.call_args[1]["text"] == "Formatted agent response"
+
+
+@patch("listeners.assistant.process_thread_and_respond")
+def test_schedule_thread_response_posts_busy_message_when_rejected(mock_process_thread):
+    """Test that a rejected background job tells the user the bot is busy."""
+    # Arrange
+    mock_client = MagicMock()
+    mock_logger = MagicMock()
+    mock_pool = MagicMock()
+    mock_pool.submit.side_effect = lambda name, func, *args, on_rejected=None, **kwargs: on_rejected() or False
+
+    # Act
+    with patch("lib.worker_pool._pool", mock_pool):
+        schedule_thread_response("C789", "123.456", mock_client, mock_logger)
+
+    # Assert
+    mock_process_thread.assert_not_called()
+    mock_client.chat_postMessage.assert_called_once_with(channel="C789", thread_ts="123.456", text=BUSY_MESSAGE)
+
+
+@patch("listeners.assistant.process_thread_and_respond")
+def test_mention_and_message_events_for_same_message_reply_once(mock_process_thread):
+    """Test that a thread mention delivered as both app_mention and message is answered once."""
+    # Arrange
+    event = {
+        "text": "Hey <@U999> can you help?",
+        "channel": "C789",
+        "ts": "123.789",
+        "thread_ts": "123.456",
+        "user": "U123",
+        "client_msg_id": "abc-123",
+    }
+    mock_client = MagicMock()
+    mock_logger = MagicMock()
+
+    # Act
+    respond_to_mention(
+        {"event": dict(event, type="app_mention"), "authorizations": [{"user_id": "U999"}]}, mock_logger, mock_client
+    )
+    respond_to_thread_message(
+        {"event": dict(event, type="message"), "authorizations": [{"user_id": "U999"}]}, mock_logger, mock_client
+    )
+
+    # Assert
+    mock_process_thread.assert_called_once_with("C789", "123.456", mock_client, mock_logger)
+
+
+@patch("listeners.assistant.process_thread_and_respond")
+def test_schedule_thread_response_routes_to_thread_shard(mock_process_thread):
+    """Test that in sharded mode the thread is sent to its shard instead of processed here."""
+    # Arrange
+    mock_dispatcher = MagicMock()
+
+    # Act
+    with patch("lib.sharding._dispatcher", mock_dispatcher):
+        schedule_thread_response("C789", "123.456", MagicMock(), MagicMock())
+
+    # Assert
+    mock_dispatcher.submit.assert_called_once_with("C789:123.456", "C789", "123.456", None)
+    mock_process_thread.assert_not_called()
+
+
+@patch("listeners.assistant.process_thread_and_respond")
+def test_retried_thread_job_skips_when_already_answered(mock_process_thread):
+    """Test that a retried queue job does not reply again if its previous attempt already did."""
+    # Arrange
+    job = LeasedJob(7, "thread_response", {"channel_id": "C789", "thread_ts": "123.456", "message_ts": "123.789"}, 2, "w")
+    mock_client = MagicMock()
+    mock_client.conversations_replies.return_value = {
+        "messages": [{"text": "Hey <@U999>", "ts": "123.789", "user": "U123"}, {"text": "Answer", "ts": "124.000", "bot_id": "B1"}]
+    }
+
+    # Act
+    run_thread_response_job(job, mock_client, MagicMock())
+
+    # Assert
+    mock_process_thread.assert_not_called()
+
+
+@patch("listeners.assistant.process_thread_and_respond")
+def test_first_thread_job_attempt_processes_thread(mock_process_thread):
+    """Test that the first attempt of a queue job answers the thread without checking for earlier replies."""
+    # Arrange
+    job = LeasedJob(7, "thread_response", {"channel_id": "C789", "thread_ts": "123.456", "message_ts": "123.789"}, 1, "w")
+    mock_client = MagicMock()
+    mock_logger = MagicMock()
+
+    # Act
+    run_thread_response_job(job, mock_client, mock_logger)
+
+    # Assert
+    mock_client.conversations_replies.assert_not_called()
+    mock_process_thread.assert_called_once_with("C789", "123.456", mock_client, mock_logger, raise_errors=True)
+
+
+@patch("lib.agent.run_agent_with_messages", new_callable=AsyncMock)
+@patch("listeners.assistant.resolve_user_names", return_value={})
+@patch("listeners.assistant.extract_files_from_slack_messages", return_value={})
+def test_failing_thread_job_is_retried_then_dead_lettered(mock_extract_files, mock_resolve_user_names, mock_run_agent, tmp_path):
+    """Test that an agent failure fails the queue job, so it is retried and dead-lettered, with one error reply at the end."""
+    # Arrange
+    mock_run_agent.side_effect = Exception("agent down")
+    mock_client = MagicMock()
+    mock_client.conversations_replies.return_value = {"messages": [{"text": "Hey <@U999>", "ts": "123.789", "user": "U123"}]}
+    job_queue = SQLiteJobQueue(str(tmp_path / "jobs.sqlite3"), max_attempts=2, retry_backoff=0)
+    job_queue.enqueue(THREAD_RESPONSE_JOB, {"channel_id": "C789", "thread_ts": "123.456", "message_ts": "123.789"})
+    worker = JobQueueWorker(job_queue, {THREAD_RESPONSE_JOB: partial(run_thread_response_job, client=mock_client, logger=MagicMock())})
+
+    # Act
+    with patch("lib.job_queue._job_queue", job_queue):
+        attempts = [worker.run_once(), worker.run_once(), worker.run_once()]
+
+    # Assert
+    assert attempts == [True, True, False]
+    assert mock_run_agent.await_count == 2
+    assert job_queue.counts() == {STATUS_DONE: 1, "dead_letter": 1}
+    assert "agent down" in job_queue.dead_letters()[0]["last_error"]
+    mock_client.chat_postMessage.assert_called_once()
+    assert "agent down" in mock_client.chat_postMessage.call_args.kwargs["text"]
@@ -0,0 +1,120 @@
+"""
+Tests for the async assistant listeners.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from listeners.aio.assistant import (
+    process_thread_and_respond,
+    respond_in_assistant_thread,
+    respond_to_mention,
+    respond_to_thread_message,
+)
+from lib.constants import MENTION_GREETING, THINKING_MESSAGE
+from lib.models import StructuredResponse
+
+
+@pytest.mark.asyncio
+@patch("listeners.aio.assistant.process_thread_and_respond", new_callable=AsyncMock)
+async def test_respond_to_mention_new_thread(mock_process_thread):
+    """Test that a new mention opens a thread and awaits processing."""
+    # Arrange
+    mock_body = {"event": {"text": "<@U123> Hello", "user": "U456", "channel": "C789", "ts": "123.456"}}
+    mock_logger = MagicMock()
+    mock_client = MagicMock()
+    mock_client.chat_postMessage = AsyncMock(return_value={"ok": True})
+
+    # Act
+    await respond_to_mention(body=mock_body, logger=mock_logger, client=mock_client)
+
+    # Assert
+    mock_client.chat_postMessage.assert_awaited_once_with(channel="C789", thread_ts="123.456", text=MENTION_GREETING)
+    mock_process_thread.assert_awaited_once_with("C789", "123.456", mock_client, mock_logger)
+
+
+@pytest.mark.asyncio
+@patch("listeners.aio.assistant.process_thread_and_respond", new_callable=AsyncMock)
+async def test_respond_to_thread_message_without_mention(mock_process_thread):
+    """Test that thread messages without a bot mention are ignored."""
+    # Arrange
+    mock_body = {
+        "event": {"text": "Tell me more", "user": "U456", "channel": "C789", "ts": "123.789", "thread_ts": "123.456"},
+        "authorizations": [{"user_id": "B123"}],
+    }
+
+    # Act
+    await respond_to_thread_message(body=mock_body, logger=MagicMock(), client=MagicMock())
+
+    # Assert
+    mock_process_thread.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+@patch("listeners.aio.assistant.fetch_slack_thread_async", new_callable=AsyncMock)
+@patch("listeners.aio.assistant.extract_files_from_slack_messages_async", new_callable=AsyncMock)
+@patch("listeners.aio.assistant.run_agent_with_messages_safe", new_callable=AsyncMock)
+@patch("listeners.aio.assistant.markdown_to_mrkdwn")
+async def test_respond_in_assistant_thread_structured(
+    mock_markdown_to_mrkdwn, mock_run_agent, mock_extract_files, mock_fetch_thread
+):
+    """Test that an assistant thread reply awaits the agent and posts title, blocks and prompts."""
+    # Arrange
+    mock_fetch_thread.return_value = [{"text": "Hello", "ts": "1.0"}]
+    mock_extract_files.return_value = {}
+    mock_run_agent.return_value = StructuredResponse(
+        thread_title="Test Thread", message_title="Test Response", response="Body", followups=["Next?"]
+    )
+    mock_markdown_to_mrkdwn.return_value = "Formatted body"
+    mock_set_status = AsyncMock()
+    mock_say = AsyncMock()
+    mock_set_title = AsyncMock()
+    mock_set_suggested_prompts = AsyncMock()
+
+    # Act
+    await respond_in_assistant_thread(
+        payload={},
+        logger=MagicMock(),
+        context=MagicMock(),
+        set_status=mock_set_status,
+        client=MagicMock(),
+        say=mock_say,
+        set_title=mock_set_title,
+        set_suggested_prompts=mock_set_suggested_prompts,
+    )
+
+    # Assert
+    mock_set_status.assert_awaited_once_with(THINKING_MESSAGE)
+    mock_run_agent.assert_awaited_once_with([{"role": "user", "content": "Hello"}], use_structured_output=True)
+    mock_set_title.assert_awaited_once_with("Test Thread")
+    mock_say.assert_awaited_once()
+    assert mock_say.call_args[1]["text"] == "Formatted body"
+    mock_set_suggested_prompts.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+@patch("listeners.aio.assistant.resolve_user_names_async", new_callable=AsyncMock)
+@patch("listeners.aio.assistant.extract_files_from_slack_messages_async", new_callable=AsyncMock)
+@patch("listeners.aio.assistant.run_agent_with_messages_safe", new_callable=AsyncMock)
+@patch("listeners.aio.assistant.markdown_to_mrkdwn")
+async def test_process_thread_and_respond_plain_text(
+    mock_markdown_to_mrkdwn, mock_run_agent, mock_extract_files, mock_resolve_user_names
+):
+    """Test that a channel thread is fetched, attributed and answered with awaited calls."""
+    # Arrange
+    mock_client = MagicMock()
+    mock_client.conversations_replies = AsyncMock(return_value={"messages": [{"text": "Hi", "user": "U1", "ts": "1.0"}]})
+    mock_client.chat_postMessage = AsyncMock()
+    mock_extract_files.return_value = {}
+    mock_resolve_user_names.return_value = {"U1": "Daisy"}
+    mock_run_agent.return_value = "Agent response"
+    mock_markdown_to_mrkdwn.return_value = "Formatted agent response"
+
+    # Act
+    await process_thread_and_respond("C789", "123.456", mock_client, MagicMock())
+
+    # Assert
+    mock_run_agent.assert_awaited_once_with([{"role": "user", "content": "Daisy: Hi"}], use_structured_output=True)
+    mock_client.chat_postMessage.assert_awaited_once_with(
+        channel="C789", thread_ts="123.456", text="Formatted agent response"
+    )
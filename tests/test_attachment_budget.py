@@ -0,0 +1,139 @@
+"""
+Tests for the attachment_budget module.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from lib.attachment_budget import AttachmentBudget, configure_attachment_budget, encoded_size, holds_attachment_budget
+from lib.file_utils import attachments_total, extract_files_from_slack_messages, extract_files_from_slack_messages_async
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def budget():
+    """Configure a small attachment budget (without waiting) for the test."""
+    budget = AttachmentBudget(capacity_bytes=4 * MB, wait_seconds=0)
+    configure_attachment_budget(budget)
+    yield budget
+    configure_attachment_budget(None)
+
+
+def test_acquire_waits_for_release():
+    """Test that a reservation waits for room, and gives up on timeout or when larger than the budget."""
+    # Arrange
+    budget = AttachmentBudget(capacity_bytes=100)
+    assert budget.acquire(80)
+    releaser = threading.Timer(0.05, budget.release, args=(80,))
+
+    # Act
+    releaser.start()
+    acquired_after_release = budget.acquire(50, timeout=2)
+
+    # Assert
+    assert acquired_after_release and budget.in_use == 50
+    assert not budget.acquire(60, timeout=0.01)
+    assert not budget.acquire(101, timeout=2)
+
+
+@patch("lib.file_utils.download_file")
+def test_extract_files_skips_attachments_over_budget_with_a_note(mock_download, budget):
+    """Test that attachments that don't fit are skipped with a note, and everything is released afterwards."""
+    # Arrange
+    mock_download.return_value = ("cows.png", b"png bytes")
+    thread = [
+        {
+            "user": "U1",
+            "ts": "1.0",
+            "text": "Look",
+            "files": [
+                {"id": "F1", "name": "cows.png", "filetype": "png", "size": MB},
+                {"id": "F2", "name": "herd.png", "filetype": "png", "size": MB},
+            ],
+        }
+    ]
+    over_budget_before = attachments_total.value(filetype="png", outcome="over_budget")
+    in_use_during = []
+
+    @holds_attachment_budget
+    def handle():
+        files_by_ts = extract_files_from_slack_messages(MagicMock(), thread)
+        in_use_during.append(budget.in_use)
+        return files_by_ts
+
+    # Act
+    files_by_ts = handle()
+
+    # Assert
+    mock_download.assert_called_once()
+    assert [part["type"] for part in files_by_ts["1.0"]] == ["input_text", "input_image"]
+    assert "herd.png" in files_by_ts["1.0"][0]["text"]
+    assert attachments_total.value(filetype="png", outcome="over_budget") == over_budget_before + 1
+    # The downloaded bytes are released once encoded; the encoded copy is held until the handler returns
+    assert in_use_during == [encoded_size(MB)]
+    assert budget.in_use == 0
+
+
+def _two_image_thread():
+    return [
+        {
+            "user": "U1",
+            "ts": "1.0",
+            "text": "Look",
+            "files": [
+                {"id": "F1", "name": "cows.png", "filetype": "png", "size": MB // 2},
+                {"id": "F2", "name": "herd.png", "filetype": "png", "size": MB // 2},
+            ],
+        }
+    ]
+
+
+@patch("lib.file_utils.download_file")
+def test_extract_files_releases_each_download_before_the_next(mock_download, budget):
+    """Test that each file is processed and its downloaded bytes released before the next file is downloaded."""
+    # Arrange
+    in_use_at_download = []
+
+    def download(client, file_info):
+        in_use_at_download.append(budget.in_use)
+        return file_info["name"], b"png bytes"
+
+    mock_download.side_effect = download
+    reserved = MB // 2 + encoded_size(MB // 2)
+
+    # Act
+    files_by_ts = holds_attachment_budget(extract_files_from_slack_messages)(MagicMock(), _two_image_thread())
+
+    # Assert
+    assert [part["type"] for part in files_by_ts["1.0"]] == ["input_image", "input_image"]
+    assert in_use_at_download == [2 * reserved, 2 * reserved - MB // 2]
+    assert budget.in_use == 0
+
+
+@pytest.mark.asyncio
+@patch("lib.file_utils.MAX_CONCURRENT_DOWNLOADS", 1)
+@patch("lib.file_utils.download_file_async")
+async def test_async_extract_files_processes_each_download_before_starting_more(mock_download, budget):
+    """Test that a download slot is only freed once its file is processed and its downloaded bytes released."""
+    # Arrange
+    in_use_at_download = []
+
+    async def download(client, file_info):
+        in_use_at_download.append(budget.in_use)
+        await asyncio.sleep(0)
+        return file_info["name"], b"png bytes"
+
+    mock_download.side_effect = download
+    reserved = MB // 2 + encoded_size(MB // 2)
+
+    # Act
+    files_by_ts = await holds_attachment_budget(extract_files_from_slack_messages_async)(MagicMock(), _two_image_thread())
+
+    # Assert
+    assert [part["type"] for part in files_by_ts["1.0"]] == ["input_image", "input_image"]
+    assert in_use_at_download == [2 * reserved, 2 * reserved - MB // 2]
+    assert budget.in_use == 0
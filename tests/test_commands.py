@@ -0,0 +1,143 @@
+"""
+Tests for the slash command listeners.
+"""
+
+import time
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from lib.constants import ASK_ACK_MESSAGE, ASK_USAGE, ASK_WORKING_MESSAGE
+from lib.models import StructuredResponse
+from listeners.aio.commands import ask_command as ask_command_async
+from listeners.commands import RESPONSE_URL_MAX_RESPONSES, ask_command, parse_ask_text
+
+
+def _answer(text="Moo **answer**"):
+    return StructuredResponse(thread_title=None, message_title="🐮 Answer", response=text, followups=None)
+
+
+def test_parse_ask_text_public_flag():
+    """Test that a leading --public flag is split from the question."""
+    # Act / Assert
+    assert parse_ask_text("  what is a cow? ") == ("what is a cow?", False)
+    assert parse_ask_text("--public what is a cow?") == ("what is a cow?", True)
+    assert parse_ask_text("--public") == ("", True)
+
+
+def test_ask_command_without_question_acks_with_usage():
+    """Test that /ask without a question is answered by the acknowledgement alone."""
+    # Arrange
+    ack, respond = MagicMock(), MagicMock()
+
+    # Act
+    ask_command(command={"text": " "}, ack=ack, respond=respond, logger=MagicMock())
+
+    # Assert
+    ack.assert_called_once_with(ASK_USAGE)
+    respond.assert_not_called()
+
+
+@patch("listeners.commands.run_agent_with_messages_sync")
+def test_ask_command_acks_then_replaces_it_with_the_answer(mock_run_agent):
+    """Test that /ask acknowledges first and delivers a private answer over response_url."""
+    # Arrange
+    mock_run_agent.return_value = _answer()
+    calls = []
+    ack = MagicMock(side_effect=lambda *args: calls.append("ack"))
+    respond = MagicMock(side_effect=lambda **kwargs: calls.append("respond"))
+
+    # Act
+    ask_command(command={"text": "what is a cow?"}, ack=ack, respond=respond, logger=MagicMock())
+
+    # Assert
+    ack.assert_called_once_with(ASK_ACK_MESSAGE)
+    assert calls == ["ack", "respond"]
+    mock_run_agent.assert_called_once_with([{"role": "user", "content": "what is a cow?"}], use_structured_output=True)
+    kwargs = respond.call_args.kwargs
+    assert kwargs["response_type"] == "ephemeral" and kwargs["replace_original"] is True
+    assert "*answer*" in kwargs["text"]
+
+
+@patch("listeners.commands.ASK_WORKING_DELAY_SECONDS", 0.01)
+@patch("listeners.commands.run_agent_with_messages_sync")
+def test_ask_command_public_long_run_shows_working_update(mock_run_agent):
+    """Test that a slow answer first shows the working update, then removes it and posts the answer in the channel."""
+
+    # Arrange
+    def slow_answer(*args, **kwargs):
+        time.sleep(0.2)
+        return _answer()
+
+    mock_run_agent.side_effect = slow_answer
+    respond = MagicMock()
+
+    # Act
+    ask_command(command={"text": "--public what is a cow?"}, ack=MagicMock(), respond=respond, logger=MagicMock())
+
+    # Assert
+    working, delete, answer = respond.call_args_list
+    assert working.kwargs == {"text": ASK_WORKING_MESSAGE, "replace_original": True}
+    assert delete.kwargs == {"delete_original": True}
+    assert answer.kwargs["response_type"] == "in_channel" and answer.kwargs["replace_original"] is False
+
+
+@patch("lib.renderer.MESSAGE_BLOCK_LIMIT", 2)
+@patch("listeners.commands.ASK_WORKING_DELAY_SECONDS", 0.01)
+@patch("listeners.commands.run_agent_with_messages_sync")
+def test_ask_command_slow_long_public_answer_stays_within_response_url_limit(mock_run_agent):
+    """Test that a slow public answer needing many messages is trimmed so every response fits one response_url."""
+
+    # Arrange
+    def slow_long_answer(*args, **kwargs):
+        time.sleep(0.2)
+        return _answer("\n\n".join(f"Paragraph {i} " + "moo " * 500 for i in range(10)))
+
+    mock_run_agent.side_effect = slow_long_answer
+    respond = MagicMock()
+
+    # Act
+    ask_command(command={"text": "--public what is a cow?"}, ack=MagicMock(), respond=respond, logger=MagicMock())
+
+    # Assert
+    working, delete, *answers = respond.call_args_list
+    assert working.kwargs["text"] == ASK_WORKING_MESSAGE
+    assert delete.kwargs == {"delete_original": True}
+    assert len(respond.call_args_list) == RESPONSE_URL_MAX_RESPONSES
+    assert all(answer.kwargs["response_type"] == "in_channel" for answer in answers)
+
+
+@pytest.mark.asyncio
+@patch("listeners.aio.commands.run_agent_with_messages_safe", new_callable=AsyncMock)
+async def test_async_ask_command_answers_without_working_update(mock_run_agent):
+    """Test that the async /ask acknowledges and answers, skipping the update for a fast answer."""
+    # Arrange
+    mock_run_agent.return_value = _answer()
+    ack, respond = AsyncMock(), AsyncMock()
+
+    # Act
+    await ask_command_async(command={"text": "what is a cow?"}, ack=ack, respond=respond, logger=MagicMock())
+
+    # Assert
+    ack.assert_awaited_once_with(ASK_ACK_MESSAGE)
+    respond.assert_awaited_once()
+    assert respond.call_args.kwargs["response_type"] == "ephemeral"
+
+
+@pytest.mark.asyncio
+@patch("listeners.aio.commands.run_agent_with_messages_safe", new_callable=AsyncMock)
+async def test_async_public_ask_removes_the_private_acknowledgement(mock_run_agent):
+    """Test that a public /ask deletes the private acknowledgement before posting the answer in the channel."""
+    # Arrange
+    mock_run_agent.return_value = _answer()
+    respond = AsyncMock()
+
+    # Act
+    await ask_command_async(
+        command={"text": "--public what is a cow?"}, ack=AsyncMock(), respond=respond, logger=MagicMock()
+    )
+
+    # Assert
+    delete, answer = respond.call_args_list
+    assert delete.kwargs == {"delete_original": True}
+    assert answer.kwargs["response_type"] == "in_channel"
@@ -0,0 +1,159 @@
+"""
+Tests for the dedupe module.
+"""
+
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from lib.dedupe import (
+    InMemoryDedupeStore,
+    SQLiteDedupeStore,
+    build_async_dedupe_middleware,
+    build_dedupe_middleware,
+    claim_message,
+    claim_message_async,
+    duplicates_total,
+    message_key,
+)
+
+
+def test_in_memory_store_claims_once_until_expiry():
+    """Test that a key can be claimed once and again only after its TTL."""
+    # Arrange
+    store = InMemoryDedupeStore(ttl_seconds=10)
+
+    # Act
+    with patch("lib.dedupe.time.monotonic", return_value=100.0):
+        first = store.claim("event:Ev1")
+        second = store.claim("event:Ev1")
+    with patch("lib.dedupe.time.monotonic", return_value=111.0):
+        after_expiry = store.claim("event:Ev1")
+
+    # Assert
+    assert (first, second, after_expiry) == (True, False, True)
+
+
+def test_in_memory_store_evicts_oldest_beyond_max_entries():
+    """Test that the in-memory store stays bounded."""
+    # Arrange
+    store = InMemoryDedupeStore(max_entries=2)
+
+    # Act
+    for key in ("a", "b", "c"):
+        store.claim(key)
+
+    # Assert
+    assert len(store) == 2
+    assert store.claim("a") is True
+    assert store.claim("c") is False
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    """Test that two stores on the same file see each other's claims, as separate bot instances would."""
+    # Arrange
+    path = str(tmp_path / "dedupe.sqlite3")
+    first_instance = SQLiteDedupeStore(path)
+    second_instance = SQLiteDedupeStore(path)
+
+    # Act
+    first = first_instance.claim("msg:abc")
+    duplicate = second_instance.claim("msg:abc")
+    other = second_instance.claim("msg:def")
+
+    # Assert
+    assert (first, duplicate, other) == (True, False, True)
+
+
+def test_sqlite_store_reclaims_expired_keys(tmp_path):
+    """Test that expired SQLite keys can be claimed again and are purged."""
+    # Arrange
+    store = SQLiteDedupeStore(str(tmp_path / "dedupe.sqlite3"), ttl_seconds=10)
+
+    # Act
+    with patch("lib.dedupe.time.time", return_value=1000.0):
+        store.claim("event:Ev1")
+        store.claim("event:Ev2")
+    with patch("lib.dedupe.time.time", return_value=1011.0):
+        reclaimed = store.claim("event:Ev1")
+        purged = store.purge_expired()
+
+    # Assert
+    assert reclaimed is True
+    assert purged == 1
+
+
+def test_message_key_is_shared_by_mention_and_message_events():
+    """Test that app_mention and message events for the same message produce the same key."""
+    # Arrange
+    mention = {"type": "app_mention", "client_msg_id": "abc", "channel": "C1", "ts": "1.0"}
+    message = {"type": "message", "client_msg_id": "abc", "channel": "C1", "ts": "1.0"}
+
+    # Act / Assert
+    assert message_key(mention) == message_key(message) == "msg:abc"
+    assert message_key({"channel": "C1", "ts": "1.0"}) == "msg:C1:1.0"
+
+
+def test_claim_message_fails_open_when_store_errors():
+    """Test that a broken store lets the event through rather than dropping it."""
+    # Arrange
+    broken = MagicMock()
+    broken.claim.side_effect = Exception("database is locked")
+
+    # Act
+    with patch("lib.dedupe._store", broken):
+        result = claim_message({"client_msg_id": "abc"})
+
+    # Assert
+    assert result is True
+
+
+def test_dedupe_middleware_acks_retried_events():
+    """Test that the middleware passes the first delivery on and acks a retry without processing it."""
+    # Arrange
+    middleware = build_dedupe_middleware()
+    body = {"event_id": "Ev123", "event": {"type": "app_mention"}}
+    ack, next_ = MagicMock(), MagicMock()
+    before = duplicates_total.value(kind="event")
+
+    # Act
+    middleware(body=body, ack=ack, next=next_)
+    middleware(body=body, ack=ack, next=next_)
+
+    # Assert
+    next_.assert_called_once()
+    ack.assert_called_once()
+    assert duplicates_total.value(kind="event") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_async_claims_use_the_sqlite_store_off_the_event_loop(tmp_path):
+    """Test that the async middleware and message claims wait for the SQLite store in a worker thread."""
+    # Arrange
+    store = SQLiteDedupeStore(str(tmp_path / "dedupe.sqlite3"))
+    claim = store.claim
+    claim_threads = []
+
+    def recording_claim(key):
+        claim_threads.append(threading.current_thread())
+        return claim(key)
+
+    store.claim = recording_claim
+    middleware = build_async_dedupe_middleware()
+    body = {"event_id": "Ev1", "event": {"type": "app_mention"}}
+    ack, next_ = AsyncMock(), AsyncMock()
+
+    # Act
+    with patch("lib.dedupe._store", store):
+        await middleware(body=body, ack=ack, next=next_)
+        await middleware(body=body, ack=ack, next=next_)
+        first = await claim_message_async({"client_msg_id": "abc"})
+        second = await claim_message_async({"client_msg_id": "abc"})
+
+    # Assert
+    next_.assert_awaited_once()
+    ack.assert_awaited_once()
+    assert (first, second) == (True, False)
+    assert len(claim_threads) == 4
+    assert threading.current_thread() not in claim_threads
@@ -0,0 +1,68 @@
+"""
+Tests for the home tab listener.
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from listeners.home_tab import HOME_VIEW, HOME_VIEW_VERSION, PUBLISHED_HOME_VERSIONS, build_home_view, home_opened
+
+
+@pytest.fixture(autouse=True)
+def clear_published_versions():
+    PUBLISHED_HOME_VERSIONS.clear()
+    yield
+    PUBLISHED_HOME_VERSIONS.clear()
+
+
+def test_home_opened_publishes_once_per_user():
+    """Test that the precomputed view is published on first open and skipped on repeat opens."""
+    # Arrange
+    mock_client = MagicMock()
+    event = {"type": "app_home_opened", "user": "U123", "tab": "home"}
+
+    # Act
+    home_opened(mock_client, event, MagicMock())
+    home_opened(mock_client, event, MagicMock())
+
+    # Assert
+    mock_client.views_publish.assert_called_once_with(user_id="U123", view=HOME_VIEW)
+
+
+def test_home_opened_trusts_version_in_published_view():
+    """Test that the version stored in the user's current view decides whether to republish."""
+    # Arrange
+    mock_client = MagicMock()
+    current = {"user": "U123", "tab": "home", "view": {"private_metadata": HOME_VIEW_VERSION}}
+    stale = {"user": "U456", "tab": "home", "view": {"private_metadata": "old-version"}}
+
+    # Act
+    home_opened(mock_client, current, MagicMock())
+    home_opened(mock_client, stale, MagicMock())
+
+    # Assert
+    mock_client.views_publish.assert_called_once_with(user_id="U456", view=HOME_VIEW)
+
+
+def test_home_opened_skips_messages_tab():
+    """Test that opening the Messages tab does not publish the home view."""
+    # Arrange
+    mock_client = MagicMock()
+
+    # Act
+    home_opened(mock_client, {"user": "U123", "tab": "messages"}, MagicMock())
+
+    # Assert
+    mock_client.views_publish.assert_not_called()
+
+
+def test_revision_bump_changes_version():
+    """Test that bumping HOME_VIEW_REVISION invalidates every published view."""
+    # Act
+    with patch("listeners.home_tab.HOME_VIEW_REVISION", 2):
+        bumped = build_home_view()
+
+    # Assert
+    assert bumped["blocks"] == HOME_VIEW["blocks"]
+    assert bumped["private_metadata"] != HOME_VIEW_VERSION
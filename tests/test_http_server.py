@@ -0,0 +1,147 @@
+"""
+Tests for the http_server module.
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+
+from slack_bolt import App, BoltResponse
+from slack_bolt.oauth.oauth_settings import OAuthSettings
+from slack_sdk.oauth.installation_store.sqlite3 import SQLite3InstallationStore
+from slack_sdk.oauth.state_store.sqlite3 import SQLite3OAuthStateStore
+from slack_sdk.signature import SignatureVerifier
+from starlette.testclient import TestClient
+
+from lib.http_server import HEALTH_PATH, SLACK_EVENTS_PATH, build_http_api, http_workers
+
+SIGNING_SECRET = "test-signing-secret"
+
+
+def _bolt_app():
+    return App(token="xoxb-test", signing_secret=SIGNING_SECRET, token_verification_enabled=False)
+
+
+def _signed_headers(body: str, timestamp: str):
+    signature = SignatureVerifier(SIGNING_SECRET).generate_signature(timestamp=timestamp, body=body)
+    return {
+        "Content-Type": "application/json",
+        "X-Slack-Request-Timestamp": timestamp,
+        "X-Slack-Signature": signature,
+    }
+
+
+def test_signed_url_verification_is_answered():
+    """Test that a correctly signed url_verification request gets its challenge back."""
+    # Arrange
+    body = json.dumps({"type": "url_verification", "challenge": "abc123"})
+    client = TestClient(build_http_api(_bolt_app()))
+
+    # Act
+    response = client.post(SLACK_EVENTS_PATH, content=body, headers=_signed_headers(body, str(int(time.time()))))
+
+    # Assert
+    assert response.status_code == 200
+    assert "abc123" in response.text
+
+
+def test_unsigned_and_stale_requests_are_rejected():
+    """Test that requests with a bad or replayed signature never reach the listeners."""
+    # Arrange
+    body = json.dumps({"type": "url_verification", "challenge": "abc123"})
+    client = TestClient(build_http_api(_bolt_app()))
+    forged = dict(_signed_headers(body, str(int(time.time()))), **{"X-Slack-Signature": "v0=forged"})
+    stale = _signed_headers(body, str(int(time.time()) - 10 * 60))
+
+    # Act
+    forged_response = client.post(SLACK_EVENTS_PATH, content=body, headers=forged)
+    stale_response = client.post(SLACK_EVENTS_PATH, content=body, headers=stale)
+
+    # Assert
+    assert forged_response.status_code == 401
+    assert stale_response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_slow_dispatches_run_concurrently_off_the_event_loop():
+    """Test that Bolt's blocking dispatch runs on the thread pool, so one worker serves requests concurrently."""
+    # Arrange
+    bolt_app = _bolt_app()
+    on_loop = []
+
+    def slow_dispatch(request):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        time.sleep(0.3)
+        return BoltResponse(status=200, body="")
+
+    bolt_app.dispatch = slow_dispatch
+    transport = httpx.ASGITransport(app=build_http_api(bolt_app))
+
+    # Act
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(client.post(SLACK_EVENTS_PATH, content="{}") for _ in range(3)))
+        elapsed = time.perf_counter() - started
+
+    # Assert
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert on_loop == [False, False, False]
+    assert elapsed < 0.6
+
+
+def test_startup_and_shutdown_hooks_run_once_per_worker():
+    """Test that startup hooks run when the worker starts, and shutdown hooks only once it stops serving."""
+    # Arrange
+    hook, shutdown_hook = MagicMock(), MagicMock()
+    api = build_http_api(_bolt_app(), on_startup=[hook], on_shutdown=[shutdown_hook])
+
+    # Act
+    with TestClient(api) as client:
+        response = client.get(HEALTH_PATH)
+        shut_down_while_serving = shutdown_hook.called
+
+    # Assert
+    hook.assert_called_once_with()
+    assert response.text == "ok"
+    assert not shut_down_while_serving
+    shutdown_hook.assert_called_once_with()
+
+
+def test_oauth_install_page_is_served_when_configured(tmp_path):
+    """Test that an app with OAuth settings serves the install page linking to Slack's authorize URL."""
+    # Arrange
+    database = str(tmp_path / "installations.db")
+    bolt_app = App(
+        signing_secret=SIGNING_SECRET,
+        oauth_settings=OAuthSettings(
+            client_id="1.2",
+            client_secret="secret",
+            scopes=["chat:write"],
+            installation_store=SQLite3InstallationStore(database=database, client_id="1.2"),
+            state_store=SQLite3OAuthStateStore(database=database, expiration_seconds=600),
+        ),
+    )
+
+    # Act
+    response = TestClient(build_http_api(bolt_app)).get("/slack/install")
+
+    # Assert
+    assert response.status_code == 200
+    assert "https://slack.com/oauth/v2/authorize?state=" in response.text
+
+
+def test_http_workers_defaults_to_cpu_count():
+    """Test that the worker count comes from MOOAI_HTTP_WORKERS or the CPU count."""
+    # Act / Assert
+    with patch.dict("os.environ", {"MOOAI_HTTP_WORKERS": "3"}):
+        assert http_workers() == 3
+    with patch.dict("os.environ", {}, clear=True), patch("lib.http_server.os.cpu_count", return_value=6):
+        assert http_workers() == 6
@@ -0,0 +1,140 @@
+"""
+Tests for the image_descriptions module.
+"""
+
+import threading
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from lib.attachment_budget import AttachmentBudget, configure_attachment_budget
+from lib.file_utils import extract_files_from_slack_messages
+from lib.image_descriptions import (
+    ImageDescriptionCache,
+    configure_image_descriptions,
+    describe_images,
+    describe_in_background,
+    image_descriptions_total,
+    replace_with_descriptions,
+)
+from lib.usage import UsageLimitExceeded
+
+OLD_IMAGE = {"id": "F1", "name": "cows.png", "filetype": "png"}
+NEW_IMAGE = {"id": "F2", "name": "barn.jpg", "filetype": "jpg"}
+
+
+def _thread(latest_text="What else?"):
+    return [
+        {"user": "U1", "ts": "1.0", "text": "Look", "files": [OLD_IMAGE]},
+        {"bot_id": "B1", "ts": "2.0", "text": "Nice cows"},
+        {"user": "U1", "ts": "3.0", "text": latest_text, "files": [NEW_IMAGE]},
+    ]
+
+
+@pytest.fixture
+def description_cache():
+    """Configure a fresh image description cache for the test."""
+    cache = ImageDescriptionCache()
+    configure_image_descriptions(cache)
+    yield cache
+    configure_image_descriptions(None)
+
+
+def test_replace_with_descriptions_keeps_latest_and_referenced_images(description_cache):
+    """Test that only earlier, described images are replaced, unless the latest message asks about images."""
+    # Arrange
+    description_cache.put("F1", "Two cows in a field")
+    description_cache.put("F2", "A red barn")
+    candidates = [("1.0", OLD_IMAGE), ("3.0", NEW_IMAGE)]
+
+    # Act
+    remaining, described = replace_with_descriptions(_thread(), candidates)
+    referenced, _ = replace_with_descriptions(_thread("Which breed is in the photo?"), candidates)
+    named, _ = replace_with_descriptions(_thread("Zoom in on cows.png"), candidates)
+
+    # Assert
+    assert remaining == [("3.0", NEW_IMAGE)]
+    assert "Two cows in a field" in described["1.0"][0]["text"]
+    assert referenced == candidates
+    assert named == candidates
+
+
+@patch("lib.file_utils.describe_in_background")
+@patch("lib.file_utils.download_file")
+def test_extract_files_sends_description_and_describes_new_images(mock_download, mock_describe, description_cache):
+    """Test that a described image isn't downloaded again and a newly sent one is queued for description."""
+    # Arrange
+    description_cache.put("F1", "Two cows in a field")
+    mock_download.return_value = ("barn.jpg", b"jpeg bytes")
+
+    # Act
+    files_by_ts = extract_files_from_slack_messages(MagicMock(), _thread())
+
+    # Assert
+    mock_download.assert_called_once()
+    assert mock_download.call_args.args[1] == NEW_IMAGE
+    assert files_by_ts["1.0"][0]["type"] == "input_text"
+    assert files_by_ts["3.0"][0]["type"] == "input_image"
+    (pending,) = mock_describe.call_args.args
+    assert [file_id for file_id, _ in pending] == ["F2"]
+
+
+@pytest.mark.asyncio
+@patch("lib.agent.run_agent_with_messages", new_callable=AsyncMock)
+async def test_describe_images_caches_successes_only(mock_run_agent, description_cache):
+    """Test that descriptions are cached, failures are not, and neither stays pending."""
+    # Arrange
+    mock_run_agent.side_effect = ["  Two cows in a field\nText: MOO  ", Exception("boom")]
+    description_cache.claim("F1")
+    description_cache.claim("F2")
+
+    # Act
+    await describe_images([("F1", "data:image/png;base64,AAAA"), ("F2", "data:image/jpeg;base64,BBBB")])
+
+    # Assert
+    assert description_cache.get("F1") == "Two cows in a field\nText: MOO"
+    assert description_cache.get("F2") is None
+    assert description_cache.claim("F2")
+
+
+@pytest.mark.asyncio
+@patch("lib.image_descriptions.logger")
+@patch("lib.agent.run_agent_with_messages", new_callable=AsyncMock)
+async def test_refused_description_is_logged_without_a_traceback(mock_run_agent, mock_logger, description_cache):
+    """Test that a description refused by a usage quota is an info log, not an exception."""
+    # Arrange
+    mock_run_agent.side_effect = UsageLimitExceeded("team_tokens_per_day", 60)
+    description_cache.claim("F1")
+    limited_before = image_descriptions_total.value(outcome="limited")
+
+    # Act
+    await describe_images([("F1", "data:image/png;base64,AAAA")])
+
+    # Assert
+    mock_logger.exception.assert_not_called()
+    assert image_descriptions_total.value(outcome="limited") == limited_before + 1
+    assert description_cache.claim("F1")
+
+
+@patch("lib.image_descriptions._executor")
+def test_background_descriptions_are_skipped_when_full_or_over_budget(mock_executor, description_cache):
+    """Test that images past the pending limit or the attachment budget aren't held, and stay describable later."""
+    # Arrange
+    budget = AttachmentBudget(capacity_bytes=10)
+    configure_attachment_budget(budget)
+    description_cache.claim("F1")
+    description_cache.claim("F2")
+
+    # Act
+    try:
+        describe_in_background([("F1", "data:image/png;base64," + "A" * 100)])
+        with patch("lib.image_descriptions._pending_slots", threading.Semaphore(0)):
+            describe_in_background([("F2", "data:,")])
+    finally:
+        configure_attachment_budget(None)
+
+    # Assert
+    mock_executor.submit.assert_not_called()
+    assert budget.in_use == 0
+    assert description_cache.claim("F1")
+    assert description_cache.claim("F2")
@@ -0,0 +1,54 @@
+"""
+Tests for the installations module.
+"""
+
+from unittest.mock import MagicMock
+
+from slack_sdk.oauth.installation_store import Installation
+from slack_sdk.oauth.installation_store.sqlite3 import SQLite3InstallationStore
+
+from lib.installations import CachedInstallationStore, installation_lookups_total
+
+
+def _installation(bot_token):
+    return Installation(
+        app_id="A1", team_id="T1", user_id="U1", bot_token=bot_token, bot_id="B1", bot_user_id="UB1", user_token="xoxp-1"
+    )
+
+
+def test_lookups_are_cached_as_copies_and_dropped_on_save():
+    """Test that repeat lookups skip the store, callers can't alter the cached copy, and a save is seen at once."""
+    # Arrange
+    backing_store = MagicMock()
+    backing_store.find_installation.side_effect = [_installation("xoxb-old"), _installation("xoxb-new")]
+    store = CachedInstallationStore(backing_store)
+    hits_before = installation_lookups_total.value(outcome="hit")
+
+    # Act
+    first = store.find_installation(enterprise_id=None, team_id="T1")
+    first.user_token = None
+    second = store.find_installation(enterprise_id=None, team_id="T1")
+    store.save(_installation("xoxb-new"))
+    after_save = store.find_installation(enterprise_id=None, team_id="T1")
+
+    # Assert
+    assert installation_lookups_total.value(outcome="hit") == hits_before + 1
+    assert second.user_token == "xoxp-1"
+    assert after_save.bot_token == "xoxb-new"
+    assert backing_store.find_installation.call_count == 2
+
+
+def test_missing_installations_are_not_cached(tmp_path):
+    """Test that a workspace that wasn't installed yet is found as soon as it installs."""
+    # Arrange
+    store = CachedInstallationStore(SQLite3InstallationStore(database=str(tmp_path / "installations.db"), client_id="1.2"))
+    missing = store.find_installation(enterprise_id=None, team_id="T1")
+
+    # Act
+    store.store.save(_installation("xoxb-1"))
+    found = store.find_installation(enterprise_id=None, team_id="T1")
+
+    # Assert
+    assert missing is None
+    assert found.bot_token == "xoxb-1"
+    assert len(store) == 1
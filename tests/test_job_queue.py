@@ -0,0 +1,100 @@
+"""
+Tests for the job_queue module.
+"""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from lib.job_queue import STATUS_DONE, STATUS_QUEUED, JobQueueWorker, SQLiteJobQueue
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    return SQLiteJobQueue(str(tmp_path / "jobs.sqlite3"), visibility_timeout=30, max_attempts=2, retry_backoff=10)
+
+
+def test_enqueue_ignores_duplicate_dedupe_keys(job_queue):
+    """Test that a job with an existing dedupe key is not enqueued twice."""
+    # Act
+    first = job_queue.enqueue("thread_response", {"channel_id": "C1"}, dedupe_key="thread_response:C1:1.0")
+    second = job_queue.enqueue("thread_response", {"channel_id": "C1"}, dedupe_key="thread_response:C1:1.0")
+
+    # Assert
+    assert first is not None
+    assert second is None
+    assert job_queue.counts() == {STATUS_QUEUED: 1, "dead_letter": 0}
+
+
+def test_leased_job_is_hidden_until_its_lease_expires(job_queue):
+    """Test that a job held by a worker that died is handed to another worker after the visibility timeout."""
+    # Arrange
+    with patch("lib.job_queue.time.time", return_value=1000.0):
+        job_queue.enqueue("thread_response", {"channel_id": "C1"})
+        (first,) = job_queue.lease("worker-a")
+
+    # Act
+    with patch("lib.job_queue.time.time", return_value=1010.0):
+        while_leased = job_queue.lease("worker-b")
+    with patch("lib.job_queue.time.time", return_value=1031.0):
+        after_expiry = job_queue.lease("worker-b")
+        stale_complete = job_queue.complete(first.id, "worker-a")
+
+    # Assert
+    assert while_leased == []
+    assert [(job.id, job.attempts, job.lease_owner) for job in after_expiry] == [(first.id, 2, "worker-b")]
+    assert stale_complete is False
+
+
+def test_failed_job_is_retried_with_backoff_then_dead_lettered(job_queue):
+    """Test that failures are retried after the backoff and dead-lettered after max attempts."""
+    # Arrange
+    with patch("lib.job_queue.time.time", return_value=1000.0):
+        job_queue.enqueue("thread_response", {"channel_id": "C1"}, dedupe_key="k")
+        (job,) = job_queue.lease("worker-a")
+        job_queue.fail(job.id, "worker-a", "boom")
+
+    # Act
+    with patch("lib.job_queue.time.time", return_value=1005.0):
+        during_backoff = job_queue.lease("worker-a")
+    with patch("lib.job_queue.time.time", return_value=1011.0):
+        (retry,) = job_queue.lease("worker-a")
+        job_queue.fail(retry.id, "worker-a", "boom again")
+        requeued = job_queue.enqueue("thread_response", {"channel_id": "C1"}, dedupe_key="k")
+
+    # Assert
+    assert during_backoff == []
+    assert retry.attempts == 2
+    assert job_queue.counts() == {STATUS_DONE: 1, "dead_letter": 1}
+    assert job_queue.dead_letters()[0]["last_error"] == "boom again"
+    assert requeued is None
+
+
+def test_queue_survives_restart(tmp_path):
+    """Test that jobs enqueued before a restart are drained by a new process."""
+    # Arrange
+    path = str(tmp_path / "jobs.sqlite3")
+    SQLiteJobQueue(path).enqueue("thread_response", {"channel_id": "C1", "thread_ts": "1.0"})
+    handler = MagicMock()
+
+    # Act
+    worker = JobQueueWorker(SQLiteJobQueue(path), {"thread_response": handler})
+    ran = worker.run_once()
+
+    # Assert
+    assert ran is True
+    assert handler.call_args[0][0].payload == {"channel_id": "C1", "thread_ts": "1.0"}
+    assert worker.job_queue.counts() == {STATUS_DONE: 1, "dead_letter": 0}
+
+
+def test_worker_records_handler_errors_as_failures(job_queue):
+    """Test that a handler exception sends the job back for retry instead of completing it."""
+    # Arrange
+    job_queue.enqueue("thread_response", {})
+    worker = JobQueueWorker(job_queue, {"thread_response": MagicMock(side_effect=Exception("agent down"))})
+
+    # Act
+    worker.run_once()
+
+    # Assert
+    assert job_queue.counts() == {STATUS_QUEUED: 1, "dead_letter": 0}
@@ -0,0 +1,114 @@
+"""
+Tests for the logging_utils module.
+"""
+
+import io
+import json
+import logging
+import sys
+import time
+from unittest.mock import patch
+
+import pytest
+
+from lib.logging_utils import DebugSampler, JsonFormatter, ScrubbingQueueHandler, _stop_listener, configure_logging, scrub
+
+
+@pytest.fixture
+def restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    _stop_listener()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def _record(msg, *args, level=logging.INFO, **extra):
+    record = logging.LogRecord("mooai.test", level, __file__, 1, msg, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_scrub_truncates_and_redacts():
+    """Test that long text is truncated and tokens and base64 payloads are redacted."""
+    # Arrange
+    text = f"token xoxb-123-abc image data:image/png;base64,{'A' * 500} auth Bearer sk-abcdefghijklmnopqrstu"
+
+    # Act
+    cleaned = scrub(text)
+    truncated = scrub("x" * 50, limit=10)
+
+    # Assert
+    assert "xoxb-123" not in cleaned
+    assert "A" * 64 not in cleaned
+    assert "data:image/png;base64,<redacted>" in cleaned
+    assert "sk-abcdefghijklmnopqrstu" not in cleaned
+    assert truncated == "xxxxxxxxxx... [truncated 40 chars]"
+
+
+def test_queue_handler_prepares_records_cheaply_and_safely():
+    """Test that queued records have merged args, scrubbed extras and a pre-formatted traceback."""
+    # Arrange
+    handler = ScrubbingQueueHandler(None)
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        exc_info = sys.exc_info()
+    record = _record("Posted %s", "reply", token="xoxb-secret", payload={"file_data": "data:a/b;base64," + "Q" * 100})
+    record.exc_info = exc_info
+
+    # Act
+    prepared = handler.prepare(record)
+
+    # Assert
+    assert prepared.msg == "Posted reply" and prepared.args is None
+    assert prepared.token == "<redacted>"
+    assert "Q" * 64 not in prepared.payload
+    assert prepared.exc_info is None and "ValueError: boom" in prepared.exc_text
+
+
+def test_json_formatter_includes_extra_fields():
+    """Test that records are emitted as JSON with their extra fields."""
+    # Act
+    line = JsonFormatter().format(_record("Job %d done", 7, job="thread_response"))
+
+    # Assert
+    entry = json.loads(line)
+    assert entry["message"] == "Job 7 done"
+    assert entry["level"] == "INFO"
+    assert entry["job"] == "thread_response"
+
+
+def test_debug_sampler_keeps_budget_then_samples():
+    """Test that DEBUG records beyond the per-second budget are sampled and other levels always pass."""
+    # Arrange
+    sampler = DebugSampler(per_second=5, sample_every=10)
+
+    # Act
+    with patch("lib.logging_utils.time.monotonic", return_value=100.0):
+        kept = sum(sampler.filter(_record("debug", level=logging.DEBUG)) for _ in range(105))
+        warnings_kept = sum(sampler.filter(_record("warn", level=logging.WARNING)) for _ in range(20))
+
+    # Assert
+    assert kept == 5 + 10
+    assert warnings_kept == 20
+
+
+def test_configure_logging_writes_json_from_background_thread(restore_root_logger):
+    """Test that log calls are written by the listener thread as JSON lines."""
+    # Arrange
+    stream = io.StringIO()
+    configure_logging(level="INFO", json_output=True, stream=stream)
+
+    # Act
+    logging.getLogger("mooai.test").info("hello %s", "world", extra={"channel": "C1"})
+    logging.getLogger("mooai.test").debug("hidden")
+    deadline = time.monotonic() + 5
+    while not stream.getvalue() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # Assert
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(e["message"], e["channel"]) for e in entries] == [("hello world", "C1")]
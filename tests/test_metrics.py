@@ -0,0 +1,140 @@
+"""
+Tests for the metrics module.
+"""
+
+import urllib.error
+import urllib.request
+from unittest.mock import MagicMock, patch
+
+import pytest
+from slack_bolt import App
+from starlette.testclient import TestClient
+
+from lib.file_utils import attachments_total, extract_files_from_slack_messages
+from lib.http_server import build_http_api
+from lib.metrics import (
+    METRICS_PATH,
+    MetricsRegistry,
+    render_prometheus,
+    stage_errors_total,
+    stage_seconds,
+    start_metrics_server,
+    time_stage,
+)
+
+
+def test_render_prometheus_makes_histogram_buckets_cumulative():
+    """Test that histogram buckets are rendered cumulatively, followed by _sum and _count."""
+    # Arrange
+    registry = MetricsRegistry()
+    histogram = registry.histogram("payload_bytes", "Payload size", buckets=(10, 100))
+    for value in (5, 50, 50, 500):
+        histogram.observe(value, kind="pdf")
+
+    # Act
+    text = render_prometheus(registry)
+
+    # Assert
+    assert "# TYPE payload_bytes histogram" in text
+    assert 'payload_bytes_bucket{kind="pdf",le="10.0"} 1' in text
+    assert 'payload_bytes_bucket{kind="pdf",le="100.0"} 3' in text
+    assert 'payload_bytes_bucket{kind="pdf",le="+Inf"} 4' in text
+    assert 'payload_bytes_sum{kind="pdf"} 605.0' in text
+    assert 'payload_bytes_count{kind="pdf"} 4' in text
+
+
+def test_render_prometheus_escapes_label_values():
+    """Test that quotes, backslashes and newlines in label values are escaped."""
+    # Arrange
+    registry = MetricsRegistry()
+    registry.counter("errors_total", "Errors").inc(error='bad "quote"\\\n')
+
+    # Act
+    text = render_prometheus(registry)
+
+    # Assert
+    assert "# HELP errors_total Errors\n# TYPE errors_total counter\n" in text
+    assert 'errors_total{error="bad \\"quote\\"\\\\\\n"} 1.0' in text
+
+
+def test_time_stage_counts_errors_by_class_and_reraises():
+    """Test that a failing stage is timed, counted by exception class and re-raised."""
+    # Arrange
+    count_before = stage_seconds.count(stage="test_stage")
+
+    # Act
+    with pytest.raises(TimeoutError):
+        with time_stage("test_stage"):
+            raise TimeoutError("slow")
+
+    # Assert
+    assert stage_seconds.count(stage="test_stage") == count_before + 1
+    assert stage_errors_total.value(stage="test_stage", error="TimeoutError") >= 1
+
+
+def test_metrics_are_served_on_the_scrape_endpoint_and_http_route():
+    """Test that the standalone server and the HTTP mode route both serve the exposition text."""
+    # Arrange
+    with time_stage("scrape_test"):
+        pass
+    server = start_metrics_server(0)
+    port = server.server_address[1]
+
+    try:
+        # Act
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{METRICS_PATH}") as response:
+            scraped = response.read().decode()
+            content_type = response.headers["Content-Type"]
+        with pytest.raises(urllib.error.HTTPError) as not_found:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/other")
+        bolt_app = App(token="xoxb-test", signing_secret="test-signing-secret", token_verification_enabled=False)
+        routed = TestClient(build_http_api(bolt_app, metrics_token="scrape")).get(
+            METRICS_PATH, headers={"Authorization": "Bearer scrape"}
+        )
+    finally:
+        server.shutdown()
+
+    # Assert
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert 'reply_stage_seconds_count{stage="scrape_test"}' in scraped
+    assert not_found.value.code == 404
+    assert routed.status_code == 200
+    assert 'reply_stage_seconds_count{stage="scrape_test"}' in routed.text
+
+
+def test_http_metrics_route_needs_its_token():
+    """Test that the public HTTP app only serves metrics when a token is configured, and only to its bearer."""
+    # Arrange
+    bolt_app = App(token="xoxb-test", signing_secret="test-signing-secret", token_verification_enabled=False)
+
+    # Act
+    unmounted = TestClient(build_http_api(bolt_app)).get(METRICS_PATH)
+    client = TestClient(build_http_api(bolt_app, metrics_token="scrape"))
+    anonymous = client.get(METRICS_PATH)
+    wrong = client.get(METRICS_PATH, headers={"Authorization": "Bearer guess"})
+
+    # Assert
+    assert unmounted.status_code == 404
+    assert anonymous.status_code == 401
+    assert wrong.status_code == 401
+
+
+@patch("lib.file_utils.download_file")
+def test_attachment_outcomes_are_counted(mock_download):
+    """Test that each attachment is counted as attached or failed to download."""
+    # Arrange
+    slack_messages = [
+        {"user": "U1", "ts": "1.0", "files": [{"id": "F1", "name": "image.png", "filetype": "png"}]},
+        {"user": "U1", "ts": "2.0", "files": [{"id": "F2", "name": "lost.png", "filetype": "png"}]},
+    ]
+    mock_download.side_effect = [("image.png", b"\x89PNG" * 10), None]
+    attached_before = attachments_total.value(filetype="png", outcome="attached")
+    failed_before = attachments_total.value(filetype="png", outcome="download_failed")
+
+    # Act
+    files_by_ts = extract_files_from_slack_messages(MagicMock(), slack_messages)
+
+    # Assert
+    assert list(files_by_ts) == ["1.0"]
+    assert attachments_total.value(filetype="png", outcome="attached") == attached_before + 1
+    assert attachments_total.value(filetype="png", outcome="download_failed") == failed_before + 1
@@ -0,0 +1,66 @@
+"""
+Tests for lazy imports and the prewarm module.
+"""
+
+import subprocess
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from agents.usage import Usage
+
+from lib.agent import get_agent, run_agent_with_messages_sync
+from lib.prewarm import PREWARM_STEPS, prewarm
+
+
+def test_importing_listeners_does_not_load_heavy_modules():
+    """Test that the agent SDK, openai, PyPDF2 and requests are only imported on first use."""
+    # Arrange
+    code = (
+        "import sys, listeners; "
+        "print(','.join(m for m in ('agents', 'openai', 'PyPDF2', 'requests') if m in sys.modules))"
+    )
+
+    # Act
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    # Assert
+    assert result.stdout.strip() == ""
+
+
+def test_prewarm_times_every_step_and_survives_failures():
+    """Test that prewarm reports each step and a failing step doesn't stop the others."""
+    # Arrange
+    failing = MagicMock(side_effect=Exception("no network"))
+    succeeding = MagicMock()
+
+    # Act
+    with patch("lib.prewarm.PREWARM_STEPS", [("failing", failing), ("succeeding", succeeding)]), patch("lib.prewarm.logger"):
+        timings = prewarm()
+
+    # Assert
+    assert set(timings) == {"failing", "succeeding"}
+    succeeding.assert_called_once_with()
+
+
+def test_prewarm_builds_the_listener_agent():
+    """Test that the agents step builds the cached agent that the listeners' agent runs then reuse."""
+    # Arrange
+    steps = dict(PREWARM_STEPS)
+    mock_result = MagicMock()
+    mock_result.final_output = "Moo"
+    mock_result.context_wrapper.usage = Usage(requests=1, input_tokens=1, output_tokens=1, total_tokens=2)
+    get_agent.cache_clear()
+
+    # Act
+    with patch("lib.agent.Agent") as MockAgent, patch("lib.agent.WebSearchTool"), patch("lib.agent.Runner") as MockRunner:
+        MockRunner.run = AsyncMock(return_value=mock_result)
+        steps["agents"]()
+        hits_before = get_agent.cache_info().hits
+        run_agent_with_messages_sync([{"role": "user", "content": "Hello"}], use_structured_output=True)
+        hits = get_agent.cache_info().hits - hits_before
+    get_agent.cache_clear()
+
+    # Assert
+    MockAgent.assert_called_once()
+    assert MockAgent.call_args[1]["output_type"] is not None
+    assert hits == 1
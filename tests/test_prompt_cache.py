@@ -0,0 +1,200 @@
+"""
+Tests for the prompt_cache module.
+"""
+
+import datetime
+import threading
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from lib.constants import SUGGESTED_PROMPTS
+from lib.models import StructuredResponse
+from lib.prompt_cache import (
+    PromptAnswerCache,
+    PromptPrewarmer,
+    SQLitePromptAnswerCache,
+    cached_first_answer,
+    cached_first_answer_async,
+    configure_prompt_cache,
+    parse_refresh_times,
+    prompt_messages,
+)
+from listeners.assistant import respond_in_assistant_thread
+
+PROMPT = prompt_messages(SUGGESTED_PROMPTS)[0]
+
+
+def _answer(text="Good news, moo"):
+    return StructuredResponse(thread_title="News", message_title="🐮 News", response=text, followups=None)
+
+
+@pytest.fixture
+def prompt_cache():
+    """Configure a fresh prompt cache for the test."""
+    cache = PromptAnswerCache()
+    configure_prompt_cache(cache)
+    yield cache
+    configure_prompt_cache(None)
+
+
+def test_parse_refresh_times_sorts_times():
+    """Test that refresh times are parsed from HH:MM and sorted."""
+    # Act / Assert
+    assert parse_refresh_times("13:30, 07:00") == [datetime.time(7, 0), datetime.time(13, 30)]
+    with pytest.raises(ValueError):
+        parse_refresh_times(" , ")
+
+
+def test_seconds_until_next_refresh_rolls_over_to_tomorrow():
+    """Test that the next refresh is later today, or at the first time tomorrow."""
+    # Arrange
+    prewarmer = PromptPrewarmer(PromptAnswerCache(), [], refresh_times=[datetime.time(7, 0), datetime.time(13, 0)])
+
+    # Act / Assert
+    assert prewarmer.seconds_until_next_refresh(datetime.datetime(2025, 5, 1, 8, 0)) == 5 * 60 * 60
+    assert prewarmer.seconds_until_next_refresh(datetime.datetime(2025, 5, 1, 14, 0)) == 17 * 60 * 60
+
+
+def test_cache_entries_expire(prompt_cache):
+    """Test that an answer older than the TTL is not served."""
+    # Arrange
+    prompt_cache.ttl_seconds = -1
+    prompt_cache.put(PROMPT, _answer())
+
+    # Act / Assert
+    assert prompt_cache.get(PROMPT) is None
+
+
+@pytest.mark.asyncio
+@patch("lib.agent.run_agent_with_messages", new_callable=AsyncMock)
+async def test_refresh_keeps_previous_answer_when_agent_fails(mock_run_agent, prompt_cache):
+    """Test that refreshing caches each answer and a failed prompt keeps its old one."""
+    # Arrange
+    prompt_cache.put("📧 Help me write an email", _answer("old"))
+    mock_run_agent.side_effect = [_answer(), Exception("boom")]
+    prewarmer = PromptPrewarmer(prompt_cache, [PROMPT, "📧 Help me write an email"])
+
+    # Act
+    refreshed = await prewarmer.refresh()
+
+    # Assert
+    assert refreshed == 1
+    assert prompt_cache.get(PROMPT).response == "Good news, moo"
+    assert prompt_cache.get("📧 Help me write an email").response == "old"
+
+
+def test_sqlite_cache_is_shared_and_each_refresh_claimed_once(tmp_path):
+    """Test that processes sharing the SQLite cache read each other's answers and only one claims a refresh."""
+    # Arrange
+    path = str(tmp_path / "prompts.sqlite3")
+    refresher, reader = SQLitePromptAnswerCache(path), SQLitePromptAnswerCache(path)
+    at = datetime.datetime(2025, 5, 1, 7, 0)
+
+    # Act
+    refresher.put(PROMPT, _answer())
+    refresher.put("plain", "Moo")
+    claims = [PromptPrewarmer(cache, [PROMPT]).claim_scheduled(at) for cache in (refresher, reader)]
+
+    # Assert
+    assert reader.get(f"  {PROMPT} ") == _answer()
+    assert reader.get("plain") == "Moo"
+    assert claims == [True, False]
+
+
+def test_startup_only_fills_missing_answers_once(tmp_path):
+    """Test that a (re)started worker computes nothing when the shared answers exist, and only one fills gaps."""
+    # Arrange
+    path = str(tmp_path / "prompts.sqlite3")
+    first, second = SQLitePromptAnswerCache(path), SQLitePromptAnswerCache(path)
+    first.put(PROMPT, _answer())
+    prompts = [PROMPT, "📧 Help me write an email"]
+
+    # Act
+    first_fill = PromptPrewarmer(first, prompts).claim_startup_fill()
+    second_fill = PromptPrewarmer(second, prompts).claim_startup_fill()
+    first.put("📧 Help me write an email", _answer("email"))
+    restarted_fill = PromptPrewarmer(SQLitePromptAnswerCache(path), prompts).claim_startup_fill()
+
+    # Assert
+    assert first_fill == ["📧 Help me write an email"]
+    assert second_fill == []
+    assert restarted_fill == []
+
+
+def test_cached_first_answer_only_for_new_threads(prompt_cache):
+    """Test that only a thread whose one user message is the prompt is answered from the cache."""
+    # Arrange
+    prompt_cache.put(PROMPT, _answer())
+    greeting = {"bot_id": "B1", "text": "Hi!"}
+    first = {"user": "U1", "text": PROMPT}
+
+    # Act / Assert
+    assert cached_first_answer([greeting, first]) is not None
+    assert cached_first_answer([greeting, {"user": "U1", "text": "Hello"}, first]) is None
+    assert cached_first_answer([greeting, {"user": "U1", "text": PROMPT, "files": [{"id": "F1"}]}]) is None
+
+
+@pytest.mark.asyncio
+@patch("lib.agent.run_agent_with_messages", new_callable=AsyncMock)
+async def test_async_prewarm_and_lookup_read_the_sqlite_cache_off_the_event_loop(mock_run_agent, tmp_path):
+    """Test that the async app's startup fill and first-answer lookup only touch the SQLite cache from threads."""
+    # Arrange
+    mock_run_agent.return_value = _answer()
+    cache = SQLitePromptAnswerCache(str(tmp_path / "prompts.sqlite3"))
+    loop_thread = threading.current_thread()
+    calls = []
+    for name in ("get", "put", "claim_refresh"):
+
+        def recording(*args, _method=getattr(cache, name), _name=name):
+            calls.append((_name, threading.current_thread() is loop_thread))
+            return _method(*args)
+
+        setattr(cache, name, recording)
+    prewarmer = PromptPrewarmer(cache, [PROMPT])
+    # Stop after the startup fill instead of waiting for the first scheduled refresh
+    prewarmer.stop()
+    configure_prompt_cache(cache)
+
+    # Act
+    try:
+        await prewarmer.run_async()
+        answer = await cached_first_answer_async([{"user": "U1", "text": PROMPT}])
+    finally:
+        configure_prompt_cache(None)
+
+    # Assert
+    assert answer.response == "Good news, moo"
+    assert {name for name, _ in calls} == {"get", "put", "claim_refresh"}
+    assert not any(on_loop for _, on_loop in calls)
+
+
+@patch("listeners.assistant.fetch_slack_thread")
+@patch("listeners.assistant.extract_files_from_slack_messages")
+@patch("listeners.assistant.run_agent_with_messages_sync")
+def test_respond_in_assistant_thread_serves_cached_answer(
+    mock_run_agent, mock_extract_files, mock_fetch_thread, prompt_cache
+):
+    """Test that a new thread starting with a prewarmed prompt is answered without running the agent."""
+    # Arrange
+    prompt_cache.put(PROMPT, _answer())
+    mock_fetch_thread.return_value = [{"bot_id": "B1", "text": "Hi!"}, {"user": "U1", "text": PROMPT}]
+    mock_say, mock_set_title = MagicMock(), MagicMock()
+
+    # Act
+    respond_in_assistant_thread(
+        payload={},
+        logger=MagicMock(),
+        context=MagicMock(),
+        set_status=MagicMock(),
+        client=MagicMock(),
+        say=mock_say,
+        set_title=mock_set_title,
+        set_suggested_prompts=MagicMock(),
+    )
+
+    # Assert
+    mock_run_agent.assert_not_called()
+    mock_extract_files.assert_not_called()
+    mock_set_title.assert_called_once_with("News")
+    assert "Good news, moo" in mock_say.call_args.kwargs["text"]
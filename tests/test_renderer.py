@@ -0,0 +1,88 @@
+"""
+Tests for the renderer module.
+"""
+
+from lib.renderer import (
+    MESSAGE_BLOCK_LIMIT,
+    SECTION_TEXT_LIMIT,
+    render_mrkdwn_messages,
+    split_mrkdwn,
+)
+
+
+def test_split_mrkdwn_short_text_is_unchanged():
+    """Test that text within the limit is returned as a single chunk."""
+    # Act
+    result = split_mrkdwn("Hello *world*")
+
+    # Assert
+    assert result == ["Hello *world*"]
+
+
+def test_split_mrkdwn_splits_on_paragraphs():
+    """Test that long text is split on paragraph boundaries within the limit."""
+    # Arrange
+    paragraphs = [f"Paragraph {i} " + "x" * 40 for i in range(10)]
+    text = "\n\n".join(paragraphs)
+
+    # Act
+    result = split_mrkdwn(text, limit=120)
+
+    # Assert
+    assert all(len(chunk) <= 120 for chunk in result)
+    assert "\n\n".join(result) == text
+
+
+def test_split_mrkdwn_keeps_code_fences_balanced():
+    """Test that a code block larger than the limit is re-fenced in every chunk."""
+    # Arrange
+    code = "\n".join(f"print({i})" for i in range(100))
+    text = f"Intro\n\n```\n{code}\n```\n\nOutro"
+
+    # Act
+    result = split_mrkdwn(text, limit=200)
+
+    # Assert
+    assert all(len(chunk) <= 200 for chunk in result)
+    assert all(chunk.count("```") % 2 == 0 for chunk in result)
+    assert result[0].startswith("Intro")
+    assert result[-1].endswith("Outro")
+
+
+def test_split_mrkdwn_hard_splits_long_words():
+    """Test that a single word longer than the limit is still split."""
+    # Act
+    result = split_mrkdwn("a" * 250, limit=100)
+
+    # Assert
+    assert [len(chunk) for chunk in result] == [100, 100, 50]
+
+
+def test_render_mrkdwn_messages_single_section():
+    """Test that a short response renders as one message with a header and a section."""
+    # Act
+    messages = render_mrkdwn_messages("Short answer", title="Title", title_divider=True)
+
+    # Assert
+    assert len(messages) == 1
+    assert messages[0].text == "Short answer"
+    assert [block.type for block in messages[0].blocks] == ["header", "divider", "section"]
+
+
+def test_render_mrkdwn_messages_splits_sections_and_messages():
+    """Test that a very long response is split into sections and then into several messages."""
+    # Arrange
+    paragraph = "y" * (SECTION_TEXT_LIMIT - 10)
+    mrkdwn = "\n\n".join([paragraph] * (MESSAGE_BLOCK_LIMIT + 5))
+
+    # Act
+    messages = render_mrkdwn_messages(mrkdwn, title="Title")
+
+    # Assert
+    assert len(messages) == 2
+    assert all(len(message.blocks) <= MESSAGE_BLOCK_LIMIT for message in messages)
+    assert messages[0].blocks[0].type == "header"
+    assert messages[1].blocks[0].type == "section"
+    sections = [block for message in messages for block in message.blocks if block.type == "section"]
+    assert len(sections) == MESSAGE_BLOCK_LIMIT + 5
+    assert all(len(block.text.text) <= SECTION_TEXT_LIMIT for block in sections)
@@ -0,0 +1,131 @@
+"""
+Tests for the sharding module.
+"""
+
+import multiprocessing
+import os
+import time
+from unittest.mock import MagicMock, patch
+
+from lib.sharding import ShardedDispatcher, rendezvous_owner, thread_key
+
+
+def _record_pid(results, value):
+    results.put((value, os.getpid()))
+
+
+def _collect(results, count, timeout=10.0):
+    collected = []
+    deadline = time.monotonic() + timeout
+    while len(collected) < count and time.monotonic() < deadline:
+        collected.append(results.get(timeout=max(deadline - time.monotonic(), 0.01)))
+    return collected
+
+
+def test_rendezvous_owner_only_moves_keys_of_removed_shard():
+    """Test that removing a shard reassigns only the keys it owned."""
+    # Arrange
+    keys = [thread_key("C1", f"{i}.000") for i in range(1000)]
+    before = {key: rendezvous_owner(key, [0, 1, 2, 3]) for key in keys}
+
+    # Act
+    after = {key: rendezvous_owner(key, [0, 1, 3]) for key in keys}
+
+    # Assert
+    moved = [key for key in keys if before[key] != after[key]]
+    assert moved and all(before[key] == 2 for key in moved)
+    assert {before[key] for key in keys} == {0, 1, 2, 3}
+
+
+def test_same_thread_always_runs_in_same_process():
+    """Test that every job for a thread is handled by the same worker process."""
+    # Arrange
+    results = multiprocessing.get_context("fork").Queue()
+    dispatcher = ShardedDispatcher(lambda value: _record_pid(results, value), workers=3)
+    dispatcher.start()
+
+    # Act
+    for i in range(6):
+        dispatcher.submit(thread_key("C1", "111.000"), i)
+    collected = _collect(results, 6)
+    dispatcher.shutdown()
+
+    # Assert
+    assert len(collected) == 6
+    assert len({pid for _, pid in collected}) == 1
+
+
+def test_shard_runs_its_jobs_concurrently():
+    """Test that a worker process runs several slow jobs at once instead of one after another."""
+    # Arrange
+    results = multiprocessing.get_context("fork").Queue()
+
+    def slow(value):
+        time.sleep(0.5)
+        _record_pid(results, value)
+
+    dispatcher = ShardedDispatcher(slow, workers=1, threads=4)
+    dispatcher.start()
+
+    # Act
+    started = time.monotonic()
+    for i in range(4):
+        dispatcher.submit(thread_key("C1", f"{i}.000"), i)
+    collected = _collect(results, 4)
+    elapsed = time.monotonic() - started
+    dispatcher.shutdown()
+
+    # Assert
+    assert len(collected) == 4
+    assert elapsed < 1.5
+
+
+def test_dead_worker_is_respawned_and_unanswered_jobs_replayed():
+    """Test that a dead worker is replaced, and only its in-flight jobs that still need a reply are replayed."""
+    # Arrange
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    released = context.Event()
+
+    def handler(value):
+        released.wait(10)
+        _record_pid(results, value)
+
+    dispatcher = ShardedDispatcher(handler, workers=1, should_replay=lambda value: value == "pending")
+    dispatcher.start()
+    original = dispatcher._processes[0]
+
+    # Act
+    dispatcher.submit("C1:1.0", "answered")
+    dispatcher.submit("C1:2.0", "pending")
+    original.kill()
+    original.join(5)
+    deadline = time.monotonic() + 5
+    while dispatcher._processes[0] is original and time.monotonic() < deadline:
+        time.sleep(0.05)
+    released.set()
+    collected = _collect(results, 1)
+    time.sleep(0.5)
+    alive = dispatcher.alive_shards()
+    dispatcher.shutdown()
+
+    # Assert
+    assert [value for value, _ in collected] == ["pending"]
+    assert results.empty()
+    assert collected[0][1] == dispatcher._processes[0].pid != original.pid
+    assert alive == [0]
+
+
+def test_submit_runs_inline_without_workers():
+    """Test that jobs run on the caller's thread when no worker is alive."""
+    # Arrange
+    handler = MagicMock()
+    dispatcher = ShardedDispatcher(handler, workers=1)
+
+    # Act
+    with patch("lib.sharding.logger"):
+        shard = dispatcher.submit("C1:1.0", "C1", "1.0")
+
+    # Assert
+    assert shard is None
+    handler.assert_called_once_with("C1", "1.0")
@@ -0,0 +1,225 @@
+"""
+Tests for the slack_client module.
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from slack_bolt import BoltContext
+from slack_sdk import WebClient
+from slack_sdk.http_retry.request import HttpRequest
+from slack_sdk.http_retry.response import HttpResponse
+from slack_sdk.http_retry.state import RetryState
+
+from lib.slack_client import (
+    RateLimitRetryHandler,
+    RateLimitedWebClient,
+    SlackRateLimiter,
+    TeamClients,
+    TokenBucket,
+    build_rate_limit_middleware,
+)
+
+
+def test_token_bucket_allows_burst_then_waits():
+    """Test that a bucket hands out its burst capacity immediately and then asks callers to wait."""
+    # Arrange
+    bucket = TokenBucket(rate_per_minute=60, capacity=2)
+
+    # Act
+    waits = [bucket.reserve() for _ in range(3)]
+
+    # Assert
+    assert waits[0] == 0
+    assert waits[1] == 0
+    assert 0.9 < waits[2] <= 1.0
+
+
+def test_token_bucket_penalize_delays_next_reservation():
+    """Test that a Retry-After penalty delays the next caller by at least that long."""
+    # Arrange
+    bucket = TokenBucket(rate_per_minute=6000, capacity=10)
+
+    # Act
+    bucket.penalize(2)
+    wait = bucket.reserve()
+
+    # Assert
+    assert wait >= 1.9
+
+
+def test_rate_limiter_uses_per_channel_buckets_for_post_message():
+    """Test that chat.postMessage buckets are keyed per channel while other methods are shared."""
+    # Arrange
+    limiter = SlackRateLimiter()
+
+    # Act / Assert
+    assert limiter.bucket("chat.postMessage", "C1") is not limiter.bucket("chat.postMessage", "C2")
+    assert limiter.bucket("files.info", "C1") is limiter.bucket("files.info", "C2")
+
+
+def test_rate_limiter_share_scales_every_bucket():
+    """Test that a process given a share of the limits gets buckets refilling at that fraction of the tier rates."""
+    # Arrange
+    limiter = SlackRateLimiter()
+    full = limiter.bucket("files.info")
+
+    # Act
+    limiter.set_share(0.25)
+
+    # Assert
+    assert limiter.bucket("files.info") is not full
+    assert limiter.bucket("files.info").rate == full.rate / 4
+    assert limiter.bucket("chat.postMessage", "C1").rate == 0.25
+
+
+def test_background_calls_wait_for_urgent_calls():
+    """Test that a background call (views.publish) queues behind an in-flight user-facing call."""
+    # Arrange
+    limiter = SlackRateLimiter(background_max_delay=5)
+    order = []
+    urgent_started = threading.Event()
+
+    def urgent():
+        with limiter.slot("chat.postMessage", "C1"):
+            urgent_started.set()
+            time.sleep(0.1)
+            order.append("urgent")
+
+    def background():
+        urgent_started.wait()
+        with limiter.slot("views.publish"):
+            order.append("background")
+
+    # Act
+    threads = [threading.Thread(target=urgent), threading.Thread(target=background)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Assert
+    assert order == ["urgent", "background"]
+
+
+def test_retry_handler_penalizes_method_bucket():
+    """Test that a 429 response pauses the bucket of the method that was rate limited."""
+    # Arrange
+    limiter = MagicMock()
+    handler = RateLimitRetryHandler(limiter)
+    request = HttpRequest(
+        method="POST",
+        url="https://slack.com/api/chat.postMessage",
+        headers={},
+        body_params={"channel": "C1"},
+    )
+    response = HttpResponse(status_code=429, headers={"Retry-After": ["3"]})
+
+    # Act
+    with patch("slack_sdk.http_retry.builtin_handlers.time.sleep"):
+        handler.prepare_for_next_attempt(state=RetryState(), request=request, response=response)
+
+    # Assert
+    limiter.penalize.assert_called_once_with("chat.postMessage", 3.0, "C1")
+
+
+def test_retry_handler_reads_channel_from_query_string_and_json_body():
+    """Test that a 429 pauses the channel's bucket when the channel was sent in the URL or a JSON body."""
+    # Arrange
+    limiter = MagicMock()
+    handler = RateLimitRetryHandler(limiter)
+    get_request = HttpRequest(
+        method="GET",
+        url="https://slack.com/api/chat.postMessage?channel=C1&ts=1.0",
+        headers={},
+    )
+    json_request = HttpRequest(
+        method="POST",
+        url="https://slack.com/api/chat.postMessage",
+        headers={"Content-Type": ["application/json;charset=utf-8"]},
+        data=b'{"channel": "C2", "text": "hi"}',
+    )
+    response = HttpResponse(status_code=429, headers={"Retry-After": ["3"]})
+
+    # Act
+    with patch("slack_sdk.http_retry.builtin_handlers.time.sleep"):
+        handler.prepare_for_next_attempt(state=RetryState(), request=get_request, response=response)
+        handler.prepare_for_next_attempt(state=RetryState(), request=json_request, response=response)
+
+    # Assert
+    assert [c.args for c in limiter.penalize.call_args_list] == [
+        ("chat.postMessage", 3.0, "C1"),
+        ("chat.postMessage", 3.0, "C2"),
+    ]
+
+
+def test_penalize_without_channel_pauses_every_channel_bucket():
+    """Test that a channel-less 429 for a per-channel method pauses each of its channels' buckets."""
+    # Arrange
+    limiter = SlackRateLimiter()
+    first = limiter.bucket("chat.postMessage", "C1")
+    second = limiter.bucket("chat.postMessage", "C2")
+    other = limiter.bucket("chat.update")
+
+    # Act
+    limiter.penalize("chat.postMessage", 5)
+
+    # Assert
+    assert first.reserve() >= 4
+    assert second.reserve() >= 4
+    assert other.reserve() == 0
+
+
+def test_rate_limited_client_waits_for_slot():
+    """Test that every API call goes through the limiter slot for its method and channel."""
+    # Arrange
+    limiter = SlackRateLimiter()
+    client = RateLimitedWebClient(token="xoxb-test", rate_limiter=limiter)
+
+    # Act
+    with patch.object(limiter, "slot", wraps=limiter.slot) as mock_slot, patch.object(
+        WebClient, "api_call", return_value={"ok": True}
+    ):
+        client.chat_postMessage(channel="C1", text="hi")
+
+    # Assert
+    mock_slot.assert_called_once_with("chat.postMessage", "C1")
+
+
+def test_rate_limit_middleware_swaps_client():
+    """Test that the middleware replaces the per-request client with a rate-limited copy."""
+    # Arrange
+    limiter = SlackRateLimiter()
+    middleware = build_rate_limit_middleware(limiter)
+    context = BoltContext({"client": WebClient(token="xoxb-test")})
+    mock_next = MagicMock()
+
+    # Act
+    middleware(body={"event": {"type": "app_mention"}}, context=context, next=mock_next)
+
+    # Assert
+    assert isinstance(context["client"], RateLimitedWebClient)
+    assert context["client"].token == "xoxb-test"
+    assert context["client"].rate_limiter is limiter
+    mock_next.assert_called_once()
+
+
+def test_team_clients_pool_one_client_and_rate_limiter_per_workspace():
+    """Test that each workspace reuses its own client and limiter, rebuilt (same limiter) when its token changes."""
+    # Arrange
+    team_clients = TeamClients()
+
+    # Act
+    first = team_clients.client_for(None, "T1", WebClient(token="xoxb-1"))
+    again = team_clients.client_for(None, "T1", WebClient(token="xoxb-1"))
+    other = team_clients.client_for(None, "T2", WebClient(token="xoxb-2"))
+    rotated = team_clients.client_for(None, "T1", WebClient(token="xoxb-1-rotated"))
+
+    # Assert
+    assert again is first
+    assert first.workspace_id == "T1" and other.workspace_id == "T2"
+    assert other.rate_limiter is not first.rate_limiter
+    assert rotated is not first and rotated.token == "xoxb-1-rotated"
+    assert rotated.rate_limiter is first.rate_limiter
+    assert len(team_clients) == 2
@@ -2,6 +2,7 @@
 Tests for the slack_utils module.
 """
 
+import threading
 from unittest.mock import MagicMock, patch
 from lib.slack_utils import format_slack_messages_for_openai, fetch_slack_thread, markdown_to_mrkdwn
 
@@ -98,7 +99,9 @@ def test_markdown_to_mrkdwn_conversion():
     markdown_text = "**Bold** and *italic*"
 
     # Act
-    with patch("lib.slack_utils.SlackMarkdownConverter") as MockConverter:
+    with patch("lib.slack_utils.SlackMarkdownConverter") as MockConverter, patch(
+        "lib.slack_utils._converter_local", threading.local()
+    ):
         mock_instance = MockConverter.return_value
         mock_instance.convert.return_value = "*Bold* and _italic_"
 
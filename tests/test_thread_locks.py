@@ -0,0 +1,127 @@
+"""
+Tests for the thread_locks module.
+"""
+
+import asyncio
+import contextvars
+import threading
+
+import pytest
+
+from lib.thread_locks import AsyncKeyedLocks, KeyedQueues, serialized_per_thread, thread_lock_contended_total
+
+
+def test_busy_key_queues_calls_without_blocking_the_caller():
+    """Test that calls for a busy key return at once and run in order on the first caller's thread."""
+    # Arrange
+    queues = KeyedQueues(name="test")
+    order = []
+    first_running = threading.Event()
+    release_first = threading.Event()
+
+    def first():
+        first_running.set()
+        release_first.wait(2)
+        order.append(("first", threading.current_thread().name))
+
+    def later(name):
+        order.append((name, threading.current_thread().name))
+        return name
+
+    # Act
+    runner = threading.Thread(target=queues.submit, args=("C1:1.0", first), name="runner")
+    runner.start()
+    first_running.wait(2)
+    second = queues.submit("C1:1.0", later, "second")
+    third = queues.submit("C1:1.0", later, "third")
+    other = queues.submit("C2:1.0", later, "other thread")
+    queued_before_release = not second.done() and not third.done()
+    release_first.set()
+    runner.join(2)
+
+    # Assert
+    assert queued_before_release
+    assert other.result() == "other thread"
+    assert third.result(2) == "third"
+    assert order == [("other thread", "MainThread"), ("first", "runner"), ("second", "runner"), ("third", "runner")]
+    assert len(queues) == 0
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_queue_keeps_draining_after_a_call_stops_its_thread():
+    """Test that a call raising SystemExit fails its Future and the calls queued behind it still run."""
+    # Arrange
+    queues = KeyedQueues(name="test_exit")
+    first_running = threading.Event()
+    release_first = threading.Event()
+
+    def first():
+        first_running.set()
+        release_first.wait(2)
+
+    def exit_thread():
+        raise SystemExit()
+
+    # Act
+    runner = threading.Thread(target=queues.submit, args=("C1:1.0", first))
+    runner.start()
+    first_running.wait(2)
+    exiting = queues.submit("C1:1.0", exit_thread)
+    after = queues.submit("C1:1.0", lambda: "after")
+    release_first.set()
+    runner.join(2)
+
+    # Assert
+    assert isinstance(exiting.exception(2), SystemExit)
+    assert after.result(2) == "after"
+    assert len(queues) == 0
+
+
+def test_serialized_per_thread_passes_on_errors_and_context():
+    """Test that a failing handler's error lands in its Future and the next reply still runs in its own context."""
+    # Arrange
+    current = contextvars.ContextVar("current", default=None)
+
+    @serialized_per_thread
+    def handler(channel_id, thread_ts, fail):
+        if fail:
+            raise RuntimeError("boom")
+        return f"{channel_id}:{thread_ts}:{current.get()}"
+
+    # Act
+    failed = handler("C1", "1.0", True)
+    current.set("caller")
+    result = handler("C1", "1.0", False).result()
+
+    # Assert
+    with pytest.raises(RuntimeError):
+        failed.result()
+    assert result == "C1:1.0:caller"
+
+
+@pytest.mark.asyncio
+async def test_async_locks_are_fifo_and_skip_cancelled_waiters():
+    """Test that async holders run in arrival order and a cancelled waiter gives up its turn."""
+    # Arrange
+    locks = AsyncKeyedLocks(name="test_async")
+    order = []
+    contended_before = thread_lock_contended_total.value()
+
+    async def reply(name, delay=0.0):
+        async with locks.hold("C1:1.0"):
+            await asyncio.sleep(delay)
+            order.append(name)
+
+    # Act
+    first = asyncio.create_task(reply("first", 0.05))
+    await asyncio.sleep(0)
+    cancelled = asyncio.create_task(reply("cancelled"))
+    third = asyncio.create_task(reply("third"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await asyncio.gather(first, third, cancelled, return_exceptions=True)
+
+    # Assert
+    assert order == ["first", "third"]
+    assert thread_lock_contended_total.value() == contended_before + 2
+    assert len(locks) == 0
@@ -0,0 +1,170 @@
+"""
+Tests for the tracing module.
+"""
+
+import json
+import threading
+
+import pytest
+from slack_bolt import App, BoltRequest
+from slack_bolt.authorization import AuthorizeResult
+
+from lib.sharding import ShardedDispatcher
+from lib.tracing import (
+    ContextThreadPoolExecutor,
+    JsonlSpanExporter,
+    configure_span_exporter,
+    format_traceparent,
+    parse_traceparent,
+    span,
+    to_chrome_trace,
+    trace_app_dispatch,
+    traced,
+)
+from lib.worker_pool import WorkerPool
+
+
+@pytest.fixture
+def span_file(tmp_path):
+    """Export spans to a JSONL file for the duration of a test."""
+    path = tmp_path / "spans.jsonl"
+    exporter = JsonlSpanExporter(str(path))
+    configure_span_exporter(exporter)
+    yield path
+    configure_span_exporter(None)
+    exporter.close()
+
+
+def _read_spans(path):
+    with open(path, encoding="utf-8") as f:
+        return {event["name"]: event for event in map(json.loads, f)}
+
+
+def test_nested_spans_share_a_trace_and_record_errors(span_file):
+    """Test that a child span points at its parent and an exception is recorded on the span."""
+    # Arrange / Act
+    with span("parent", channel="C1"):
+        with pytest.raises(ValueError):
+            with span("child"):
+                raise ValueError("boom")
+
+    # Assert
+    spans = _read_spans(span_file)
+    parent, child = spans["parent"]["args"], spans["child"]["args"]
+    assert parent["parent_id"] is None and parent["channel"] == "C1"
+    assert child["trace_id"] == parent["trace_id"]
+    assert child["parent_id"] == parent["span_id"]
+    assert child["error"] == "ValueError"
+    assert spans["child"]["ph"] == "X" and spans["child"]["dur"] >= 0
+
+
+def test_spans_are_disabled_without_an_exporter():
+    """Test that span() is a no-op until an exporter is configured."""
+    # Act
+    with span("ignored") as current:
+        pass
+
+    # Assert
+    assert current is None
+
+
+def test_worker_pool_jobs_join_the_submitters_trace(span_file):
+    """Test that a job run on a worker thread is a child of the span that submitted it."""
+    # Arrange
+    pool = WorkerPool(size=1, queue_size=1)
+    done = threading.Event()
+
+    def job():
+        with span("job"):
+            pass
+        done.set()
+
+    # Act
+    with span("submit"):
+        pool.submit("test", job)
+    done.wait(5)
+    pool.shutdown()
+
+    # Assert
+    spans = _read_spans(span_file)
+    assert spans["job"]["args"]["parent_id"] == spans["submit"]["args"]["span_id"]
+
+
+def test_listener_spans_are_children_of_the_event_span(span_file):
+    """Test that a Bolt listener run on the listener executor joins the slack.event trace."""
+    # Arrange
+    app = App(
+        signing_secret="secret",
+        authorize=lambda **kwargs: AuthorizeResult(
+            enterprise_id=None, team_id="T1", bot_token="xoxb-test", bot_user_id="UBOT"
+        ),
+        request_verification_enabled=False,
+        listener_executor=ContextThreadPoolExecutor(max_workers=1),
+    )
+    handled = threading.Event()
+
+    @app.event("app_mention")
+    @traced("handle_mention")
+    def handle_mention(body, logger):
+        handled.set()
+
+    trace_app_dispatch(app)
+    body = {
+        "type": "event_callback",
+        "event_id": "Ev1",
+        "team_id": "T1",
+        "authorizations": [{"user_id": "UBOT", "team_id": "T1", "is_bot": True}],
+        "event": {"type": "app_mention", "channel": "C1", "user": "U1", "text": "hi", "ts": "1.0"},
+    }
+
+    # Act
+    response = app.dispatch(BoltRequest(body=json.dumps(body), headers={"content-type": ["application/json"]}))
+    handled.wait(5)
+    app.listener_runner.listener_executor.shutdown(wait=True)
+
+    # Assert
+    spans = _read_spans(span_file)
+    event = spans["slack.event"]["args"]
+    assert response.status == 200
+    assert event["type"] == "app_mention" and event["event_id"] == "Ev1"
+    assert spans["handle_mention"]["args"]["parent_id"] == event["span_id"]
+
+
+def _child_span(name):
+    with span(name):
+        pass
+
+
+def test_shard_jobs_carry_the_trace_to_worker_processes(span_file):
+    """Test that a job run in a forked shard worker is parented on the submitting span."""
+    # Arrange
+    dispatcher = ShardedDispatcher(_child_span, workers=1)
+    dispatcher.start()
+
+    # Act
+    with span("submit"):
+        dispatcher.submit("C1:1.0", "shard_job")
+    dispatcher.shutdown()
+
+    # Assert
+    spans = _read_spans(span_file)
+    assert spans["shard_job"]["args"]["parent_id"] == spans["submit"]["args"]["span_id"]
+    assert spans["shard_job"]["pid"] != spans["submit"]["pid"]
+
+
+def test_traceparent_round_trip_and_chrome_trace_conversion(span_file, tmp_path):
+    """Test that traceparent values round-trip and the JSONL converts to a traceEvents document."""
+    # Arrange
+    with span("root") as root:
+        pass
+    output = tmp_path / "trace.json"
+
+    # Act
+    parsed = parse_traceparent(format_traceparent(root.context))
+    written = to_chrome_trace(str(span_file), str(output))
+
+    # Assert
+    assert parsed == root.context
+    assert parse_traceparent("garbage") is None
+    assert written == 1
+    assert json.loads(output.read_text())["traceEvents"][0]["name"] == "root"
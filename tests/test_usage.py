@@ -0,0 +1,193 @@
+"""
+Tests for the usage module.
+"""
+
+import time
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from agents.usage import Usage
+
+from lib.agent import run_agent_with_messages_sync
+from lib.constants import USAGE_LIMIT_TITLE
+from lib.usage import (
+    SQLiteUsageStore,
+    UsageLimitExceeded,
+    UsageLimits,
+    UsageScope,
+    attachment_bytes_in,
+    background_usage,
+    configure_usage_store,
+    start_run,
+    thread_requester,
+    usage_scope,
+)
+
+
+@pytest.fixture
+def usage_store(tmp_path):
+    """Configure a usage store in a temporary SQLite file for the test."""
+    store = SQLiteUsageStore(str(tmp_path / "usage.sqlite3"))
+    configure_usage_store(store)
+    yield store
+    configure_usage_store(None)
+
+
+def test_totals_aggregate_by_scope(usage_store):
+    """Test that runs are summed per user, channel and workspace."""
+    # Arrange
+    since = time.time() - 60
+    first = usage_store.start_run(UsageScope("U1", "C1", "T1"), attachment_bytes=1000)
+    usage_store.finish_run(first, model_requests=1, input_tokens=100, output_tokens=20, cached_tokens=50)
+    second = usage_store.start_run(UsageScope("U2", "C1", "T1"))
+    usage_store.finish_run(second, model_requests=2, input_tokens=300, output_tokens=30, cached_tokens=0)
+
+    # Act
+    user_totals = usage_store.totals(since, user_id="U1")
+    team_totals = usage_store.totals(since, team_id="T1")
+    by_user = usage_store.totals_by("user_id", since)
+
+    # Assert
+    assert user_totals.input_tokens == 100 and user_totals.cached_tokens == 50 and user_totals.attachment_bytes == 1000
+    assert team_totals.runs == 2 and team_totals.model_requests == 3 and team_totals.output_tokens == 50
+    assert [user for user, _ in by_user] == ["U2", "U1"]
+    with pytest.raises(ValueError):
+        usage_store.totals_by("email", since)
+
+
+def test_token_quota_refuses_runs_once_used_up(usage_store):
+    """Test that a user past their daily tokens is refused, while other users and scopes are not."""
+    # Arrange
+    usage_store.limits = UsageLimits(user_tokens_per_day=100)
+    run_id = usage_store.start_run(UsageScope("U1", "C1", "T1"))
+    usage_store.finish_run(run_id, model_requests=1, input_tokens=90, output_tokens=10, cached_tokens=0)
+
+    # Act
+    with pytest.raises(UsageLimitExceeded) as refused:
+        usage_store.start_run(UsageScope("U1", "C2", "T1"))
+
+    # Assert
+    assert refused.value.quota == "user_tokens_per_day"
+    assert 0 < refused.value.retry_after <= 24 * 60 * 60
+    usage_store.start_run(UsageScope("U2", "C1", "T1"))
+    usage_store.start_run(UsageScope(None, "C1", "T1"))
+
+
+def test_in_flight_reservations_count_against_token_quotas(usage_store):
+    """Test that runs in flight hold their reserved tokens against the quota until finish_run settles them."""
+    # Arrange
+    usage_store.limits = UsageLimits(team_tokens_per_day=2_000)
+    first = usage_store.start_run(UsageScope("U1", "C1", "T1"), reserved_tokens=1_200)
+    second = usage_store.start_run(UsageScope("U2", "C1", "T1"), reserved_tokens=1_200)
+
+    # Act
+    with pytest.raises(UsageLimitExceeded) as refused:
+        usage_store.start_run(UsageScope("U3", "C1", "T1"), reserved_tokens=1_200)
+    usage_store.finish_run(first, model_requests=1, input_tokens=300, output_tokens=100, cached_tokens=0)
+    usage_store.finish_run(second, model_requests=0, input_tokens=0, output_tokens=0, cached_tokens=0)
+
+    # Assert
+    assert refused.value.quota == "team_tokens_per_day"
+    usage_store.start_run(UsageScope("U3", "C1", "T1"), reserved_tokens=1_200)
+
+
+def test_request_rate_limit_counts_started_runs(usage_store):
+    """Test that the per-user rate limit counts runs still in progress."""
+    # Arrange
+    usage_store.limits = UsageLimits(user_requests_per_minute=2)
+    usage_store.start_run(UsageScope("U1"))
+    usage_store.start_run(UsageScope("U1"))
+
+    # Act / Assert
+    with pytest.raises(UsageLimitExceeded):
+        usage_store.start_run(UsageScope("U1"))
+    assert usage_store.totals(0, user_id="U1").runs == 2
+
+
+def test_background_runs_are_accounted_but_not_rate_limited(usage_store):
+    """Test that runs in background_usage count toward the scope's usage but not its per-minute request limit."""
+    # Arrange
+    usage_store.limits = UsageLimits(user_requests_per_minute=1)
+    messages = [{"role": "user", "content": "Describe this"}]
+
+    # Act
+    with usage_scope("U1", "C1", "T1"):
+        with background_usage():
+            start_run(messages)
+            start_run(messages)
+        start_run(messages)
+        with pytest.raises(UsageLimitExceeded):
+            start_run(messages)
+
+    # Assert
+    assert usage_store.totals(0, user_id="U1").runs == 3
+
+
+def test_attachment_bytes_and_requester():
+    """Test measuring encoded attachments and finding the message being answered."""
+    # Arrange
+    messages = [
+        {"role": "user", "content": [{"type": "input_image", "image_url": "data:image/png;base64,AAAA"}]},
+        {"role": "assistant", "content": "Moo"},
+        {"role": "user", "content": [{"type": "input_file", "file_data": "xyz"}, {"type": "input_text", "text": "hi"}]},
+    ]
+    thread = [{"user": "U1", "team": "T1"}, {"bot_id": "B1"}, {"user": "U2", "team": "T1"}, {"bot_id": "B1"}]
+
+    # Act / Assert
+    assert attachment_bytes_in(messages) == len("data:image/png;base64,AAAA") + 3
+    assert thread_requester(thread) == {"user": "U2", "team": "T1"}
+    assert thread_requester([{"bot_id": "B1"}]) == {}
+
+
+def test_run_agent_records_usage_for_the_scope(usage_store):
+    """Test that an agent run is accounted to the scope it ran in."""
+    # Arrange
+    mock_result = MagicMock()
+    mock_result.final_output = "Moo"
+    mock_result.context_wrapper.usage = Usage(requests=1, input_tokens=120, output_tokens=30, total_tokens=150)
+
+    # Act
+    with patch("lib.agent.Agent"), patch("lib.agent.Runner") as MockRunner:
+        MockRunner.run = AsyncMock(return_value=mock_result)
+        with usage_scope("U1", "C1", "T1"):
+            run_agent_with_messages_sync([{"role": "user", "content": "Hello"}])
+
+    # Assert
+    totals = usage_store.totals(0, user_id="U1", channel_id="C1", team_id="T1")
+    assert totals.runs == 1 and totals.input_tokens == 120 and totals.output_tokens == 30
+
+
+def test_run_agent_over_quota_returns_limit_response(usage_store):
+    """Test that a refused run answers with the usage limit message and never calls the model."""
+    # Arrange
+    usage_store.limits = UsageLimits(team_tokens_per_day=10)
+    run_id = usage_store.start_run(UsageScope("U1", "C1", "T1"))
+    usage_store.finish_run(run_id, model_requests=1, input_tokens=10, output_tokens=0, cached_tokens=0)
+
+    # Act
+    with patch("lib.agent.Agent"), patch("lib.agent.Runner") as MockRunner:
+        MockRunner.run = AsyncMock()
+        with usage_scope("U2", "C2", "T1"):
+            response = run_agent_with_messages_sync([{"role": "user", "content": "Hello"}], use_structured_output=True)
+
+    # Assert
+    MockRunner.run.assert_not_called()
+    assert response.message_title == USAGE_LIMIT_TITLE
+
+
+def test_run_agent_without_usage_store_stays_on_the_event_loop():
+    """Test that without a usage store an agent run does no accounting on a worker thread."""
+    # Arrange
+    mock_result = MagicMock()
+    mock_result.final_output = "Moo"
+    mock_result.context_wrapper.usage = Usage(requests=1, input_tokens=120, output_tokens=30, total_tokens=150)
+
+    # Act
+    with patch("lib.agent.Agent"), patch("lib.agent.Runner") as MockRunner:
+        MockRunner.run = AsyncMock(return_value=mock_result)
+        with patch("lib.usage.asyncio.to_thread") as to_thread:
+            response = run_agent_with_messages_sync([{"role": "user", "content": "Hello"}])
+
+    # Assert
+    to_thread.assert_not_called()
+    assert response == "Moo"
@@ -0,0 +1,158 @@
+"""
+Tests for the user_directory module.
+"""
+
+import asyncio
+import threading
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from lib.slack_utils import format_slack_messages_for_openai
+from lib.slack_client import RateLimitedWebClient
+from lib.user_directory import USER_DIRECTORY, WARM_ON_MISSES, UserDirectory, display_name, user_directory_for
+
+
+def test_display_name_prefers_profile_display_name():
+    """Test that the profile display name wins over other name fields."""
+    # Arrange
+    user = {"id": "U1", "name": "daisy", "profile": {"display_name": "Daisy", "real_name": "Daisy Cow"}}
+
+    # Act / Assert
+    assert display_name(user) == "Daisy"
+    assert display_name({"id": "U2", "name": "bessie", "profile": {"display_name": ""}}) == "bessie"
+
+
+def test_warm_loads_all_pages():
+    """Test that warming follows users.list cursors until the last page."""
+    # Arrange
+    directory = UserDirectory()
+    mock_client = MagicMock()
+    mock_client.users_list.side_effect = [
+        {"members": [{"id": "U1", "name": "a"}], "response_metadata": {"next_cursor": "next"}},
+        {"members": [{"id": "U2", "name": "b"}], "response_metadata": {"next_cursor": ""}},
+    ]
+
+    # Act
+    count = directory.warm(mock_client)
+
+    # Assert
+    assert count == 2
+    assert directory.get("U1") == "a"
+    assert directory.get("U2") == "b"
+    assert mock_client.users_list.call_count == 2
+
+
+def test_resolve_only_fetches_missing_users_once():
+    """Test that resolve calls users.info once per unknown user and serves repeats from cache."""
+    # Arrange
+    directory = UserDirectory()
+    directory.put("U1", "Daisy")
+    mock_client = MagicMock()
+    mock_client.users_info.return_value = {"user": {"id": "U2", "name": "bessie"}}
+
+    # Act
+    first = directory.resolve(mock_client, ["U1", "U2", "U2"])
+    second = directory.resolve(mock_client, ["U2"])
+
+    # Assert
+    assert first == {"U1": "Daisy", "U2": "bessie"}
+    assert second == {"U2": "bessie"}
+    mock_client.users_info.assert_called_once_with(user="U2")
+
+
+def test_many_misses_refresh_in_background_instead_of_inline():
+    """Test that a lookup missing many users answers from users.info without waiting for users.list."""
+    # Arrange
+    directory = UserDirectory()
+    user_ids = [f"U{i}" for i in range(WARM_ON_MISSES + 5)]
+    listing = threading.Event()
+    release_listing = threading.Event()
+    mock_client = MagicMock()
+    mock_client.users_info.side_effect = lambda user: {"user": {"id": user, "name": user.lower()}}
+
+    def users_list(**kwargs):
+        listing.set()
+        release_listing.wait(2)
+        return {"members": [], "response_metadata": {}}
+
+    mock_client.users_list.side_effect = users_list
+
+    # Act
+    first = directory.resolve(mock_client, user_ids)
+    listing.wait(2)
+    directory.invalidate("U0")
+    second = directory.resolve(mock_client, user_ids)
+    release_listing.set()
+
+    # Assert
+    assert first == {uid: uid.lower() for uid in user_ids}
+    assert second == first
+    assert mock_client.users_info.call_count == len(user_ids) + 1
+    assert mock_client.users_list.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_async_warms_share_one_pass():
+    """Test that concurrent warm_async calls page through users.list once."""
+    # Arrange
+    directory = UserDirectory()
+    mock_client = MagicMock()
+
+    async def users_list(**kwargs):
+        await asyncio.sleep(0.01)
+        return {"members": [{"id": "U1", "name": "a"}], "response_metadata": {}}
+
+    mock_client.users_list = AsyncMock(side_effect=users_list)
+
+    # Act
+    counts = await asyncio.gather(directory.warm_async(mock_client), directory.warm_async(mock_client))
+
+    # Assert
+    assert counts == [1, 1]
+    assert mock_client.users_list.await_count == 1
+
+
+def test_entries_expire_after_ttl():
+    """Test that cached names are dropped once their TTL has passed."""
+    # Arrange
+    directory = UserDirectory(ttl_seconds=-1)
+
+    # Act
+    directory.put("U1", "Daisy")
+
+    # Assert
+    assert directory.get("U1") is None
+
+
+def test_format_slack_messages_attributes_speakers():
+    """Test that user messages are prefixed with their speaker's name and bot messages are not."""
+    # Arrange
+    slack_messages = [
+        {"text": "Hello", "user": "U1"},
+        {"text": "Hi there", "bot_id": "B123", "user": "UBOT"},
+        {"text": "Me too", "user": "U2"},
+    ]
+
+    # Act
+    result = format_slack_messages_for_openai(slack_messages, user_names={"U1": "Daisy", "U2": "Bessie", "UBOT": "Moo"})
+
+    # Assert
+    assert [m["content"] for m in result] == ["Daisy: Hello", "Hi there", "Bessie: Me too"]
+
+
+def test_user_directory_for_partitions_by_workspace():
+    """Test that pooled clients of different workspaces get separate directories, and other clients the shared one."""
+    # Arrange
+    first = RateLimitedWebClient(token="xoxb-1")
+    first.workspace_id = "T1"
+    second = RateLimitedWebClient(token="xoxb-2")
+    second.workspace_id = "T2"
+
+    # Act
+    user_directory_for(first).put("U1", "Daisy")
+
+    # Assert
+    assert user_directory_for(first).get("U1") == "Daisy"
+    assert user_directory_for(second).get("U1") is None
+    assert user_directory_for(MagicMock()) is USER_DIRECTORY
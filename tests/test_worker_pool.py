@@ -0,0 +1,171 @@
+"""
+Tests for the worker_pool module.
+"""
+
+import threading
+from unittest.mock import MagicMock, patch
+
+from lib.worker_pool import (
+    OVERFLOW_CALLER_RUNS,
+    OVERFLOW_DROP_OLDEST,
+    WorkerPool,
+    configure_worker_pool,
+    dispatch,
+    job_run_seconds,
+    jobs_total,
+)
+from lib.thread_locks import serialized_per_thread
+
+
+def _blocked_pool(overflow):
+    """Create a one-worker pool with a one-slot queue, with the worker held busy by a blocking job."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    pool = WorkerPool(size=1, queue_size=1, overflow=overflow)
+    pool.submit("block", block)
+    started.wait(5)
+    return pool, release
+
+
+def test_submit_runs_job_and_records_timing():
+    """Test that submitted jobs run on a worker and their run time is recorded."""
+    # Arrange
+    pool = WorkerPool(size=2, queue_size=10)
+    done = threading.Event()
+    before = job_run_seconds.count(job="timed")
+
+    # Act
+    accepted = pool.submit("timed", done.set)
+    pool.shutdown()
+
+    # Assert
+    assert accepted
+    assert done.is_set()
+    assert job_run_seconds.count(job="timed") == before + 1
+
+
+def test_submit_rejects_when_queue_full():
+    """Test that the reject policy refuses new jobs and calls their rejection handler."""
+    # Arrange
+    pool, release = _blocked_pool("reject")
+    pool.submit("queued", lambda: None)
+    on_rejected = MagicMock()
+
+    # Act
+    accepted = pool.submit("overflow", lambda: None, on_rejected=on_rejected)
+    release.set()
+    pool.shutdown()
+
+    # Assert
+    assert not accepted
+    on_rejected.assert_called_once()
+
+
+def test_submit_drop_oldest_replaces_queued_job():
+    """Test that the drop_oldest policy rejects the oldest queued job, outside the submit lock, and keeps the new one."""
+    # Arrange
+    pool, release = _blocked_pool(OVERFLOW_DROP_OLDEST)
+    lock_held = []
+    oldest_rejected = MagicMock(side_effect=lambda: lock_held.append(pool._submit_lock.locked()))
+    newest = MagicMock()
+    pool.submit("oldest", lambda: None, on_rejected=oldest_rejected)
+
+    # Act
+    accepted = pool.submit("newest", newest)
+    release.set()
+    pool.shutdown()
+
+    # Assert
+    assert accepted
+    oldest_rejected.assert_called_once()
+    assert lock_held == [False]
+    newest.assert_called_once()
+
+
+def test_submit_caller_runs_when_queue_full():
+    """Test that the caller_runs policy runs the overflow job on the submitting thread."""
+    # Arrange
+    pool, release = _blocked_pool(OVERFLOW_CALLER_RUNS)
+    pool.submit("queued", lambda: None)
+    ran_on = []
+
+    # Act
+    pool.submit("overflow", lambda: ran_on.append(threading.current_thread()))
+    release.set()
+    pool.shutdown()
+
+    # Assert
+    assert ran_on == [threading.current_thread()]
+
+
+def test_dispatch_runs_inline_without_pool():
+    """Test that dispatch runs the job on the calling thread when no pool is configured."""
+    # Arrange
+    configure_worker_pool(None)
+    job = MagicMock()
+
+    # Act
+    accepted = dispatch("inline", job, 1, key="value")
+
+    # Assert
+    assert accepted
+    job.assert_called_once_with(1, key="value")
+
+
+def test_dispatch_uses_configured_pool():
+    """Test that dispatch hands jobs to the configured pool."""
+    # Arrange
+    mock_pool = MagicMock()
+    job = MagicMock()
+
+    # Act
+    with patch("lib.worker_pool._pool", mock_pool):
+        dispatch("pooled", job, 1)
+
+    # Assert
+    job.assert_not_called()
+    mock_pool.submit.assert_called_once_with("pooled", job, 1, on_rejected=None)
+
+
+def test_failed_serialized_job_counts_as_error():
+    """Test that a job returning a Future is counted by how the Future resolves, so its errors are recorded."""
+    # Arrange
+    pool = WorkerPool(size=1, queue_size=10)
+    before = jobs_total.value(job="thread_reply", outcome="error")
+
+    @serialized_per_thread
+    def reply(channel_id, thread_ts):
+        raise RuntimeError("boom")
+
+    # Act
+    pool.submit("thread_reply", reply, "C1", "1.0")
+    pool.shutdown()
+
+    # Assert
+    assert jobs_total.value(job="thread_reply", outcome="error") == before + 1
+
+
+def test_shutdown_runs_queued_jobs_then_drops_the_rest_at_the_timeout():
+    """Test that shutdown waits for queued jobs until its timeout, drops and counts the rest, and refuses new jobs."""
+    # Arrange
+    pool, release = _blocked_pool("reject")
+    pool.submit("left_behind", lambda: None)
+    dropped_before = jobs_total.value(job="left_behind", outcome="dropped_at_shutdown")
+    on_rejected = MagicMock()
+
+    # Act
+    dropped = pool.shutdown(timeout=0.05)
+    accepted = pool.submit("late", lambda: None, on_rejected=on_rejected)
+    release.set()
+
+    # Assert
+    assert dropped == 1
+    assert jobs_total.value(job="left_behind", outcome="dropped_at_shutdown") == dropped_before + 1
+    assert not accepted
+    on_rejected.assert_called_once_with()
+    assert pool.shutdown() == 0